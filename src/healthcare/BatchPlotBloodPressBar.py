@@ -0,0 +1,310 @@
+import argparse
+import logging
+import os
+import statistics
+import time
+from typing import Dict, Hashable, List, Tuple
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import rcParams
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from PlotBloodPressBar_3_pandas_month import (
+    AXES_GRID_STYLE, BAR_COLORS, BAR_LINE_STYLE, BAR_WIDTH, COLOR_PRESS_MIN, COLOR_PULSE_RATE,
+    FMT_DATE, LEGEND_LOC, LEGEND_PULSE_LABEL, LIM_MAX_PULSE, PHONE_DENSITY, PHONE_PX_HEIGHT,
+    PHONE_PX_WIDTH, STD_BLOOD_PRESS_MAX, STD_BLOOD_PRESS_MIN, STD_LINE_STYLE, TITLE_FONT_STYLE,
+    USE_COLS, X_LIM_MARGIN, X_TICKS_STYLE, Y_LIM_MARGIN, Y_PRESSURE_LABEL, Y_PULSE_LABEL,
+    calcEndOfMonth, compute_y_lim_range, drawCustomBarLegend, drawTextOverValue,
+    makeColListForPlotting, makeTitleWithMonthRange
+)
+from util.csv_month_index import get_index, read_month_bytes
+from util.fixed_layout import save_figure
+from util.phase_timer import (
+    PHASE_DRAW, PHASE_ENCODE, PHASE_FIGURE, PHASE_READ, PHASE_WRITE, span, start_timer, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.plot_template import StaticTemplate, TemplateCache, encode_png
+
+"""
+健康管理DBからエクスポートした血圧測定データの月間棒グラフを複数月分まとめて出力する (バッチ)
+[描画方法]
+  静的レイヤー (Y軸, グリッド線, 基準線, 凡例) は図の仕様毎に1回だけ描画しラスターをキャッシュする
+  図の仕様: 月の日数, Y軸の範囲
+    ※Y軸の範囲は全月共通の範囲に固定する (範囲外の値を含む月のみ広げる)
+  月毎にデータレイヤー (血圧の棒, 脈拍の折れ線, 基準値超過の値, X軸ラベル, タイトル) のみ描画する
+    ※X軸ラベル (日と曜日) は月毎に異なるため、X軸はテンプレートのダイナミックとして毎回描画する
+  ※ --no-template で月毎に全レイヤーを描画する (処理時間の比較用)
+[出力] 出力ディレクトリ/BloodPressBar_YYYY-MM.png
+[実行例] python BatchPlotBloodPressBar.py --blood-press datas/csv/blood_pressure.csv
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# デフォルトの出力ディレクトリ
+DEFAULT_OUTPUT_DIR: str = os.path.join("output", "blood_press")
+# 出力ファイル名フォーマット
+FMT_OUTPUT_FILE: str = "BloodPressBar_{}.png"
+# 描画領域の名前 (テンプレートの描画領域の辞書のキー)
+AXES_PRESSURE: str = "pressure"
+AXES_PULSE_RATE: str = "pulse_rate"
+# 全月共通のY軸の範囲 (下限, 上限) ※月毎の値から計算するとテンプレートを共有できないため固定する
+BATCH_Y_LIM_MIN: float = 40.
+BATCH_Y_LIM_MAX: float = 180.
+
+
+def pixelToInch(width_px: int, height_px: int, density: float) -> Tuple[float, float]:
+    """
+    携帯用の描画領域サイズ(ピクセル)をインチに変換する
+    :param width_px: 幅(ピクセル)
+    :param height_px: 高さ(ピクセル)
+    :param density: 密度
+    :return: 幅(インチ), 高さ(インチ)
+    """
+    px: float = 1 / rcParams["figure.dpi"]
+    px = px / (2.0 if density > 2.0 else density)
+    return width_px * px, height_px * px
+
+
+def readMonthData(path_csv: str, year_month: str) -> DataFrame:
+    """
+    指定年月の血圧測定データを読み込み月間(1日〜末日)のインデックスを設定する ※欠損日は NaN
+    :param path_csv: 血圧測定CSVファイルパス
+    :param year_month: 年月
+    :return: 月間の血圧測定データ
+    """
+    endDay: int = calcEndOfMonth(year_month)
+    df: DataFrame = pd.read_csv(
+        read_month_bytes(path_csv, year_month), header=0,
+        parse_dates=['measurement_day'], date_format=FMT_DATE,
+        usecols=USE_COLS
+    )
+    return df.set_index('measurement_day').reindex(
+        pd.date_range(start=f"{year_month}-01", end=f"{year_month}-{endDay:#02d}",
+                      name='measurement_day')
+    )
+
+
+def pinYLimRange(yLimMin: float, yLimMax: float) -> Tuple[float, float]:
+    """
+    月毎のY軸の範囲を全月共通の範囲に揃える ※共通の範囲外の値を含む月は月毎の範囲まで広げる
+    :param yLimMin: 月毎のY軸の最小値 (compute_y_lim_range)
+    :param yLimMax: 月毎のY軸の最大値 (compute_y_lim_range)
+    :return: Y軸の最小値, Y軸の最大値
+    """
+    return min(float(yLimMin), BATCH_Y_LIM_MIN), max(float(yLimMax), BATCH_Y_LIM_MAX)
+
+
+def buildFigure(figsize: Tuple[float, float], xTicksLabels: List[str],
+                yLimMin: float, yLimMax: float,
+                title: str) -> Tuple[Figure, Axes, Axes]:
+    """
+    静的レイヤー (軸, X軸ラベル, グリッド線, 基準線, 凡例) を描画した図を生成する
+    :param figsize: 図のサイズ(インチ)
+    :param xTicksLabels: X軸ラベル
+    :param yLimMin: Y軸の最小値
+    :param yLimMax: Y軸の最大値
+    :param title: タイトル ※レイアウト計算用 (テンプレートではデータレイヤー)
+    :return: 図, 血圧の描画領域, 脈拍の描画領域
+    """
+    # pyplotに登録しない (テンプレートキャッシュから外れたら解放される)
+    fig: Figure = Figure(figsize=figsize, layout='constrained')
+    ax: Axes = fig.subplots()
+    # Y方向のグリッド線のみ表示 ※データレイヤーを前面に描画するためグリッド線は背面
+    ax.set_axisbelow(True)
+    ax.grid(**AXES_GRID_STYLE)
+    ax.set_ylabel(Y_PRESSURE_LABEL)
+    ax.set_title(title, fontdict=TITLE_FONT_STYLE)
+    # 最高血圧・最低血圧の基準線
+    ax.axhline(y=STD_BLOOD_PRESS_MAX, **STD_LINE_STYLE)
+    ax.axhline(y=STD_BLOOD_PRESS_MIN, **STD_LINE_STYLE)
+    ax.set_yticks(np.arange(yLimMin, yLimMax + 1, Y_LIM_MARGIN))
+    ax.set_ylim(yLimMin, yLimMax)
+    ax.set_xticks(np.arange(len(xTicksLabels)), xTicksLabels, **X_TICKS_STYLE)
+    ax.set_xlim(X_LIM_MARGIN, (len(xTicksLabels) + X_LIM_MARGIN))
+    # 棒グラフ(AM/PM毎のカラー)の凡例を描画
+    drawCustomBarLegend(ax, X_LIM_MARGIN, yLimMin)
+
+    # 右側軸: 脈拍
+    ax_pulseRate: Axes = ax.twinx()
+    ax_pulseRate.set_ylabel(Y_PULSE_LABEL)
+    ax_pulseRate.set_yticks(np.arange(yLimMin, LIM_MAX_PULSE + 1, Y_LIM_MARGIN))
+    ax_pulseRate.set_ylim(yLimMin, yLimMax)
+    # 凡例は折れ線と同じスタイルのダミー線で作成する (折れ線はデータレイヤー)
+    ax_pulseRate.legend(
+        handles=[Line2D([], [], color=COLOR_PULSE_RATE, label=LEGEND_PULSE_LABEL)],
+        loc=LEGEND_LOC
+    )
+    return fig, ax, ax_pulseRate
+
+
+def drawDataLayers(ax: Axes, ax_pulseRate: Axes, title: str, xTicksLabels: List[str],
+                   pressMaxValues: np.ndarray, pressMinValues: np.ndarray,
+                   pulseValues: np.ndarray) -> None:
+    """
+    データレイヤー (血圧の棒, 脈拍の折れ線, 基準値超過の値, X軸ラベル, タイトル) を描画する
+    :param ax: 血圧の描画領域
+    :param ax_pulseRate: 脈拍の描画領域
+    :param title: タイトル
+    :param xTicksLabels: X軸ラベル ※目盛りの位置は静的レイヤー (月の日数で決まる)
+    :param pressMaxValues: 最高血圧値 (AM/PM交互)
+    :param pressMinValues: 最低血圧値 (AM/PM交互)
+    :param pulseValues: 脈拍値 (AM/PM交互)
+    """
+    xIndexes: np.ndarray = np.arange(pressMaxValues.shape[0])
+    ax.set_title(title, fontdict=TITLE_FONT_STYLE)
+    ax.set_xticks(xIndexes, xTicksLabels, **X_TICKS_STYLE)
+    # 最低血圧値の棒グラフ: 描画領域色(白色)にして見えないようにする
+    ax.bar(xIndexes, pressMinValues, BAR_WIDTH, color=COLOR_PRESS_MIN)
+    # 最大血圧値(最低血圧値との差分): 棒のカラー(AMカラー/PMカラー交互)
+    ax.bar(
+        xIndexes, pressMaxValues - pressMinValues, BAR_WIDTH,
+        bottom=pressMinValues, color=BAR_COLORS * (xIndexes.shape[0] // 2), **BAR_LINE_STYLE
+    )
+    # 最高血圧: 基準値を超えた値のみを上端に表示
+    drawTextOverValue(ax, pressMaxValues, STD_BLOOD_PRESS_MAX)
+    ax_pulseRate.plot(xIndexes, pulseValues, color=COLOR_PULSE_RATE)
+
+
+def buildTemplate(figsize: Tuple[float, float], spec_key: Hashable, xTicksLabels: List[str],
+                  yLimMin: float, yLimMax: float, title: str) -> StaticTemplate:
+    """
+    静的テンプレートを作成する
+    :param figsize: 図のサイズ(インチ)
+    :param spec_key: 図の仕様
+    :param xTicksLabels: X軸ラベル ※レイアウト計算用 (テンプレートではデータレイヤー)
+    :param yLimMin: Y軸の最小値
+    :param yLimMax: Y軸の最大値
+    :param title: タイトル ※レイアウト計算用
+    :return: 静的テンプレート
+    """
+    fig, ax, ax_pulseRate = buildFigure(figsize, xTicksLabels, yLimMin, yLimMax, title)
+    # 基準線と凡例は棒グラフより前面
+    overlays = list(ax.lines) + list(ax.patches) + list(ax.texts) + [ax_pulseRate.get_legend()]
+    # X軸ラベル (日と曜日) は月毎に異なるため X軸は毎回描画する
+    return StaticTemplate(
+        fig, {AXES_PRESSURE: ax, AXES_PULSE_RATE: ax_pulseRate},
+        layout_name=f"{script_name}:{spec_key}", overlays=overlays, dynamics=[ax.xaxis]
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 血圧測定CSVデータファイルパス: 複数月
+    parser.add_argument("--blood-press", type=str, required=True,
+                        help="datas/csv/blood_pressure.csv")
+    # 出力ディレクトリ
+    parser.add_argument("--output-dir", type=str, default=DEFAULT_OUTPUT_DIR,
+                        help=f"出力ディレクトリ (デフォルト {DEFAULT_OUTPUT_DIR})")
+    # 全レイヤーを月毎に描画する (処理時間の比較用)
+    parser.add_argument("--no-template", action="store_true",
+                        help="Render all layers for each month.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, no_template=args.no_template)
+    start_profiler(script_name, args.profile, args.output_dir, logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, no_template=args.no_template)
+
+    path_csv: str = os.path.expanduser(args.blood_press)
+    if not os.path.exists(path_csv):
+        app_logger.warning("CSV not found.")
+        exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    figsize: Tuple[float, float] = pixelToInch(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+    templates: TemplateCache = TemplateCache()
+    # CSVに含まれる全ての年月 (年月オフセットインデックス)
+    year_months: List[str] = sorted(get_index(path_csv).months.keys())
+    app_logger.info(f"year_months: {year_months}")
+
+    render_times: Dict[str, float] = {}
+    # テンプレートを作成した年月 (キャッシュミス)
+    built_months: List[str] = []
+    batch_start: float = time.perf_counter()
+    for year_month in year_months:
+        start: float = time.perf_counter()
+        with span(PHASE_READ) as sp:
+            df_month: DataFrame = readMonthData(path_csv, year_month)
+            sp.rows = df_month.shape[0]
+        xTicksLabels, pressMaxValues, pressMinValues, pulseValues = makeColListForPlotting(
+            df_month
+        )
+        yLimMin, yLimMax = pinYLimRange(
+            *compute_y_lim_range(pressMinValues, pulseValues, pressMaxValues))
+        titleDateRange: str = makeTitleWithMonthRange(year_month, df_month.shape[0])
+        save_path: str = os.path.join(args.output_dir, FMT_OUTPUT_FILE.format(year_month))
+
+        if args.no_template:
+            with span(PHASE_FIGURE):
+                fig, ax, ax_pulseRate = buildFigure(
+                    figsize, xTicksLabels, yLimMin, yLimMax, titleDateRange
+                )
+                drawDataLayers(ax, ax_pulseRate, titleDateRange, xTicksLabels,
+                               pressMaxValues, pressMinValues, pulseValues)
+            timed_save(fig, save_path, lambda fp: save_figure(
+                fig, fp, script_name, fixed_layout=True, format="png"))
+        else:
+            # 図の仕様: 月の日数, Y軸の範囲 (全月共通)
+            spec_key: Tuple = (df_month.shape[0], yLimMin, yLimMax)
+            built: int = templates.built
+            with span(PHASE_FIGURE):
+                template: StaticTemplate = templates.get(
+                    spec_key, lambda: buildTemplate(
+                        figsize, spec_key, xTicksLabels, yLimMin, yLimMax, titleDateRange)
+                )
+            if templates.built > built:
+                built_months.append(year_month)
+            with span(PHASE_DRAW):
+                rgba: np.ndarray = template.render(
+                    lambda axes: drawDataLayers(
+                        axes[AXES_PRESSURE], axes[AXES_PULSE_RATE], titleDateRange, xTicksLabels,
+                        pressMaxValues, pressMinValues, pulseValues)
+                )
+            with span(PHASE_ENCODE):
+                png: bytes = encode_png(rgba)
+            with span(PHASE_WRITE) as sp:
+                with open(save_path, "wb") as fp:
+                    fp.write(png)
+                sp.nbytes = len(png)
+        render_times[year_month] = (time.perf_counter() - start) * 1000.
+        app_logger.info(f"{save_path}: {render_times[year_month]:.1f}ms")
+
+    # バッチ全体の処理時間 (テンプレートの作成を含む)
+    batch_ms: float = (time.perf_counter() - batch_start) * 1000.
+    app_logger.info(
+        f"months: {len(render_times)}, templates built: {templates.built}, "
+        f"batch total: {batch_ms:.1f}ms, per month: {batch_ms / max(len(render_times), 1):.1f}ms"
+    )
+    if not args.no_template:
+        # テンプレートを作成した月と再利用した月の平均処理時間
+        built_times: List[float] = [render_times[year_month] for year_month in built_months]
+        reused_times: List[float] = [
+            elapsed for year_month, elapsed in render_times.items() if year_month not in built_months
+        ]
+        app_logger.info(
+            f"built: {len(built_times)} months "
+            f"(mean {statistics.mean(built_times) if built_times else 0.:.1f}ms), "
+            f"reused: {len(reused_times)} months "
+            f"(mean {statistics.mean(reused_times) if reused_times else 0.:.1f}ms)"
+        )
@@ -0,0 +1,136 @@
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from BenchmarkFixedLayout import (
+    PHONE_DENSITY, PHONE_PX_HEIGHT, PHONE_PX_WIDTH, makeBarTwinx, makeGrid4x1, pixelToInch
+)
+from util.density_outputs import (
+    DENSITY_CHOICES, DENSITY_SCALES, THUMBNAIL_DIR, THUMBNAIL_PX_WIDTH, density_path, dp_size,
+    save_densities
+)
+from util.fixed_layout import save_figure
+
+"""
+携帯アプリ向けの複数密度の画像出力の処理時間を比較するベンチマーク
+[比較モード]
+  (1) separate: 密度毎 (サムネイルを含む) に図の作成・レイアウト計算・保存を繰り返す (密度毎に別々に実行する場合)
+  (2) pipeline: 図の作成・レイアウト計算は1回, 密度毎に描画し PNGエンコード・書き込みは並列 (save_densities)
+[対象図] BenchmarkFixedLayout.py と同じ携帯用サイズのダミーデータの図 (bar_twinx, grid_4x1)
+[実行例] python BenchmarkDensityOutputs.py --repeat 5
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 出力ファイル名フォーマット
+FMT_OUTPUT_FILE: str = "{}.png"
+# 結果出力フォーマット
+FMT_RESULT: str = "{:<10} {:<9} outputs={} median={:>8.2f}ms"
+FMT_SPEEDUP: str = "{:<10} pipeline/separate={:.1%}"
+
+
+def saveSeparately(make_figure: Callable[[Tuple[float, float]], Figure],
+                   figsize: Tuple[float, float], out_dir: str, fig_name: str, width_dp: float,
+                   cache_file: str) -> int:
+    """
+    密度毎に図を作成しレイアウトを計算して保存する (レイアウト未キャッシュ)
+    :param make_figure: 図の作成関数
+    :param figsize: 図のサイズ(インチ)
+    :param out_dir: 出力ディレクトリ
+    :param fig_name: 図の名前 (レイアウト名, ファイル名)
+    :param width_dp: 描画領域の幅 (dp)
+    :param cache_file: レイアウトキャッシュファイル ※保存毎に削除する
+    :return: 出力件数
+    """
+    file_name: str = FMT_OUTPUT_FILE.format(fig_name)
+    # (出力先, 幅のピクセル数)
+    outputs: List[Tuple[str, float]] = [
+        (density_path(out_dir, density, file_name), width_dp * DENSITY_SCALES[density])
+        for density in DENSITY_CHOICES
+    ]
+    outputs.append((os.path.join(out_dir, THUMBNAIL_DIR, file_name), THUMBNAIL_PX_WIDTH))
+    for save_path, width_px in outputs:
+        fig: Figure = make_figure(figsize)
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        save_figure(fig, save_path, fig_name, fixed_layout=True, cache_file=cache_file,
+                    format="png", dpi=width_px / figsize[0])
+        plt.close(fig)
+    return len(outputs)
+
+
+def savePipeline(make_figure: Callable[[Tuple[float, float]], Figure],
+                 figsize: Tuple[float, float], out_dir: str, fig_name: str,
+                 width_dp: float) -> int:
+    """
+    図を1回だけ作成し密度毎に描画して保存する (save_densities)
+    :param make_figure: 図の作成関数
+    :param figsize: 図のサイズ(インチ)
+    :param out_dir: 出力ディレクトリ
+    :param fig_name: 図の名前 (レイアウト名, ファイル名)
+    :param width_dp: 描画領域の幅 (dp)
+    :return: 出力件数
+    """
+    fig: Figure = make_figure(figsize)
+    save_paths: Dict[str, str] = save_densities(
+        fig, out_dir, FMT_OUTPUT_FILE.format(fig_name), width_dp, fig_name)
+    plt.close(fig)
+    return len(save_paths)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 計測回数
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数 (デフォルト 5)")
+    # 作業ディレクトリ ※未指定なら一時ディレクトリ (終了時に削除)
+    parser.add_argument("--work-dir", type=str, help="Directory for the written images.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.repeat < 1:
+        app_logger.warning("--repeat must be >= 1")
+        exit(1)
+
+    figsize: Tuple[float, float] = pixelToInch(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+    param_width_dp: float = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)[0]
+    figure_makers: Dict[str, Callable[[Tuple[float, float]], Figure]] = {
+        "bar_twinx": makeBarTwinx, "grid_4x1": makeGrid4x1
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir: str = args.work_dir if args.work_dir is not None else tmp_dir
+        cache_file: str = os.path.join(tmp_dir, "fixed_layout.json")
+        for fig_name, make_figure in figure_makers.items():
+            modes: Dict[str, Callable[[], int]] = {
+                "separate": lambda: saveSeparately(
+                    make_figure, figsize, os.path.join(work_dir, "separate"), fig_name,
+                    param_width_dp, cache_file),
+                "pipeline": lambda: savePipeline(
+                    make_figure, figsize, os.path.join(work_dir, "pipeline"), fig_name,
+                    param_width_dp),
+            }
+            medians: Dict[str, float] = {}
+            for mode, save_func in modes.items():
+                elapsed: List[float] = []
+                outputs: int = 0
+                for _ in range(args.repeat):
+                    start: float = time.perf_counter()
+                    outputs = save_func()
+                    elapsed.append((time.perf_counter() - start) * 1000.)
+                medians[mode] = statistics.median(elapsed)
+                app_logger.info(FMT_RESULT.format(fig_name, mode, outputs, medians[mode]))
+            app_logger.info(FMT_SPEEDUP.format(fig_name, medians["pipeline"] / medians["separate"]))
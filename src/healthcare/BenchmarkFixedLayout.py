@@ -0,0 +1,173 @@
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from util.fixed_layout import save_figure
+
+"""
+画像保存の描画回数と処理時間を比較するベンチマーク
+[比較モード]
+  (1) tight: layout='constrained' + bbox_inches="tight" (従来の保存方法)
+  (2) fixed(miss): 固定レイアウト (レイアウト未キャッシュ: 初回のみレイアウト計算)
+  (3) fixed(hit): 固定レイアウト (キャッシュ済みの位置を設定して1回の描画)
+[対象図] 携帯用サイズ (1064x1704px, 密度2.75) の以下の図 ※ダミーデータ
+  bar_twinx: 血圧測定データ (棒グラフ + 右側軸の折れ線)
+  grid_4x1: 睡眠管理データの度数表 (4行1列)
+[実行例] python BenchmarkFixedLayout.py --repeat 10
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 携帯用の描画領域サイズ(ピクセル)と密度
+PHONE_PX_WIDTH: int = 1064
+PHONE_PX_HEIGHT: int = 1704
+PHONE_DENSITY: float = 2.75
+# 月間のデータ件数 (AM/PM)
+MONTH_DAYS: int = 31
+# 結果出力フォーマット
+FMT_RESULT: str = "{:<10} {:<12} draws={:>2} layouts={:>2} median={:>8.2f}ms"
+
+
+def pixelToInch(width_px: int, height_px: int, density: float) -> Tuple[float, float]:
+    """
+    携帯用の描画領域サイズ(ピクセル)をインチに変換する
+    :param width_px: 幅(ピクセル)
+    :param height_px: 高さ(ピクセル)
+    :param density: 密度
+    :return: 幅(インチ), 高さ(インチ)
+    """
+    px: float = 1 / plt.rcParams["figure.dpi"]
+    px = px / (2.0 if density > 2.0 else density)
+    return width_px * px, height_px * px
+
+
+def makeBarTwinx(figsize: Tuple[float, float]) -> Figure:
+    """
+    血圧測定データ相当の図 (棒グラフ + 右側軸の折れ線) を生成する
+    :param figsize: 図のサイズ(インチ)
+    :return: Figure
+    """
+    rng: np.random.Generator = np.random.default_rng(0)
+    x_indexes: np.ndarray = np.arange(MONTH_DAYS * 2)
+    fig, ax = plt.subplots(figsize=figsize, layout='constrained')
+    ax.bar(x_indexes, rng.uniform(60, 90, x_indexes.size), 0.7, color="white")
+    ax.bar(x_indexes, rng.uniform(30, 60, x_indexes.size), 0.7,
+           bottom=75, color=["limegreen", "darkorange"] * MONTH_DAYS)
+    ax.set_title("Blood pressure 2023-01-01 - 2023-01-31")
+    ax.set_ylabel("mmHg")
+    ax.set_xticks(x_indexes, [f"{i // 2 + 1} (Mo)" if i % 2 == 0 else "" for i in x_indexes],
+                  rotation=90)
+    ax_pulse = ax.twinx()
+    ax_pulse.plot(x_indexes, rng.uniform(55, 75, x_indexes.size), color="blue", label="pulse")
+    ax_pulse.set_ylabel("bpm")
+    ax_pulse.legend(loc="upper right")
+    return fig
+
+
+def makeGrid4x1(figsize: Tuple[float, float]) -> Figure:
+    """
+    睡眠管理データの度数表相当の図 (4行1列) を生成する
+    :param figsize: 図のサイズ(インチ)
+    :return: Figure
+    """
+    rng: np.random.Generator = np.random.default_rng(0)
+    fig, axes = plt.subplots(4, 1, figsize=figsize, layout='constrained',
+                             gridspec_kw={'height_ratios': [1.2, 1., 1., 1.]})
+    for idx, ax in enumerate(axes):
+        ax.bar(np.arange(12), rng.integers(0, 10, 12), 0.4, label="good")
+        ax.bar(np.arange(12) + 0.4, rng.integers(0, 10, 12), 0.4, label="warning")
+        ax.set_title(f"histogram {idx + 1}")
+        ax.set_xticks(np.arange(12), [f"{h:02d}:00" for h in range(12)])
+        ax.legend(loc="upper right")
+    return fig
+
+
+def saveWithoutCache(fig: Figure, layout_name: str, cache_file: str) -> None:
+    """
+    レイアウトキャッシュファイルを削除してから固定レイアウトで保存する (レイアウト未キャッシュ)
+    :param fig: Figure
+    :param layout_name: レイアウト名
+    :param cache_file: レイアウトキャッシュファイル
+    """
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+    save_figure(fig, BytesIO(), layout_name, fixed_layout=True, cache_file=cache_file, format="png")
+
+
+def countingSave(fig: Figure, save_func: Callable[[Figure], None]) -> Tuple[int, int, float]:
+    """
+    保存時の描画回数・レイアウト計算回数・処理時間を計測する
+    :param fig: Figure
+    :param save_func: 保存関数
+    :return: 描画回数, レイアウト計算回数, 処理時間(ミリ秒)
+    """
+    counts: Dict[str, int] = {"draw": 0, "layout": 0}
+    org_draw = fig.draw
+
+    def draw(renderer):
+        counts["draw"] += 1
+        return org_draw(renderer)
+
+    fig.draw = draw
+    engine = fig.get_layout_engine()
+    if engine is not None:
+        org_execute = engine.execute
+
+        def execute(target_fig):
+            counts["layout"] += 1
+            return org_execute(target_fig)
+
+        engine.execute = execute
+
+    start: float = time.perf_counter()
+    save_func(fig)
+    elapsed_ms: float = (time.perf_counter() - start) * 1000.
+    return counts["draw"], counts["layout"], elapsed_ms
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 計測回数
+    parser.add_argument("--repeat", type=int, default=10, help="計測回数 (デフォルト 10)")
+    args: argparse.Namespace = parser.parse_args()
+
+    figsize: Tuple[float, float] = pixelToInch(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+    figure_makers: Dict[str, Callable[[Tuple[float, float]], Figure]] = {
+        "bar_twinx": makeBarTwinx, "grid_4x1": makeGrid4x1
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file: str = os.path.join(tmp_dir, "fixed_layout.json")
+        for fig_name, make_figure in figure_makers.items():
+            modes: List[Tuple[str, Callable[[Figure], None]]] = [
+                ("tight", lambda f: save_figure(f, BytesIO(), fig_name, format="png")),
+                ("fixed(miss)", lambda f: saveWithoutCache(f, fig_name, cache_file)),
+                ("fixed(hit)", lambda f: save_figure(
+                    f, BytesIO(), fig_name, fixed_layout=True, cache_file=cache_file, format="png")),
+            ]
+            for mode, save_func in modes:
+                results: List[Tuple[int, int, float]] = []
+                for _ in range(args.repeat):
+                    fig: Figure = make_figure(figsize)
+                    results.append(countingSave(fig, save_func))
+                    plt.close(fig)
+                draws, layouts, _ = results[-1]
+                median_ms: float = statistics.median([elapsed for _, _, elapsed in results])
+                app_logger.info(FMT_RESULT.format(fig_name, mode, draws, layouts, median_ms))
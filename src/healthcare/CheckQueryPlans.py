@@ -0,0 +1,186 @@
+import argparse
+import logging
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Set
+
+import sqlalchemy
+from sqlalchemy.sql import text
+
+from util.db_engine import get_engine
+from util.plan_check import PlanWarning, check_plan, explain, format_plan
+from util.queries import QUERIES
+
+"""
+健康管理データベースの全選択クエリー (util/queries.py) の実行計画をチェックする
+(1) 複数年分の合成データをトランザクション内で登録し統計情報を更新する
+(2) 各クエリーの EXPLAIN を取得し、シーケンシャルスキャンと行数見積もりの爆発を警告する
+(3) トランザクションはロールバックするため合成データはデータベースに残らない
+[実行例] python CheckQueryPlans.py --years 5 --persons 10 --analyze
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 健康管理データベース接続情報
+DB_HEALTHCARE_CONF: str = os.path.join("conf", "db_healthcare.json")
+
+# ISO8601フォーマット
+FMT_DATE: str = '%Y-%m-%d'
+# 合成データのメールアドレス
+FMT_SEED_EMAIL: str = "plancheck{}@examples.com"
+SEED_EMAIL_PATTERN: str = "plancheck%@examples.com"
+# シーケンシャルスキャンを許容するテーブル (ユーザーテーブルは件数が少ない)
+IGNORE_SEQ_SCAN_TABLES: Set[str] = {"person"}
+
+# 合成データ登録SQL
+# ユーザーテーブル: 既存の最大ID以降に登録
+INSERT_SEED_PERSON: str = """
+INSERT INTO bodyhealth.person(id, email, name)
+SELECT
+  (SELECT COALESCE(MAX(id), 0) FROM bodyhealth.person) + g
+  ,'plancheck' || g || '@examples.com'
+  ,'plancheck' || g
+FROM generate_series(1, :persons) g
+"""
+# 睡眠管理テーブル
+INSERT_SEED_SLEEP_MAN: str = """
+INSERT INTO bodyhealth.sleep_management(
+  pid, measurement_day, wakeup_time, sleep_score, sleeping_time, deep_sleeping_time)
+SELECT
+  p.id, d::date
+  ,time '05:00' + (random() * 90) * interval '1 minute'
+  ,(55 + random() * 45)::smallint
+  ,time '05:00' + (random() * 180) * interval '1 minute'
+  ,time '00:20' + (random() * 70) * interval '1 minute'
+FROM
+  bodyhealth.person p
+  CROSS JOIN generate_series(CAST(:startDay AS date), CAST(:endDay AS date), interval '1 day') d
+WHERE
+  p.email LIKE :emailPattern
+"""
+# 夜間頻尿要因テーブル
+INSERT_SEED_NOCTURIA_FACTORS: str = """
+INSERT INTO bodyhealth.nocturia_factors(
+  pid, measurement_day, midnight_toilet_visits, has_coffee, has_tea, has_alcohol,
+  has_nutrition_drink, has_sports_drink, has_diuretic, take_medicine, take_bathing)
+SELECT
+  p.id, d::date
+  ,(random() * 6)::smallint
+  ,random() < 0.5, random() < 0.3, random() < 0.1
+  ,random() < 0.1, random() < 0.1, random() < 0.05, random() < 0.5, random() < 0.7
+FROM
+  bodyhealth.person p
+  CROSS JOIN generate_series(CAST(:startDay AS date), CAST(:endDay AS date), interval '1 day') d
+WHERE
+  p.email LIKE :emailPattern
+"""
+# 血圧測定テーブル
+INSERT_SEED_BLOOD_PRESS: str = """
+INSERT INTO bodyhealth.blood_pressure(
+  pid, measurement_day
+  ,morning_measurement_time, morning_max, morning_min, morning_pulse_rate
+  ,evening_measurement_time, evening_max, evening_min, evening_pulse_rate)
+SELECT
+  p.id, d::date
+  ,time '06:30' + (random() * 60) * interval '1 minute'
+  ,(105 + random() * 35)::smallint, (60 + random() * 25)::smallint, (55 + random() * 20)::smallint
+  ,time '20:30' + (random() * 120) * interval '1 minute'
+  ,(105 + random() * 35)::smallint, (60 + random() * 25)::smallint, (55 + random() * 20)::smallint
+FROM
+  bodyhealth.person p
+  CROSS JOIN generate_series(CAST(:startDay AS date), CAST(:endDay AS date), interval '1 day') d
+WHERE
+  p.email LIKE :emailPattern
+"""
+SEED_TABLES: List[str] = [
+    "bodyhealth.person", "bodyhealth.sleep_management",
+    "bodyhealth.nocturia_factors", "bodyhealth.blood_pressure"
+]
+
+
+def seedSyntheticData(conn: sqlalchemy.Connection,
+                      persons: int, start_day: str, end_day: str) -> None:
+    """
+    合成データを登録し統計情報を更新する ※呼び出し側のトランザクション内で実行する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param persons: 合成ユーザー数
+    :param start_day: 合成データの開始日
+    :param end_day: 合成データの終了日
+    """
+    params: Dict = {"startDay": start_day, "endDay": end_day, "emailPattern": SEED_EMAIL_PATTERN}
+    conn.execute(text(INSERT_SEED_PERSON), {"persons": persons})
+    for sql in [INSERT_SEED_SLEEP_MAN, INSERT_SEED_NOCTURIA_FACTORS, INSERT_SEED_BLOOD_PRESS]:
+        rs = conn.execute(text(sql), params)
+        app_logger.info(f"seed rows: {rs.rowcount}")
+    # ANALYZE はトランザクション内で実行可能 (ロールバックで統計情報も元に戻る)
+    for table in SEED_TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数
+    parser.add_argument("--years", type=int, default=5, help="合成データの年数 (デフォルト 5)")
+    # 合成ユーザー数
+    parser.add_argument("--persons", type=int, default=10, help="合成ユーザー数 (デフォルト 10)")
+    # EXPLAIN ANALYZE で実際の行数と比較する
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE を実行する")
+    # 見積もり行数の爆発とみなす倍率
+    parser.add_argument("--blowup-ratio", type=float, default=10., help="行数見積もりの許容倍率")
+    # ホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    args: argparse.Namespace = parser.parse_args()
+
+    # 合成データの期間: 本日から指定年数前まで
+    today: date = date.today()
+    seed_start: str = (today - timedelta(days=365 * args.years)).strftime(FMT_DATE)
+    seed_end: str = today.strftime(FMT_DATE)
+    # チェック対象の期間: 合成データの中間の1ヶ月
+    check_start: date = today - timedelta(days=365 * args.years // 2)
+    query_params: Dict = {
+        "emailAddress": FMT_SEED_EMAIL.format(1),
+        "startDay": check_start.strftime(FMT_DATE),
+        "endDay": (check_start + timedelta(days=30)).strftime(FMT_DATE)
+    }
+    app_logger.info(f"seed: {seed_start} - {seed_end}, query_params: {query_params}")
+
+    # 共有エンジン (接続プール)
+    engineHealthcare: sqlalchemy.Engine = get_engine(DB_HEALTHCARE_CONF, hostname=args.db_host)
+
+    all_warnings: Dict[str, List[PlanWarning]] = {}
+    try:
+        with engineHealthcare.connect() as conn:
+            trans = conn.begin()
+            try:
+                seedSyntheticData(conn, args.persons, seed_start, seed_end)
+                for query_id, query in QUERIES.items():
+                    plan: Dict = explain(conn, query, query_params, analyze=args.analyze)
+                    app_logger.info(f"[{query_id}]\n{format_plan(plan)}")
+                    all_warnings[query_id] = check_plan(
+                        plan, ignore_relations=IGNORE_SEQ_SCAN_TABLES,
+                        blowup_ratio=args.blowup_ratio
+                    )
+            finally:
+                # 合成データは残さない
+                trans.rollback()
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
+
+    has_warning: bool = False
+    for query_id, warnings in all_warnings.items():
+        if len(warnings) == 0:
+            app_logger.info(f"[{query_id}] OK")
+            continue
+
+        has_warning = True
+        for warning in warnings:
+            app_logger.warning(f"[{query_id}] {warning.message}")
+    exit(1 if has_warning else 0)
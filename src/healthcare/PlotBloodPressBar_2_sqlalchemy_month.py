@@ -1,12 +1,10 @@
 import argparse
 import enum
 import logging
-import json
 import os
-import socket
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import matplotlib
@@ -17,15 +15,23 @@ from matplotlib.axes import Axes
 from matplotlib.patches import Rectangle
 
 import sqlalchemy
-from sqlalchemy.engine.url import URL
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Result
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.sql import text
 
+from util.db_engine import get_engine
 import util.date_util as du
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.density_outputs import DENSITY_CHOICES, dp_size, save_densities
+from util.phase_timer import (
+    PHASE_CONNECT, PHASE_FIGURE, PHASE_QUERY, PHASE_TRANSFORM, span, start_timer, timed, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import seq_summary, set_full_dump
+from util.queries import QUERY_ID_BLOOD_PRESS
+from util.query_cache import DEFAULT_CACHE_DIR, fetch_rows
+from util.blood_press_util import convert_bar_values, make_col_list_for_plotting
 
 """
 データベースから取得した月間の血圧測定データ(欠損値あり)を棒グラフでプロット
@@ -39,28 +45,6 @@ LOG_FMT = '%(levelname)s %(message)s'
 
 # 健康管理データベース接続情報
 DB_HEALTHCARE_CONF: str = os.path.join("conf", "db_healthcare.json")
-# 血圧測定テーブルデータ取得クエリ
-QUERY_BLOOD_PRESS = """
-SELECT
-  to_char(measurement_day,'YYYY-MM-DD') as measurement_day
-  ,to_char(morning_measurement_time,'HH24:MI') as morning_measurement_time
-  ,morning_max
-  ,morning_min
-  ,morning_pulse_rate
-  ,to_char(evening_measurement_time, 'HH24:MI') as evening_measurement_time
-  ,evening_max
-  ,evening_min
-  ,evening_pulse_rate
-FROM
-  bodyhealth.person p
-  INNER JOIN bodyhealth.blood_pressure bp ON p.id = bp.pid
-WHERE
-  email=:emailAddress
-  AND
-  measurement_day BETWEEN :startDay AND :endDay
-  ORDER BY measurement_day
-"""
-
 # 文字列定数定義
 Y_PRESSURE_LABEL: str = "血圧値(mmHg)"
 Y_PULSE_LABEL: str = "脈拍(回/分)"
@@ -112,8 +96,6 @@ BAR_LEGEND_LABEL_STYLE: Dict = {
 LEGEND_LOC: str = 'lower right'
 # タイトルフォーマット
 FMT_MEASUREMENT_RANGE: str = "【表示期間】{}〜{}"
-# 日本語の曜日
-JP_WEEK_DAY_NAMES: List[str] = ["月", "火", "水", "木", "金", "土", "日"]
 
 # スマートフォンの描画領域サイズ (ピクセル): Google pixel 4a
 PHONE_PX_WIDTH: int = 1064
@@ -141,22 +123,9 @@ class BloodPressure:
     eveningPulseRate: int
 
 
-def getDBConnectionWithDict(filePath: str) -> dict:
-    """
-    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
-    :param filePath: 接続設定ファイルパス (JSON形式)
-    :return: SQLAlchemyのURL用辞書オブジェクト
-    """
-    with open(filePath, 'r') as fp:
-        db_conf: json = json.load(fp)
-        hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return db_conf
-
-
 def getRecordsWithDict(DbSession: sqlalchemy.orm.scoping.scoped_session,
-                       mailAddress: str, startDate: str, endDate: str
+                       mailAddress: str, startDate: str, endDate: str,
+                       cacheDir: Optional[str] = DEFAULT_CACHE_DIR
                        ) -> Dict[str, BloodPressure]:
     """
     血圧測定テーブルから月間の血圧測定データを取得する
@@ -164,16 +133,20 @@ def getRecordsWithDict(DbSession: sqlalchemy.orm.scoping.scoped_session,
     :param mailAddress: メールアドレス (主キー)
     :param startDate: 開祖日
     :param endDate: 終了日
+    :param cacheDir: クエリー結果キャッシュディレクトリ ※Noneならキャッシュを使わない
     :return: 月間の血圧測定データ(日付をキーとする辞書オブジェクト)
     """
-    params: Dict = {
-        "emailAddress": mailAddress, "startDay": startDate, "endDay": endDate}
     rows = None
     try:
         with DbSession() as sess:
-            rs: Result = sess.execute(text(QUERY_BLOOD_PRESS), params)
-            if rs:
-                rows = rs.fetchall()
+            with span(PHASE_CONNECT):
+                sess.connection()
+            # 完了月はキャッシュから取得し、未キャッシュの月のみデータベースに問い合わせる
+            with span(PHASE_QUERY) as sp:
+                rows = fetch_rows(
+                    sess, QUERY_ID_BLOOD_PRESS, mailAddress, startDate, endDate, cache_dir=cacheDir
+                ).rows
+                sp.rows = len(rows)
     except SQLAlchemyError as err:
         app_logger.warning(err.args)
         raise err
@@ -192,51 +165,30 @@ def getRecordsWithDict(DbSession: sqlalchemy.orm.scoping.scoped_session,
     return result
 
 
+@timed(PHASE_TRANSFORM)
 def makeColListForPlotting(pPlotDateRanges: List[str],
-                           pRecordsWithDict: Dict[str, BloodPressure]) -> Tuple:
+                           pRecordsWithDict: Dict[str, BloodPressure]
+                           ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
     """
     月間のプロット用項目別(X軸ラベル, 最高血圧, 最低血圧, 脈拍)リスト生成\n
       測定データはレコードデータが存在すればレコードからそのまま代入\n
-      存在しない場合は Noneを設定
+      存在しない場合は np.nanを設定
     :param pPlotDateRanges: 月間日付リスト
     :param pRecordsWithDict: 月間の血圧測定データ(日付をキーとする辞書オブジェクト)
     :return: 月間のプロット用項目別(X軸ラベル, 最高血圧, 最低血圧, 脈拍)リスト
     """
-    # X軸ラベル (AM/PM)
-    rawTicksLabels: List[str] = []
-    # 最高血圧値 (AM/PM)
-    rawPressMaxes: List[Optional[int]] = []
-    # 最低血圧値 (AM/PM)
-    rawPressMines: List[Optional[int]] = []
-    # 脈拍 (AM/PM)
-    rawPulseRates: List[Optional[int]] = []
+    # 日毎の測定値 (AM最高,AM最低,AM脈拍,PM最高,PM最低,PM脈拍) ※欠損値(None)は np.nan に変換される
+    dailyValues: np.ndarray = np.full((len(pPlotDateRanges), 6), np.nan)
     # 月間の日付範囲と取得レコードの日付をマッチング
     for row_idx, str_date in enumerate(pPlotDateRanges):
-        # 月間の血圧データの場合はX軸ラベルは日付のみとする ※PM軸はブランクのみ
-        rawTicksLabels.append(makeDateLabel(str_date))
-        if str_date in recordsWithDict.keys():
-            # レコードを取り出す
-            data: BloodPressure = pRecordsWithDict[str_date]
-            # PM用ラベルは設定しない
-            rawTicksLabels.append("")
-            # 最高血圧(AM/PM)
-            rawPressMaxes.append(data.morningMax)
-            rawPressMaxes.append(data.eveningMax)
-            # 最低血圧(AM/PM)
-            rawPressMines.append(data.morningMin)
-            rawPressMines.append(data.eveningMin)
-            # 脈拍(AM/PM)
-            rawPulseRates.append(data.morningPulseRate)
-            rawPulseRates.append(data.eveningPulseRate)
-        else:
-            rawTicksLabels.append("")
-            rawPressMaxes.append(None)
-            rawPressMaxes.append(None)
-            rawPressMines.append(None)
-            rawPressMines.append(None)
-            rawPulseRates.append(None)
-            rawPulseRates.append(None)
-    return rawTicksLabels, rawPressMaxes, rawPressMines, rawPulseRates
+        data: Optional[BloodPressure] = pRecordsWithDict.get(str_date)
+        if data is not None:
+            dailyValues[row_idx] = (
+                data.morningMax, data.morningMin, data.morningPulseRate,
+                data.eveningMax, data.eveningMin, data.eveningPulseRate
+            )
+    # AM/PMを交互に並べる
+    return make_col_list_for_plotting(pPlotDateRanges, *dailyValues.T)
 
 
 def calcEndOfMonth(str_year_month: str) -> int:
@@ -259,18 +211,6 @@ def calcEndOfMonth(str_year_month: str) -> int:
     return valLastDayOfMonth.day
 
 
-def makeDateLabel(strIsoDay: str) -> str:
-    """
-    X軸の日付ラベル文字列を生成する\n
-    [形式] "日 (曜日)"
-    :param strIsoDay: ISO8601 日付文字列
-    :return: 日付ラベル文字列
-    """
-    val_date: datetime = datetime.strptime(strIsoDay, "%Y-%m-%d")
-    weekday_name = JP_WEEK_DAY_NAMES[val_date.weekday()]
-    return f"{val_date.day} ({weekday_name})"
-
-
 def makeTitleWithMonthRange(str_yearMonth: str, val_endDay: int) -> str:
     def to_japanese_date(iso_date: str) -> str:
         """
@@ -290,31 +230,6 @@ def makeTitleWithMonthRange(str_yearMonth: str, val_endDay: int) -> str:
     return FMT_MEASUREMENT_RANGE.format(startJpDay, endJpDay)
 
 
-def convertBarValues(pressMaxes: List[Optional[int]],
-                     pressMines: List[Optional[int]]) -> Tuple[np.ndarray, np.ndarray]:
-    """
-    最高血圧値リスト、最低血圧値リストからそれぞれの描画(棒)オブジェクトを生成する\n
-    リストの中にNoneが含まれていた場合は np.NaN に置き換える\n
-    (データの性質) 最高血圧値が存在すれば最低血圧も存在する、存在しなけれは他の値も全て存在しない
-    :param pressMaxes: 最高血圧値リスト(欠損値 Noneを含む)
-    :param pressMines: 最低血圧値リスト(欠損値 Noneを含む)
-    :return: 最高血圧棒グラフ用Numpyリスト (最低血圧値を差し引き), 最低血圧棒グラフ用Numpyリスト
-    """
-    max_diff_values: List[Any] = []
-    min_values: List[Any] = []
-    for val_max, val_min in zip(pressMaxes, pressMines):
-        if val_max is not None and val_min is not None:
-            # 最高血圧値の棒は積み上げ式にするために最低血圧値との差分
-            max_diff_values.append((val_max - val_min))
-            # 最低血圧値
-            min_values.append(val_min)
-        else:
-            # 両方NaN(未設定)
-            max_diff_values.append(np.NaN)
-            min_values.append(np.NaN)
-    return np.array(max_diff_values), np.array(min_values)
-
-
 def pixelToInch(width_px: int, height_px: int, density: float) -> Tuple[float, float]:
     """
     携帯用の描画領域サイズ(ピクセル)をインチに変換する
@@ -358,26 +273,27 @@ def compute_y_lim_range(npPressMinValues: np.ndarray,
     return np_y_lim_min, np_y_lim_max
 
 
-def drawTextOverValue(axes: matplotlib.pyplot.Axes, valList: List, std_value: float,
+def drawTextOverValue(axes: matplotlib.pyplot.Axes, values: np.ndarray, std_value: float,
                       drawPos: DrawPosition = DrawPosition.BOTTOM) -> None:
     """
     基準値を超えた値を対応グラフの上部に表示する
     :param axes: プロット領域
-    :param valList: 値リスト
+    :param values: 値 ndarray (欠損値 np.nan)
     :param std_value: 基準値
     :param drawPos: 描画位置 (BOTTOM|TOP)
     """
-    for x_idx, val in enumerate(valList):
-        if val is not None and val > std_value:
-            draw_margin: float
-            draw_style: Dict
-            if drawPos == DrawPosition.BOTTOM:
-                draw_margin = val + DRAW_POS_MARGIN
-                draw_style = DRAW_TEXT_STYLE
-            else:
-                draw_margin = val - DRAW_POS_MARGIN
-                draw_style = DRAW_TEXT_TOP_STYLE
-            axes.text(x_idx, draw_margin, str(val), **draw_style)
+    # np.nan との比較は常に False のため欠損値は除外される
+    for x_idx in np.flatnonzero(values > std_value):
+        val: float = values[x_idx]
+        draw_margin: float
+        draw_style: Dict
+        if drawPos == DrawPosition.BOTTOM:
+            draw_margin = val + DRAW_POS_MARGIN
+            draw_style = DRAW_TEXT_STYLE
+        else:
+            draw_margin = val - DRAW_POS_MARGIN
+            draw_style = DRAW_TEXT_TOP_STYLE
+        axes.text(x_idx, draw_margin, f"{val:.0f}", **draw_style)
 
 
 def drawCustomRectWithText(axes: matplotlib.pyplot.Axes,
@@ -442,8 +358,34 @@ if __name__ == '__main__':
     # 年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="年月 (例) 2023-04")
+    # クエリー結果キャッシュを使わない
+    parser.add_argument("--no-cache", action="store_true", help="Disable query result cache.")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # 携帯アプリ用の密度毎 (mdpi〜xxxhdpi) の画像とサムネイルの出力ディレクトリ
+    parser.add_argument("--density-dir", type=str,
+                        help="Write drawable-<density>/ images and a thumbnail here.")
+    # 出力する密度 (--density-dir 指定時)
+    parser.add_argument("--densities", type=str, nargs="+", choices=DENSITY_CHOICES,
+                        default=DENSITY_CHOICES, help="Densities written to --density-dir.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
     app_logger.info(args)
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
 
     # 選択クエリーの主キー: メールアドレス
     mail_address: str = args.mail_address
@@ -465,13 +407,11 @@ if __name__ == '__main__':
     plotDateRanges: List[str] = [
         "{}-{:#02d}".format(year_month, day) for day in range(1, endDay + 1)
     ]
-    app_logger.info(plotDateRanges)
+    app_logger.info(seq_summary(plotDateRanges, "plotDateRanges"))
 
     # 健康管理データベース
-    # SQLAlchemyデータベース接続URL用辞書オブジェクト取得
-    connDict: dict = getDBConnectionWithDict(DB_HEALTHCARE_CONF)
-    connUrl: URL = URL.create(**connDict)
-    engineHealthcare: sqlalchemy.Engine = create_engine(connUrl, echo=False)
+    # 共有エンジン (接続プール)
+    engineHealthcare: sqlalchemy.Engine = get_engine(DB_HEALTHCARE_CONF)
     # Flaskアプリで使うscoped_sessionに合わせるためバッチでもscoped_sessionクラスを生成する
     Cls_sess_healthcare: sqlalchemy.orm.scoping.scoped_session = scoped_session(
         sessionmaker(bind=engineHealthcare)
@@ -480,7 +420,8 @@ if __name__ == '__main__':
 
     # 血圧測定テーブルから月間レコードを日付と血圧データの辞書オブジェクトとして取得
     recordsWithDict: Dict[str, BloodPressure] = getRecordsWithDict(
-        Cls_sess_healthcare, mail_address, start_date, end_date
+        Cls_sess_healthcare, mail_address, start_date, end_date,
+        cacheDir=None if args.no_cache else DEFAULT_CACHE_DIR
     )
     # Check record count
     app_logger.info(recordsWithDict.keys())
@@ -489,7 +430,7 @@ if __name__ == '__main__':
         exit(0)
 
     # 月間のプロット用項目別(X軸ラベル, 最高血圧, 最低血圧, 脈拍)リスト生成
-    xTicksLabels, pressMaxList, pressMinList, pulseRateList = makeColListForPlotting(
+    xTicksLabels, pressMaxValues, pressMinValues, pulseValues = makeColListForPlotting(
         plotDateRanges, recordsWithDict
     )
 
@@ -498,19 +439,13 @@ if __name__ == '__main__':
     # 棒のカラー配列を作成: AM/PM毎にデータ件数分
     barColors: List[str] = BAR_COLORS * dateRangeSize
     # 血圧値(最高,最低)棒グラフ用Numpyリスト作成
-    barMaxDiffValues, barMinValues = convertBarValues(pressMaxList, pressMinList)
-    # Y軸の最大値計算用Numpyリスト (Noneを np.NaNに変換)
-    yLimMaxValues: np.ndarray = np.array([
-        (val if val is not None else np.NaN) for val in pressMaxList]
-    )
-    # 折れ線グラフ(脈拍)用Numpyリスト (Noneを np.NaNに変換)
-    pulseValues: np.ndarray = np.array([
-        (val if val is not None else np.NaN) for val in pulseRateList]
-    )
-    app_logger.info(f"barMaxDiffValues:\n{barMaxDiffValues}")
-    app_logger.info(f"barMinValues:\n{barMinValues}")
-    app_logger.info(f"linePulseRateValues:\n{pulseValues}")
-    app_logger.info(f"yLimMaxValues:\n{yLimMaxValues}")
+    barMaxDiffValues, barMinValues = convert_bar_values(pressMaxValues, pressMinValues)
+    # Y軸の最大値計算用Numpyリスト
+    yLimMaxValues: np.ndarray = pressMaxValues
+    app_logger.info(seq_summary(barMaxDiffValues, "barMaxDiffValues"))
+    app_logger.info(seq_summary(barMinValues, "barMinValues"))
+    app_logger.info(seq_summary(pulseValues, "linePulseRateValues"))
+    app_logger.info(seq_summary(yLimMaxValues, "yLimMaxValues"))
 
     # Y軸の最小値と最大値を計算
     yLimMin: float
@@ -525,51 +460,59 @@ if __name__ == '__main__':
         PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY
     )
 
-    # 描画領域作成
-    fig: Figure
-    ax: Axes
-    fig, ax = plt.subplots(figsize=(figWidthInch, figHeightInch), layout='constrained')
-    # グリッド線
-    ax.grid(**AXES_GRID_STYLE)
-    app_logger.info(f"fig: {fig}, axes: {ax}")
-
-    # X軸の作成: データ件数 * 2 (AM + PM)
-    xIndexes = np.arange(dateRangeSize * 2)
-    # 最低血圧値の棒グラフ: 描画領域色(白色)にして見えないようにする
-    ax.bar(xIndexes, barMinValues, BAR_WIDTH, color=COLOR_PRESS_MIN)
-    # 最大血圧値(最低血圧値との差分): 棒のカラー(AMカラー/PMカラー交互)
-    ax.bar(
-        xIndexes, barMaxDiffValues, BAR_WIDTH,
-        bottom=barMinValues, color=barColors, **BAR_LINE_STYLE
-    )
-    # 最高血圧の基準値
-    ax.axhline(y=STD_BLOOD_PRESS_MAX, **STD_LINE_STYLE)
-    # 最低血圧の基準
-    ax.axhline(y=STD_BLOOD_PRESS_MIN, **STD_LINE_STYLE)
-    ax.set_ylabel(Y_PRESSURE_LABEL)
-    ax.set_title(titleDateRange, fontdict=TITLE_FONT_STYLE)
-    # 最大値を+1することにより最大値が表示される
-    ax.set_yticks(np.arange(yLimMin, yLimMax + 1, Y_LIM_MARGIN))
-    ax.set_ylim(yLimMin, yLimMax)
-    ax.set_xticks(np.arange(dateRangeSize * 2), xTicksLabels, **X_TICKS_STYLE)
-    ax.set_xlim(X_LIM_MARGIN, (dateRangeSize * 2 + X_LIM_MARGIN))
-    # 最高血圧: 基準値を超えた値のみを上端に表示
-    drawTextOverValue(ax, pressMaxList, STD_BLOOD_PRESS_MAX)
-    # 棒グラフ(AM/PM毎のカラー)の凡例を描画
-    drawCustomBarLegend(ax, X_LIM_MARGIN, yLimMin)
-
-    # 右側軸: 脈拍は折れ線グラフ
-    ax_pulseRate: Axes = ax.twinx()
-    ax_pulseRate.set_ylabel(Y_PULSE_LABEL)
-    ax_pulseRate.plot(xIndexes, pulseValues, color=COLOR_PULSE_RATE,
-                      label=LEGEND_PULSE_LABEL)
-    # 脈拍の軸ラベルは脈拍の軸の最大値+1まで表示
-    ax_pulseRate.set_yticks(np.arange(yLimMin, LIM_MAX_PULSE + 1, Y_LIM_MARGIN))
-    ax_pulseRate.set_ylim(yLimMin, yLimMax)
-    ax_pulseRate.legend(loc=LEGEND_LOC)
+    with span(PHASE_FIGURE):
+        # 描画領域作成
+        fig: Figure
+        ax: Axes
+        fig, ax = plt.subplots(figsize=(figWidthInch, figHeightInch), layout='constrained')
+        # グリッド線
+        ax.grid(**AXES_GRID_STYLE)
+        app_logger.info(f"fig: {fig}, axes: {ax}")
+
+        # X軸の作成: データ件数 * 2 (AM + PM)
+        xIndexes = np.arange(dateRangeSize * 2)
+        # 最低血圧値の棒グラフ: 描画領域色(白色)にして見えないようにする
+        ax.bar(xIndexes, barMinValues, BAR_WIDTH, color=COLOR_PRESS_MIN)
+        # 最大血圧値(最低血圧値との差分): 棒のカラー(AMカラー/PMカラー交互)
+        ax.bar(
+            xIndexes, barMaxDiffValues, BAR_WIDTH,
+            bottom=barMinValues, color=barColors, **BAR_LINE_STYLE
+        )
+        # 最高血圧の基準値
+        ax.axhline(y=STD_BLOOD_PRESS_MAX, **STD_LINE_STYLE)
+        # 最低血圧の基準
+        ax.axhline(y=STD_BLOOD_PRESS_MIN, **STD_LINE_STYLE)
+        ax.set_ylabel(Y_PRESSURE_LABEL)
+        ax.set_title(titleDateRange, fontdict=TITLE_FONT_STYLE)
+        # 最大値を+1することにより最大値が表示される
+        ax.set_yticks(np.arange(yLimMin, yLimMax + 1, Y_LIM_MARGIN))
+        ax.set_ylim(yLimMin, yLimMax)
+        ax.set_xticks(np.arange(dateRangeSize * 2), xTicksLabels, **X_TICKS_STYLE)
+        ax.set_xlim(X_LIM_MARGIN, (dateRangeSize * 2 + X_LIM_MARGIN))
+        # 最高血圧: 基準値を超えた値のみを上端に表示
+        drawTextOverValue(ax, pressMaxValues, STD_BLOOD_PRESS_MAX)
+        # 棒グラフ(AM/PM毎のカラー)の凡例を描画
+        drawCustomBarLegend(ax, X_LIM_MARGIN, yLimMin)
+
+        # 右側軸: 脈拍は折れ線グラフ
+        ax_pulseRate: Axes = ax.twinx()
+        ax_pulseRate.set_ylabel(Y_PULSE_LABEL)
+        ax_pulseRate.plot(xIndexes, pulseValues, color=COLOR_PULSE_RATE,
+                          label=LEGEND_PULSE_LABEL)
+        # 脈拍の軸ラベルは脈拍の軸の最大値+1まで表示
+        ax_pulseRate.set_yticks(np.arange(yLimMin, LIM_MAX_PULSE + 1, Y_LIM_MARGIN))
+        ax_pulseRate.set_ylim(yLimMin, yLimMax)
+        ax_pulseRate.legend(loc=LEGEND_LOC)
 
     # プロット画像をファイル-族
     save_name = gen_imgname(script_name)
-    save_path = os.path.join("screen_shots", save_name)
-    app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    if args.density_dir is not None:
+        # 携帯アプリ用: 図とレイアウトは1回だけ作成し密度毎に描画する
+        width_dp, _ = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+        save_densities(fig, os.path.expanduser(args.density_dir), save_name, width_dp,
+                       script_name, densities=args.densities, logger=app_logger)
+    else:
+        save_path = os.path.join("screen_shots", save_name)
+        app_logger.info(save_path)
+        timed_save(fig, save_path, lambda fp: save_figure(
+            fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
@@ -2,7 +2,7 @@ import argparse
 import enum
 import logging
 import os
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import Dict, List, Tuple
 
 import numpy as np
@@ -14,10 +14,20 @@ from matplotlib.axes import Axes
 from matplotlib.patches import Rectangle
 
 import pandas as pd
-from pandas.core.frame import DataFrame, Series
+from pandas.core.frame import DataFrame
 
 import util.date_util as du
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.density_outputs import DENSITY_CHOICES, dp_size, save_densities
+from util.phase_timer import (
+    PHASE_FIGURE, PHASE_READ, PHASE_TRANSFORM, span, start_timer, timed, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import frame_summary, seq_summary, set_full_dump
+from util.blood_press_util import make_col_list_for_plotting
+from util.csv_month_index import read_month_bytes
 
 """
 健康管理DBからエクスポートした月間の血圧測定データ(欠損値あり)を棒グラフでプロット
@@ -83,8 +93,6 @@ BAR_LEGEND_LABEL_STYLE: Dict = {
 LEGEND_LOC: str = 'lower right'
 # タイトルフォーマット
 FMT_MEASUREMENT_RANGE: str = "【表示期間】{}〜{}"
-# 日本語の曜日
-JP_WEEK_DAY_NAMES: List[str] = ["月", "火", "水", "木", "金", "土", "日"]
 
 # スマートフォンの描画領域サイズ (ピクセル): Google pixel 4a
 PHONE_PX_WIDTH: int = 1064
@@ -127,18 +135,6 @@ def calcEndOfMonth(str_year_month: str) -> int:
     return valLastDayOfMonth.day
 
 
-def makeDateLabel(strIsoDay: str) -> str:
-    """
-    X軸の日付ラベル文字列を生成する\n
-    [形式] "日 (曜日)"
-    :param strIsoDay: ISO8601 日付文字列
-    :return: 日付ラベル文字列
-    """
-    val_date: datetime = datetime.strptime(strIsoDay, FMT_DATE)
-    weekday_name = JP_WEEK_DAY_NAMES[val_date.weekday()]
-    return f"{val_date.day} ({weekday_name})"
-
-
 def makeTitleWithMonthRange(str_yearMonth: str, val_endDay: int) -> str:
     def to_japanese_date(iso_date: str) -> str:
         """
@@ -158,40 +154,23 @@ def makeTitleWithMonthRange(str_yearMonth: str, val_endDay: int) -> str:
     return FMT_MEASUREMENT_RANGE.format(startJpDay, endJpDay)
 
 
+@timed(PHASE_TRANSFORM)
 def makeColListForPlotting(df: DataFrame) ->\
         Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
     """
     X軸用ラベルリスト、AM/PM毎の測定値をマージしたnp.ndarrayを生成する
-    :param df:
+    :param df: 月間(１日〜末日)の血圧測定データ ※インデックスは測定日
     :return: X軸用ラベルリスト, 最高血圧値ndarray, 最低血圧値ndarray, 脈拍値ndarray
     """
-    x_ticklers: List[str] = []
-    pressMaxes: List[np.float] = []
-    pressMines: List[np.float] = []
-    pulseRates: List[np.float] = []
-    # 月間(１日〜末日)の日付リスト
-    indexes: Series = df.index
-    mMaxSer: Series = df['morning_max']
-    mMinSer: Series = df['morning_min']
-    mPulseSer: Series = df['morning_pulse_rate']
-    eMaxSer: Series = df['evening_max']
-    eMinSer: Series = df['evening_min']
-    ePulseSer: Series = df['evening_pulse_rate']
-    for day, mMax, mMin, mPulse, eMax, eMin, ePulse in zip(
-            indexes, mMaxSer, mMinSer, mPulseSer, eMaxSer, eMinSer, ePulseSer):
-        x_ticklers.append(makeDateLabel(day.strftime(FMT_DATE)))  # AM軸
-        x_ticklers.append("")  # PM軸 ※常に空文字
-        pressMaxes.append(mMax)  # AM
-        pressMaxes.append(eMax)  # PM
-        pressMines.append(mMin)
-        pressMines.append(eMin)
-        pulseRates.append(mPulse)
-        pulseRates.append(ePulse)
-    # 測定値リストを np.ndarryに変換
-    np_pressMaxes = np.array(pressMaxes)
-    np_pressMines = np.array(pressMines)
-    np_pulseRates = np.array(pulseRates)
-    return x_ticklers, np_pressMaxes, np_pressMines, np_pulseRates
+    return make_col_list_for_plotting(
+        df.index.values,
+        df['morning_max'].to_numpy(dtype=np.float64),
+        df['morning_min'].to_numpy(dtype=np.float64),
+        df['morning_pulse_rate'].to_numpy(dtype=np.float64),
+        df['evening_max'].to_numpy(dtype=np.float64),
+        df['evening_min'].to_numpy(dtype=np.float64),
+        df['evening_pulse_rate'].to_numpy(dtype=np.float64)
+    )
 
 
 def pixelToInch(width_px: int, height_px: int, density: float) -> Tuple[float, float]:
@@ -321,8 +300,32 @@ if __name__ == '__main__':
     # 血圧測定CSVデータファイルパス: 年月のみか、複数月
     parser.add_argument("--blood-press", type=str, required=True,
                         help="datas/csv/blood_pressure.csv")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # 携帯アプリ用の密度毎 (mdpi〜xxxhdpi) の画像とサムネイルの出力ディレクトリ
+    parser.add_argument("--density-dir", type=str,
+                        help="Write drawable-<density>/ images and a thumbnail here.")
+    # 出力する密度 (--density-dir 指定時)
+    parser.add_argument("--densities", type=str, nargs="+", choices=DENSITY_CHOICES,
+                        default=DENSITY_CHOICES, help="Densities written to --density-dir.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
     app_logger.info(args)
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
 
     # CSVファイルの存在チェック
     path_csv: str = os.path.expanduser(args.blood_press)
@@ -346,15 +349,17 @@ if __name__ == '__main__':
     # グラフタイトル (月間範囲)
     titleDateRange: str = makeTitleWithMonthRange(year_month, endDay)
 
-    # CSVファイル読み込み
-    df_main: DataFrame = pd.read_csv(
-        path_csv, header=0,
-        parse_dates=['measurement_day'], date_format=FMT_DATE,
-        usecols=USE_COLS
-    )
+    # CSVファイル読み込み: 年月オフセットインデックスで指定年月の行のみを読み込む
+    with span(PHASE_READ) as sp:
+        df_main: DataFrame = pd.read_csv(
+            read_month_bytes(path_csv, year_month), header=0,
+            parse_dates=['measurement_day'], date_format=FMT_DATE,
+            usecols=USE_COLS
+        )
+        sp.rows = df_main.shape[0]
     # 測定日をインデックスに設定
     df_main.index = df_main['measurement_day']
-    app_logger.info(df_main.index)
+    app_logger.info(seq_summary(df_main.index, "df_main.index"))
 
     # 当該年月の期間に欠損値があればインデックス振り直す
     org_dataSize: int = df_main.index.shape[0]
@@ -377,8 +382,7 @@ if __name__ == '__main__':
             df_main = df_main.reindex(
                 pd.date_range(start=start_date, end=end_date, name='measurement_day')
             )
-    app_logger.info(df_main.shape)
-    app_logger.info(df_main)
+    app_logger.info(frame_summary(df_main, "df_main"))
 
     # 血圧測定データは日当たりAM/PMの各測定値があるためマージする
     # Pandasで読み込んだ場合、データはnp.ndarrayになっており欠損値はNaNに設定されている
@@ -392,10 +396,10 @@ if __name__ == '__main__':
     dateRangeSize: int = df_main.shape[0]
     # 棒のカラー配列を作成: AM/PM毎にデータ件数分
     barColors: List[str] = BAR_COLORS * dateRangeSize
-    app_logger.info(f"xTicksLabels:\n{xTicksLabels}")
-    app_logger.info(f"pressMaxValues:\n{pressMaxValues}")
-    app_logger.info(f"pressMinValues:\n{pressMinValues}")
-    app_logger.info(f"pulseRateValues:\n{pulseValues}")
+    app_logger.info(seq_summary(xTicksLabels, "xTicksLabels"))
+    app_logger.info(seq_summary(pressMaxValues, "pressMaxValues"))
+    app_logger.info(seq_summary(pressMinValues, "pressMinValues"))
+    app_logger.info(seq_summary(pulseValues, "pulseRateValues"))
     # 最高血圧棒グラフ用差分
     barMaxDiffValues: np.ndarray = pressMaxValues - pressMinValues
 
@@ -412,51 +416,59 @@ if __name__ == '__main__':
         PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY
     )
 
-    # 描画領域作成
-    fig: Figure
-    ax: Axes
-    fig, ax = plt.subplots(figsize=(figWidthInch, figHeightInch), layout='constrained')
-    # Y方向のグリッド線のみ表示
-    ax.grid(**AXES_GRID_STYLE)
-    app_logger.info(f"fig: {fig}, axes: {ax}")
-
-    # X軸の作成: データ件数 * 2 (AM + PM)
-    xIndexes = np.arange(dateRangeSize * 2)
-    # 最低血圧値の棒グラフ: 描画領域色(白色)にして見えないようにする
-    ax.bar(xIndexes, pressMinValues, BAR_WIDTH, color=COLOR_PRESS_MIN)
-    # 最大血圧値(最低血圧値との差分): 棒のカラー(AMカラー/PMカラー交互)
-    ax.bar(
-        xIndexes, barMaxDiffValues, BAR_WIDTH,
-        bottom=pressMinValues, color=barColors, **BAR_LINE_STYLE
-    )
-    # 最高血圧の基準値
-    ax.axhline(y=STD_BLOOD_PRESS_MAX, **STD_LINE_STYLE)
-    # 最低血圧の基準
-    ax.axhline(y=STD_BLOOD_PRESS_MIN, **STD_LINE_STYLE)
-    ax.set_ylabel(Y_PRESSURE_LABEL)
-    ax.set_title(titleDateRange, fontdict=TITLE_FONT_STYLE)
-    # 最大値を+1することにより最大値が表示される
-    ax.set_yticks(np.arange(yLimMin, yLimMax + 1, Y_LIM_MARGIN))
-    ax.set_ylim(yLimMin, yLimMax)
-    ax.set_xticks(np.arange(dateRangeSize * 2), xTicksLabels, **X_TICKS_STYLE)
-    ax.set_xlim(X_LIM_MARGIN, (dateRangeSize * 2 + X_LIM_MARGIN))
-    # 最高血圧: 基準値を超えた値のみを上端に表示
-    drawTextOverValue(ax, pressMaxValues, STD_BLOOD_PRESS_MAX)
-    # 棒グラフ(AM/PM毎のカラー)の凡例を描画
-    drawCustomBarLegend(ax, X_LIM_MARGIN, yLimMin)
-
-    # 右側軸: 脈拍は折れ線グラフ
-    ax_pulseRate: Axes = ax.twinx()
-    ax_pulseRate.set_ylabel(Y_PULSE_LABEL)
-    ax_pulseRate.plot(xIndexes, pulseValues, color=COLOR_PULSE_RATE,
-                      label=LEGEND_PULSE_LABEL)
-    # 脈拍の軸ラベルは脈拍の軸の最大値+1まで表示
-    ax_pulseRate.set_yticks(np.arange(yLimMin, LIM_MAX_PULSE + 1, Y_LIM_MARGIN))
-    ax_pulseRate.set_ylim(yLimMin, yLimMax)
-    ax_pulseRate.legend(loc=LEGEND_LOC)
+    with span(PHASE_FIGURE):
+        # 描画領域作成
+        fig: Figure
+        ax: Axes
+        fig, ax = plt.subplots(figsize=(figWidthInch, figHeightInch), layout='constrained')
+        # Y方向のグリッド線のみ表示
+        ax.grid(**AXES_GRID_STYLE)
+        app_logger.info(f"fig: {fig}, axes: {ax}")
+
+        # X軸の作成: データ件数 * 2 (AM + PM)
+        xIndexes = np.arange(dateRangeSize * 2)
+        # 最低血圧値の棒グラフ: 描画領域色(白色)にして見えないようにする
+        ax.bar(xIndexes, pressMinValues, BAR_WIDTH, color=COLOR_PRESS_MIN)
+        # 最大血圧値(最低血圧値との差分): 棒のカラー(AMカラー/PMカラー交互)
+        ax.bar(
+            xIndexes, barMaxDiffValues, BAR_WIDTH,
+            bottom=pressMinValues, color=barColors, **BAR_LINE_STYLE
+        )
+        # 最高血圧の基準値
+        ax.axhline(y=STD_BLOOD_PRESS_MAX, **STD_LINE_STYLE)
+        # 最低血圧の基準
+        ax.axhline(y=STD_BLOOD_PRESS_MIN, **STD_LINE_STYLE)
+        ax.set_ylabel(Y_PRESSURE_LABEL)
+        ax.set_title(titleDateRange, fontdict=TITLE_FONT_STYLE)
+        # 最大値を+1することにより最大値が表示される
+        ax.set_yticks(np.arange(yLimMin, yLimMax + 1, Y_LIM_MARGIN))
+        ax.set_ylim(yLimMin, yLimMax)
+        ax.set_xticks(np.arange(dateRangeSize * 2), xTicksLabels, **X_TICKS_STYLE)
+        ax.set_xlim(X_LIM_MARGIN, (dateRangeSize * 2 + X_LIM_MARGIN))
+        # 最高血圧: 基準値を超えた値のみを上端に表示
+        drawTextOverValue(ax, pressMaxValues, STD_BLOOD_PRESS_MAX)
+        # 棒グラフ(AM/PM毎のカラー)の凡例を描画
+        drawCustomBarLegend(ax, X_LIM_MARGIN, yLimMin)
+
+        # 右側軸: 脈拍は折れ線グラフ
+        ax_pulseRate: Axes = ax.twinx()
+        ax_pulseRate.set_ylabel(Y_PULSE_LABEL)
+        ax_pulseRate.plot(xIndexes, pulseValues, color=COLOR_PULSE_RATE,
+                          label=LEGEND_PULSE_LABEL)
+        # 脈拍の軸ラベルは脈拍の軸の最大値+1まで表示
+        ax_pulseRate.set_yticks(np.arange(yLimMin, LIM_MAX_PULSE + 1, Y_LIM_MARGIN))
+        ax_pulseRate.set_ylim(yLimMin, yLimMax)
+        ax_pulseRate.legend(loc=LEGEND_LOC)
 
     # プロット画像をファイル-族
     save_name = gen_imgname(script_name)
-    save_path = os.path.join("screen_shots", save_name)
-    app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    if args.density_dir is not None:
+        # 携帯アプリ用: 図とレイアウトは1回だけ作成し密度毎に描画する
+        width_dp, _ = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+        save_densities(fig, os.path.expanduser(args.density_dir), save_name, width_dp,
+                       script_name, densities=args.densities, logger=app_logger)
+    else:
+        save_path = os.path.join("screen_shots", save_name)
+        app_logger.info(save_path)
+        timed_save(fig, save_path, lambda fp: save_figure(
+            fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
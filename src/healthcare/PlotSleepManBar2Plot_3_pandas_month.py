@@ -17,6 +17,15 @@ from pandas.core.frame import DataFrame, Series
 
 import util.date_util as du
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.density_outputs import DENSITY_CHOICES, dp_size, save_densities
+from util.phase_timer import (
+    PHASE_FIGURE, PHASE_READ, PHASE_TRANSFORM, span, start_timer, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import frame_summary, set_full_dump
+from util.csv_month_index import read_month_bytes
 
 """
 健康管理DBからエクスポートした２つのCSVを結合し
@@ -349,8 +358,32 @@ if __name__ == '__main__':
     # 夜間頻尿要因CSVデータファイルパス: 年月のみか、複数月 ※件数は一致すること
     parser.add_argument("--noct-fact", type=str, required=True,
                         help="datas/csv/nocturia_factors.csv")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # 携帯アプリ用の密度毎 (mdpi〜xxxhdpi) の画像とサムネイルの出力ディレクトリ
+    parser.add_argument("--density-dir", type=str,
+                        help="Write drawable-<density>/ images and a thumbnail here.")
+    # 出力する密度 (--density-dir 指定時)
+    parser.add_argument("--densities", type=str, nargs="+", choices=DENSITY_CHOICES,
+                        default=DENSITY_CHOICES, help="Densities written to --density-dir.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
     app_logger.info(args)
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
 
     # CSVファイルの存在チェック
     path_sleepMan: str = os.path.expanduser(args.sleep_man)
@@ -375,97 +408,98 @@ if __name__ == '__main__':
     # グラフタイトル (月間範囲)
     titleDateRange: str = makeTitleWithMonthRange(year_month, endDay)
     # https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html
-    # 睡眠管理用DataFrame
-    df_sleepMan: DataFrame = pd.read_csv(
-        path_sleepMan, header=0,
-        parse_dates=['measurement_day'], date_format=FMT_DATE,
-        usecols=SLEEP_MAN_COLS
-    )
-    # 夜間頻尿要因用DataFrame
-    df_noctFact: DataFrame = pd.read_csv(
-        path_noctFact, header=0,
-        parse_dates=['measurement_day'], date_format=FMT_DATE,
-        usecols=NOCT_FACT_COLS
-    )
-    # 複数テーブルのデータをインデックスで結合する
-    # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.join.html
-    # INNER JOIN (1:1)
-    df_sleepMan = df_sleepMan.set_index('measurement_day').join(
-        df_noctFact.set_index('measurement_day')
-    )
-    app_logger.info(df_sleepMan.shape)
-
-    # 就寝時刻の計算: (測定日[必須]+起床時間[必須]) - 睡眠時間[任意]
-    days: Series = df_sleepMan.index
-    bedTimes: List[Optional[datetime]] = [
-        calcBedTime(
-            day.strftime(FMT_DATE), wakeup, sleeping) for day, wakeup, sleeping in zip(
-            days, df_sleepMan['wakeup_time'], df_sleepMan['sleeping_time']
+    # 年月オフセットインデックスで指定年月の行のみを読み込む
+    with span(PHASE_READ) as sp:
+        # 睡眠管理用DataFrame
+        df_sleepMan: DataFrame = pd.read_csv(
+            read_month_bytes(path_sleepMan, year_month), header=0,
+            parse_dates=['measurement_day'], date_format=FMT_DATE,
+            usecols=SLEEP_MAN_COLS
         )
-    ]
-
-    # 起床時刻("%H:%M:%S"): 秒部分をトリムする ※健康管理Androidアプリで入力した値が"%H:%M"
-    df_sleepMan['wakeup_time'] = df_sleepMan['wakeup_time'].apply(trimSecondsWithTime)
-    # 睡眠時間("%H:%M:%S"): 分(整数)に変換
-    df_sleepMan['sleeping_time'] = df_sleepMan['sleeping_time'].apply(toMinute)
-    # 深い睡眠("%H:%M:%S"): 分(整数)に変換
-    df_sleepMan['deep_sleeping_time'] = df_sleepMan['deep_sleeping_time'].apply(toMinute)
-    # 就寝時間: X軸出力用に時刻部分のみ設定する
-    df_sleepMan['bed_time'] = [bedTm.strftime("%H:%M") for bedTm in bedTimes]
-    app_logger.info(df_sleepMan)
-    app_logger.info(df_sleepMan.index)
-
-    # 当該年月の期間に欠損値があればインデックス振り直す
-    org_dataSize: int = df_sleepMan.index.shape[0]
-    app_logger.info(f"org_dataSize:{org_dataSize}")
-    if org_dataSize < endDay:
-        # 単月データで欠損値有り (測定日未登録)
-        app_logger.info(f"{org_dataSize} < endDay: {endDay}")
-        # https://pandas.pydata.org/docs/reference/api/pandas.date_range.html
-        df_sleepMan = df_sleepMan.reindex(
-            pd.date_range(start=start_date, end=end_date, name='measurement_day')
+        # 夜間頻尿要因用DataFrame
+        df_noctFact: DataFrame = pd.read_csv(
+            read_month_bytes(path_noctFact, year_month), header=0,
+            parse_dates=['measurement_day'], date_format=FMT_DATE,
+            usecols=NOCT_FACT_COLS
         )
-    else:
-        # 複数月にまたがるCSV
-        app_logger.info(f"filter[{start_date} : {end_date}]")
-        # 月間データを取り出す
-        df_sleepMan = df_sleepMan.loc[start_date:end_date]
-        filtered_dataSize: int = df_sleepMan.shape[0]
-        app_logger.info(f"filtered_dataSize: {filtered_dataSize}")
-        # 月間データに欠損データが有る場合は埋める
-        if filtered_dataSize < endDay:
+        # 複数テーブルのデータをインデックスで結合する
+        # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.join.html
+        # INNER JOIN (1:1)
+        df_sleepMan = df_sleepMan.set_index('measurement_day').join(
+            df_noctFact.set_index('measurement_day')
+        )
+        sp.rows = df_sleepMan.shape[0]
+
+    with span(PHASE_TRANSFORM):
+        # 就寝時刻の計算: (測定日[必須]+起床時間[必須]) - 睡眠時間[任意]
+        days: Series = df_sleepMan.index
+        bedTimes: List[Optional[datetime]] = [
+            calcBedTime(
+                day.strftime(FMT_DATE), wakeup, sleeping) for day, wakeup, sleeping in zip(
+                days, df_sleepMan['wakeup_time'], df_sleepMan['sleeping_time']
+            )
+        ]
+
+        # 起床時刻("%H:%M:%S"): 秒部分をトリムする ※健康管理Androidアプリで入力した値が"%H:%M"
+        df_sleepMan['wakeup_time'] = df_sleepMan['wakeup_time'].apply(trimSecondsWithTime)
+        # 睡眠時間("%H:%M:%S"): 分(整数)に変換
+        df_sleepMan['sleeping_time'] = df_sleepMan['sleeping_time'].apply(toMinute)
+        # 深い睡眠("%H:%M:%S"): 分(整数)に変換
+        df_sleepMan['deep_sleeping_time'] = df_sleepMan['deep_sleeping_time'].apply(toMinute)
+        # 就寝時間: X軸出力用に時刻部分のみ設定する
+        df_sleepMan['bed_time'] = [bedTm.strftime("%H:%M") for bedTm in bedTimes]
+        app_logger.info(frame_summary(df_sleepMan, "df_sleepMan"))
+
+        # 当該年月の期間に欠損値があればインデックス振り直す
+        org_dataSize: int = df_sleepMan.index.shape[0]
+        app_logger.info(f"org_dataSize:{org_dataSize}")
+        if org_dataSize < endDay:
+            # 単月データで欠損値有り (測定日未登録)
+            app_logger.info(f"{org_dataSize} < endDay: {endDay}")
+            # https://pandas.pydata.org/docs/reference/api/pandas.date_range.html
             df_sleepMan = df_sleepMan.reindex(
                 pd.date_range(start=start_date, end=end_date, name='measurement_day')
             )
-    app_logger.info(df_sleepMan.shape)
-    app_logger.info(df_sleepMan)
-
-    # 深い睡眠データ
-    deepSleepingSer: Series = df_sleepMan['deep_sleeping_time']
-    # 睡眠時間描画用の差分 ※積み上げ棒グラフの深い睡眠の上にスタック描画
-    sleepingDiffSer: Series = df_sleepMan['sleeping_time'] - deepSleepingSer
-    app_logger.info(f"sleepingDiff:\n{sleepingDiffSer}")
-
-    # データ件数(月間: 1〜末日までの日数)
-    dateRangeSize: int = df_sleepMan.shape[0]
-    # X軸のインデックス生成 ※月間の日数
-    xIndexes = np.arange(dateRangeSize)
-    # Seriesからプロット用ラベルデータを作成する
-    # メインプロットのX軸ラベル
-    daySer: Series = df_sleepMan.index
-    # 起床時間の欠損値(測定日なし) NANをプランクを設定
-    # https://sparkbyexamples.com/pandas/pandas-replace-nan-with-blank-empty-string/
-    #  Pandas Replace NaN to empty string
-    wakeupSer: Series = df_sleepMan['wakeup_time'].fillna("")
-    # X軸ラベルリスト: "日 (曜日) " + 起床時刻
-    xLabels: List[str] = [
-        f"{makeDateLabel(day.strftime(FMT_DATE))} {wakeup}" for day, wakeup in zip(
-            daySer, wakeupSer
-        )
-    ]
-    # Y軸 (0〜12時間) ["00:00","00:30","01:00", ..., "11:30","12:00"]
-    sleepingTimeYTicks: List = [minuteToFormatTime(x) for x in
-                                range(0, SLEEP_TIME_MAX + 1, 30)]
+        else:
+            # 複数月にまたがるCSV
+            app_logger.info(f"filter[{start_date} : {end_date}]")
+            # 月間データを取り出す
+            df_sleepMan = df_sleepMan.loc[start_date:end_date]
+            filtered_dataSize: int = df_sleepMan.shape[0]
+            app_logger.info(f"filtered_dataSize: {filtered_dataSize}")
+            # 月間データに欠損データが有る場合は埋める
+            if filtered_dataSize < endDay:
+                df_sleepMan = df_sleepMan.reindex(
+                    pd.date_range(start=start_date, end=end_date, name='measurement_day')
+                )
+        app_logger.info(frame_summary(df_sleepMan, "df_sleepMan"))
+
+        # 深い睡眠データ
+        deepSleepingSer: Series = df_sleepMan['deep_sleeping_time']
+        # 睡眠時間描画用の差分 ※積み上げ棒グラフの深い睡眠の上にスタック描画
+        sleepingDiffSer: Series = df_sleepMan['sleeping_time'] - deepSleepingSer
+        app_logger.info(frame_summary(sleepingDiffSer, "sleepingDiff"))
+
+        # データ件数(月間: 1〜末日までの日数)
+        dateRangeSize: int = df_sleepMan.shape[0]
+        # X軸のインデックス生成 ※月間の日数
+        xIndexes = np.arange(dateRangeSize)
+        # Seriesからプロット用ラベルデータを作成する
+        # メインプロットのX軸ラベル
+        daySer: Series = df_sleepMan.index
+        # 起床時間の欠損値(測定日なし) NANをプランクを設定
+        # https://sparkbyexamples.com/pandas/pandas-replace-nan-with-blank-empty-string/
+        #  Pandas Replace NaN to empty string
+        wakeupSer: Series = df_sleepMan['wakeup_time'].fillna("")
+        # X軸ラベルリスト: "日 (曜日) " + 起床時刻
+        xLabels: List[str] = [
+            f"{makeDateLabel(day.strftime(FMT_DATE))} {wakeup}" for day, wakeup in zip(
+                daySer, wakeupSer
+            )
+        ]
+        # Y軸 (0〜12時間) ["00:00","00:30","01:00", ..., "11:30","12:00"]
+        sleepingTimeYTicks: List = [minuteToFormatTime(x) for x in
+                                    range(0, SLEEP_TIME_MAX + 1, 30)]
 
     # グラフ出力
     # 携帯用の描画領域サイズ(ピクセル)をインチに変換
@@ -473,100 +507,108 @@ if __name__ == '__main__':
         PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY
     )
 
-    # 描画領域作成
-    #  (1)上段描画領域: 夜間トイレ回数 (Y軸), 就寝時間 (X軸)
-    #  (2)下段描画領域: 睡眠管理データ
-    fig: Figure
-    ax_top: Axes
-    ax_main: Axes
-    # https://stackoverflow.com/questions/34268742/how-to-use-gridspec-with-subplots
-    #  How to use `GridSpec()` with `subplots()`
-    # 上段エリア (補助プロット): 1, 下段エリア (メインプロット): 5
-    # 上段エリアのX軸に就寝時間を出力するため sharex=False (デフォルト) とする
-    fig, (ax_top, ax_main) = plt.subplots(
-        2, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
-        figsize=(fig_width_inch, fig_height_inch)
-    )
-    app_logger.info(f"fig: {fig}, ax_top: {ax_top}, ax_main: {ax_main}")
-    # Y方向のグリッド線のみ表示
-    ax_main.grid(**AXES_GRID_STYLE)
-    ax_top.grid(**AXES_GRID_STYLE)
-
-    # 下段メインプロット領域
-    # 深い睡眠: 棒グラフ
-    ax_main.bar(xIndexes, deepSleepingSer, BAR_WIDTH,
-                color=COLOR_BAR_DEEP_SLEEPING,
-                label=LABEL_DEEP_SLEEPING, **BAR_LINE_STYLE)
-    # 睡眠時間 (深い睡眠との差分): 棒グラフ
-    ax_main.bar(xIndexes, sleepingDiffSer, BAR_WIDTH,
-                color=COLOR_BAR_SLEEPING,
-                bottom=deepSleepingSer,
-                label=LABEL_SLEEPING, **BAR_LINE_STYLE)
-    # 凡例の位置設定
-    ax_main.legend(loc=LEGEND_LOC)
-    ax_main.set_ylabel("睡眠時間")
-    # y軸ラベル: 睡眠時間 "時:分"
-    ax_main.set_yticks(np.arange(SLEEP_TIME_MIN, (SLEEP_TIME_MAX + 1), SLEEP_TIME_STEP),
-                       sleepingTimeYTicks,
-                       **TIME_TICKS_STYLE)
-    ax_main.set_ylim(SLEEP_TIME_MIN, SLEEP_TIME_MAX)
-    # x軸ラベル
-    ax_main.set_xticks(xIndexes, xLabels, **X_TICKS_STYLE)
-    ax_main.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
-
-    # 睡眠スコアを取得: 折れ線グラフ (ラベル軸は右側)
-    sleepScoreSer: Series = df_sleepMan['sleep_score']
-    # 右側に軸を作成
-    ax_main_score = ax_main.twinx()
-    ax_main_score.set_ylabel(LABEL_SLEEP_SCORE)
-    ax_main_score.plot(xIndexes, sleepScoreSer, **SCORE_LINE_STYLE)
-    # 右側y軸ラベル: 100まで表示させるため+1
-    ax_main_score.set_yticks(np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
-                             np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
-                             **SCORE_TICKS_STYLE)
-    # 右側Y軸値(0〜100)
-    ax_main_score.set_ylim(0, SCORE_MAX)
-    # 睡眠スコアが良い以上の場合はスコア値を表示
-    drawScoreWithMarker(ax_main_score, sleepScoreSer)
-    # 睡眠スコア範囲の矩形描画
-    # 非常に良い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX,
-                       SLEEP_TIME_MAX * RATE_SCORE_BEST,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_BEST)
-    # 良い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BEST,
-                       SLEEP_TIME_MAX * RATE_SCORE_GOOD,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_GOOD)
-    # やや低い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_GOOD,
-                       SLEEP_TIME_MAX * RATE_SCORE_BAD,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_WORNING, alpha=0.1)
-    # 低い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BAD,
-                       SLEEP_TIME_MIN,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_BAD, alpha=0.1)
-
-    # 上端プロット領域
-    # タイトル
-    ax_top.set_title(titleDateRange, **TITLE_STYLE)
-    # 夜間トイレ回数 (散布図)
-    toiletVisitsSer: Series = df_sleepMan['midnight_toilet_visits']
-    # X軸に表示する就寝時間の欠損値は空文字を設定
-    topXTicks: Series = df_sleepMan['bed_time'].fillna("")
-    ax_top.scatter(xIndexes, toiletVisitsSer, **SCATTER_TOILET_VISITS_STYLE)
-    ax_top.set_ylim(TOILET_VISITS_MIN, TOILET_VISITS_MAX)
-    ax_top.set_ylabel(TOP_AXES_LABEL)
-    ax_top.set_yticks(range(TOILET_VISITS_MIN, TOILET_VISITS_MAX + 1))
-    # 睡眠時間をX軸に表示 ※X軸数はメインプロット領域と同一
-    ax_top.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
-    ax_top.set_xticks(xIndexes, topXTicks, **TOP_X_TICKS_STYLE)
+    with span(PHASE_FIGURE):
+        # 描画領域作成
+        #  (1)上段描画領域: 夜間トイレ回数 (Y軸), 就寝時間 (X軸)
+        #  (2)下段描画領域: 睡眠管理データ
+        fig: Figure
+        ax_top: Axes
+        ax_main: Axes
+        # https://stackoverflow.com/questions/34268742/how-to-use-gridspec-with-subplots
+        #  How to use `GridSpec()` with `subplots()`
+        # 上段エリア (補助プロット): 1, 下段エリア (メインプロット): 5
+        # 上段エリアのX軸に就寝時間を出力するため sharex=False (デフォルト) とする
+        fig, (ax_top, ax_main) = plt.subplots(
+            2, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
+            figsize=(fig_width_inch, fig_height_inch)
+        )
+        app_logger.info(f"fig: {fig}, ax_top: {ax_top}, ax_main: {ax_main}")
+        # Y方向のグリッド線のみ表示
+        ax_main.grid(**AXES_GRID_STYLE)
+        ax_top.grid(**AXES_GRID_STYLE)
+
+        # 下段メインプロット領域
+        # 深い睡眠: 棒グラフ
+        ax_main.bar(xIndexes, deepSleepingSer, BAR_WIDTH,
+                    color=COLOR_BAR_DEEP_SLEEPING,
+                    label=LABEL_DEEP_SLEEPING, **BAR_LINE_STYLE)
+        # 睡眠時間 (深い睡眠との差分): 棒グラフ
+        ax_main.bar(xIndexes, sleepingDiffSer, BAR_WIDTH,
+                    color=COLOR_BAR_SLEEPING,
+                    bottom=deepSleepingSer,
+                    label=LABEL_SLEEPING, **BAR_LINE_STYLE)
+        # 凡例の位置設定
+        ax_main.legend(loc=LEGEND_LOC)
+        ax_main.set_ylabel("睡眠時間")
+        # y軸ラベル: 睡眠時間 "時:分"
+        ax_main.set_yticks(np.arange(SLEEP_TIME_MIN, (SLEEP_TIME_MAX + 1), SLEEP_TIME_STEP),
+                           sleepingTimeYTicks,
+                           **TIME_TICKS_STYLE)
+        ax_main.set_ylim(SLEEP_TIME_MIN, SLEEP_TIME_MAX)
+        # x軸ラベル
+        ax_main.set_xticks(xIndexes, xLabels, **X_TICKS_STYLE)
+        ax_main.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
+
+        # 睡眠スコアを取得: 折れ線グラフ (ラベル軸は右側)
+        sleepScoreSer: Series = df_sleepMan['sleep_score']
+        # 右側に軸を作成
+        ax_main_score = ax_main.twinx()
+        ax_main_score.set_ylabel(LABEL_SLEEP_SCORE)
+        ax_main_score.plot(xIndexes, sleepScoreSer, **SCORE_LINE_STYLE)
+        # 右側y軸ラベル: 100まで表示させるため+1
+        ax_main_score.set_yticks(np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
+                                 np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
+                                 **SCORE_TICKS_STYLE)
+        # 右側Y軸値(0〜100)
+        ax_main_score.set_ylim(0, SCORE_MAX)
+        # 睡眠スコアが良い以上の場合はスコア値を表示
+        drawScoreWithMarker(ax_main_score, sleepScoreSer)
+        # 睡眠スコア範囲の矩形描画
+        # 非常に良い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX,
+                           SLEEP_TIME_MAX * RATE_SCORE_BEST,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_BEST)
+        # 良い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BEST,
+                           SLEEP_TIME_MAX * RATE_SCORE_GOOD,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_GOOD)
+        # やや低い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_GOOD,
+                           SLEEP_TIME_MAX * RATE_SCORE_BAD,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_WORNING, alpha=0.1)
+        # 低い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BAD,
+                           SLEEP_TIME_MIN,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_BAD, alpha=0.1)
+
+        # 上端プロット領域
+        # タイトル
+        ax_top.set_title(titleDateRange, **TITLE_STYLE)
+        # 夜間トイレ回数 (散布図)
+        toiletVisitsSer: Series = df_sleepMan['midnight_toilet_visits']
+        # X軸に表示する就寝時間の欠損値は空文字を設定
+        topXTicks: Series = df_sleepMan['bed_time'].fillna("")
+        ax_top.scatter(xIndexes, toiletVisitsSer, **SCATTER_TOILET_VISITS_STYLE)
+        ax_top.set_ylim(TOILET_VISITS_MIN, TOILET_VISITS_MAX)
+        ax_top.set_ylabel(TOP_AXES_LABEL)
+        ax_top.set_yticks(range(TOILET_VISITS_MIN, TOILET_VISITS_MAX + 1))
+        # 睡眠時間をX軸に表示 ※X軸数はメインプロット領域と同一
+        ax_top.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
+        ax_top.set_xticks(xIndexes, topXTicks, **TOP_X_TICKS_STYLE)
 
     # プロット結果をPNG形式でファイル保存
     save_name = gen_imgname(script_name)
-    save_path = os.path.join("screen_shots", save_name)
-    app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    if args.density_dir is not None:
+        # 携帯アプリ用: 図とレイアウトは1回だけ作成し密度毎に描画する
+        width_dp, _ = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+        save_densities(fig, os.path.expanduser(args.density_dir), save_name, width_dp,
+                       script_name, densities=args.densities, logger=app_logger)
+    else:
+        save_path = os.path.join("screen_shots", save_name)
+        app_logger.info(save_path)
+        timed_save(fig, save_path, lambda fp: save_figure(
+            fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
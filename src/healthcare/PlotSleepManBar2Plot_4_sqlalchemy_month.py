@@ -1,8 +1,6 @@
 import argparse
 import logging
-import json
 import os
-import socket
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
@@ -16,15 +14,22 @@ from matplotlib.figure import Figure
 from matplotlib.patches import Rectangle
 
 import sqlalchemy
-from sqlalchemy.engine.url import URL
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Result
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.sql import text
 
+from util.db_engine import get_engine
 import util.date_util as du
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.density_outputs import DENSITY_CHOICES, dp_size, save_densities
+from util.phase_timer import (
+    PHASE_CONNECT, PHASE_FIGURE, PHASE_QUERY, PHASE_TRANSFORM, span, start_timer, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import seq_summary, set_full_dump
+from util.queries import QUERY_ID_SLEEP_MAN
+from util.query_cache import DEFAULT_CACHE_DIR, fetch_rows
 
 """
 健康管理DBから取得した月間の睡眠管理データ(夜間頻尿要因データの一部を結合)を棒グラフでプロット
@@ -155,28 +160,6 @@ PHONE_PX_HEIGHT: int = 1704
 # 同上: 密度
 PHONE_DENSITY: float = 2.75
 
-# 睡眠管理テーブルデータ取得クエリ
-QUERY_SLEEP_MAN = """
-SELECT
-  to_char(sm.measurement_day,'YYYY-MM-DD') as measurement_day
-  ,to_char(wakeup_time,'HH24:MI') as wakeup_time
-  ,sleep_score
-  ,to_char(sleeping_time, 'HH24:MI') as sleeping_time
-  ,to_char(deep_sleeping_time, 'HH24:MI') as deep_sleeping_time
-  ,midnight_toilet_visits
-FROM
-  bodyhealth.person p
-  INNER JOIN bodyhealth.sleep_management sm ON p.id = sm.pid
-  INNER JOIN bodyhealth.nocturia_factors nf ON p.id = nf.pid
-WHERE
-  email=:emailAddress
-  AND
-  sm.measurement_day BETWEEN :startDay AND :endDay
-  AND
-  sm.measurement_day = nf.measurement_day
-  ORDER BY sm.measurement_day
-"""
-
 
 @dataclass
 class SleepManJoined:
@@ -189,22 +172,9 @@ class SleepManJoined:
     midnight_toilet_visits: int
 
 
-def getDBConnectionWithDict(filePath: str) -> dict:
-    """
-    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
-    :param filePath: 接続設定ファイルパス (JSON形式)
-    :return: SQLAlchemyのURL用辞書オブジェクト
-    """
-    with open(filePath, 'r') as fp:
-        db_conf: json = json.load(fp)
-        hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return db_conf
-
-
 def getRecordsWithDict(DbSession: sqlalchemy.orm.scoping.scoped_session,
-                       mailAddress: str, startDate: str, endDate: str
+                       mailAddress: str, startDate: str, endDate: str,
+                       cacheDir: Optional[str] = DEFAULT_CACHE_DIR
                        ) -> Dict[str, SleepManJoined]:
     """
     睡眠管理テーブルから月間の睡眠管理データを取得する
@@ -212,16 +182,20 @@ def getRecordsWithDict(DbSession: sqlalchemy.orm.scoping.scoped_session,
     :param mailAddress: メールアドレス (主キー)
     :param startDate: 開祖日
     :param endDate: 終了日
+    :param cacheDir: クエリー結果キャッシュディレクトリ ※Noneならキャッシュを使わない
     :return: 月間の睡眠管理データ(日付をキーとする辞書オブジェクト)
     """
-    params: Dict = {
-        "emailAddress": mailAddress, "startDay": startDate, "endDay": endDate}
     rows = None
     try:
         with DbSession() as sess:
-            rs: Result = sess.execute(text(QUERY_SLEEP_MAN), params)
-            if rs:
-                rows = rs.fetchall()
+            with span(PHASE_CONNECT):
+                sess.connection()
+            # 完了月はキャッシュから取得し、未キャッシュの月のみデータベースに問い合わせる
+            with span(PHASE_QUERY) as sp:
+                rows = fetch_rows(
+                    sess, QUERY_ID_SLEEP_MAN, mailAddress, startDate, endDate, cache_dir=cacheDir
+                ).rows
+                sp.rows = len(rows)
     except SQLAlchemyError as err:
         app_logger.warning(err.args)
         raise err
@@ -484,7 +458,33 @@ if __name__ == '__main__':
     # 年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="年月 (例) 2023-04")
+    # クエリー結果キャッシュを使わない
+    parser.add_argument("--no-cache", action="store_true", help="Disable query result cache.")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # 携帯アプリ用の密度毎 (mdpi〜xxxhdpi) の画像とサムネイルの出力ディレクトリ
+    parser.add_argument("--density-dir", type=str,
+                        help="Write drawable-<density>/ images and a thumbnail here.")
+    # 出力する密度 (--density-dir 指定時)
+    parser.add_argument("--densities", type=str, nargs="+", choices=DENSITY_CHOICES,
+                        default=DENSITY_CHOICES, help="Densities written to --density-dir.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
     # 選択クエリーの主キー: メールアドレス
     mail_address: str = args.mail_address
     year_month: str = args.year_month
@@ -506,15 +506,11 @@ if __name__ == '__main__':
     plotDateRanges: List[str] = [
         "{}-{:#02d}".format(year_month, day) for day in range(1, endDay + 1)
     ]
-    app_logger.info(plotDateRanges)
+    app_logger.info(seq_summary(plotDateRanges, "plotDateRanges"))
 
     # 健康管理データベース
-    # SQLAlchemyデータベース接続URL用辞書オブジェクト取得
-    connDict: dict = getDBConnectionWithDict(DB_HEALTHCARE_CONF)
-    # データベース接続URL生成
-    connUrl: URL = URL.create(**connDict)
-    # SQLAlchemyデータベースエンジン
-    engineHealthcare: sqlalchemy.Engine = create_engine(connUrl, echo=False)
+    # 共有エンジン (接続プール)
+    engineHealthcare: sqlalchemy.Engine = get_engine(DB_HEALTHCARE_CONF)
     # scopedセッションクラス取得
     Cls_sess_healthcare: sqlalchemy.orm.scoping.scoped_session = scoped_session(
         sessionmaker(bind=engineHealthcare)
@@ -523,7 +519,8 @@ if __name__ == '__main__':
 
     # 睡眠管理テーブルから月間レコードを日付と睡眠管理データの辞書オブジェクトとして取得
     recordsWithDict: Dict[str, SleepManJoined] = getRecordsWithDict(
-        Cls_sess_healthcare, mail_address, start_date, end_date
+        Cls_sess_healthcare, mail_address, start_date, end_date,
+        cacheDir=None if args.no_cache else DEFAULT_CACHE_DIR
     )
     # Check record count
     app_logger.info(recordsWithDict.keys())
@@ -531,65 +528,66 @@ if __name__ == '__main__':
         app_logger.warning(f"{mail_address}, {year_month}: Record is empty!")
         exit(0)
 
-    # 月間のプロット用項目別(X軸ラベル, 睡眠スコア, 睡眠時間, 深い睡眠)リスト生成
-    xLabels, scores, sleepingTimes, deepSleepingTimes, bedTimes = makeColsForPlotting(
-        plotDateRanges, recordsWithDict
-    )
-    # 上段に睡眠時刻と夜間トイレ回数のサブプロット領域追加
-    toiletVisits: List[Optional[SleepManJoined]] = makeNocturiaColListForPlotting(
-        plotDateRanges, recordsWithDict
-    )
-    # 睡眠時間 (分)
-    sleepingMinutes: List[Optional[int]] = [toMinute(s_time) for s_time in sleepingTimes]
-    # 深い睡眠 (分)
-    deepSleepingMinutes: List[Optional[int]] = [
-        toMinute(s_time) for s_time in deepSleepingTimes
-    ]
-
-    app_logger.info(f"xTicksLabels:\n{xLabels}")
-    app_logger.info(f"sleepScores:\n{scores}")
-    app_logger.info(f"sleepingTimes:\n{sleepingTimes}")
-    app_logger.info(f"deepSleepingTimes:\n{deepSleepingTimes}")
-    app_logger.info(f"bedTimes:\n{bedTimes}")
-    app_logger.info(f"toiletVisits:\n{toiletVisits}")
-
-    # プロット用オブジェクトリスト
-    # 睡眠スコア
-    np_sleepScores: np.array = np.array(
-        [val if val is not None else np.nan for val in scores]
-    )
-    app_logger.info(f"{np_sleepScores}")
-    # 深い睡眠
-    np_deepSleepingMinutes: np.ndarray = np.array([
-        val if val is not None else np.nan for val in deepSleepingMinutes
-    ])
-    app_logger.info(np_deepSleepingMinutes)
-    # 睡眠時間
-    np_sleepingMinutes: np.ndarray = np.array([
-        val if val is not None else np.nan for val in sleepingMinutes
-    ])
-    app_logger.info(np_sleepingMinutes)
-    # 就寝時間 (上端のX軸): None なら 空文字, 値有りなら"HH:MM"
-    topXTicks: List[str] = [
-        val_dt.strftime("%H:%M") if val_dt is not None else "" for val_dt in bedTimes
-    ]
-    app_logger.info(f"topXTicks:\n{topXTicks}")
-    # トイレ回数
-    np_toiletVisits: List[np.ndarray] = [
-        val if val is not None else np.nan for val in toiletVisits
-    ]
-    app_logger.info(f"toiletVisits:\n{np_toiletVisits}")
-    # 棒グラフ用の睡眠時間 = (睡眠時間 - 深い睡眠)
-    np_sleepingDiffMinutes = np_sleepingMinutes - np_deepSleepingMinutes
-    app_logger.info(np_sleepingDiffMinutes)
-
-    # プロット用ラベルデータを作成する
-    # X軸: データ件数(月間: 1〜末日までの日数)
-    dateRangeSize: int = len(plotDateRanges)
-    xIndexes = np.arange(dateRangeSize)
-    # Y軸 (0〜12時間) ["00:00","00:30","01:00", ..., "11:30","12:00"]
-    sleepingTimeYTicks: List = [minuteToFormatTime(x) for x in
-                                range(0, SLEEP_TIME_MAX + 1, 30)]
+    with span(PHASE_TRANSFORM):
+        # 月間のプロット用項目別(X軸ラベル, 睡眠スコア, 睡眠時間, 深い睡眠)リスト生成
+        xLabels, scores, sleepingTimes, deepSleepingTimes, bedTimes = makeColsForPlotting(
+            plotDateRanges, recordsWithDict
+        )
+        # 上段に睡眠時刻と夜間トイレ回数のサブプロット領域追加
+        toiletVisits: List[Optional[SleepManJoined]] = makeNocturiaColListForPlotting(
+            plotDateRanges, recordsWithDict
+        )
+        # 睡眠時間 (分)
+        sleepingMinutes: List[Optional[int]] = [toMinute(s_time) for s_time in sleepingTimes]
+        # 深い睡眠 (分)
+        deepSleepingMinutes: List[Optional[int]] = [
+            toMinute(s_time) for s_time in deepSleepingTimes
+        ]
+
+        app_logger.info(seq_summary(xLabels, "xTicksLabels"))
+        app_logger.info(seq_summary(scores, "sleepScores"))
+        app_logger.info(seq_summary(sleepingTimes, "sleepingTimes"))
+        app_logger.info(seq_summary(deepSleepingTimes, "deepSleepingTimes"))
+        app_logger.info(seq_summary(bedTimes, "bedTimes"))
+        app_logger.info(seq_summary(toiletVisits, "toiletVisits"))
+
+        # プロット用オブジェクトリスト
+        # 睡眠スコア
+        np_sleepScores: np.array = np.array(
+            [val if val is not None else np.nan for val in scores]
+        )
+        app_logger.info(seq_summary(np_sleepScores, "np_sleepScores"))
+        # 深い睡眠
+        np_deepSleepingMinutes: np.ndarray = np.array([
+            val if val is not None else np.nan for val in deepSleepingMinutes
+        ])
+        app_logger.info(seq_summary(np_deepSleepingMinutes, "np_deepSleepingMinutes"))
+        # 睡眠時間
+        np_sleepingMinutes: np.ndarray = np.array([
+            val if val is not None else np.nan for val in sleepingMinutes
+        ])
+        app_logger.info(seq_summary(np_sleepingMinutes, "np_sleepingMinutes"))
+        # 就寝時間 (上端のX軸): None なら 空文字, 値有りなら"HH:MM"
+        topXTicks: List[str] = [
+            val_dt.strftime("%H:%M") if val_dt is not None else "" for val_dt in bedTimes
+        ]
+        app_logger.info(seq_summary(topXTicks, "topXTicks"))
+        # トイレ回数
+        np_toiletVisits: List[np.ndarray] = [
+            val if val is not None else np.nan for val in toiletVisits
+        ]
+        app_logger.info(seq_summary(np_toiletVisits, "toiletVisits"))
+        # 棒グラフ用の睡眠時間 = (睡眠時間 - 深い睡眠)
+        np_sleepingDiffMinutes = np_sleepingMinutes - np_deepSleepingMinutes
+        app_logger.info(seq_summary(np_sleepingDiffMinutes, "np_sleepingDiffMinutes"))
+
+        # プロット用ラベルデータを作成する
+        # X軸: データ件数(月間: 1〜末日までの日数)
+        dateRangeSize: int = len(plotDateRanges)
+        xIndexes = np.arange(dateRangeSize)
+        # Y軸 (0〜12時間) ["00:00","00:30","01:00", ..., "11:30","12:00"]
+        sleepingTimeYTicks: List = [minuteToFormatTime(x) for x in
+                                    range(0, SLEEP_TIME_MAX + 1, 30)]
 
     # グラフ出力
     # 携帯用の描画領域サイズ(ピクセル)をインチに変換
@@ -597,100 +595,108 @@ if __name__ == '__main__':
         PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY
     )
 
-    # 描画領域作成
-    #  (1)上段描画領域: 夜間トイレ回数 (Y軸), 就寝時間 (X軸)
-    #  (2)下段描画領域: 睡眠管理データ
-    fig: Figure
-    ax_top: Axes
-    ax_main: Axes
-    # https://stackoverflow.com/questions/34268742/how-to-use-gridspec-with-subplots
-    #  How to use `GridSpec()` with `subplots()`
-    # 上段エリア (補助プロット): 1, 下段エリア (メインプロット): 5
-    # 上段エリアのX軸に就寝時間を出力するため sharex=False (デフォルト) とする
-    # https://matplotlib.org/stable/tutorials/intermediate/constrainedlayout_guide.html
-    #  Constrained Layout Guide
-    fig, (ax_top, ax_main) = plt.subplots(
-        2, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
-        figsize=(fig_width_inch, fig_height_inch)
-    )
-    app_logger.info(f"fig: {fig}, ax_top: {ax_top}, ax_main: {ax_main}")
-    # Y方向のグリッド線のみ表示
-    ax_main.grid(**AXES_GRID_STYLE)
-    ax_top.grid(**AXES_GRID_STYLE)
-
-    # 下段メインプロット領域
-    # 深い睡眠: 棒グラフ
-    ax_main.bar(xIndexes, np_deepSleepingMinutes, BAR_WIDTH,
-                color=COLOR_BAR_DEEP_SLEEPING,
-                label=LABEL_DEEP_SLEEPING, **BAR_LINE_STYLE)
-    # 睡眠時間 (深い睡眠との差分): 棒グラフ
-    ax_main.bar(xIndexes, np_sleepingDiffMinutes, BAR_WIDTH,
-                color=COLOR_BAR_SLEEPING,
-                bottom=np_deepSleepingMinutes,
-                label=LABEL_SLEEPING, **BAR_LINE_STYLE)
-    # 凡例の位置設定
-    ax_main.legend(loc=LEGEND_LOC)
-    ax_main.set_ylabel("睡眠時間")
-    # y軸ラベル: 睡眠時間 "時:分"
-    ax_main.set_yticks(np.arange(SLEEP_TIME_MIN, (SLEEP_TIME_MAX + 1), SLEEP_TIME_STEP),
-                       sleepingTimeYTicks,
-                       **TIME_TICKS_STYLE)
-    ax_main.set_ylim(SLEEP_TIME_MIN, SLEEP_TIME_MAX)
-    # x軸ラベル
-    ax_main.set_xticks(xIndexes, xLabels, **X_TICKS_STYLE)
-    ax_main.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
-    # 月間データの場合はラベルを出力しない ※日単位当たり幅が小さいため重なってしまう
-    # ax.bar_label(ax.containers[0], label_type='edge', **BAR_LABEL_STYLE)
-    # draw_sleeping_time(ax, sleeping_list)
-
-    # 睡眠スコア領域を取得: 折れ線グラフ (ラベル軸は右側)
-    ax_main_score = ax_main.twinx()
-    ax_main_score.set_ylabel(LABEL_SLEEP_SCORE)
-    ax_main_score.plot(xIndexes, np_sleepScores, **SCORE_LINE_STYLE)
-    # 右側y軸ラベル: 100まで表示させるため+1
-    ax_main_score.set_yticks(np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
-                             np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
-                             **SCORE_TICKS_STYLE)
-    # 右側Y軸値(0〜100)
-    ax_main_score.set_ylim(0, SCORE_MAX)
-    # 睡眠スコアが良い以上の場合はスコア値を表示
-    drawScoreWithMarker(ax_main_score, scores)
-    # 睡眠スコア範囲の矩形描画
-    # 非常に良い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX,
-                       SLEEP_TIME_MAX * RATE_SCORE_BEST,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_BEST)
-    # 良い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BEST,
-                       SLEEP_TIME_MAX * RATE_SCORE_GOOD,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_GOOD)
-    # やや低い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_GOOD,
-                       SLEEP_TIME_MAX * RATE_SCORE_BAD,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_WORNING, alpha=0.1)
-    # 低い
-    drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BAD,
-                       SLEEP_TIME_MIN,
-                       X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
-                       facecolor=COLOR_SCORE_BAD, alpha=0.1)
-
-    # 上端プロット領域
-    # タイトル
-    ax_top.set_title(titleDateRange, **TITLE_STYLE)
-    # 夜間トイレ回数 (散布図)
-    ax_top.scatter(xIndexes, np_toiletVisits, **SCATTER_TOILET_VISITS_STYLE)
-    ax_top.set_ylim(TOILET_VISITS_MIN, TOILET_VISITS_MAX)
-    ax_top.set_ylabel(TOP_AXES_LABEL)
-    ax_top.set_yticks(range(TOILET_VISITS_MIN, TOILET_VISITS_MAX + 1))
-    # 睡眠時間をX軸に表示 ※X軸数はメインプロット領域と同一
-    ax_top.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
-    ax_top.set_xticks(xIndexes, topXTicks, **TOP_X_TICKS_STYLE)
+    with span(PHASE_FIGURE):
+        # 描画領域作成
+        #  (1)上段描画領域: 夜間トイレ回数 (Y軸), 就寝時間 (X軸)
+        #  (2)下段描画領域: 睡眠管理データ
+        fig: Figure
+        ax_top: Axes
+        ax_main: Axes
+        # https://stackoverflow.com/questions/34268742/how-to-use-gridspec-with-subplots
+        #  How to use `GridSpec()` with `subplots()`
+        # 上段エリア (補助プロット): 1, 下段エリア (メインプロット): 5
+        # 上段エリアのX軸に就寝時間を出力するため sharex=False (デフォルト) とする
+        # https://matplotlib.org/stable/tutorials/intermediate/constrainedlayout_guide.html
+        #  Constrained Layout Guide
+        fig, (ax_top, ax_main) = plt.subplots(
+            2, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
+            figsize=(fig_width_inch, fig_height_inch)
+        )
+        app_logger.info(f"fig: {fig}, ax_top: {ax_top}, ax_main: {ax_main}")
+        # Y方向のグリッド線のみ表示
+        ax_main.grid(**AXES_GRID_STYLE)
+        ax_top.grid(**AXES_GRID_STYLE)
+
+        # 下段メインプロット領域
+        # 深い睡眠: 棒グラフ
+        ax_main.bar(xIndexes, np_deepSleepingMinutes, BAR_WIDTH,
+                    color=COLOR_BAR_DEEP_SLEEPING,
+                    label=LABEL_DEEP_SLEEPING, **BAR_LINE_STYLE)
+        # 睡眠時間 (深い睡眠との差分): 棒グラフ
+        ax_main.bar(xIndexes, np_sleepingDiffMinutes, BAR_WIDTH,
+                    color=COLOR_BAR_SLEEPING,
+                    bottom=np_deepSleepingMinutes,
+                    label=LABEL_SLEEPING, **BAR_LINE_STYLE)
+        # 凡例の位置設定
+        ax_main.legend(loc=LEGEND_LOC)
+        ax_main.set_ylabel("睡眠時間")
+        # y軸ラベル: 睡眠時間 "時:分"
+        ax_main.set_yticks(np.arange(SLEEP_TIME_MIN, (SLEEP_TIME_MAX + 1), SLEEP_TIME_STEP),
+                           sleepingTimeYTicks,
+                           **TIME_TICKS_STYLE)
+        ax_main.set_ylim(SLEEP_TIME_MIN, SLEEP_TIME_MAX)
+        # x軸ラベル
+        ax_main.set_xticks(xIndexes, xLabels, **X_TICKS_STYLE)
+        ax_main.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
+        # 月間データの場合はラベルを出力しない ※日単位当たり幅が小さいため重なってしまう
+        # ax.bar_label(ax.containers[0], label_type='edge', **BAR_LABEL_STYLE)
+        # draw_sleeping_time(ax, sleeping_list)
+
+        # 睡眠スコア領域を取得: 折れ線グラフ (ラベル軸は右側)
+        ax_main_score = ax_main.twinx()
+        ax_main_score.set_ylabel(LABEL_SLEEP_SCORE)
+        ax_main_score.plot(xIndexes, np_sleepScores, **SCORE_LINE_STYLE)
+        # 右側y軸ラベル: 100まで表示させるため+1
+        ax_main_score.set_yticks(np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
+                                 np.arange(0, (SCORE_MAX + 1), SCORE_STEP),
+                                 **SCORE_TICKS_STYLE)
+        # 右側Y軸値(0〜100)
+        ax_main_score.set_ylim(0, SCORE_MAX)
+        # 睡眠スコアが良い以上の場合はスコア値を表示
+        drawScoreWithMarker(ax_main_score, scores)
+        # 睡眠スコア範囲の矩形描画
+        # 非常に良い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX,
+                           SLEEP_TIME_MAX * RATE_SCORE_BEST,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_BEST)
+        # 良い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BEST,
+                           SLEEP_TIME_MAX * RATE_SCORE_GOOD,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_GOOD)
+        # やや低い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_GOOD,
+                           SLEEP_TIME_MAX * RATE_SCORE_BAD,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_WORNING, alpha=0.1)
+        # 低い
+        drawRectBackground(ax_main, SLEEP_TIME_MAX * RATE_SCORE_BAD,
+                           SLEEP_TIME_MIN,
+                           X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN,
+                           facecolor=COLOR_SCORE_BAD, alpha=0.1)
+
+        # 上端プロット領域
+        # タイトル
+        ax_top.set_title(titleDateRange, **TITLE_STYLE)
+        # 夜間トイレ回数 (散布図)
+        ax_top.scatter(xIndexes, np_toiletVisits, **SCATTER_TOILET_VISITS_STYLE)
+        ax_top.set_ylim(TOILET_VISITS_MIN, TOILET_VISITS_MAX)
+        ax_top.set_ylabel(TOP_AXES_LABEL)
+        ax_top.set_yticks(range(TOILET_VISITS_MIN, TOILET_VISITS_MAX + 1))
+        # 睡眠時間をX軸に表示 ※X軸数はメインプロット領域と同一
+        ax_top.set_xlim(X_LIM_MARGIN, dateRangeSize + X_LIM_MARGIN)
+        ax_top.set_xticks(xIndexes, topXTicks, **TOP_X_TICKS_STYLE)
 
     # プロット結果をPNG形式でファイル保存
     save_name = gen_imgname(script_name)
-    save_path = os.path.join("screen_shots", save_name)
-    app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    if args.density_dir is not None:
+        # 携帯アプリ用: 図とレイアウトは1回だけ作成し密度毎に描画する
+        width_dp, _ = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+        save_densities(fig, os.path.expanduser(args.density_dir), save_name, width_dp,
+                       script_name, densities=args.densities, logger=app_logger)
+    else:
+        save_path = os.path.join("screen_shots", save_name)
+        app_logger.info(save_path)
+        timed_save(fig, save_path, lambda fp: save_figure(
+            fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
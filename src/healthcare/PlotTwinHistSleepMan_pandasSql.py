@@ -1,8 +1,6 @@
 import argparse
 import logging
-import json
 import os
-import socket
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
@@ -19,11 +17,21 @@ from pandas.core.frame import DataFrame, Series
 from pandas.core.groupby import DataFrameGroupBy
 
 import sqlalchemy
-from sqlalchemy.engine.url import URL
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
 
+from util.db_engine import get_engine
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.density_outputs import DENSITY_CHOICES, dp_size, save_densities
+from util.phase_timer import (
+    PHASE_CONNECT, PHASE_FIGURE, PHASE_QUERY, PHASE_TRANSFORM, span, start_timer, timed,
+    timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import frame_summary, set_full_dump
+from util.frame_dtype import COMPACT_NULLABLE_INT, compact_frame
+from util.queries import QUERY_ID_SLEEP_MAN
+from util.query_cache import DEFAULT_CACHE_DIR, QueryResult, fetch_rows
 from util.date_util import check_str_date
 
 """
@@ -49,27 +57,6 @@ LOG_FMT = '%(levelname)s %(message)s'
 # 健康管理データベース接続情報
 DB_HEALTHCARE_CONF: str = os.path.join("conf", "db_healthcare.json")
 
-QUERY_SLEEP_MAN = """
-SELECT
-  to_char(sm.measurement_day,'YYYY-MM-DD') as measurement_day
-  ,to_char(wakeup_time,'HH24:MI') as wakeup_time
-  ,sleep_score
-  ,to_char(sleeping_time, 'HH24:MI') as sleeping_time
-  ,to_char(deep_sleeping_time, 'HH24:MI') as deep_sleeping_time
-  ,midnight_toilet_visits
-FROM
-  bodyhealth.person p
-  INNER JOIN bodyhealth.sleep_management sm ON p.id = sm.pid
-  INNER JOIN bodyhealth.nocturia_factors nf ON p.id = nf.pid
-WHERE
-  email=:emailAddress
-  AND
-  sm.measurement_day BETWEEN :startDay AND :endDay
-  AND
-  sm.measurement_day = nf.measurement_day
-  ORDER BY sm.measurement_day
-"""
-
 # ISO8601フォーマット
 FMT_DATE: str = '%Y-%m-%d'
 # datetime変換フォーマット
@@ -151,22 +138,6 @@ WARN_LEGEND: Patch = Patch(color=BAR_COLOR_WARN, label=LEGEND_WARN)
 GOOD_LEGEND: Patch = Patch(color=BAR_COLOR_GOOD, label=LEGEND_GOOD)
 
 
-def getDBConnectionWithDict(file_path: str, hostname: str = None) -> dict:
-    """
-    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
-    :param file_path: 接続設定ファイルパス (JSON形式)
-    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
-    :return: SQLAlchemyのURL用辞書オブジェクト
-    """
-    with open(file_path, 'r') as fp:
-        db_conf: json = json.load(fp)
-        if hostname is None:
-            hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return db_conf
-
-
 def toMinute(s_time: str) -> Optional[int]:
     """
     時刻文字列("時:分")を分に変換する
@@ -305,26 +276,34 @@ def pixelToInch(width_px: int, height_px: int, density: float) -> Tuple[float, f
     return inch_width, inch_height
 
 
+@timed(PHASE_TRANSFORM)
 def makeGroupingObjectsForHistogram(df_orig: DataFrame) -> Dict[str, Series]:
     """
     与えられたDataFrameからヒストグラムプロット用のグルービングオブジェクトを取得する
     :param df_orig: SQLから生成されたデータフレームを指定条件でフィルタリングされたデータフレーム
     :return: グルービングオブジェクトの辞書
     """
-    # 就寝時刻の計算(分) ※起床時刻の形式("%H:%M")
-    day_idx: pd.DatetimeIndex = df_orig.index
-    day_array: np.ndarray = day_idx.to_pydatetime()
-    bed_times: List[Optional[int]] = [
-        calcBedTimeToMinute(
-            day.strftime(FMT_DATE), wakeup, sleeping) for day, wakeup, sleeping in zip(
-            day_array, df_orig[COL_WAKEUP_TIME], df_orig[COL_SLEEPING_TIME]
-        )
-    ]
-    df_orig[GROUP_BEDTIME] = bed_times
-    # 睡眠時間("%H:%M"): 分(整数)に変換
-    df_orig[COL_SLEEPING_TIME] = df_orig[COL_SLEEPING_TIME].apply(toMinute)
-    # 深い睡眠("%H:%M"): 分(整数)に変換
-    df_orig[COL_DEEP_SLEEPING_TIME] = df_orig[COL_DEEP_SLEEPING_TIME].apply(toMinute)
+    if pd.api.types.is_numeric_dtype(df_orig[COL_SLEEPING_TIME]):
+        # 省メモリ型 (--compact-dtypes): 睡眠時間・深い睡眠は分(int16)に変換済み
+        # 就寝時刻(分) = 起床時刻(分) - 睡眠時間(分) ※負なら前日 (calcBedTimeToMinute と同じ)
+        #  起床時刻 (category) はユニークな時刻のみ分に変換する
+        wakeup_minutes: Series = df_orig[COL_WAKEUP_TIME].map(toMinute).astype(COMPACT_NULLABLE_INT)
+        df_orig[GROUP_BEDTIME] = wakeup_minutes - df_orig[COL_SLEEPING_TIME]
+    else:
+        # 就寝時刻の計算(分) ※起床時刻の形式("%H:%M")
+        day_idx: pd.DatetimeIndex = df_orig.index
+        day_array: np.ndarray = day_idx.to_pydatetime()
+        bed_times: List[Optional[int]] = [
+            calcBedTimeToMinute(
+                day.strftime(FMT_DATE), wakeup, sleeping) for day, wakeup, sleeping in zip(
+                day_array, df_orig[COL_WAKEUP_TIME], df_orig[COL_SLEEPING_TIME]
+            )
+        ]
+        df_orig[GROUP_BEDTIME] = bed_times
+        # 睡眠時間("%H:%M"): 分(整数)に変換
+        df_orig[COL_SLEEPING_TIME] = df_orig[COL_SLEEPING_TIME].apply(toMinute)
+        # 深い睡眠("%H:%M"): 分(整数)に変換
+        df_orig[COL_DEEP_SLEEPING_TIME] = df_orig[COL_DEEP_SLEEPING_TIME].apply(toMinute)
     # グループオブジェクト
     # 就寝時刻
     ranges = range(BED_TIME_MIN, BED_TIME_MAX + 1, STEP_BED_TIME)
@@ -529,7 +508,37 @@ if __name__ == '__main__':
                         help="2023-04-30")
     # ホスト名 ※任意 (例) raspi-4
     parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # クエリー結果キャッシュを使わない
+    parser.add_argument("--no-cache", action="store_true", help="Disable query result cache.")
+    # スコア・回数を int16, 睡眠時間・深い睡眠を分 (int16), 起床時刻を category で保持する
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold scores and minutes as int16 and labels as category.")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # 携帯アプリ用の密度毎 (mdpi〜xxxhdpi) の画像とサムネイルの出力ディレクトリ
+    parser.add_argument("--density-dir", type=str,
+                        help="Write drawable-<density>/ images and a thumbnail here.")
+    # 出力する密度 (--density-dir 指定時)
+    parser.add_argument("--densities", type=str, nargs="+", choices=DENSITY_CHOICES,
+                        default=DENSITY_CHOICES, help="Densities written to --density-dir.")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing,
+                start_date=args.start_date, end_date=args.end_date)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, start_date=args.start_date, end_date=args.end_date)
+    set_full_dump(args.debug_dump)
     # 選択クエリーの主キー: メールアドレス
     mail_address: str = args.mail_address
     # 検索範囲
@@ -543,102 +552,113 @@ if __name__ == '__main__':
             app_logger.warning(f"Invalid date format ('YYYY-mm-dd'): {i_date}")
             exit(1)
 
-    connDict: dict = getDBConnectionWithDict(DB_HEALTHCARE_CONF, hostname=db_host)
-    # データベース接続URL生成
-    connUrl: URL = URL.create(**connDict)
-    # SQLAlchemyデータベースエンジン
-    engineHealthcare: sqlalchemy.Engine = create_engine(connUrl, echo=False)
+    # 共有エンジン (接続プール)
+    engineHealthcare: sqlalchemy.Engine = get_engine(DB_HEALTHCARE_CONF, hostname=db_host)
 
-    query_params: Dict = {"emailAddress": mail_address, "startDay": start_date, "endDay": end_date}
-    pd.set_option('display.max_rows', None)
     try:
-        with engineHealthcare.connect() as conn:
-            df_all = pd.read_sql(
-                text(QUERY_SLEEP_MAN), conn, params=query_params,
-                parse_dates=['measurement_day']
+        with span(PHASE_CONNECT):
+            conn: sqlalchemy.Connection = engineHealthcare.connect()
+        with conn, span(PHASE_QUERY) as sp:
+            # 完了月はキャッシュから取得し、未キャッシュの月のみデータベースに問い合わせる
+            result: QueryResult = fetch_rows(
+                conn, QUERY_ID_SLEEP_MAN, mail_address, start_date, end_date,
+                cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR
             )
+            sp.rows = len(result.rows)
+        df_all = pd.DataFrame(result.rows, columns=result.columns)
+        df_all['measurement_day'] = pd.to_datetime(df_all['measurement_day'], format=FMT_DATE)
     except Exception as err:
         app_logger.warning(err)
         exit(1)
 
-    app_logger.info(f"shape: {df_all.shape}")
-    app_logger.info(f"columns: {df_all.columns}")
     # 測定日をインデックスに設定
     df_all: DataFrame = df_all.set_index('measurement_day')
-    app_logger.debug(f"df_all: {df_all}")
+    if args.compact_dtypes:
+        with span(PHASE_TRANSFORM):
+            df_all = compact_frame(df_all, minute_columns=[COL_SLEEPING_TIME, COL_DEEP_SLEEPING_TIME],
+                                   logger=app_logger, name="df_all")
+    app_logger.info(frame_summary(df_all, "df_all"))
     # (1) 睡眠スコアが良いデータ
     df_score_good: DataFrame = df_all.loc[df_all[COL_SLEEP_SCORE] >= GOOD_SLEEP_SCORE].copy()
     app_logger.info(f"df_score_good.size: {df_score_good.shape[0]}")
-    app_logger.debug(f"df_score_good: {df_score_good}")
+    app_logger.debug(frame_summary(df_score_good, "df_score_good"))
     # ヒストグラム用グルービングオブジェクト取得
     dict_good: Dict[str, Series] = makeGroupingObjectsForHistogram(df_score_good)
     good_bedtime: Series = dict_good[GROUP_BEDTIME]
     good_deep_sleeping: Series = dict_good[GROUP_DEEP_SLEEPING]
     good_sleeping: Series = dict_good[GROUP_SLEEPING]
     good_toilet_visits: Series = dict_good[GROUP_TOILET_VISITS]
-    app_logger.info(f"good_bedtime: {good_bedtime}")
-    app_logger.info(f"good_deep_sleeping: {good_deep_sleeping}")
-    app_logger.info(f"good_sleeping: {good_sleeping}")
-    app_logger.info(f"good_toilet_visits: {good_toilet_visits}")
+    app_logger.info(frame_summary(good_bedtime, "good_bedtime"))
+    app_logger.info(frame_summary(good_deep_sleeping, "good_deep_sleeping"))
+    app_logger.info(frame_summary(good_sleeping, "good_sleeping"))
+    app_logger.info(frame_summary(good_toilet_visits, "good_toilet_visits"))
     # (2) 睡眠スコアが悪いデータ
     df_score_warn: DataFrame = df_all.loc[df_all[COL_SLEEP_SCORE] < WARN_SLEEP_SCORE].copy()
     app_logger.info(f"df_score_warn.size: {df_score_warn.shape[0]}")
-    app_logger.debug(f"df_score_warn: {df_score_warn}")
+    app_logger.debug(frame_summary(df_score_warn, "df_score_warn"))
     dict_warn: Dict[str, Series] = makeGroupingObjectsForHistogram(df_score_warn)
     warn_bedtime: Series = dict_warn[GROUP_BEDTIME]
     warn_deep_sleeping: Series = dict_warn[GROUP_DEEP_SLEEPING]
     warn_sleeping: Series = dict_warn[GROUP_SLEEPING]
     warn_toilet_visits: Series = dict_warn[GROUP_TOILET_VISITS]
-    app_logger.info(f"warn_bedtime: {warn_bedtime}")
-    app_logger.info(f"warn_deep_sleeping: {warn_deep_sleeping}")
-    app_logger.info(f"warn_sleeping: {warn_sleeping}")
-    app_logger.info(f"warn_toilet_visits: {warn_toilet_visits}")
+    app_logger.info(frame_summary(warn_bedtime, "warn_bedtime"))
+    app_logger.info(frame_summary(warn_deep_sleeping, "warn_deep_sleeping"))
+    app_logger.info(frame_summary(warn_sleeping, "warn_sleeping"))
+    app_logger.info(frame_summary(warn_toilet_visits, "warn_toilet_visits"))
 
     # グラフ出力
     # 携帯用の描画領域サイズ(ピクセル)をインチに変換
     fig_width_inch, fig_height_inch = pixelToInch(
         PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY
     )
-    fig: Figure
-    # 1段目: 夜間トイレ回数の度数プロット領域
-    ax_toilet_visits: Axes
-    # 2段目: 就寝時刻の度数プロット領域
-    ax_bedtime: Axes
-    # 3段目: 深い睡眠の度数プロット領域
-    ax_deep_sleeping: Axes
-    # 4段目: 睡眠時間の度数プロット領域
-    ax_sleeping: Axes
-    fig, (ax_toilet_visits, ax_bedtime, ax_deep_sleeping, ax_sleeping) = plt.subplots(
-        4, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
-        figsize=(fig_width_inch, fig_height_inch)
-    )
-    # UserWarning: This figure was using a layout engine that is incompatible
-    #  with subplots_adjust and/or tight_layout; not calling subplots_adjust.
-    # plt.subplots_adjust(hspace=2.0)
-    # Y方向のグリッド線のみ表示
-    for axes in [ax_toilet_visits, ax_bedtime, ax_deep_sleeping, ax_sleeping]:
-        axes.grid(**AXES_GRID_STYLE)
-
-    # (1) 夜間起床回数
-    # グラフタイトル (期間)
-    titleDateRange: str = makeTitleWithDayRange(start_date, end_date)
-    ax_toilet_visits.set_title(titleDateRange, **TITLE_STYLE)
-    # Axes.barでツイン棒グラフ描画
-    plotToiletVisitsTwinHist(ax_toilet_visits, warn_toilet_visits, good_toilet_visits)
-    # カスタム(矩形)のツイン棒グラフ描画
-    # (2) 就寝時刻プロット
-    plotBedtimeTwinBar(ax_bedtime, warn_bedtime, good_bedtime)
-    # (3) 深い睡眠時間プロット
-    plotDeepSleepingTwinBar(ax_deep_sleeping, warn_deep_sleeping, good_deep_sleeping)
-    # (4) 睡眠時間プロット
-    plotSleepingTwinBar(ax_sleeping, warn_sleeping, good_sleeping)
-    # 同じ凡例をまとめて設定 (2)-(4)
-    # https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.legend.html
-    for axes in [ax_bedtime, ax_deep_sleeping, ax_sleeping]:
-        axes.legend(handles=[WARN_LEGEND, GOOD_LEGEND], **LEGEND_STYLE)
+    with span(PHASE_FIGURE):
+        fig: Figure
+        # 1段目: 夜間トイレ回数の度数プロット領域
+        ax_toilet_visits: Axes
+        # 2段目: 就寝時刻の度数プロット領域
+        ax_bedtime: Axes
+        # 3段目: 深い睡眠の度数プロット領域
+        ax_deep_sleeping: Axes
+        # 4段目: 睡眠時間の度数プロット領域
+        ax_sleeping: Axes
+        fig, (ax_toilet_visits, ax_bedtime, ax_deep_sleeping, ax_sleeping) = plt.subplots(
+            4, 1, gridspec_kw={'height_ratios': GRID_SPEC_HEIGHT_RATIO}, layout='constrained',
+            figsize=(fig_width_inch, fig_height_inch)
+        )
+        # UserWarning: This figure was using a layout engine that is incompatible
+        #  with subplots_adjust and/or tight_layout; not calling subplots_adjust.
+        # plt.subplots_adjust(hspace=2.0)
+        # Y方向のグリッド線のみ表示
+        for axes in [ax_toilet_visits, ax_bedtime, ax_deep_sleeping, ax_sleeping]:
+            axes.grid(**AXES_GRID_STYLE)
+
+        # (1) 夜間起床回数
+        # グラフタイトル (期間)
+        titleDateRange: str = makeTitleWithDayRange(start_date, end_date)
+        ax_toilet_visits.set_title(titleDateRange, **TITLE_STYLE)
+        # Axes.barでツイン棒グラフ描画
+        plotToiletVisitsTwinHist(ax_toilet_visits, warn_toilet_visits, good_toilet_visits)
+        # カスタム(矩形)のツイン棒グラフ描画
+        # (2) 就寝時刻プロット
+        plotBedtimeTwinBar(ax_bedtime, warn_bedtime, good_bedtime)
+        # (3) 深い睡眠時間プロット
+        plotDeepSleepingTwinBar(ax_deep_sleeping, warn_deep_sleeping, good_deep_sleeping)
+        # (4) 睡眠時間プロット
+        plotSleepingTwinBar(ax_sleeping, warn_sleeping, good_sleeping)
+        # 同じ凡例をまとめて設定 (2)-(4)
+        # https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.legend.html
+        for axes in [ax_bedtime, ax_deep_sleeping, ax_sleeping]:
+            axes.legend(handles=[WARN_LEGEND, GOOD_LEGEND], **LEGEND_STYLE)
 
     # プロット結果をPNG形式でファイル保存
     save_name = gen_imgname(script_name)
-    save_path = os.path.join("screen_shots", save_name)
-    app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    if args.density_dir is not None:
+        # 携帯アプリ用: 図とレイアウトは1回だけ作成し密度毎に描画する
+        width_dp, _ = dp_size(PHONE_PX_WIDTH, PHONE_PX_HEIGHT, PHONE_DENSITY)
+        save_densities(fig, os.path.expanduser(args.density_dir), save_name, width_dp,
+                       script_name, densities=args.densities, logger=app_logger)
+    else:
+        save_path = os.path.join("screen_shots", save_name)
+        app_logger.info(save_path)
+        timed_save(fig, save_path, lambda fp: save_figure(
+            fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
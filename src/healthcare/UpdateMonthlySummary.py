@@ -0,0 +1,50 @@
+import argparse
+import logging
+import os
+
+import sqlalchemy
+
+from util.db_engine import get_engine
+from util.monthly_summary import update_monthly_summary
+
+"""
+健康管理データベースの月間集計テーブル (bodyhealth.monthly_summary) を更新する
+前回更新以降に変更された (ユーザー, 年月) のみ再集計する ※cron等で定期実行する
+[実行例]
+  (1) 差分更新: python UpdateMonthlySummary.py
+  (2) 全データの再集計: python UpdateMonthlySummary.py --rebuild
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 健康管理データベース接続情報
+DB_HEALTHCARE_CONF: str = os.path.join("conf", "db_healthcare.json")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 全データを再集計する
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild all monthly summaries.")
+    # ホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    args: argparse.Namespace = parser.parse_args()
+
+    # 共有エンジン (接続プール)
+    engineHealthcare: sqlalchemy.Engine = get_engine(DB_HEALTHCARE_CONF, hostname=args.db_host)
+
+    try:
+        # 再集計とウォーターマーク更新は同一トランザクション
+        with engineHealthcare.begin() as conn:
+            updated: int = update_monthly_summary(conn, rebuild=args.rebuild)
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
+
+    app_logger.info(f"updated monthly summaries: {updated}")
@@ -0,0 +1,16 @@
+\connect healthcare_db
+
+-- 睡眠管理テーブルと夜間頻尿要因テーブルの結合は複合主キー (pid, measurement_day) で行う
+-- (util/queries.py QUERY_SLEEP_MAN)
+--  主キーインデックスで結合は可能だが、夜間頻尿要因テーブルは取得列(midnight_toilet_visits)以外の
+--  列 (condition_memo varchar(255) など) が多いためヒープ参照を避けるカバリングインデックスを追加する
+--  ※ INCLUDE句は PostgreSQL 11 以降
+DROP INDEX IF EXISTS bodyhealth.idx_nocturia_factors_toilet_visits;
+CREATE INDEX idx_nocturia_factors_toilet_visits ON bodyhealth.nocturia_factors
+   (pid, measurement_day) INCLUDE (midnight_toilet_visits);
+
+-- インデックス追加後に統計情報を更新する
+ANALYZE bodyhealth.person;
+ANALYZE bodyhealth.sleep_management;
+ANALYZE bodyhealth.nocturia_factors;
+ANALYZE bodyhealth.blood_pressure;
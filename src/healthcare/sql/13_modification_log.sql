@@ -0,0 +1,52 @@
+\connect healthcare_db
+
+-- 測定日の変更履歴テーブル
+--  クエリー結果キャッシュ (util/query_cache.py) の無効化判定に使用する
+--  キャッシュ書き込み後に変更 (登録・更新・削除) された測定日を含む年月のキャッシュは無効とする
+--  ※ EXECUTE FUNCTION は PostgreSQL 11 以降
+DROP TABLE IF EXISTS bodyhealth.modified_days;
+CREATE TABLE IF NOT EXISTS bodyhealth.modified_days(
+  pid smallint NOT NULL,
+  table_name varchar(32) NOT NULL,
+  measurement_day date NOT NULL,
+  modified_at timestamp with time zone NOT NULL,
+  CONSTRAINT pk_modified_days PRIMARY KEY (pid, table_name, measurement_day)
+);
+
+-- 変更された測定日の最終変更時刻を登録するトリガー関数
+--  clock_timestamp(): トランザクション開始時刻 (now()) ではなく実際の変更時刻
+CREATE OR REPLACE FUNCTION bodyhealth.record_modified_day() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO bodyhealth.modified_days(pid, table_name, measurement_day, modified_at)
+      VALUES (OLD.pid, TG_TABLE_NAME, OLD.measurement_day, clock_timestamp())
+      ON CONFLICT (pid, table_name, measurement_day)
+      DO UPDATE SET modified_at = EXCLUDED.modified_at;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO bodyhealth.modified_days(pid, table_name, measurement_day, modified_at)
+      VALUES (NEW.pid, TG_TABLE_NAME, NEW.measurement_day, clock_timestamp())
+      ON CONFLICT (pid, table_name, measurement_day)
+      DO UPDATE SET modified_at = EXCLUDED.modified_at;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sleep_management_modified ON bodyhealth.sleep_management;
+CREATE TRIGGER trg_sleep_management_modified
+   AFTER INSERT OR UPDATE OR DELETE ON bodyhealth.sleep_management
+   FOR EACH ROW EXECUTE FUNCTION bodyhealth.record_modified_day();
+
+DROP TRIGGER IF EXISTS trg_nocturia_factors_modified ON bodyhealth.nocturia_factors;
+CREATE TRIGGER trg_nocturia_factors_modified
+   AFTER INSERT OR UPDATE OR DELETE ON bodyhealth.nocturia_factors
+   FOR EACH ROW EXECUTE FUNCTION bodyhealth.record_modified_day();
+
+DROP TRIGGER IF EXISTS trg_blood_pressure_modified ON bodyhealth.blood_pressure;
+CREATE TRIGGER trg_blood_pressure_modified
+   AFTER INSERT OR UPDATE OR DELETE ON bodyhealth.blood_pressure
+   FOR EACH ROW EXECUTE FUNCTION bodyhealth.record_modified_day();
+
+ALTER TABLE bodyhealth.modified_days OWNER TO developer;
+ALTER FUNCTION bodyhealth.record_modified_day() OWNER TO developer;
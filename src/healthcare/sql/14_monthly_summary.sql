@@ -0,0 +1,56 @@
+\connect healthcare_db
+
+-- 月間集計テーブル (ユーザー・年月毎)
+--  各グラフの長期トレンド (年単位の比較など) は日毎のテーブル (365行/年) ではなく
+--  月間集計テーブル (12行/年) から取得する
+--  更新: UpdateMonthlySummary.py (ウォーターマーク方式)
+--   測定日の変更履歴テーブル (13_modification_log.sql) で前回更新以降に変更された
+--   (ユーザー, 年月) のみ再集計する
+DROP TABLE IF EXISTS bodyhealth.monthly_summary;
+CREATE TABLE IF NOT EXISTS bodyhealth.monthly_summary(
+  pid smallint NOT NULL,
+  -- 年月 (月の1日)
+  year_month date NOT NULL,
+  -- 睡眠管理: 測定日数, 睡眠スコア平均, 睡眠スコアの分布 (〜59, 60〜69, 70〜79, 80〜89, 90〜)
+  sleep_days smallint NOT NULL,
+  sleep_score_mean real,
+  sleep_score_lt60 smallint NOT NULL,
+  sleep_score_60s smallint NOT NULL,
+  sleep_score_70s smallint NOT NULL,
+  sleep_score_80s smallint NOT NULL,
+  sleep_score_ge90 smallint NOT NULL,
+  -- 睡眠時間・深い睡眠の平均(分)
+  sleeping_minutes_mean real,
+  deep_sleeping_minutes_mean real,
+  -- 夜間頻尿要因: 測定日数, 夜間トイレ回数の合計と平均
+  nocturia_days smallint NOT NULL,
+  toilet_visits_sum integer NOT NULL,
+  toilet_visits_mean real,
+  -- 血圧測定: 測定日数, AM/PM毎の最高血圧・最低血圧・脈拍の平均
+  blood_press_days smallint NOT NULL,
+  morning_max_mean real,
+  morning_min_mean real,
+  morning_pulse_rate_mean real,
+  evening_max_mean real,
+  evening_min_mean real,
+  evening_pulse_rate_mean real,
+  updated_at timestamp with time zone NOT NULL,
+  CONSTRAINT pk_monthly_summary PRIMARY KEY (pid, year_month)
+);
+ALTER TABLE bodyhealth.monthly_summary ADD CONSTRAINT fkey_monthly_summary_person
+   FOREIGN KEY (pid) REFERENCES bodyhealth.person(id) ON DELETE CASCADE;
+
+-- 月間集計テーブルの更新済み位置 (変更履歴の最終変更時刻)
+DROP TABLE IF EXISTS bodyhealth.summary_watermark;
+CREATE TABLE IF NOT EXISTS bodyhealth.summary_watermark(
+  name varchar(32) NOT NULL,
+  modified_at timestamp with time zone NOT NULL,
+  CONSTRAINT pk_summary_watermark PRIMARY KEY (name)
+);
+
+-- 前回更新以降に変更された測定日の取得用インデックス
+DROP INDEX IF EXISTS bodyhealth.idx_modified_days_modified_at;
+CREATE INDEX idx_modified_days_modified_at ON bodyhealth.modified_days (modified_at);
+
+ALTER TABLE bodyhealth.monthly_summary OWNER TO developer;
+ALTER TABLE bodyhealth.summary_watermark OWNER TO developer;
@@ -0,0 +1,91 @@
+from typing import List, Tuple
+
+import numpy as np
+
+"""
+血圧測定データのプロット用項目生成ユーティリティ
+(1) 日毎のAM/PM測定値を (2N,) の配列に交互に並べる ※ [AM1, PM1, AM2, PM2, ...]
+(2) X軸ラベル (AM軸: "日 (曜日)", PM軸: 空文字) を一括で生成する
+※欠損値は np.nan
+"""
+
+# 日本語の曜日
+JP_WEEK_DAY_NAMES: List[str] = ["月", "火", "水", "木", "金", "土", "日"]
+# 1970-01-01 (datetime64[D]の0日) の曜日: 木曜日 (月曜日=0)
+EPOCH_WEEKDAY: int = 3
+
+
+def to_day_array(days) -> np.ndarray:
+    """
+    日付のシーケンス (ISO8601文字列リスト, DatetimeIndex等) を datetime64[D] の配列に変換する
+    :param days: 日付のシーケンス
+    :return: datetime64[D] の配列
+    """
+    return np.asarray(days, dtype='datetime64[D]')
+
+
+def interleave_am_pm(morning: np.ndarray, evening: np.ndarray) -> np.ndarray:
+    """
+    AM/PMの測定値を交互に並べた配列を生成する
+    :param morning: AMの測定値 (N,)
+    :param evening: PMの測定値 (N,)
+    :return: AM/PMを交互に並べた測定値 (2N,) ※float64, 欠損値 np.nan
+    """
+    return np.column_stack(
+        (np.asarray(morning, dtype=np.float64), np.asarray(evening, dtype=np.float64))
+    ).ravel()
+
+
+def make_am_pm_ticks_labels(days: np.ndarray) -> List[str]:
+    """
+    AM/PM交互のX軸ラベルを生成する\n
+    [形式] AM軸: "日 (曜日)", PM軸: 空文字
+    :param days: datetime64[D] の配列 (N,)
+    :return: X軸ラベルリスト (2N)
+    """
+    # 日と曜日を配列演算で一括計算
+    day_of_month: np.ndarray = (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+    weekdays: np.ndarray = (days.astype(np.int64) + EPOCH_WEEKDAY) % 7
+    labels: List[str] = [""] * (days.shape[0] * 2)
+    labels[0::2] = [
+        f"{day} ({JP_WEEK_DAY_NAMES[weekday]})"
+        for day, weekday in zip(day_of_month.tolist(), weekdays.tolist())
+    ]
+    return labels
+
+
+def make_col_list_for_plotting(
+        days, morning_max: np.ndarray, morning_min: np.ndarray, morning_pulse: np.ndarray,
+        evening_max: np.ndarray, evening_min: np.ndarray, evening_pulse: np.ndarray
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    X軸用ラベルリスト、AM/PM毎の測定値を交互に並べた np.ndarrayを生成する
+    :param days: 月間(１日〜末日)の日付のシーケンス
+    :param morning_max: AMの最高血圧値
+    :param morning_min: AMの最低血圧値
+    :param morning_pulse: AMの脈拍値
+    :param evening_max: PMの最高血圧値
+    :param evening_min: PMの最低血圧値
+    :param evening_pulse: PMの脈拍値
+    :return: X軸用ラベルリスト, 最高血圧値ndarray, 最低血圧値ndarray, 脈拍値ndarray
+    """
+    return (
+        make_am_pm_ticks_labels(to_day_array(days)),
+        interleave_am_pm(morning_max, evening_max),
+        interleave_am_pm(morning_min, evening_min),
+        interleave_am_pm(morning_pulse, evening_pulse)
+    )
+
+
+def convert_bar_values(press_maxes: np.ndarray,
+                       press_mines: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    最高血圧値と最低血圧値から積み上げ棒グラフ用の配列を生成する\n
+    どちらかが欠損値の場合は両方 np.nan とする
+    :param press_maxes: 最高血圧値 (欠損値 np.nan)
+    :param press_mines: 最低血圧値 (欠損値 np.nan)
+    :return: 最高血圧棒グラフ用 (最低血圧値を差し引き), 最低血圧棒グラフ用
+    """
+    valid: np.ndarray = ~(np.isnan(press_maxes) | np.isnan(press_mines))
+    return (np.where(valid, press_maxes - press_mines, np.nan),
+            np.where(valid, press_mines, np.nan))
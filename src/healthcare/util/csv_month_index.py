@@ -0,0 +1,284 @@
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+"""
+健康管理DBからエクスポートしたCSVの年月オフセットインデックス (サイドカーファイル)
+(1) 年月 ("YYYY-MM") 毎にファイル先頭からのバイトオフセット, バイト長, 行数を保持する
+(2) CSVに追記された場合は前回インデックス作成時のファイルサイズ以降のみ走査して更新する
+(3) 指定年月の行のみを読み込みヘッダー行と連結して返却する ※pandas.read_csv に渡す
+[サイドカーファイル] CSVファイルパス + ".monthidx.json"
+[前提] psqlでエクスポートしたCSV: 1行目がヘッダー, 日付列はISO8601形式 ("YYYY-MM-DD")
+"""
+
+# サイドカーファイルの拡張子
+INDEX_FILE_EXT: str = ".monthidx.json"
+# インデックスファイルのフォーマットバージョン ※変更時は再作成する
+INDEX_VERSION: int = 1
+# 日付列名
+DEFAULT_DATE_COLUMN: str = "measurement_day"
+# ファイル同一性チェックに使用する先頭バイト数
+HEAD_DIGEST_SIZE: int = 4096
+# 年月文字列 ("YYYY-MM") のバイト長
+YEAR_MONTH_LEN: int = 7
+# CSVの引用符
+QUOTE_CHAR: bytes = b'"'
+
+
+@dataclass
+class MonthSegment:
+    """ 年月毎の連続した行の範囲を保持するデータクラス """
+    offset: int
+    length: int
+    rows: int
+
+
+@dataclass
+class MonthIndex:
+    """ CSVファイルの年月オフセットインデックスを保持するデータクラス """
+    # インデックス作成時のファイルサイズ (走査済みバイト数)
+    size: int
+    # インデックス作成時のファイル更新時刻 (ナノ秒)
+    mtime_ns: int
+    # ファイル先頭のダイジェスト (先頭 head_len バイト)
+    head_digest: str
+    head_len: int
+    # ヘッダー行 (改行含む) のバイト長
+    header_len: int
+    # 日付列の位置
+    date_col_idx: int
+    # 年月をキーとする行範囲リスト ※同一年月の行が連続しない場合は複数
+    months: Dict[str, List[MonthSegment]] = field(default_factory=dict)
+
+
+def index_path(csv_path: str) -> str:
+    """
+    CSVファイルのサイドカーインデックスファイルパスを取得する
+    :param csv_path: CSVファイルパス
+    :return: インデックスファイルパス
+    """
+    return csv_path + INDEX_FILE_EXT
+
+
+def _head_digest(fp, head_len: int) -> str:
+    """
+    ファイル先頭の指定バイト数のダイジェストを計算する
+    :param fp: バイナリモードのファイルオブジェクト
+    :param head_len: バイト数
+    :return: SHA-1ダイジェスト (16進文字列)
+    """
+    fp.seek(0)
+    return hashlib.sha1(fp.read(head_len)).hexdigest()
+
+
+def _iter_records(fp, start: int):
+    """
+    指定オフセットからCSVレコード単位で走査する\n
+    引用符で囲まれた項目内の改行 (メモ列など) は同一レコードとして扱う
+    :param fp: バイナリモードのファイルオブジェクト
+    :param start: 走査開始オフセット
+    :return: (オフセット, レコードのバイト列) のイテレータ
+    """
+    fp.seek(start)
+    offset: int = start
+    record_start: int = start
+    parts: List[bytes] = []
+    quote_count: int = 0
+    for line in fp:
+        parts.append(line)
+        quote_count += line.count(QUOTE_CHAR)
+        offset += len(line)
+        # 引用符の数が奇数なら項目内改行のため次の行に続く
+        if quote_count % 2 == 0:
+            yield record_start, b"".join(parts)
+            record_start = offset
+            parts, quote_count = [], 0
+    if parts:
+        yield record_start, b"".join(parts)
+
+
+def _extract_year_month(record: bytes, date_col_idx: int) -> str:
+    """
+    レコードから日付列の年月 ("YYYY-MM") を取り出す ※日付列より前の列は引用符なしであること
+    :param record: CSVレコード
+    :param date_col_idx: 日付列の位置
+    :return: 年月文字列
+    """
+    value: bytes = record.split(b",", date_col_idx + 1)[date_col_idx]
+    return value.strip(QUOTE_CHAR)[:YEAR_MONTH_LEN].decode("ascii")
+
+
+def _scan(fp, idx: MonthIndex, start: int) -> None:
+    """
+    指定オフセット以降を走査しインデックスに年月毎の行範囲を追加する
+    :param fp: バイナリモードのファイルオブジェクト
+    :param idx: 更新対象インデックス
+    :param start: 走査開始オフセット
+    """
+    last_month: Optional[str] = None
+    last_end: int = -1
+    # 直前の走査の最終行範囲 ※同一年月の追記行はこの範囲を伸ばす
+    for month, segments in idx.months.items():
+        tail: MonthSegment = segments[-1]
+        if tail.offset + tail.length == start:
+            last_month, last_end = month, start
+    for offset, record in _iter_records(fp, start):
+        if not record.strip():
+            continue
+        month: str = _extract_year_month(record, idx.date_col_idx)
+        if month == last_month and offset == last_end:
+            segment: MonthSegment = idx.months[month][-1]
+            segment.length += len(record)
+            segment.rows += 1
+        else:
+            idx.months.setdefault(month, []).append(MonthSegment(offset, len(record), 1))
+        last_month, last_end = month, offset + len(record)
+
+
+def build_index(csv_path: str, date_column: str = DEFAULT_DATE_COLUMN) -> MonthIndex:
+    """
+    CSVファイル全体を走査してインデックスを作成する
+    :param csv_path: CSVファイルパス
+    :param date_column: 日付列名
+    :return: 年月オフセットインデックス
+    """
+    stat: os.stat_result = os.stat(csv_path)
+    with open(csv_path, "rb") as fp:
+        header: bytes = fp.readline()
+        columns: List[str] = header.decode("utf-8").strip().split(",")
+        head_len: int = min(stat.st_size, HEAD_DIGEST_SIZE)
+        idx: MonthIndex = MonthIndex(
+            size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+            head_digest=_head_digest(fp, head_len), head_len=head_len,
+            header_len=len(header), date_col_idx=columns.index(date_column)
+        )
+        _scan(fp, idx, idx.header_len)
+    return idx
+
+
+def refresh_index(csv_path: str, idx: MonthIndex,
+                  date_column: str = DEFAULT_DATE_COLUMN) -> MonthIndex:
+    """
+    インデックスを最新のCSVファイルに合わせて更新する\n
+    (1) ファイルサイズと更新時刻が同じなら更新不要\n
+    (2) 追記のみ (先頭が一致しファイルサイズが増加) なら追記部分のみ走査\n
+    (3) それ以外 (上書き・縮小) は全体を再作成
+    :param csv_path: CSVファイルパス
+    :param idx: 前回作成したインデックス
+    :param date_column: 日付列名
+    :return: 更新済みインデックス
+    """
+    stat: os.stat_result = os.stat(csv_path)
+    if stat.st_size == idx.size and stat.st_mtime_ns == idx.mtime_ns:
+        return idx
+
+    if stat.st_size > idx.size:
+        with open(csv_path, "rb") as fp:
+            # 前回の最終行が改行で終わっていること (行の途中からの追記は再作成)
+            fp.seek(idx.size - 1)
+            is_appended: bool = (fp.read(1) == b"\n"
+                                 and _head_digest(fp, idx.head_len) == idx.head_digest)
+            if is_appended:
+                _scan(fp, idx, idx.size)
+                idx.size, idx.mtime_ns = stat.st_size, stat.st_mtime_ns
+                return idx
+
+    return build_index(csv_path, date_column)
+
+
+def load_index(csv_path: str) -> Optional[MonthIndex]:
+    """
+    サイドカーファイルからインデックスを読み込む
+    :param csv_path: CSVファイルパス
+    :return: インデックス ※ファイルが存在しないかバージョン不一致ならNone
+    """
+    path: str = index_path(csv_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r") as fp:
+            data: Dict = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    if data.pop("version", None) != INDEX_VERSION:
+        return None
+
+    months: Dict[str, List[MonthSegment]] = {
+        month: [MonthSegment(*seg) for seg in segments]
+        for month, segments in data.pop("months").items()
+    }
+    return MonthIndex(months=months, **data)
+
+
+def save_index(csv_path: str, idx: MonthIndex) -> None:
+    """
+    インデックスをサイドカーファイルに保存する
+    :param csv_path: CSVファイルパス
+    :param idx: インデックス
+    """
+    data: Dict = {
+        "version": INDEX_VERSION,
+        "size": idx.size, "mtime_ns": idx.mtime_ns,
+        "head_digest": idx.head_digest, "head_len": idx.head_len,
+        "header_len": idx.header_len, "date_col_idx": idx.date_col_idx,
+        "months": {
+            month: [[seg.offset, seg.length, seg.rows] for seg in segments]
+            for month, segments in idx.months.items()
+        }
+    }
+    # 書き込み途中のファイルを読まないように一時ファイルから置き換える
+    path: str = index_path(csv_path)
+    tmp_path: str = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(data, fp)
+    os.replace(tmp_path, path)
+
+
+def get_index(csv_path: str, date_column: str = DEFAULT_DATE_COLUMN) -> MonthIndex:
+    """
+    最新のインデックスを取得する\n
+    サイドカーファイルが無ければ作成し、CSVが更新されていれば差分更新して保存する\n
+    ※サイドカーファイルが保存できない (読み取り専用ディレクトリ等) 場合でもインデックスは返却する
+    :param csv_path: CSVファイルパス
+    :param date_column: 日付列名
+    :return: 年月オフセットインデックス
+    """
+    idx: Optional[MonthIndex] = load_index(csv_path)
+    if idx is None:
+        idx = build_index(csv_path, date_column)
+    else:
+        old_state = (idx.size, idx.mtime_ns)
+        idx = refresh_index(csv_path, idx, date_column)
+        if (idx.size, idx.mtime_ns) == old_state:
+            return idx
+
+    try:
+        save_index(csv_path, idx)
+    except OSError:
+        pass
+    return idx
+
+
+def read_month_bytes(csv_path: str, year_month: str,
+                     date_column: str = DEFAULT_DATE_COLUMN) -> io.BytesIO:
+    """
+    指定年月の行のみをヘッダー行付きで読み込む
+    :param csv_path: CSVファイルパス
+    :param year_month: 年月 ("YYYY-MM")
+    :param date_column: 日付列名
+    :return: ヘッダー行 + 指定年月の行 ※pandas.read_csv の入力
+    """
+    idx: MonthIndex = get_index(csv_path, date_column)
+    buf: io.BytesIO = io.BytesIO()
+    with open(csv_path, "rb") as fp:
+        buf.write(fp.read(idx.header_len))
+        for segment in idx.months.get(year_month, []):
+            fp.seek(segment.offset)
+            buf.write(fp.read(segment.length))
+    buf.seek(0)
+    return buf
@@ -0,0 +1,175 @@
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from util.fixed_layout import fix_layout
+from util.phase_timer import PHASE_DRAW, PHASE_WRITE, span
+from util.plot_template import encode_png
+
+"""
+携帯アプリ (Android) 向けの複数密度の画像出力
+(1) 図は1回だけ作成し、レイアウト (サブプロットの位置) も1回だけ計算する (固定レイアウト)
+    ※位置は図に対する割合のため解像度 (dpi) を変えても同じ位置を使える
+(2) 密度 (mdpi〜xxxhdpi) 毎に dpi を変えて描画する ※図のサイズ (インチ) は変えないため全密度で同じ見た目
+    画像の幅 (ピクセル) = 描画領域の幅 (dp) × 密度の倍率
+(3) サムネイルは最大密度の描画結果を縮小する (描画しない)
+(4) PNGエンコードとファイル書き込みはスレッドプールで並列に実行し、次の密度の描画と重ねる
+    ※描画は同じ図を使うため順番に実行する
+[出力] 出力ディレクトリ/drawable-<密度>/<ファイル名> (Android のリソースディレクトリと同じ構成)
+       出力ディレクトリ/thumbnail/<ファイル名>
+"""
+
+# 密度の倍率 (mdpi: 160dpi を 1.0 とする)
+DENSITY_SCALES: Dict[str, float] = {
+    "mdpi": 1.0,
+    "hdpi": 1.5,
+    "xhdpi": 2.0,
+    "xxhdpi": 3.0,
+    "xxxhdpi": 4.0,
+}
+DENSITY_CHOICES: List[str] = list(DENSITY_SCALES.keys())
+# 密度毎の出力ディレクトリ名フォーマット
+FMT_DENSITY_DIR: str = "drawable-{}"
+# サムネイルの出力ディレクトリ名
+THUMBNAIL_DIR: str = "thumbnail"
+# サムネイルの幅 (ピクセル) ※0ならサムネイルを出力しない
+THUMBNAIL_PX_WIDTH: int = 240
+# PNGエンコード・ファイル書き込みのスレッド数
+DEFAULT_MAX_WORKERS: int = 4
+
+
+def dp_size(width_px: int, height_px: int, density: float) -> Tuple[float, float]:
+    """
+    携帯用の描画領域サイズ (ピクセル) を dp (密度非依存ピクセル) に変換する
+    :param width_px: 幅 (ピクセル)
+    :param height_px: 高さ (ピクセル)
+    :param density: 密度
+    :return: 幅 (dp), 高さ (dp)
+    """
+    return width_px / density, height_px / density
+
+
+def target_dpi(fig: Figure, width_dp: float, scale: float) -> float:
+    """
+    画像の幅が 描画領域の幅 (dp) × 密度の倍率 になる dpi を計算する
+    :param fig: Figure
+    :param width_dp: 描画領域の幅 (dp)
+    :param scale: 密度の倍率
+    :return: dpi
+    """
+    return width_dp * scale / fig.get_size_inches()[0]
+
+
+def density_path(out_dir: str, density: str, file_name: str) -> str:
+    """
+    密度毎の出力ファイルパスを取得する
+    :param out_dir: 出力ディレクトリ
+    :param density: 密度 (DENSITY_CHOICES)
+    :param file_name: ファイル名
+    :return: 出力ディレクトリ/drawable-<密度>/<ファイル名>
+    """
+    return os.path.join(out_dir, FMT_DENSITY_DIR.format(density), file_name)
+
+
+def render_rgba(fig: Figure, canvas: FigureCanvasAgg, dpi: float) -> np.ndarray:
+    """
+    図を指定した dpi で描画する
+    :param fig: Figure (固定レイアウト設定済み)
+    :param canvas: 図の Agg キャンバス
+    :param dpi: dpi
+    :return: 描画結果 (RGBA配列のコピー)
+    """
+    fig.set_dpi(dpi)
+    canvas.draw()
+    return np.array(canvas.buffer_rgba())
+
+
+def write_png(save_path: str, rgba: np.ndarray) -> int:
+    """
+    描画結果をPNG形式でファイル保存する ※スレッドプールで実行する
+    :param save_path: 保存先ファイルパス
+    :param rgba: 描画結果 (RGBA配列)
+    :return: ファイルサイズ (バイト)
+    """
+    png: bytes = encode_png(rgba)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, "wb") as fp:
+        fp.write(png)
+    return len(png)
+
+
+def write_thumbnail(save_path: str, rgba: np.ndarray, width_px: int) -> int:
+    """
+    描画結果を縮小してPNG形式でファイル保存する ※スレッドプールで実行する
+    :param save_path: 保存先ファイルパス
+    :param rgba: 描画結果 (RGBA配列)
+    :param width_px: サムネイルの幅 (ピクセル) ※高さは縦横比を保つ
+    :return: ファイルサイズ (バイト)
+    """
+    height_px: int = max(1, round(rgba.shape[0] * width_px / rgba.shape[1]))
+    thumbnail: Image.Image = Image.fromarray(rgba).resize(
+        (width_px, height_px), Image.Resampling.LANCZOS)
+    return write_png(save_path, np.asarray(thumbnail))
+
+
+def save_densities(fig: Figure, out_dir: str, file_name: str, width_dp: float,
+                   layout_name: str,
+                   densities: Sequence[str] = DENSITY_CHOICES,
+                   thumbnail_px: int = THUMBNAIL_PX_WIDTH,
+                   max_workers: int = DEFAULT_MAX_WORKERS,
+                   logger: Optional[logging.Logger] = None) -> Dict[str, str]:
+    """
+    図を密度毎に描画して出力ディレクトリに保存する\n
+    レイアウトは最初に1回だけ計算し、描画後の図の dpi は元に戻す
+    :param fig: Figure ※レイアウトエンジンは外される
+    :param out_dir: 出力ディレクトリ
+    :param file_name: ファイル名 (例) PlotBloodPressBar_3_pandas_month.png
+    :param width_dp: 描画領域の幅 (dp) (dp_size)
+    :param layout_name: 固定レイアウトのレイアウト名
+    :param densities: 出力する密度 (DENSITY_CHOICES)
+    :param thumbnail_px: サムネイルの幅 (ピクセル) ※0ならサムネイルを出力しない
+    :param max_workers: PNGエンコード・ファイル書き込みのスレッド数
+    :param logger: application logger
+    :return: 密度 (サムネイルは "thumbnail") をキーとする保存先ファイルパス
+    :raise ValueError: 未定義の密度
+    """
+    for density in densities:
+        if density not in DENSITY_SCALES:
+            raise ValueError(f"Invalid density: {density}")
+
+    org_dpi: float = fig.dpi
+    canvas: FigureCanvasAgg = FigureCanvasAgg(fig)
+    # レイアウトは元の dpi で1回だけ計算する (プロセス内のみキャッシュ)
+    fix_layout(fig, layout_name, cache_file=None)
+    # 倍率の大きい順に描画する (サムネイルは最大密度の描画結果から作成する)
+    ordered: List[str] = sorted(densities, key=lambda name: DENSITY_SCALES[name], reverse=True)
+    save_paths: Dict[str, str] = {}
+    futures: Dict[str, Future] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for density in ordered:
+                dpi: float = target_dpi(fig, width_dp, DENSITY_SCALES[density])
+                with span(PHASE_DRAW):
+                    rgba: np.ndarray = render_rgba(fig, canvas, dpi)
+                save_paths[density] = density_path(out_dir, density, file_name)
+                futures[density] = executor.submit(write_png, save_paths[density], rgba)
+                if thumbnail_px > 0 and THUMBNAIL_DIR not in futures:
+                    save_paths[THUMBNAIL_DIR] = os.path.join(out_dir, THUMBNAIL_DIR, file_name)
+                    futures[THUMBNAIL_DIR] = executor.submit(
+                        write_thumbnail, save_paths[THUMBNAIL_DIR], rgba, thumbnail_px)
+                if logger is not None:
+                    logger.debug(f"{density}: dpi={dpi:.1f}, size={rgba.shape[1]}x{rgba.shape[0]}")
+            # 残りのエンコード・書き込みの完了を待つ
+            with span(PHASE_WRITE) as sp:
+                sp.nbytes = sum(future.result() for future in futures.values())
+    finally:
+        fig.set_dpi(org_dpi)
+    if logger is not None:
+        logger.info(f"{file_name}: {', '.join(save_paths.keys())} -> {out_dir}")
+    return save_paths
@@ -0,0 +1,109 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame, Series
+
+"""
+健康管理データの DataFrame の省メモリ型 (--compact-dtypes)
+(1) スコア・回数・血圧・脈拍・日数 (bodyhealth の smallint 列) は int16
+    ※欠損値を含む列は pandas の Int16 (欠損値対応の整数型)
+(2) 平均値 (bodyhealth の real 列) は float32
+(3) 時間 ("時:分") の列は分 (int16) に変換する ※変換する列は呼び出し側で指定する (文字列のまま使う列は変換しない)
+(4) 重複の多い文字列列 (起床時刻・測定時刻等のラベル) は category
+(5) 変換前後のメモリ使用量 (文字列の実体を含む) をログ出力する
+[テーブル定義] sql/*.sql
+"""
+
+# smallint 列 (日毎のテーブル, 月間集計テーブル)
+SMALLINT_COLUMNS: List[str] = [
+    "sleep_score", "midnight_toilet_visits", "counts",
+    "morning_max", "morning_min", "morning_pulse_rate",
+    "evening_max", "evening_min", "evening_pulse_rate",
+    "sleep_days", "sleep_score_lt60", "sleep_score_60s", "sleep_score_70s", "sleep_score_80s",
+    "sleep_score_ge90", "nocturia_days", "blood_press_days",
+]
+# real 列 (月間集計テーブルの平均値)
+REAL_COLUMNS: List[str] = [
+    "sleep_score_mean", "sleeping_minutes_mean", "deep_sleeping_minutes_mean",
+    "toilet_visits_mean",
+    "morning_max_mean", "morning_min_mean", "morning_pulse_rate_mean",
+    "evening_max_mean", "evening_min_mean", "evening_pulse_rate_mean",
+]
+# smallint 列の省メモリ型 (欠損値なし, 欠損値あり)
+COMPACT_INT: type = np.int16
+COMPACT_NULLABLE_INT: str = "Int16"
+# real 列の省メモリ型
+COMPACT_FLOAT: type = np.float32
+# category に変換する文字列列のユニーク数の上限 (行数に対する比率)
+CATEGORY_MAX_RATIO: float = 0.5
+# メモリ使用量の出力フォーマット
+FMT_MEMORY: str = "{name}: {before:,} -> {after:,} bytes ({ratio:.1%})"
+
+
+def to_int16(values: Series) -> Series:
+    """
+    整数値の列を int16 に変換する
+    :param values: 整数値 (欠損値を含む場合は float または object) の列
+    :return: int16 の列 ※欠損値を含む場合は Int16
+    """
+    if values.isna().any():
+        return values.astype(COMPACT_NULLABLE_INT)
+    return values.astype(COMPACT_INT)
+
+
+def to_minutes(times: Series) -> Series:
+    """
+    時間文字列 ("HH:MM" または "HH:MM:SS") の列を分 (int16) に変換する ※秒は切り捨て
+    :param times: 時間文字列の列 ※欠損値有り(None)
+    :return: 分の列 ※欠損値を含む場合は Int16
+    """
+    hours: Series = pd.to_numeric(times.str.slice(0, 2))
+    minutes: Series = pd.to_numeric(times.str.slice(3, 5))
+    return to_int16(hours * 60 + minutes)
+
+
+def frame_memory(df: DataFrame) -> int:
+    """
+    DataFrameのメモリ使用量を取得する
+    :param df: DataFrame
+    :return: インデックスと文字列の実体を含むメモリ使用量 (バイト)
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact_frame(df: DataFrame, minute_columns: Sequence[str] = (),
+                  logger: Optional[logging.Logger] = None, name: str = "df") -> DataFrame:
+    """
+    smallint 列を int16, real 列を float32, 時間列を分 (int16), 重複の多い文字列列を category に
+    変換したDataFrameを取得する\n
+    元のDataFrameは変更しない
+    :param df: 健康管理データのDataFrame
+    :param minute_columns: 分に変換する時間文字列の列名 ※指定しない時間列は category の対象
+    :param logger: application logger ※指定時は変換前後のメモリ使用量を出力する
+    :param name: ログ出力用の名前
+    :return: 変換後のDataFrame
+    """
+    rows: int = df.shape[0]
+    columns: Dict[str, Series] = {}
+    for col_name in df.columns:
+        values: Series = df[col_name]
+        if col_name in minute_columns:
+            columns[col_name] = to_minutes(values)
+        elif col_name in SMALLINT_COLUMNS:
+            columns[col_name] = to_int16(values)
+        elif col_name in REAL_COLUMNS:
+            columns[col_name] = values.astype(COMPACT_FLOAT)
+        elif (pd.api.types.is_string_dtype(values.dtype) and rows > 0
+              and values.nunique() <= rows * CATEGORY_MAX_RATIO):
+            columns[col_name] = values.astype("category")
+        else:
+            columns[col_name] = values
+    compacted: DataFrame = pd.DataFrame(columns, index=df.index)
+    if logger is not None:
+        before_bytes: int = frame_memory(df)
+        after_bytes: int = frame_memory(compacted)
+        logger.info(FMT_MEMORY.format(name=name, before=before_bytes, after=after_bytes,
+                                      ratio=after_bytes / before_bytes if before_bytes > 0 else 1.))
+    return compacted
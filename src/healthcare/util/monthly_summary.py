@@ -0,0 +1,224 @@
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+from pandas.core.frame import DataFrame
+from sqlalchemy.sql import text
+
+from util.frame_dtype import compact_frame
+
+"""
+健康管理データベースの月間集計テーブル (bodyhealth.monthly_summary) の更新と取得
+(1) 更新: 変更履歴テーブル (bodyhealth.modified_days) の前回更新位置 (ウォーターマーク) 以降に
+    変更された (ユーザー, 年月) のみ日毎のテーブルから再集計する ※再集計は冪等
+(2) 取得: 長期トレンド用に指定期間の月間集計をDataFrameで取得する (1年 = 12行)
+[テーブル作成] sql/14_monthly_summary.sql
+"""
+
+# ウォーターマーク名
+WATERMARK_NAME: str = "monthly_summary"
+# ウォーターマークの安全マージン(秒)
+#  変更履歴の変更時刻は変更時点の時刻のため、ウォーターマーク取得後にコミットされた
+#  トランザクションの変更を取りこぼさないようにマージン分を重複して再集計する
+WATERMARK_MARGIN_SECONDS: int = 60
+
+# 再集計対象 (ユーザー, 年月) を抽出するサブクエリー
+# (1) 前回更新以降に変更された測定日を含む (ユーザー, 年月)
+TARGETS_MODIFIED: str = """
+SELECT DISTINCT
+  pid, date_trunc('month', measurement_day)::date as year_month
+FROM
+  bodyhealth.modified_days
+WHERE
+  modified_at > :sinceTime - make_interval(secs => :marginSeconds)
+  AND
+  modified_at <= :untilTime
+"""
+# (2) 全データ (初回作成・再作成)
+TARGETS_ALL: str = """
+SELECT pid, date_trunc('month', measurement_day)::date as year_month
+  FROM bodyhealth.sleep_management
+UNION
+SELECT pid, date_trunc('month', measurement_day)::date
+  FROM bodyhealth.nocturia_factors
+UNION
+SELECT pid, date_trunc('month', measurement_day)::date
+  FROM bodyhealth.blood_pressure
+"""
+
+# 再集計して登録・更新するクエリー ※{targets} に再集計対象のサブクエリーを設定する
+#  日毎のテーブルは主キー (pid, measurement_day) の範囲検索で1ヶ月分 (最大31行) のみ参照する
+UPSERT_MONTHLY_SUMMARY: str = """
+INSERT INTO bodyhealth.monthly_summary(
+  pid, year_month
+  ,sleep_days, sleep_score_mean
+  ,sleep_score_lt60, sleep_score_60s, sleep_score_70s, sleep_score_80s, sleep_score_ge90
+  ,sleeping_minutes_mean, deep_sleeping_minutes_mean
+  ,nocturia_days, toilet_visits_sum, toilet_visits_mean
+  ,blood_press_days
+  ,morning_max_mean, morning_min_mean, morning_pulse_rate_mean
+  ,evening_max_mean, evening_min_mean, evening_pulse_rate_mean
+  ,updated_at)
+SELECT
+  t.pid, t.year_month
+  ,sm.days, sm.score_mean
+  ,sm.score_lt60, sm.score_60s, sm.score_70s, sm.score_80s, sm.score_ge90
+  ,sm.sleeping_mean, sm.deep_sleeping_mean
+  ,nf.days, nf.visits_sum, nf.visits_mean
+  ,bp.days
+  ,bp.morning_max_mean, bp.morning_min_mean, bp.morning_pulse_rate_mean
+  ,bp.evening_max_mean, bp.evening_min_mean, bp.evening_pulse_rate_mean
+  ,now()
+FROM
+  ({targets}) t
+  CROSS JOIN LATERAL (
+    SELECT
+      count(*) as days
+      ,avg(sleep_score) as score_mean
+      ,count(*) FILTER (WHERE sleep_score < 60) as score_lt60
+      ,count(*) FILTER (WHERE sleep_score >= 60 AND sleep_score < 70) as score_60s
+      ,count(*) FILTER (WHERE sleep_score >= 70 AND sleep_score < 80) as score_70s
+      ,count(*) FILTER (WHERE sleep_score >= 80 AND sleep_score < 90) as score_80s
+      ,count(*) FILTER (WHERE sleep_score >= 90) as score_ge90
+      ,avg(extract(epoch FROM sleeping_time) / 60) as sleeping_mean
+      ,avg(extract(epoch FROM deep_sleeping_time) / 60) as deep_sleeping_mean
+    FROM bodyhealth.sleep_management
+    WHERE pid = t.pid
+      AND measurement_day >= t.year_month
+      AND measurement_day < t.year_month + interval '1 month'
+  ) sm
+  CROSS JOIN LATERAL (
+    SELECT
+      count(*) as days
+      ,coalesce(sum(midnight_toilet_visits), 0) as visits_sum
+      ,avg(midnight_toilet_visits) as visits_mean
+    FROM bodyhealth.nocturia_factors
+    WHERE pid = t.pid
+      AND measurement_day >= t.year_month
+      AND measurement_day < t.year_month + interval '1 month'
+  ) nf
+  CROSS JOIN LATERAL (
+    SELECT
+      count(*) as days
+      ,avg(morning_max) as morning_max_mean
+      ,avg(morning_min) as morning_min_mean
+      ,avg(morning_pulse_rate) as morning_pulse_rate_mean
+      ,avg(evening_max) as evening_max_mean
+      ,avg(evening_min) as evening_min_mean
+      ,avg(evening_pulse_rate) as evening_pulse_rate_mean
+    FROM bodyhealth.blood_pressure
+    WHERE pid = t.pid
+      AND measurement_day >= t.year_month
+      AND measurement_day < t.year_month + interval '1 month'
+  ) bp
+ON CONFLICT (pid, year_month) DO UPDATE SET
+  sleep_days = EXCLUDED.sleep_days
+  ,sleep_score_mean = EXCLUDED.sleep_score_mean
+  ,sleep_score_lt60 = EXCLUDED.sleep_score_lt60
+  ,sleep_score_60s = EXCLUDED.sleep_score_60s
+  ,sleep_score_70s = EXCLUDED.sleep_score_70s
+  ,sleep_score_80s = EXCLUDED.sleep_score_80s
+  ,sleep_score_ge90 = EXCLUDED.sleep_score_ge90
+  ,sleeping_minutes_mean = EXCLUDED.sleeping_minutes_mean
+  ,deep_sleeping_minutes_mean = EXCLUDED.deep_sleeping_minutes_mean
+  ,nocturia_days = EXCLUDED.nocturia_days
+  ,toilet_visits_sum = EXCLUDED.toilet_visits_sum
+  ,toilet_visits_mean = EXCLUDED.toilet_visits_mean
+  ,blood_press_days = EXCLUDED.blood_press_days
+  ,morning_max_mean = EXCLUDED.morning_max_mean
+  ,morning_min_mean = EXCLUDED.morning_min_mean
+  ,morning_pulse_rate_mean = EXCLUDED.morning_pulse_rate_mean
+  ,evening_max_mean = EXCLUDED.evening_max_mean
+  ,evening_min_mean = EXCLUDED.evening_min_mean
+  ,evening_pulse_rate_mean = EXCLUDED.evening_pulse_rate_mean
+  ,updated_at = EXCLUDED.updated_at
+"""
+
+# ウォーターマーク取得 (更新中の同時実行を防ぐため行ロック)
+QUERY_WATERMARK: str = """
+SELECT modified_at FROM bodyhealth.summary_watermark WHERE name=:name FOR UPDATE
+"""
+# 変更履歴の最終変更時刻
+QUERY_LAST_MODIFIED: str = "SELECT max(modified_at) FROM bodyhealth.modified_days"
+UPSERT_WATERMARK: str = """
+INSERT INTO bodyhealth.summary_watermark(name, modified_at) VALUES (:name, :modifiedAt)
+ON CONFLICT (name) DO UPDATE SET modified_at = EXCLUDED.modified_at
+"""
+
+# 長期トレンド用の月間集計取得クエリー
+QUERY_MONTHLY_SUMMARY: str = """
+SELECT
+  to_char(year_month,'YYYY-MM') as year_month
+  ,sleep_days, sleep_score_mean
+  ,sleep_score_lt60, sleep_score_60s, sleep_score_70s, sleep_score_80s, sleep_score_ge90
+  ,sleeping_minutes_mean, deep_sleeping_minutes_mean
+  ,nocturia_days, toilet_visits_sum, toilet_visits_mean
+  ,blood_press_days
+  ,morning_max_mean, morning_min_mean, morning_pulse_rate_mean
+  ,evening_max_mean, evening_min_mean, evening_pulse_rate_mean
+FROM
+  bodyhealth.person p
+  INNER JOIN bodyhealth.monthly_summary ms ON p.id = ms.pid
+WHERE
+  email=:emailAddress
+  AND
+  year_month BETWEEN CAST(:startMonth AS date) AND CAST(:endMonth AS date)
+ORDER BY year_month
+"""
+
+# 睡眠スコア分布の列名 (低い順)
+SLEEP_SCORE_DIST_COLS: List[str] = [
+    "sleep_score_lt60", "sleep_score_60s", "sleep_score_70s", "sleep_score_80s", "sleep_score_ge90"
+]
+
+
+def update_monthly_summary(conn, rebuild: bool = False) -> int:
+    """
+    月間集計テーブルを更新する ※呼び出し側でコミットする
+    :param conn: SQLAlchemy接続オブジェクト (またはセッション)
+    :param rebuild: True なら全データを再集計する
+    :return: 登録・更新件数
+    """
+    # 今回の更新位置: 再集計前に取得する (再集計中の変更は次回の対象)
+    until_time: Optional[datetime] = conn.execute(text(QUERY_LAST_MODIFIED)).scalar()
+    since_time: Optional[datetime] = conn.execute(
+        text(QUERY_WATERMARK), {"name": WATERMARK_NAME}
+    ).scalar()
+
+    if rebuild or since_time is None:
+        # 初回 (ウォーターマーク未登録) または再作成
+        rs = conn.execute(text(UPSERT_MONTHLY_SUMMARY.format(targets=TARGETS_ALL)))
+    elif until_time is None or until_time <= since_time:
+        # 前回更新以降の変更なし
+        return 0
+    else:
+        rs = conn.execute(
+            text(UPSERT_MONTHLY_SUMMARY.format(targets=TARGETS_MODIFIED)),
+            {"sinceTime": since_time, "untilTime": until_time,
+             "marginSeconds": WATERMARK_MARGIN_SECONDS}
+        )
+
+    if until_time is not None:
+        conn.execute(text(UPSERT_WATERMARK), {"name": WATERMARK_NAME, "modifiedAt": until_time})
+    return rs.rowcount
+
+
+def get_monthly_summary(conn, email: str, start_month: str, end_month: str,
+                        compact: bool = False) -> DataFrame:
+    """
+    指定期間の月間集計を取得する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param email: メールアドレス
+    :param start_month: 開始年月 ("YYYY-MM")
+    :param end_month: 終了年月 ("YYYY-MM")
+    :param compact: True なら smallint 列を int16, real 列を float32 に変換する
+    :return: 年月 ("YYYY-MM") をインデックスとする月間集計DataFrame ※未集計の年月は含まない
+    """
+    df: DataFrame = pd.read_sql(
+        text(QUERY_MONTHLY_SUMMARY), conn,
+        params={"emailAddress": email,
+                "startMonth": f"{start_month}-01", "endMonth": f"{end_month}-01"}
+    )
+    if compact:
+        df = compact_frame(df)
+    return df.set_index("year_month")
@@ -0,0 +1,302 @@
+import atexit
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from matplotlib.figure import Figure
+
+"""
+処理フェーズ毎の処理時間計測ユーティリティ
+(1) スクリプトの開始時に start_timer() で計測を開始する ※--timing 指定時のみ有効
+(2) 各フェーズをコンテキストマネージャ span() またはデコレータ timed() で計測する
+(3) 終了時に1実行1行のJSON (logs/<スクリプト名>.timing.jsonl) を追記する
+    ※フェーズのネストは elapsed_ms (子を含む) と self_ms (子を除く) で区別する
+[無効時] span() は何もしないスパンを返し、計測・記録は行わない
+        ※フェーズリスナー (プロファイラ等) が登録されている場合は計測のみ行う (記録しない)
+"""
+
+# フェーズ名: DB接続, クエリー, CSV読み込み, データ変換, 図の作成, 描画, エンコード, ファイル出力
+PHASE_CONNECT: str = "connect"
+PHASE_QUERY: str = "query"
+PHASE_READ: str = "read"
+PHASE_TRANSFORM: str = "transform"
+PHASE_FIGURE: str = "figure"
+PHASE_DRAW: str = "draw"
+PHASE_ENCODE: str = "encode"
+PHASE_WRITE: str = "write"
+
+# 計測結果の出力ディレクトリ (スクリプト直下)
+DEFAULT_LOG_DIR: str = "logs"
+# 計測結果ファイル名フォーマット (JSON Lines)
+FMT_TIMING_LOG: str = "{}.timing.jsonl"
+
+
+class Span:
+    """ 1フェーズの計測結果 """
+    __slots__ = ("name", "offset_ms", "elapsed_ms", "child_ms", "rows", "nbytes", "error")
+
+    def __init__(self, name: str, offset_ms: float, rows: Optional[int] = None):
+        """
+        :param name: フェーズ名
+        :param offset_ms: 計測開始からの開始時刻(ミリ秒)
+        :param rows: 処理件数
+        """
+        self.name: str = name
+        self.offset_ms: float = offset_ms
+        self.elapsed_ms: float = 0.
+        # 子フェーズの処理時間合計
+        self.child_ms: float = 0.
+        self.rows: Optional[int] = rows
+        self.nbytes: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON出力用の辞書に変換する ※未設定の項目は出力しない
+        :return: 計測結果の辞書
+        """
+        result: Dict[str, Any] = {
+            "phase": self.name,
+            "offset_ms": round(self.offset_ms, 3),
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "self_ms": round(self.elapsed_ms - self.child_ms, 3),
+        }
+        for key in ("rows", "nbytes", "error"):
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
+        return result
+
+
+class _NullSpan:
+    """ 計測無効時のスパン (属性の設定を無視する) """
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        pass
+
+
+# 計測無効時に共有するスパン
+_NULL_SPAN: _NullSpan = _NullSpan()
+
+# フェーズの開始・終了を通知するリスナー (引数: フェーズ名, 開始なら True)
+_phase_listeners: List[Callable[[str, bool], None]] = []
+
+
+class PhaseTimer:
+    """ 1実行分のフェーズ毎の処理時間を計測し記録するクラス """
+
+    def __init__(self, script_name: str, enabled: bool = False,
+                 log_dir: str = DEFAULT_LOG_DIR, **context):
+        """
+        :param script_name: スクリプト名
+        :param enabled: 計測の有効/無効
+        :param log_dir: 計測結果の出力ディレクトリ
+        :param context: 計測結果に付加する実行条件 (年月など)
+        """
+        self.script_name: str = script_name
+        self.enabled: bool = enabled
+        self.log_dir: str = log_dir
+        self.context: Dict[str, Any] = context
+        self.spans: List[Span] = []
+        self._stack: List[Span] = []
+        self._started_at: datetime = datetime.now().astimezone()
+        self._start: float = time.perf_counter()
+        # 計測開始までのCPU時間 (主にモジュールのインポート)
+        self._startup_cpu: float = time.process_time()
+        self._written: bool = False
+
+    def span(self, name: str, rows: Optional[int] = None):
+        """
+        フェーズの処理時間を計測するコンテキストマネージャ\n
+        処理件数は with 文で受け取ったスパンの rows に設定する
+        :param name: フェーズ名
+        :param rows: 処理件数
+        :return: コンテキストマネージャ (Span)
+        """
+        if not self.enabled and not _phase_listeners:
+            return _NULL_SPAN
+        return self._measure(name, rows)
+
+    @contextmanager
+    def _measure(self, name: str, rows: Optional[int]) -> Iterator[Span]:
+        start: float = time.perf_counter()
+        sp: Span = Span(name, (start - self._start) * 1000., rows=rows)
+        parent: Optional[Span] = self._stack[-1] if self._stack else None
+        self._stack.append(sp)
+        for listener in _phase_listeners:
+            listener(name, True)
+        try:
+            yield sp
+        except BaseException as err:
+            sp.error = type(err).__name__
+            raise
+        finally:
+            sp.elapsed_ms = (time.perf_counter() - start) * 1000.
+            for listener in _phase_listeners:
+                listener(name, False)
+            self._stack.pop()
+            if parent is not None:
+                parent.child_ms += sp.elapsed_ms
+            self.spans.append(sp)
+
+    def to_record(self) -> Dict[str, Any]:
+        """
+        1実行分の計測結果を生成する
+        :return: 計測結果の辞書 (フェーズは開始順)
+        """
+        return {
+            "script": self.script_name,
+            "host": socket.gethostname(),
+            "started_at": self._started_at.isoformat(timespec="milliseconds"),
+            "finished_at": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+            "total_ms": round((time.perf_counter() - self._start) * 1000., 3),
+            "startup_cpu_ms": round(self._startup_cpu * 1000., 3),
+            "cpu_ms": round((time.process_time() - self._startup_cpu) * 1000., 3),
+            **self.context,
+            "phases": [sp.to_dict() for sp in sorted(self.spans, key=lambda s: s.offset_ms)],
+        }
+
+    def write(self) -> Optional[str]:
+        """
+        計測結果を1行のJSONとして計測結果ファイルに追記する ※1実行につき1回のみ
+        :return: 計測結果ファイルパス ※無効または出力済みなら None
+        """
+        if not self.enabled or self._written:
+            return None
+
+        self._written = True
+        os.makedirs(self.log_dir, exist_ok=True)
+        stem: str = os.path.splitext(self.script_name)[0]
+        log_path: str = os.path.join(self.log_dir, FMT_TIMING_LOG.format(stem))
+        with open(log_path, 'a') as fp:
+            fp.write(json.dumps(self.to_record(), ensure_ascii=False) + "\n")
+        return log_path
+
+
+# 実行中のタイマー ※start_timer() 前は無効
+_timer: PhaseTimer = PhaseTimer("")
+
+
+def start_timer(script_name: str, enabled: bool = True,
+                log_dir: str = DEFAULT_LOG_DIR, **context) -> PhaseTimer:
+    """
+    計測を開始する ※有効なら終了時 (exit() を含む) に計測結果を出力する
+    :param script_name: スクリプト名
+    :param enabled: 計測の有効/無効
+    :param log_dir: 計測結果の出力ディレクトリ
+    :param context: 計測結果に付加する実行条件 (年月など)
+    :return: タイマー
+    """
+    global _timer
+    _timer = PhaseTimer(script_name, enabled=enabled, log_dir=log_dir, **context)
+    if enabled:
+        atexit.register(_timer.write)
+    return _timer
+
+
+def add_phase_listener(listener: Callable[[str, bool], None]) -> None:
+    """
+    フェーズの開始・終了を通知するリスナーを登録する ※計測が無効でもフェーズの開始・終了を通知する
+    :param listener: リスナー (引数: フェーズ名, 開始なら True)
+    """
+    _phase_listeners.append(listener)
+
+
+def _is_active() -> bool:
+    """
+    フェーズを計測するか判定する
+    :return: 計測が有効またはフェーズリスナーが登録済みなら True
+    """
+    return _timer.enabled or len(_phase_listeners) > 0
+
+
+def get_timer() -> PhaseTimer:
+    """
+    実行中のタイマーを取得する
+    :return: タイマー
+    """
+    return _timer
+
+
+def span(name: str, rows: Optional[int] = None):
+    """
+    実行中のタイマーでフェーズの処理時間を計測するコンテキストマネージャ
+    :param name: フェーズ名
+    :param rows: 処理件数
+    :return: コンテキストマネージャ (Span)
+    """
+    return _timer.span(name, rows=rows)
+
+
+def timed(name: str) -> Callable:
+    """
+    関数の処理時間をフェーズとして計測するデコレータ
+    :param name: フェーズ名
+    :return: デコレータ
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _is_active():
+                return func(*args, **kwargs)
+            with _timer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def timed_draw(fig: Figure) -> Iterator[None]:
+    """
+    図の描画 (Figure.draw) を描画フェーズとして計測する ※bbox_inches="tight" の保存では2回計測される
+    :param fig: Figure
+    """
+    if not _is_active():
+        yield
+        return
+
+    org_draw: Callable = fig.draw
+
+    def draw(renderer):
+        with _timer.span(PHASE_DRAW):
+            return org_draw(renderer)
+
+    fig.draw = draw
+    try:
+        yield
+    finally:
+        del fig.draw
+
+
+def timed_save(fig: Figure, save_path: str, save: Callable[[Any], None]) -> None:
+    """
+    図の保存を描画・エンコード・ファイル出力のフェーズに分けて計測する\n
+    計測有効時はバイトストリームに保存してからファイルに出力する
+    :param fig: Figure
+    :param save_path: 保存先ファイルパス
+    :param save: 保存関数 (引数: 保存先のファイルパスまたはバイトストリーム)
+    """
+    if not _is_active():
+        save(save_path)
+        return
+
+    buf: BytesIO = BytesIO()
+    # エンコードの self_ms は描画を除いた処理時間
+    with _timer.span(PHASE_ENCODE), timed_draw(fig):
+        save(buf)
+    with _timer.span(PHASE_WRITE) as sp:
+        with open(save_path, 'wb') as fp:
+            fp.write(buf.getbuffer())
+        sp.nbytes = buf.getbuffer().nbytes
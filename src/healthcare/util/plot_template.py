@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+import numpy as np
+from matplotlib.artist import Artist
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.image as mpimg
+
+from util.fixed_layout import fix_layout
+
+"""
+静的レイヤーのテンプレート (描画済みラスター) とブリッティングによる繰り返し描画ユーティリティ
+(1) 図の仕様 (図のサイズ, 軸の範囲, X軸ラベル等) 毎に静的レイヤー (グリッド線, 基準線, 凡例, 軸ラベル等) を
+    1回だけ描画してラスターをキャッシュする
+(2) 描画毎にキャッシュしたラスターを復元し、データレイヤー (棒, 折れ線, タイトル等) のみ描画する
+    ※データレイヤーより前面の静的 Artist (基準線, 凡例等) はオーバーレイとしてデータレイヤーの後に描画する
+    ※データレイヤーの Artist は animated=True として静的レイヤーの描画から除外する
+    ※図毎に値が変わる既存の Artist (X軸ラベル等) はダイナミックとして静的レイヤーから除外し毎回描画する
+[用途] バッチ・サーバーで同じレイアウトの図を大量に描画する場合
+"""
+
+# テンプレートキャッシュの最大件数 (図1件あたり数MBのラスターを保持する)
+DEFAULT_MAX_TEMPLATES: int = 32
+
+
+class StaticTemplate:
+    """ 静的レイヤーを描画済みの図とそのラスターを保持するクラス """
+
+    def __init__(self, fig: Figure, axes: Dict[str, Axes], layout_name: str,
+                 overlays: Optional[List[Artist]] = None,
+                 dynamics: Optional[List[Artist]] = None):
+        """
+        静的レイヤーを描画しラスターを保存する\n
+        レイアウトエンジンは初回のみ実行し以降はサブプロットの位置を固定する
+        :param fig: 静的レイヤーを描画済みの図 ※pyplotに登録しない Figure() を推奨 (キャッシュから外れたら解放)
+        :param axes: 名前をキーとする描画領域の辞書 (データレイヤーの描画関数に渡す)
+        :param layout_name: 固定レイアウトのレイアウト名
+        :param overlays: データレイヤーより前面に描画する静的な Artist (基準線, 凡例等)
+        :param dynamics: データレイヤーの描画関数で更新する既存の Artist (X軸等)
+        """
+        self.fig: Figure = fig
+        self.axes: Dict[str, Axes] = axes
+        self.canvas: FigureCanvasAgg = FigureCanvasAgg(fig)
+        # タイトルはデータレイヤー (年月毎に異なる) のため静的レイヤーの描画から除外する
+        self.titles: List[Artist] = [ax.title for ax in axes.values()]
+        # 前面の静的 Artist はデータレイヤーの描画後に毎回描画する
+        self.overlays: List[Artist] = overlays or []
+        # 図毎に値が変わる既存の Artist はタイトルと同様に毎回描画する
+        self.dynamics: List[Artist] = dynamics or []
+        for artist in self.titles + self.dynamics + self.overlays:
+            artist.set_animated(True)
+        fix_layout(fig, layout_name, cache_file=None)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(fig.bbox)
+
+    def render(self, draw_data: Callable[[Dict[str, Axes]], None]) -> np.ndarray:
+        """
+        静的レイヤーのラスターを復元しデータレイヤーのみ描画する\n
+        描画関数で追加された Artist を描画領域毎に zorder 順で描画し、描画後に除去する
+        :param draw_data: データレイヤーの描画関数 (タイトルの設定を含む)
+        :return: 描画結果 (RGBA配列のコピー)
+        """
+        self.canvas.restore_region(self.background)
+        before: Dict[str, Set[Artist]] = {
+            name: set(ax.get_children()) for name, ax in self.axes.items()
+        }
+        # 棒グラフ等のコンテナ (ax.containers) は Artist の除去では削除されないため件数を保持する
+        container_counts: Dict[str, int] = {
+            name: len(ax.containers) for name, ax in self.axes.items()
+        }
+        draw_data(self.axes)
+        # 描画領域毎の追加された Artist (描画順: 描画領域の登録順, zorder順)
+        added: List[Artist] = []
+        for name, ax in self.axes.items():
+            added.extend(sorted(
+                (artist for artist in ax.get_children() if artist not in before[name]),
+                key=lambda artist: artist.get_zorder()
+            ))
+        try:
+            for artist in added:
+                artist.set_animated(True)
+                self.fig.draw_artist(artist)
+            for artist in self.titles + self.dynamics + self.overlays:
+                self.fig.draw_artist(artist)
+            return np.array(self.canvas.buffer_rgba())
+        finally:
+            # 追加したデータレイヤーを除去しテンプレートの状態に戻す
+            for artist in added:
+                artist.remove()
+            for name, ax in self.axes.items():
+                del ax.containers[container_counts[name]:]
+
+    def render_png(self, draw_data: Callable[[Dict[str, Axes]], None]) -> bytes:
+        """
+        データレイヤーを描画しPNG形式にエンコードする
+        :param draw_data: データレイヤーの描画関数
+        :return: PNG形式のバイト列
+        """
+        return encode_png(self.render(draw_data))
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """
+    描画結果をPNG形式にエンコードする
+    :param rgba: 描画結果 (RGBA配列)
+    :return: PNG形式のバイト列
+    """
+    buf: BytesIO = BytesIO()
+    mpimg.imsave(buf, rgba, format="png")
+    return buf.getvalue()
+
+
+class TemplateCache:
+    """ 図の仕様をキーとする静的テンプレートのキャッシュ (LRU) """
+
+    def __init__(self, max_templates: int = DEFAULT_MAX_TEMPLATES):
+        """
+        :param max_templates: キャッシュの最大件数
+        """
+        self.max_templates: int = max_templates
+        self._templates: "OrderedDict[Hashable, StaticTemplate]" = OrderedDict()
+        # テンプレートの作成件数 (キャッシュミス)
+        self.built: int = 0
+
+    def get(self, spec_key: Hashable,
+            build_static: Callable[[], StaticTemplate]) -> StaticTemplate:
+        """
+        図の仕様に対応する静的テンプレートを取得する ※未作成なら作成してキャッシュする
+        :param spec_key: 図の仕様 (図のサイズ, 軸の範囲, X軸ラベル等の静的レイヤーを決定する値)
+        :param build_static: 静的テンプレートの作成関数
+        :return: 静的テンプレート
+        """
+        template: Optional[StaticTemplate] = self._templates.get(spec_key)
+        if template is not None:
+            self._templates.move_to_end(spec_key)
+            return template
+
+        template = build_static()
+        self.built += 1
+        self._templates[spec_key] = template
+        if len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+        return template
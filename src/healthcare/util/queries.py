@@ -0,0 +1,67 @@
+from typing import Dict, List
+
+"""
+健康管理データベースの選択クエリー定義
+[結合条件] 睡眠管理テーブルと夜間頻尿要因テーブルは複合主キー (pid, measurement_day) で結合する
+"""
+
+# 睡眠管理テーブル(夜間頻尿要因の夜間トイレ回数を結合)データ取得クエリ
+#  nocturia_factors を pid のみで結合すると同一人物の全期間の直積が生成されてから
+#  WHERE句で日付を絞り込むことになるため、結合条件に測定日を含める
+QUERY_SLEEP_MAN: str = """
+SELECT
+  to_char(sm.measurement_day,'YYYY-MM-DD') as measurement_day
+  ,to_char(wakeup_time,'HH24:MI') as wakeup_time
+  ,sleep_score
+  ,to_char(sleeping_time, 'HH24:MI') as sleeping_time
+  ,to_char(deep_sleeping_time, 'HH24:MI') as deep_sleeping_time
+  ,midnight_toilet_visits
+FROM
+  bodyhealth.person p
+  INNER JOIN bodyhealth.sleep_management sm ON p.id = sm.pid
+  INNER JOIN bodyhealth.nocturia_factors nf
+    ON sm.pid = nf.pid AND sm.measurement_day = nf.measurement_day
+WHERE
+  email=:emailAddress
+  AND
+  sm.measurement_day BETWEEN :startDay AND :endDay
+  ORDER BY sm.measurement_day
+"""
+
+# 血圧測定テーブルデータ取得クエリ
+QUERY_BLOOD_PRESS: str = """
+SELECT
+  to_char(measurement_day,'YYYY-MM-DD') as measurement_day
+  ,to_char(morning_measurement_time,'HH24:MI') as morning_measurement_time
+  ,morning_max
+  ,morning_min
+  ,morning_pulse_rate
+  ,to_char(evening_measurement_time, 'HH24:MI') as evening_measurement_time
+  ,evening_max
+  ,evening_min
+  ,evening_pulse_rate
+FROM
+  bodyhealth.person p
+  INNER JOIN bodyhealth.blood_pressure bp ON p.id = bp.pid
+WHERE
+  email=:emailAddress
+  AND
+  measurement_day BETWEEN :startDay AND :endDay
+  ORDER BY measurement_day
+"""
+
+# クエリーID
+QUERY_ID_SLEEP_MAN: str = "sleep_man"
+QUERY_ID_BLOOD_PRESS: str = "blood_press"
+
+# クエリーIDと選択クエリーの辞書 ※実行計画チェックツールなどで全クエリーを走査する
+QUERIES: Dict[str, str] = {
+    QUERY_ID_SLEEP_MAN: QUERY_SLEEP_MAN,
+    QUERY_ID_BLOOD_PRESS: QUERY_BLOOD_PRESS,
+}
+
+# クエリーIDと参照テーブル名リストの辞書 ※クエリー結果キャッシュの無効化判定 (変更履歴テーブル)
+QUERY_TABLES: Dict[str, List[str]] = {
+    QUERY_ID_SLEEP_MAN: ["sleep_management", "nocturia_factors"],
+    QUERY_ID_BLOOD_PRESS: ["blood_pressure"],
+}
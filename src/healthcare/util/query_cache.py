@@ -0,0 +1,281 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import text
+
+from util.queries import QUERIES, QUERY_TABLES
+
+"""
+健康管理データベースの選択クエリー結果キャッシュ
+(1) キャッシュキー: (クエリーID, メールアドレス, 年月) ※1エントリ = 1ヶ月分 (1日〜末日) の結果
+(2) 保存形式: 列単位の numpy圧縮ファイル (.npz) ※欠損値(NULL)は列毎のマスクで保持
+(3) 無効化: 測定日の変更履歴テーブル (sql/13_modification_log.sql) で
+    キャッシュ書き込み後に変更された測定日を含む年月のエントリを無効とする
+    ※変更履歴テーブルが無い場合は前月以前 (完了月) のエントリのみ使用する
+(4) 複数月にまたがる検索範囲はキャッシュ済みの月を連結し、未キャッシュの月のみデータベースから取得する
+"""
+
+# デフォルトのキャッシュディレクトリ (スクリプト直下)
+DEFAULT_CACHE_DIR: str = "cache"
+# キャッシュファイル拡張子
+CACHE_FILE_EXT: str = ".npz"
+# 年月フォーマット
+FMT_YEAR_MONTH: str = "%Y-%m"
+# ISO8601フォーマット
+FMT_DATE: str = "%Y-%m-%d"
+# 検索結果の測定日の列名 ※全クエリー共通 ("YYYY-MM-DD" 文字列)
+COL_MEASUREMENT_DAY: str = "measurement_day"
+# キャッシュファイルのメタデータキー
+KEY_COLUMNS: str = "__columns__"
+KEY_WRITTEN_AT: str = "__written_at__"
+FMT_KEY_NULL: str = "__null__{}"
+# 書き込み時刻の安全マージン(秒)
+#  キャッシュ書き込み時刻はデータ取得前のデータベース時刻とし、さらに取得と並行して
+#  コミットされたトランザクションの変更を取りこぼさないようにマージンを差し引く
+WRITTEN_AT_MARGIN_SECONDS: float = 60.
+
+# 測定日の変更履歴から年月毎の最終変更時刻を取得するクエリー
+QUERY_MODIFIED_MONTHS: str = """
+SELECT
+  to_char(md.measurement_day,'YYYY-MM') as year_month
+  ,max(md.modified_at) as modified_at
+FROM
+  bodyhealth.person p
+  INNER JOIN bodyhealth.modified_days md ON p.id = md.pid
+WHERE
+  email=:emailAddress
+  AND
+  md.table_name = ANY(:tableNames)
+  AND
+  md.measurement_day BETWEEN :startDay AND :endDay
+GROUP BY to_char(md.measurement_day,'YYYY-MM')
+"""
+QUERY_DB_NOW: str = "SELECT now()"
+
+
+@dataclass
+class QueryResult:
+    """ 選択クエリーの結果 (列名リストとレコードリスト) を保持するデータクラス """
+    columns: List[str]
+    rows: List[tuple]
+
+
+def month_ranges(start_day: str, end_day: str) -> List[Tuple[str, str, str]]:
+    """
+    検索範囲を年月毎の範囲 (年月, 1日, 末日) に分割する
+    :param start_day: 開始日 (ISO8601)
+    :param end_day: 終了日 (ISO8601)
+    :return: (年月, 月の1日, 月の末日) リスト
+    """
+    result: List[Tuple[str, str, str]] = []
+    curr: date = datetime.strptime(start_day, FMT_DATE).date().replace(day=1)
+    last: date = datetime.strptime(end_day, FMT_DATE).date()
+    while curr <= last:
+        next_month: date = (curr + timedelta(days=31)).replace(day=1)
+        result.append((
+            curr.strftime(FMT_YEAR_MONTH),
+            curr.strftime(FMT_DATE), (next_month - timedelta(days=1)).strftime(FMT_DATE)
+        ))
+        curr = next_month
+    return result
+
+
+def cache_path(cache_dir: str, query_id: str, email: str, year_month: str) -> str:
+    """
+    キャッシュファイルパスを取得する ※メールアドレスはハッシュ化してディレクトリ名とする
+    :param cache_dir: キャッシュディレクトリ
+    :param query_id: クエリーID
+    :param email: メールアドレス
+    :param year_month: 年月
+    :return: キャッシュファイルパス
+    """
+    email_key: str = hashlib.sha1(email.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, query_id, email_key, year_month + CACHE_FILE_EXT)
+
+
+def _to_column_array(values: List) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    1列分の値リストを numpy配列と欠損値マスクに変換する
+    :param values: 1列分の値リスト (欠損値 None)
+    :return: 値の配列, 欠損値マスク
+    """
+    nulls: np.ndarray = np.array([val is None for val in values], dtype=bool)
+    present: List = [val for val in values if val is not None]
+    if present and all(isinstance(val, bool) for val in present):
+        return np.array([bool(val) for val in values], dtype=bool), nulls
+    if present and all(isinstance(val, int) for val in present):
+        return np.array([val if val is not None else 0 for val in values], dtype=np.int64), nulls
+    if present and all(isinstance(val, (int, float)) for val in present):
+        return np.array([val if val is not None else np.nan for val in values],
+                        dtype=np.float64), nulls
+    return np.array([str(val) if val is not None else "" for val in values], dtype=np.str_), nulls
+
+
+def save_month(path: str, columns: List[str], rows: List[tuple], written_at: float) -> None:
+    """
+    1ヶ月分の検索結果を列単位でキャッシュファイルに保存する
+    :param path: キャッシュファイルパス
+    :param columns: 列名リスト
+    :param rows: 1ヶ月分のレコードリスト
+    :param written_at: 書き込み時刻 (データベース時刻のエポック秒)
+    """
+    arrays: Dict[str, np.ndarray] = {
+        KEY_COLUMNS: np.array(columns, dtype=np.str_),
+        KEY_WRITTEN_AT: np.array(written_at, dtype=np.float64)
+    }
+    col_values: List[tuple] = list(zip(*rows)) if rows else [()] * len(columns)
+    for col_idx, values in enumerate(col_values):
+        arrays[str(col_idx)], arrays[FMT_KEY_NULL.format(col_idx)] = _to_column_array(list(values))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 書き込み途中のファイルを読まないように一時ファイルから置き換える
+    tmp_path: str = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        np.savez_compressed(fp, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_month(path: str) -> Optional[Tuple[float, QueryResult]]:
+    """
+    キャッシュファイルから1ヶ月分の検索結果を読み込む
+    :param path: キャッシュファイルパス
+    :return: (書き込み時刻, 検索結果) ※ファイルが存在しないか読み込めない場合はNone
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as npz:
+            columns: List[str] = npz[KEY_COLUMNS].tolist()
+            written_at: float = float(npz[KEY_WRITTEN_AT])
+            col_values: List[List] = []
+            for col_idx in range(len(columns)):
+                nulls: np.ndarray = npz[FMT_KEY_NULL.format(col_idx)]
+                values: List = npz[str(col_idx)].tolist()
+                col_values.append(
+                    [None if is_null else val for val, is_null in zip(values, nulls.tolist())]
+                )
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return written_at, QueryResult(columns, list(zip(*col_values)))
+
+
+def get_modified_months(conn, query_id: str, email: str,
+                        start_day: str, end_day: str) -> Optional[Dict[str, float]]:
+    """
+    変更履歴テーブルから年月毎の最終変更時刻を取得する
+    :param conn: SQLAlchemy接続オブジェクト (またはセッション)
+    :param query_id: クエリーID
+    :param email: メールアドレス
+    :param start_day: 開始日
+    :param end_day: 終了日
+    :return: 年月をキーとする最終変更時刻 (エポック秒) ※変更履歴テーブルが無い場合はNone
+    """
+    params: Dict = {
+        "emailAddress": email, "tableNames": QUERY_TABLES[query_id],
+        "startDay": start_day, "endDay": end_day
+    }
+    try:
+        rows = conn.execute(text(QUERY_MODIFIED_MONTHS), params).fetchall()
+    except SQLAlchemyError:
+        # 変更履歴テーブル未作成: 失敗したトランザクションを破棄して続行する
+        conn.rollback()
+        return None
+
+    return {year_month: modified_at.timestamp() for year_month, modified_at in rows}
+
+
+def fetch_rows(conn, query_id: str, email: str, start_day: str, end_day: str,
+               cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> QueryResult:
+    """
+    選択クエリーの結果をキャッシュ経由で取得する\n
+    有効なキャッシュが存在する年月はキャッシュから、それ以外の年月はデータベースから取得し
+    年月単位でキャッシュに保存する
+    :param conn: SQLAlchemy接続オブジェクト (またはセッション)
+    :param query_id: クエリーID (util.queries.QUERIES のキー)
+    :param email: メールアドレス
+    :param start_day: 開始日 (ISO8601)
+    :param end_day: 終了日 (ISO8601)
+    :param cache_dir: キャッシュディレクトリ ※Noneならキャッシュを使わない
+    :return: 検索結果 (測定日順)
+    """
+    query: str = QUERIES[query_id]
+    months: List[Tuple[str, str, str]] = month_ranges(start_day, end_day)
+    # キャッシュ未使用または対象月が無い (開始日 > 終了日) 場合は直接検索する ※後者は0件
+    if cache_dir is None or len(months) == 0:
+        rs = conn.execute(
+            text(query), {"emailAddress": email, "startDay": start_day, "endDay": end_day}
+        )
+        return QueryResult(list(rs.keys()), rs.fetchall())
+
+    # データ取得前のデータベース時刻を書き込み時刻とする
+    db_now: float = conn.execute(text(QUERY_DB_NOW)).scalar().timestamp()
+    modified: Optional[Dict[str, float]] = get_modified_months(
+        conn, query_id, email, months[0][1], months[-1][2]
+    )
+    this_month: str = date.today().strftime(FMT_YEAR_MONTH)
+
+    # 年月毎の検索結果 (キャッシュヒット分)
+    month_results: Dict[str, QueryResult] = {}
+    for year_month, _, _ in months:
+        # 変更履歴が無い場合は完了月のみキャッシュを利用する
+        if modified is None and year_month >= this_month:
+            continue
+        cached: Optional[Tuple[float, QueryResult]] = load_month(
+            cache_path(cache_dir, query_id, email, year_month)
+        )
+        if cached is None:
+            continue
+        written_at, result = cached
+        if modified is not None and modified.get(year_month, 0.) >= written_at:
+            continue
+        month_results[year_month] = result
+
+    # 未キャッシュの年月: 連続する年月をまとめて1回のクエリーで取得する
+    missing_spans: List[List[Tuple[str, str, str]]] = []
+    for month in months:
+        if month[0] in month_results:
+            continue
+        if missing_spans and months.index(missing_spans[-1][-1]) + 1 == months.index(month):
+            missing_spans[-1].append(month)
+        else:
+            missing_spans.append([month])
+
+    columns: Optional[List[str]] = None
+    for span in missing_spans:
+        rs = conn.execute(
+            text(query), {"emailAddress": email, "startDay": span[0][1], "endDay": span[-1][2]}
+        )
+        columns = list(rs.keys())
+        span_col_day: int = columns.index(COL_MEASUREMENT_DAY)
+        rows: List[tuple] = [tuple(row) for row in rs.fetchall()]
+        for year_month, _, _ in span:
+            month_rows: List[tuple] = [
+                row for row in rows if row[span_col_day].startswith(year_month)
+            ]
+            result: QueryResult = QueryResult(columns, month_rows)
+            month_results[year_month] = result
+            if modified is None and year_month >= this_month:
+                continue
+            try:
+                save_month(cache_path(cache_dir, query_id, email, year_month),
+                           columns, month_rows, db_now - WRITTEN_AT_MARGIN_SECONDS)
+            except OSError:
+                pass
+
+    # 年月順に連結し検索範囲で絞り込む
+    if columns is None:
+        columns = month_results[months[0][0]].columns
+    col_day: int = columns.index(COL_MEASUREMENT_DAY)
+    stitched: List[tuple] = [
+        row
+        for year_month, _, _ in months
+        for row in month_results[year_month].rows
+        if start_day <= row[col_day] <= end_day
+    ]
+    return QueryResult(columns, stitched)
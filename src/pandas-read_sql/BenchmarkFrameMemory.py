@@ -0,0 +1,126 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from BenchmarkSQLiteRead import FMT_SEED_DEVICE, generate_db, to_year_months
+from PlotWeatherCompPrevYear_sqlite3 import get_dataframe
+from plotter.frame_dtype import compact_columns, compact_frame, frame_memory
+from plotter.resolution import RESOLUTION_CHOICES, RESOLUTION_RAW
+from plotter.sensor_validation import POLICY_OFF
+from plotter.sqlite_db import close_connections, get_shared_connection
+
+"""
+複数年分の観測データを保持した場合の DataFrame のメモリ使用量を比較するベンチマーク (--compact-dtypes)
+[比較] 既定の型 (float64) と省メモリ型 (観測値 float32, ラベル列 category)
+  ※常駐プロセスが全デバイスの複数年分の月間データを保持する場合を想定し、全年月・全デバイスの合計を出力する
+  ※float32 への変換誤差 (観測値の最大絶対誤差) も出力する ※センサーの分解能は 0.1
+[データ] 複数年分の合成データ (10分間隔) の weather.db を作業ディレクトリに生成する ※前年までの完了年
+[実行例] python BenchmarkFrameMemory.py --years 5 --devices 2 --resolution raw hourly
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# デバイス名列 (全デバイスを連結した DataFrame のラベル列)
+COL_DEVICE_NAME: str = "device_name"
+# 結果出力フォーマット
+FMT_RESULT: str = ("{:<8} rows={:>9,} default={:>12,} bytes compact={:>12,} bytes ({:.1%})"
+                   " max_error={:.1e}")
+
+
+def load_all(db_path: str, devices: int, year_months: List[str], resolution: str) -> DataFrame:
+    """
+    全デバイスの全年月の観測データを取得してデバイス名列付きで連結する
+    :param db_path: データベースファイルパス
+    :param devices: デバイス数
+    :param year_months: 年月リスト
+    :param resolution: 集計間隔
+    :return: 全デバイス・全年月の観測データ
+    """
+    frames: List[DataFrame] = []
+    for dev_idx in range(devices):
+        device_name: str = FMT_SEED_DEVICE.format(dev_idx + 1)
+        for year_month in year_months:
+            df: DataFrame = get_dataframe(get_shared_connection(db_path), device_name, year_month,
+                                          resolution=resolution, validation=POLICY_OFF)
+            frames.append(df.assign(**{COL_DEVICE_NAME: device_name}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def max_error(df: DataFrame, df_compact: DataFrame) -> float:
+    """
+    省メモリ型への変換による観測値の最大絶対誤差を取得する
+    :param df: 既定の型の観測データ
+    :param df_compact: 省メモリ型の観測データ
+    :return: 全観測値列の最大絶対誤差
+    """
+    errors: List[float] = [
+        float(np.nanmax(np.abs(df[col_name].to_numpy(dtype=np.float64)
+                               - df_compact[col_name].to_numpy(dtype=np.float64))))
+        for col_name in compact_columns(list(df.columns))
+    ]
+    return max(errors) if errors else 0.
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数 (前年までの完了年)
+    parser.add_argument("--years", type=int, default=3, help="合成データの年数 (デフォルト 3)")
+    # 合成データのデバイス数
+    parser.add_argument("--devices", type=int, default=2, help="合成デバイス数 (デフォルト 2)")
+    # 集計間隔 (複数指定可)
+    parser.add_argument("--resolution", type=str, nargs="+", choices=RESOLUTION_CHOICES,
+                        default=[RESOLUTION_RAW], help="Bucket sizes to compare.")
+    # 作業ディレクトリ ※未指定なら一時ディレクトリ (終了時に削除)
+    parser.add_argument("--work-dir", type=str, help="Directory for the generated database.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.years < 1 or args.devices < 1:
+        app_logger.warning("--years and --devices must be >= 1")
+        exit(1)
+
+    last_year: int = date.today().year - 1
+    param_years: List[int] = list(range(last_year - args.years + 1, last_year + 1))
+    param_year_months: List[str] = to_year_months(param_years)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir: str = args.work_dir if args.work_dir is not None else tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        db_path: str = os.path.abspath(os.path.join(work_dir, "weather.db"))
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        gen_start: float = time.perf_counter()
+        seed_rows: int = generate_db(db_path, param_years, args.devices)
+        app_logger.info(f"generated: {seed_rows} rows, years={param_years}, devices={args.devices}, "
+                        f"{time.perf_counter() - gen_start:.1f}s")
+
+        for resolution in args.resolution:
+            df_all: DataFrame = load_all(db_path, args.devices, param_year_months, resolution)
+            df_compact: DataFrame = compact_frame(df_all)
+            default_bytes: int = frame_memory(df_all)
+            compact_bytes: int = frame_memory(df_compact)
+            app_logger.info(FMT_RESULT.format(
+                resolution, df_all.shape[0], default_bytes, compact_bytes,
+                compact_bytes / default_bytes, max_error(df_all, df_compact)))
+            # 列毎のメモリ使用量 (既定の型 -> 省メモリ型)
+            col_bytes: Dict[str, str] = {
+                col_name: f"{df_all[col_name].dtype}:{df_all[col_name].memory_usage(deep=True):,}"
+                          f" -> {df_compact[col_name].dtype}:{df_compact[col_name].memory_usage(deep=True):,}"
+                for col_name in df_all.columns
+            }
+            app_logger.info(f"{resolution} columns: {col_bytes}")
+            del df_all, df_compact
+        close_connections()
@@ -0,0 +1,127 @@
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+from BenchmarkSQLiteRead import FMT_RESULT, FMT_SEED_DEVICE, generate_db, measure, to_year_months
+from PlotWeatherCompPrevYear_sqlite3 import QUERY_RANGE_DATA, next_year_month
+from plotter.sqlite_db import is_without_rowid, migrate_without_rowid, open_read_only
+
+"""
+SQLite3 の t_weather のテーブル構成毎に範囲検索の処理時間とファイルサイズを比較するベンチマーク
+[比較構成]
+  (1) rowid: 主キー (did, measurement_time) のインデックス + rowid テーブル (db/sqlite3/weather_db.sql)
+  (2) without_rowid: 主キー順に格納した WITHOUT ROWID テーブル (db/sqlite3/weather_db_without_rowid.sql)
+      ※(1) から migrate_without_rowid() で移行する
+[計測] 月間・年間の範囲検索 (QUERY_RANGE_DATA の全行取得) ※同じ PRAGMA 設定の接続
+[実行例] python BenchmarkSQLiteLayout.py --years 5 --devices 2 --repeat 3
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# テーブル構成
+LAYOUT_ROWID: str = "rowid"
+LAYOUT_WITHOUT_ROWID: str = "without_rowid"
+# 範囲検索の実行計画を取得するSQL
+EXPLAIN_RANGE_DATA: str = "EXPLAIN QUERY PLAN " + QUERY_RANGE_DATA
+
+
+def scan_range(connection: sqlite3.Connection, device_name: str,
+               from_date: str, to_date: str) -> int:
+    """
+    期間の観測データを全行取得する
+    :param connection: SQLite3接続
+    :param device_name: デバイス名
+    :param from_date: 開始日 "YYYY-MM-DD"
+    :param to_date: 終了日 (この日を含まない) "YYYY-MM-DD"
+    :return: 取得行数
+    """
+    return len(connection.execute(QUERY_RANGE_DATA, (device_name, from_date, to_date)).fetchall())
+
+
+def query_plan(connection: sqlite3.Connection, device_name: str) -> List[str]:
+    """
+    範囲検索の実行計画を取得する
+    :param connection: SQLite3接続
+    :param device_name: デバイス名
+    :return: 実行計画の詳細リスト
+    """
+    rows: List[Tuple] = connection.execute(
+        EXPLAIN_RANGE_DATA, (device_name, "2000-01-01", "2000-02-01")).fetchall()
+    return [row[-1] for row in rows]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数 (前年までの完了年)
+    parser.add_argument("--years", type=int, default=3, help="合成データの年数 (デフォルト 3)")
+    # 合成データのデバイス数
+    parser.add_argument("--devices", type=int, default=2, help="合成デバイス数 (デフォルト 2)")
+    # 計測回数 (全期間の取得の繰り返し回数)
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数 (デフォルト 3)")
+    # 作業ディレクトリ ※未指定なら一時ディレクトリ (終了時に削除)
+    parser.add_argument("--work-dir", type=str, help="Directory for the generated databases.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.years < 1 or args.devices < 1 or args.repeat < 1:
+        app_logger.warning("--years, --devices and --repeat must be >= 1")
+        exit(1)
+
+    last_year: int = date.today().year - 1
+    param_years: List[int] = list(range(last_year - args.years + 1, last_year + 1))
+    param_year_months: List[str] = to_year_months(param_years)
+    device_name: str = FMT_SEED_DEVICE.format(1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir: str = args.work_dir if args.work_dir is not None else tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        db_paths: Dict[str, str] = {
+            layout: os.path.join(work_dir, f"weather_{layout}.db")
+            for layout in (LAYOUT_ROWID, LAYOUT_WITHOUT_ROWID)
+        }
+        for path in db_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        gen_start: float = time.perf_counter()
+        seed_rows: int = generate_db(db_paths[LAYOUT_ROWID], param_years, args.devices)
+        # 移行先と同じく空き領域の無い状態でサイズを比較する
+        with sqlite3.connect(db_paths[LAYOUT_ROWID], isolation_level=None) as gen_conn:
+            gen_conn.execute("VACUUM")
+        gen_conn.close()
+        app_logger.info(f"generated: {seed_rows} rows, years={param_years}, "
+                        f"{time.perf_counter() - gen_start:.1f}s")
+        migrate_start: float = time.perf_counter()
+        migrate_without_rowid(db_paths[LAYOUT_ROWID], db_paths[LAYOUT_WITHOUT_ROWID])
+        app_logger.info(f"migrated: {time.perf_counter() - migrate_start:.1f}s")
+
+        for layout, db_path in db_paths.items():
+            conn: sqlite3.Connection = open_read_only(db_path)
+            try:
+                app_logger.info(f"[{layout}] without_rowid={is_without_rowid(conn)}, "
+                                f"size={os.path.getsize(db_path)}, "
+                                f"plan={query_plan(conn, device_name)}")
+                scans: Dict[str, Tuple[Callable[[str], int], List[str]]] = {
+                    "month": (lambda ym: scan_range(conn, device_name, f"{ym}-01",
+                                                    next_year_month(f"{ym}-01")),
+                              param_year_months),
+                    "year": (lambda y: scan_range(conn, device_name, f"{y}-01-01",
+                                                  f"{int(y) + 1}-01-01"),
+                             [str(year) for year in param_years]),
+                }
+                for scan_name, (fetch_func, periods) in scans.items():
+                    first_ms, median_ms, p90_ms = measure(
+                        {scan_name: fetch_func}, periods, args.repeat)[scan_name]
+                    app_logger.info(FMT_RESULT.format(layout, scan_name,
+                                                      first_ms, median_ms, p90_ms))
+            finally:
+                conn.close()
@@ -0,0 +1,236 @@
+import argparse
+import calendar
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from PlotWeatherCompPrevYear_sqlite3 import (
+    QUERY_RANGE_DATA, get_connection, get_dataframe, next_year_month
+)
+from plotter.sensor_validation import POLICY_OFF
+from plotter.sqlite_db import (
+    close_connections, connection_for_year_month, export_year_archive, get_shared_connection
+)
+
+"""
+SQLite3 の月間データ取得の処理時間を接続設定毎に比較するベンチマーク
+[比較設定]
+  (1) per-call: 取得毎に mode=ro で接続・クローズ (従来の get_connection)
+  (2) shared: 共有接続 (プリペアドステートメントキャッシュが有効) ※PRAGMA はデフォルト
+  (3) shared+pragmas: 共有接続 + mmap_size, cache_size, temp_store
+  (4) archive: 年単位のアーカイブファイルを immutable=1 で開いた共有接続 ※PRAGMA はデフォルト
+[計測対象]
+  raw: カーソルの execute + fetchall のみ ※接続・PRAGMA の差が DataFrame の生成に埋もれないように分けて計測する
+  dataframe: get_dataframe 全体 (read_sql, 日時列の変換を含む)
+[データ] 複数年分の合成データ (10分間隔) の weather.db を作業ディレクトリに生成する ※前年までの完了年
+[実行例] python BenchmarkSQLiteRead.py --years 5 --devices 2 --repeat 3
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# テーブル生成SQL
+SCHEMA_SQL: str = os.path.join("db", "sqlite3", "weather_db.sql")
+# 合成データのデバイス名
+FMT_SEED_DEVICE: str = "bench_{}"
+# 合成データの測定間隔 (秒)
+SEED_INTERVAL_SECONDS: int = 600
+# 日本時間のUTCからの時差 (秒)
+JST_OFFSET_SECONDS: int = 9 * 3600
+INSERT_DEVICE: str = "INSERT INTO t_device(name) VALUES (?)"
+INSERT_WEATHER: str = """
+INSERT INTO t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+# 結果出力フォーマット
+FMT_RESULT: str = "{:<13} {:<20} first={:>8.2f}ms median={:>8.2f}ms p90={:>8.2f}ms"
+# 計測対象
+TARGET_RAW: str = "raw"
+TARGET_DATAFRAME: str = "dataframe"
+
+
+def generate_db(db_path: str, years: List[int], devices: int,
+                schema_sql: str = SCHEMA_SQL) -> int:
+    """
+    合成データの気象データベースを生成する
+    :param db_path: データベースファイルパス
+    :param years: 合成データの年リスト
+    :param devices: デバイス数
+    :param schema_sql: テーブル生成SQLファイルパス
+    :return: 登録件数
+    """
+    rng: np.random.Generator = np.random.default_rng(0)
+    # 日本時間の最初の年の年初から最後の年の翌年の年初まで
+    start: int = calendar.timegm(date(years[0], 1, 1).timetuple()) - JST_OFFSET_SECONDS
+    end: int = calendar.timegm(date(years[-1] + 1, 1, 1).timetuple()) - JST_OFFSET_SECONDS
+    times: np.ndarray = np.arange(start, end, SEED_INTERVAL_SECONDS, dtype=np.int64)
+    # 年周期・日周期の外気温, 湿度, 気圧
+    days: np.ndarray = (times - start) / 86400.
+    conn: sqlite3.Connection = sqlite3.connect(db_path)
+    try:
+        with open(schema_sql, 'r') as fp:
+            conn.executescript(fp.read())
+        rows: int = 0
+        for dev_idx in range(devices):
+            cur = conn.execute(INSERT_DEVICE, (FMT_SEED_DEVICE.format(dev_idx + 1),))
+            did: int = cur.lastrowid
+            temp_out: np.ndarray = (10. - 12. * np.cos(2 * np.pi * days / 365.25)
+                                    - 4. * np.cos(2 * np.pi * days) + rng.normal(0, 0.5, times.size))
+            temp_in: np.ndarray = temp_out * 0.3 + 16.
+            humid: np.ndarray = np.clip(55. + rng.normal(0, 8., times.size), 0., 100.)
+            pressure: np.ndarray = (1010. + 8. * np.sin(2 * np.pi * days / 5.)
+                                    + rng.normal(0, 0.3, times.size))
+            records = zip([did] * times.size, times.tolist(),
+                          np.round(temp_out, 1).tolist(), np.round(temp_in, 1).tolist(),
+                          np.round(humid, 1).tolist(), np.round(pressure, 1).tolist())
+            conn.executemany(INSERT_WEATHER, records)
+            rows += times.size
+        conn.commit()
+        conn.execute("ANALYZE")
+        return rows
+    finally:
+        conn.close()
+
+
+def fetch_raw(conn: sqlite3.Connection, device_name: str, year_month: str) -> int:
+    """
+    月間データをカーソルで取得する (execute + fetchall のみ)
+    :param conn: SQLite3接続
+    :param device_name: デバイス名
+    :param year_month: 年月 "YYYY-MM"
+    :return: 取得件数
+    """
+    from_date: str = year_month + "-01"
+    cursor: sqlite3.Cursor = conn.execute(
+        QUERY_RANGE_DATA, (device_name, from_date, next_year_month(from_date)))
+    try:
+        return len(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def fetch_per_call(db_path: str, device_name: str, year_month: str, target: str) -> None:
+    """ 取得毎に接続・クローズする (従来の方法) """
+    conn: sqlite3.Connection = get_connection(db_path, read_only=True)
+    try:
+        fetch_target(conn, device_name, year_month, target)
+    finally:
+        conn.close()
+
+
+def fetch_target(conn: sqlite3.Connection, device_name: str, year_month: str,
+                 target: str) -> None:
+    """
+    計測対象の方法で月間データを取得する
+    :param conn: SQLite3接続
+    :param device_name: デバイス名
+    :param year_month: 年月 "YYYY-MM"
+    :param target: 計測対象 (TARGET_RAW: execute + fetchall, TARGET_DATAFRAME: get_dataframe)
+    """
+    if target == TARGET_RAW:
+        fetch_raw(conn, device_name, year_month)
+    else:
+        get_dataframe(conn, device_name, year_month, validation=POLICY_OFF)
+
+
+def measure(settings: Dict[str, Callable[[str], None]], year_months: List[str],
+            repeat: int) -> Dict[str, Tuple[float, float, float]]:
+    """
+    全年月の月間データ取得を繰り返し接続設定毎の処理時間を計測する\n
+    年月毎に全ての設定を交互に実行する ※計測中の負荷の変動が特定の設定に偏らないようにする
+    :param settings: 設定名をキーとする取得関数 (引数: 年月)
+    :param year_months: 年月リスト
+    :param repeat: 繰り返し回数
+    :return: 設定名をキーとする (初回の処理時間, 中央値, 90パーセンタイル) (ミリ秒)
+    """
+    elapsed: Dict[str, List[float]] = {setting: [] for setting in settings}
+    for _ in range(repeat):
+        for year_month in year_months:
+            for setting, fetch in settings.items():
+                start: float = time.perf_counter()
+                fetch(year_month)
+                elapsed[setting].append((time.perf_counter() - start) * 1000.)
+    return {
+        setting: (times[0], statistics.median(times), float(np.percentile(times, 90)))
+        for setting, times in elapsed.items()
+    }
+
+
+def to_year_months(years: List[int]) -> List[str]:
+    """
+    年リストの全年月を取得する
+    :param years: 年リスト
+    :return: 年月リスト "YYYY-MM"
+    """
+    year_months: List[str] = []
+    year_month: str = f"{years[0]}-01"
+    while int(year_month.split("-")[0]) <= years[-1]:
+        year_months.append(year_month)
+        year_month = next_year_month(year_month)
+    return year_months
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数 (前年までの完了年)
+    parser.add_argument("--years", type=int, default=3, help="合成データの年数 (デフォルト 3)")
+    # 合成データのデバイス数
+    parser.add_argument("--devices", type=int, default=2, help="合成デバイス数 (デフォルト 2)")
+    # 計測回数 (全年月の取得の繰り返し回数)
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数 (デフォルト 3)")
+    # 作業ディレクトリ ※未指定なら一時ディレクトリ (終了時に削除)
+    parser.add_argument("--work-dir", type=str, help="Directory for the generated databases.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.years < 1 or args.devices < 1 or args.repeat < 1:
+        app_logger.warning("--years, --devices and --repeat must be >= 1")
+        exit(1)
+
+    last_year: int = date.today().year - 1
+    param_years: List[int] = list(range(last_year - args.years + 1, last_year + 1))
+    param_year_months: List[str] = to_year_months(param_years)
+    device_name: str = FMT_SEED_DEVICE.format(1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir: str = args.work_dir if args.work_dir is not None else tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        # get_connection() は絶対パスのURIで接続する
+        db_path: str = os.path.abspath(os.path.join(work_dir, "weather.db"))
+        archive_dir: str = os.path.join(work_dir, "archive")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        gen_start: float = time.perf_counter()
+        seed_rows: int = generate_db(db_path, param_years, args.devices)
+        for year in param_years:
+            export_year_archive(db_path, archive_dir, year)
+        app_logger.info(f"generated: {seed_rows} rows, years={param_years}, "
+                        f"{time.perf_counter() - gen_start:.1f}s, size={os.path.getsize(db_path)}")
+
+        for target in (TARGET_RAW, TARGET_DATAFRAME):
+            settings: Dict[str, Callable[[str], None]] = {
+                "per-call": lambda ym: fetch_per_call(db_path, device_name, ym, target),
+                "shared": lambda ym: fetch_target(
+                    get_shared_connection(db_path), device_name, ym, target),
+                "shared+pragmas": lambda ym: fetch_target(
+                    get_shared_connection(db_path, tuned=True), device_name, ym, target),
+                "archive": lambda ym: fetch_target(
+                    connection_for_year_month(db_path, ym, archive_dir), device_name, ym, target),
+            }
+            results: Dict[str, Tuple[float, float, float]] = measure(
+                settings, param_year_months, args.repeat)
+            for setting, (first_ms, median_ms, p90_ms) in results.items():
+                app_logger.info(FMT_RESULT.format(target, setting, first_ms, median_ms, p90_ms))
+            # 計測対象毎に共有接続を作り直す (初回の接続・キャッシュの状態を揃える)
+            close_connections()
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import os
+import time
+from datetime import date
+
+from plotter.sqlite_db import export_year_archive
+
+"""
+SQLite3 の気象データベースから完了年の観測データのみを含む年単位のアーカイブファイルを作成する
+[出力] アーカイブディレクトリ/weather_YYYY.db
+  ※PlotWeatherCompPrevYear_sqlite3.py --archive-dir で指定すると該当年の読み込みに immutable=1 で使用する
+  ※アーカイブファイルは作成後に更新しないこと (観測データを修正した場合は再作成する)
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # SQLite3 データベースパス: ~/db/weather.db
+    parser.add_argument("--sqlite3-db", type=str, required=True,
+                        help="QLite3 データベースパス")
+    # アーカイブディレクトリ: ~/db/archive
+    parser.add_argument("--archive-dir", type=str, required=True,
+                        help="Directory of closed-year archives.")
+    # アーカイブする年 (前年以前の完了年)
+    parser.add_argument("--year", type=int, required=True, help="2022")
+    args: argparse.Namespace = parser.parse_args()
+    # データベースパス
+    db_path: str = os.path.expanduser(args.sqlite3_db)
+    if not os.path.exists(db_path):
+        app_logger.warning("database not found!")
+        exit(1)
+    # 当年は観測データが追加されるためアーカイブしない
+    if args.year >= date.today().year:
+        app_logger.warning("--year must be a closed year (before this year)")
+        exit(1)
+
+    try:
+        start: float = time.perf_counter()
+        path: str = export_year_archive(db_path, os.path.expanduser(args.archive_dir), args.year)
+        app_logger.info(f"archive: {path}, size={os.path.getsize(path)}, "
+                        f"{time.perf_counter() - start:.1f}s")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
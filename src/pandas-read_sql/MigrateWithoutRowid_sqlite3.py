@@ -0,0 +1,59 @@
+import argparse
+import logging
+import os
+import time
+
+import sqlite3
+
+from plotter.sqlite_db import is_without_rowid, migrate_without_rowid, open_read_only
+
+"""
+SQLite3 の気象データベースの t_weather を WITHOUT ROWID (主キー (did, measurement_time) 順に格納) の
+テーブルに移行したデータベースファイルを作成する
+[テーブル生成SQL] db/sqlite3/weather_db_without_rowid.sql
+  ※移行元のデータベースは変更しない (移行先を確認後にファイルを置き換える)
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 移行元の SQLite3 データベースパス: ~/db/weather.db
+    parser.add_argument("--sqlite3-db", type=str, required=True,
+                        help="QLite3 データベースパス")
+    # 移行先のデータベースパス: ~/db/weather_without_rowid.db ※既に存在する場合はエラー
+    parser.add_argument("--output", type=str, required=True,
+                        help="Path of the migrated database (must not exist).")
+    args: argparse.Namespace = parser.parse_args()
+    # データベースパス
+    db_path: str = os.path.expanduser(args.sqlite3_db)
+    if not os.path.exists(db_path):
+        app_logger.warning("database not found!")
+        exit(1)
+    out_path: str = os.path.expanduser(args.output)
+
+    try:
+        conn: sqlite3.Connection = open_read_only(db_path, tuned=False)
+        try:
+            already: bool = is_without_rowid(conn)
+        finally:
+            conn.close()
+        if already:
+            app_logger.warning("t_weather is already WITHOUT ROWID")
+            exit(1)
+
+        start: float = time.perf_counter()
+        rows: int = migrate_without_rowid(db_path, out_path)
+        app_logger.info(f"migrated: {rows} rows, {time.perf_counter() - start:.1f}s")
+        app_logger.info(f"size: {os.path.getsize(db_path)} -> {os.path.getsize(out_path)}")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
@@ -0,0 +1,228 @@
+import argparse
+import logging
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from PlotWeatherCompPrevYear_sqlite3 import get_dataframe, save_text
+from plotter.sqlite_db import get_shared_connection
+from plotter.plotterweather import (
+    COL_BAND_LOWER, COL_BAND_MEDIAN, COL_BAND_UPPER, gen_climatology_plot_image
+)
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.climate_sketch import SKETCH_BINS, ClimateSketch, day_of_year_index, sketch_path
+from plotter.month_cache import DEFAULT_CACHE_DIR
+from plotter.phase_timer import PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, span, start_timer
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, set_full_dump
+
+"""
+気象センサーデータの指定年月の観測データを通日毎の気候値 (過去の全観測データの分布) と比較したグラフをHTMLに出力する
+[Database] SQLite3
+[気候値] 観測項目毎の通日の分布スケッチ (plotter.climate_sketch) から 10%, 50%, 90% 点を求める
+  ※スケッチはデバイス毎に cache/ に保存し、前回の取り込み以降の観測データ (完了月のみ) を加算して更新する
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 出力画層用HTMLテンプレート
+OUT_HTML = """
+<!DOCTYPE html>
+<html lang="ja">
+<body>
+<img src="{}"/>
+</body>
+</html>
+"""
+
+# インデックス
+COL_TIME: str = "measurement_time"
+# 測定時刻 (unix timestamp) 列
+COL_EPOCH: str = "epoch"
+# バンドの確率 (下限, 中央値, 上限)
+BAND_PROBS: List[float] = [0.1, 0.5, 0.9]
+# スケッチ更新時のクエリー結果の読み込み行数
+SKETCH_CHUNK_ROWS: int = 50000
+# バンドのプロット時刻 (各日の正午)
+BAND_HOUR_OFFSET: pd.Timedelta = pd.Timedelta(hours=12)
+
+# 前回の取り込み以降の観測データを取得するSQL (SQLite3専用)
+#  取り込み済みの最終測定時刻 (unix timestamp) より後, 指定日 (当月1日) より前
+QUERY_SKETCH_DATA: str = """
+SELECT
+   measurement_time as epoch
+   ,datetime(measurement_time, 'unixepoch', 'localtime') as measurement_time
+   ,temp_out, humid, pressure
+FROM
+   t_weather
+WHERE
+   did=(SELECT id FROM t_device WHERE name=:deviceName)
+   AND measurement_time > :watermark
+   AND measurement_time < CAST(strftime('%s', :toDate, '-9 hours') AS INTEGER)
+ORDER BY measurement_time;
+"""
+
+
+def update_sketch(connection: sqlite3.Connection, sketch: ClimateSketch,
+                  device_name: str, to_date: str,
+                  logger: Optional[logging.Logger] = None) -> int:
+    """
+    前回の取り込み以降の観測データをスケッチに加算する ※クエリー結果は分割して読み込む
+
+    不正値 (範囲外の値・スパイク) は除く
+    :param connection: SQLite3接続
+    :param sketch: スケッチ
+    :param device_name: デバイス名
+    :param to_date: 取り込み範囲の終了日 (この日を含まない) "YYYY-MM-DD"
+    :param logger: application logger
+    :return: 加算した行数
+    """
+    query_params: Dict = {
+        'deviceName': device_name, 'watermark': sketch.watermark, 'toDate': to_date
+    }
+    if logger is not None:
+        logger.info(f"query_params: {query_params}")
+    rows: int = 0
+    with span(PHASE_QUERY) as sp:
+        for chunk in pd.read_sql(QUERY_SKETCH_DATA, connection, params=query_params,
+                                 parse_dates=[COL_TIME], chunksize=SKETCH_CHUNK_ROWS):
+            if chunk.shape[0] == 0:
+                continue
+            # 不正値は NaN にしてスケッチに加算しない
+            chunk, _ = validate_readings(chunk, POLICY_MASK)
+            sketch.update(day_of_year_index(chunk[COL_TIME].to_numpy()), chunk)
+            sketch.watermark = int(chunk[COL_EPOCH].iloc[-1])
+            rows += chunk.shape[0]
+        sp.rows = rows
+    return rows
+
+
+def make_bands(sketch: ClimateSketch, year_month: str) -> Dict[str, DataFrame]:
+    """
+    指定年月の各日の気候値の分位点バンドを生成する
+    :param sketch: スケッチ
+    :param year_month: 年月 "YYYY-MM"
+    :return: 観測項目列名をキーとする分位点バンドのDataFrame (測定時刻, 下限, 中央値, 上限列)
+    """
+    days: pd.DatetimeIndex = pd.date_range(
+        f"{year_month}-01", periods=pd.Period(year_month).days_in_month, freq="D")
+    doy: np.ndarray = day_of_year_index(days.to_numpy())
+    bands: Dict[str, DataFrame] = {}
+    for col_name in SKETCH_BINS:
+        values: np.ndarray = sketch.quantiles(col_name, BAND_PROBS)[doy]
+        bands[col_name] = pd.DataFrame({
+            COL_TIME: days + BAND_HOUR_OFFSET,
+            COL_BAND_LOWER: values[:, 0],
+            COL_BAND_MEDIAN: values[:, 1],
+            COL_BAND_UPPER: values[:, 2],
+        })
+    return bands
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # SQLite3 データベースパス: ~/db/weather.db
+    parser.add_argument("--sqlite3-db", type=str, required=True,
+                        help="QLite3 データベースパス")
+    # デバイス名: esp8266_1
+    parser.add_argument("--device-name", type=str, required=True,
+                        help="device name in t_device.")
+    # 検索年月
+    parser.add_argument("--year-month", type=str, required=True,
+                        help="2023-04")
+    # 保存済みのスケッチを破棄して全観測データから再作成する
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the climatology sketch from all rows.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32 で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
+    args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
+    # データベースパス
+    db_path: str = os.path.expanduser(args.sqlite3_db)
+    if not os.path.exists(db_path):
+        app_logger.warning("database not found!")
+        exit(1)
+
+    # 検索年月
+    param_year_month = args.year_month
+    # スケッチファイル
+    path_sketch: str = sketch_path(DEFAULT_CACHE_DIR, os.path.abspath(db_path), args.device_name)
+
+    try:
+        # 共有の読み込み専用接続 ※終了時に自動でクローズする
+        with span(PHASE_CONNECT):
+            conn: sqlite3.Connection = get_shared_connection(db_path)
+        app_logger.info(f"connection: {conn}")
+        sketch: Optional[ClimateSketch] = None if args.rebuild else ClimateSketch.load(path_sketch)
+        if sketch is None:
+            sketch = ClimateSketch()
+        # 完了月 (当月1日より前) の観測データを取り込む
+        added: int = update_sketch(conn, sketch, args.device_name,
+                                   date.today().replace(day=1).isoformat(), logger=app_logger)
+        app_logger.info(f"sketch: added={added}, watermark={sketch.watermark}")
+        if added > 0:
+            sketch.save(path_sketch)
+
+        df_curr: DataFrame = get_dataframe(conn, args.device_name, param_year_month,
+                                           logger=app_logger, validation=args.validate,
+                                           compact=args.compact_dtypes)
+        with span(PHASE_TRANSFORM):
+            bands: Dict[str, DataFrame] = make_bands(sketch, param_year_month)
+        for col_name, df_band in bands.items():
+            app_logger.debug(frame_summary(df_band, f"band.{col_name}"))
+
+        if df_curr.shape[0] > 0 and bands[next(iter(SKETCH_BINS))][COL_BAND_MEDIAN].notna().any():
+            img_src: str = gen_climatology_plot_image(
+                df_curr, bands, param_year_month, BAND_PROBS, logger=app_logger,
+                fixed_layout=args.fixed_layout, gap_threshold=gap_threshold(args.gap_minutes))
+            # プロット結果をPNG形式でファイル保存
+            script_names: List[str] = script_name.split(".")
+            save_name = f"{script_names[0]}.html"
+            save_path = os.path.join("output", save_name)
+            app_logger.info(save_path)
+            html: str = OUT_HTML.format(img_src)
+            save_text(save_path, html)
+        else:
+            app_logger.warning("該当レコードなし")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
@@ -0,0 +1,225 @@
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from sqlalchemy.engine import Connection, Engine
+
+from plotter.db_engine import get_engine
+from plotter.plotterweather import gen_devices_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.frame_dtype import compact_frame
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.phase_timer import (
+    PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, PHASE_WRITE, span, start_timer, timed
+)
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, set_full_dump
+
+"""
+複数の気象センサーデバイスの同一年月の観測データを重ねたグラフをHTMLに出力する
+[Database] PostgreSQL
+[Database library] SQLAlchemy (pip install sqlalchemy)
+[取得] 全デバイスの観測データを1回のクエリー (デバイスIDのIN条件) で取得し、メモリ上でデバイス毎に分割する
+       ※クエリー回数はデバイス数によらず1回
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 気象センサーデータベース接続情報
+DB_CONF: str = os.path.join("conf", "db_sensors.json")
+
+# 出力画層用HTMLテンプレート
+OUT_HTML = """
+<!DOCTYPE html>
+<html lang="ja">
+<body>
+<img src="{}"/>
+</body>
+</html>
+"""
+
+# インデックス
+COL_TIME: str = "measurement_time"
+# デバイス名列
+COL_DEVICE_NAME: str = "device_name"
+
+# 複数の気象センサーデバイス名と期間から気象観測データを取得するSQL (SQLAlchemy用)
+#  デバイス名のタプルは psycopg2 で (name1, name2, ...) に展開される
+#  デバイス毎の分割用にデバイス名・測定時刻順でソートする
+QUERY_DEVICES_RANGE_DATA: str = """
+SELECT
+   dev.name AS device_name, measurement_time, temp_out, humid, pressure
+FROM
+   weather.t_weather wt
+   INNER JOIN weather.t_device dev ON wt.did = dev.id
+WHERE
+   wt.did IN (SELECT id FROM weather.t_device WHERE name IN %(deviceNames)s)
+   AND (
+      measurement_time >= %(fromDate)s
+      AND
+      measurement_time < %(toDate)s
+   )
+ORDER BY dev.name, measurement_time;
+"""
+
+
+def next_year_month(s_year_month: str) -> str:
+    """
+    年月文字列の次の月を計算する
+    :param s_year_month: 年月文字列 "YYYY-MM-DD"
+    :return: 翌年月日
+    """
+    year, month, day = [int(part) for part in s_year_month.split('-')]
+    month += 1
+    if month > 12:
+        year += 1
+        month = 1
+    return f"{year:04}-{month:02}-{day:02}"
+
+
+@timed(PHASE_WRITE)
+def save_text(file, contents):
+    with open(file, 'w') as fp:
+        fp.write(contents)
+
+
+def get_devices_dataframe(db_engine: Engine,
+                          device_names: List[str], year_month: str,
+                          logger: Optional[logging.Logger] = None,
+                          compact: bool = False) -> DataFrame:
+    """
+    複数デバイスの指定年月の観測データを1回のクエリーで取得する
+    :param db_engine: 共有エンジン
+    :param device_names: デバイス名リスト
+    :param year_month: 年月 (形式: "%Y-%m")
+    :param logger: application logger
+    :param compact: True なら観測値列を float32, デバイス名列を category に変換する
+    :return: 全デバイスの観測データ (デバイス名列付き)
+    """
+    from_date: str = year_month + "-01"
+    query_params: Dict = {
+        'deviceNames': tuple(device_names),
+        'fromDate': from_date, 'toDate': next_year_month(from_date)
+    }
+    if logger is not None:
+        logger.info(f"query_params: {query_params}")
+    with span(PHASE_CONNECT):
+        conn: Connection = db_engine.connect()
+    with conn, span(PHASE_QUERY) as sp:
+        df: DataFrame = pd.read_sql(
+            QUERY_DEVICES_RANGE_DATA, conn,
+            params=query_params,
+            parse_dates=[COL_TIME]
+        )
+        sp.rows = df.shape[0]
+    if compact:
+        df = compact_frame(df, logger=logger, name=year_month)
+    if logger is not None:
+        logger.info(frame_summary(df, "df"))
+    return df
+
+
+def split_by_device(df: DataFrame, device_names: List[str]) -> Dict[str, DataFrame]:
+    """
+    全デバイスの観測データをデバイス毎に分割する ※データの無いデバイスは含まない
+    :param df: 全デバイスの観測データ (デバイス名列付き)
+    :param device_names: デバイス名リスト (出力順)
+    :return: デバイス名をキーとする観測データ (指定順)
+    """
+    groups: Dict[str, DataFrame] = {
+        name: group.drop(columns=COL_DEVICE_NAME).reset_index(drop=True)
+        for name, group in df.groupby(COL_DEVICE_NAME, sort=False)
+    }
+    return {name: groups[name] for name in device_names if name in groups}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # デバイス名 (複数): esp8266_1 esp8266_2
+    parser.add_argument("--device-names", type=str, nargs="+", required=True,
+                        help="device names in t_device.")
+    # 検索年月
+    parser.add_argument("--year-month", type=str, required=True,
+                        help="2023-04")
+    # データベースサーバーのホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32, デバイス名列を category で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
+    args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month,
+                devices=len(args.device_names))
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger,
+                      year_month=args.year_month, devices=len(args.device_names))
+    set_full_dump(args.debug_dump)
+    # デバイス名 (重複は除く)
+    param_device_names: List[str] = list(dict.fromkeys(args.device_names))
+    # 検索年月
+    param_year_month = args.year_month
+
+    try:
+        # 共有エンジン (接続プール)
+        db_engine: Engine = get_engine(DB_CONF, hostname=args.db_host)
+        df_all: DataFrame = get_devices_dataframe(
+            db_engine, param_device_names, param_year_month, logger=app_logger,
+            compact=args.compact_dtypes)
+        with span(PHASE_TRANSFORM, rows=df_all.shape[0]):
+            device_dfs: Dict[str, DataFrame] = split_by_device(df_all, param_device_names)
+            # デバイス毎に不正値を処理する
+            device_dfs = {
+                name: validate_readings(df, args.validate, logger=app_logger)[0]
+                for name, df in device_dfs.items()
+            }
+        for name in param_device_names:
+            if name not in device_dfs:
+                app_logger.warning(f"該当レコードなし: {name}")
+
+        if len(device_dfs) > 0:
+            img_src: str = gen_devices_plot_image(
+                device_dfs, param_year_month, logger=app_logger,
+                fixed_layout=args.fixed_layout, gap_threshold=gap_threshold(args.gap_minutes))
+            # プロット結果をPNG形式でファイル保存
+            script_names: List[str] = script_name.split(".")
+            save_name = f"{script_names[0]}.html"
+            save_path = os.path.join("output", save_name)
+            app_logger.info(save_path)
+            html: str = OUT_HTML.format(img_src)
+            save_text(save_path, html)
+        else:
+            app_logger.warning("該当レコードなし")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
@@ -1,17 +1,28 @@
 import argparse
-import json
 import logging
 import os
-import socket
 from io import StringIO
 from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 from pandas.core.frame import DataFrame
 import psycopg2
-from psycopg2.extensions import connection
+from sqlalchemy.pool import PoolProxiedConnection
 
+from plotter.db_engine import raw_connection
 from plotter.plotterweather import gen_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.frame_dtype import compact_frame
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.phase_timer import (
+    PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, PHASE_WRITE, span, start_timer, timed
+)
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, set_full_dump
+from plotter.resolution import (
+    AGGREGATE_COLUMNS, FMT_PG_BUCKET_TIME, RESOLUTION_CHOICES, RESOLUTION_RAW, bucket_seconds
+)
 
 """
 気象センサーデータの前年対比グラフをHTMLに出力する
@@ -27,7 +38,7 @@ script_name = os.path.basename(__file__)
 LOG_FMT = '%(levelname)s %(message)s'
 
 # 気象センサーデータベース接続情報
-DB_CONF: str = os.path.join("conf", "db_sensors_psycopg.json")
+DB_CONF: str = os.path.join("conf", "db_sensors.json")
 
 # 出力画層用HTMLテンプレート
 OUT_HTML = """
@@ -39,12 +50,8 @@ OUT_HTML = """
 </html>
 """
 
-# 取得カラム: 測定時刻,外気温,湿度,気圧
+# インデックス ※取得カラム名はカーソルの列情報から取得する
 COL_TIME: str = "measurement_time"
-COL_TEMP_OUT: str = "temp_out"
-COL_HUMID: str = "humid"
-COL_PRESSURE: str = "pressure"
-HEADER_WEATHER: str = f'"{COL_TIME}","{COL_TEMP_OUT}","{COL_HUMID}","{COL_PRESSURE}"'
 
 # 気象センサーデバイス名と期間から気象観測データを取得するSQL (PostgreSQL固有関数使用)
 QUERY_RANGE_DATA: str = """
@@ -62,6 +69,25 @@ WHERE
 ORDER BY measurement_time;
 """
 
+# 気象センサーデバイス名と期間から集計間隔毎の平均値・最小値・最大値を取得するSQL (PostgreSQL固有関数使用)
+#  measurement_time の epoch を集計間隔 (秒) で切り捨てて集計する (--resolution)
+QUERY_RANGE_BUCKET_DATA: str = f"""
+SELECT
+   {FMT_PG_BUCKET_TIME.format(seconds="%(bucketSeconds)s")} AS measurement_time
+   ,{AGGREGATE_COLUMNS}
+FROM
+   weather.t_weather
+WHERE
+   did=(SELECT id FROM weather.t_device WHERE name=%(deviceName)s)
+   AND (
+     measurement_time >= %(fromDate)s
+     AND
+     measurement_time < %(toDate)s
+   )
+GROUP BY 1
+ORDER BY 1;
+"""
+
 
 def next_year_month(s_year_month: str) -> str:
     """
@@ -100,6 +126,7 @@ def previous_year_month(s_year_month: str) -> str:
     return f"{prev_year}-{s_month}"
 
 
+@timed(PHASE_WRITE)
 def save_text(file, contents):
     with open(file, 'w') as fp:
         fp.write(contents)
@@ -108,15 +135,9 @@ def save_text(file, contents):
 class PgDatabase(object):
     def __init__(self, conf_path: str, hostname: str = None, logger: logging.Logger = None):
         self.logger = logger
-        with open(conf_path, 'r') as fp:
-            db_conf = json.load(fp)
-            if hostname is None:
-                hostname = socket.gethostname()
-            db_conf["host"] = db_conf["host"].format(hostname=hostname)
+        # 共有エンジンの接続プールから psycopg2 の接続を取得する ※close() でプールに返却
         # default connection is itarable curosr
-        self.conn = psycopg2.connect(**db_conf)
-        # Dictinaly-like cursor connection.
-        # self.conn = psycopg2.connect(**dbconf, cursor_factory=psycopg2.extras.DictCursor)
+        self.conn: PoolProxiedConnection = raw_connection(conf_path, hostname=hostname)
         if self.logger is not None:
             self.logger.debug(self.conn)
 
@@ -131,9 +152,11 @@ class PgDatabase(object):
 
 
 class WeatherDao:
-    def __init__(self, conn: connection, logger: Optional[logging.Logger] = None):
+    def __init__(self, conn: PoolProxiedConnection, logger: Optional[logging.Logger] = None,
+                 resolution: str = RESOLUTION_RAW):
         self.conn = conn
         self.logger = logger
+        self.resolution = resolution
 
     def getMonthData(self,
                      device_name: str,
@@ -144,25 +167,32 @@ class WeatherDao:
         query_params: Dict = {
             'deviceName': device_name, 'fromDate': from_date, 'toDate': exclude_to_date
         }
-        with self.conn.cursor() as cursor:
-            cursor.execute(QUERY_RANGE_DATA, query_params)
+        query: str = QUERY_RANGE_DATA
+        if self.resolution != RESOLUTION_RAW:
+            query = QUERY_RANGE_BUCKET_DATA
+            query_params['bucketSeconds'] = bucket_seconds(self.resolution)
+        with self.conn.cursor() as cursor, span(PHASE_QUERY) as sp:
+            cursor.execute(query, query_params)
             tuple_list = cursor.fetchall()
+            # 取得カラム: 測定時刻,外気温,湿度,気圧 (集計時は各最小値・最大値を含む)
+            columns: List[str] = [desc[0] for desc in cursor.description]
             record_count: int = len(tuple_list)
+            sp.rows = record_count
             if self.logger is not None:
                 self.logger.debug(f"tuple_list.size {record_count}")
 
         if record_count == 0:
             return 0, None
-        return record_count, _csv_to_stringio(tuple_list)
+        return record_count, _csv_to_stringio(columns, tuple_list)
 
 
-def _csv_to_stringio(tuple_list: List[Tuple[str, float, float, float]]) -> StringIO:
+def _csv_to_stringio(columns: List[str], tuple_list: List[Tuple]) -> StringIO:
     str_buffer = StringIO()
     # ヘッダー出力
-    str_buffer.write(HEADER_WEATHER + "\n")
-    # レコード出力
-    for (m_time, temp_out, humid, pressure) in tuple_list:
-        line = f'"{m_time}",{temp_out},{humid},{pressure}\n'
+    str_buffer.write(",".join(f'"{col}"' for col in columns) + "\n")
+    # レコード出力: 測定時刻, 観測値...
+    for (m_time, *values) in tuple_list:
+        line = f'"{m_time}",' + ",".join(str(val) for val in values) + "\n"
         str_buffer.write(line)
 
     # StringIO need Set first position
@@ -172,7 +202,9 @@ def _csv_to_stringio(tuple_list: List[Tuple[str, float, float, float]]) -> Strin
 
 def get_dataframe(dao: WeatherDao,
                   device_name: str, year_month: str,
-                  logger: Optional[logging.Logger] = None) -> Optional[pd.DataFrame]:
+                  logger: Optional[logging.Logger] = None,
+                  validation: str = POLICY_MASK,
+                  compact: bool = False) -> Optional[pd.DataFrame]:
     record_count: int
     csv_buffer: StringIO
     record_count, csv_buffer = dao.getMonthData(device_name, year_month)
@@ -182,26 +214,33 @@ def get_dataframe(dao: WeatherDao,
     if record_count == 0:
         return None
 
-    df: DataFrame = pd.read_csv(
-        csv_buffer,
-        header=0,
-        parse_dates=[COL_TIME],
-        names=[COL_TIME, COL_TEMP_OUT, COL_HUMID, COL_PRESSURE]
-    )
+    with span(PHASE_TRANSFORM, rows=record_count):
+        df: DataFrame = pd.read_csv(
+            csv_buffer,
+            header=0,
+            parse_dates=[COL_TIME]
+        )
+        if compact:
+            df = compact_frame(df, logger=logger, name=year_month)
+        df, _ = validate_readings(df, validation, logger=logger)
     if logger is not None:
-        logger.info(f"{df}")
+        logger.info(frame_summary(df, "df"))
     return df
 
 
-def get_all_df(conn: connection,
+def get_all_df(conn: PoolProxiedConnection,
                device_name: str, curr_year_month,
-               logger: Optional[logging.Logger] = None
+               logger: Optional[logging.Logger] = None,
+               resolution: str = RESOLUTION_RAW,
+               validation: str = POLICY_MASK,
+               compact: bool = False
                ) -> Tuple[Optional[DataFrame], Optional[DataFrame], Optional[str]]:
-    dao = WeatherDao(conn, logger=logger)
+    dao = WeatherDao(conn, logger=logger, resolution=resolution)
     try:
         # 今年の年月テータ取得
         df_curr: Optional[pd.DataFrame] = get_dataframe(
-            dao, device_name, curr_year_month, logger=logger)
+            dao, device_name, curr_year_month, logger=logger, validation=validation,
+            compact=compact)
         if df_curr is None:
             return None, None, None
 
@@ -209,7 +248,8 @@ def get_all_df(conn: connection,
         # 前年計算
         prev_ym: str = previous_year_month(curr_year_month)
         df_prev: Optional[DataFrame] = get_dataframe(
-            dao, device_name, prev_ym, logger=logger)
+            dao, device_name, prev_ym, logger=logger, validation=validation,
+            compact=compact)
         return df_curr, df_prev, prev_ym
     except Exception as err:
         logger.warning(err)
@@ -228,9 +268,40 @@ if __name__ == '__main__':
     # 最新の検索年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="2023-04")
+    # 集計間隔 (raw: 集計なし) ※集計時は平均値・最小値・最大値を取得する
+    parser.add_argument("--resolution", type=str, choices=RESOLUTION_CHOICES,
+                        default=RESOLUTION_RAW, help="Bucket size aggregated in SQL.")
     # データベースサーバーのホスト名 ※任意 (例) raspi-4
     parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32, ラベル列を category で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month,
+                resolution=args.resolution)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
     # デバイス名
     param_device_name: str = args.device_name
     # 比較最新年月
@@ -239,17 +310,21 @@ if __name__ == '__main__':
     # database
     db: Optional[PgDatabase] = None
     try:
-        db = PgDatabase(DB_CONF, args.db_host, logger=app_logger)
-        db_conn: connection = db.get_connection()
+        with span(PHASE_CONNECT):
+            db = PgDatabase(DB_CONF, args.db_host, logger=app_logger)
+        db_conn: PoolProxiedConnection = db.get_connection()
         curr_df: Optional[DataFrame]
         prev_df: Optional[DataFrame]
         prev_year_month: Optional[str]
         curr_df, prev_df, prev_year_month = get_all_df(
-            db_conn, args.device_name, param_year_month, logger=app_logger)
+            db_conn, args.device_name, param_year_month, logger=app_logger,
+            resolution=args.resolution, validation=args.validate, compact=args.compact_dtypes)
 
         if curr_df is not None and prev_df is not None:
             img_src: str = gen_plot_image(
-                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger)
+                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger,
+                fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, bucket_seconds(args.resolution)))
             # プロット結果をPNG形式でファイル保存
             script_names: List[str] = script_name.split(".")
             save_name = f"{script_names[0]}.html"
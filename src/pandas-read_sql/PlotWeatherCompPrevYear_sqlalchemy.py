@@ -1,20 +1,29 @@
 import argparse
-import json
 import logging
 import os
-import socket
 from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 from pandas.core.frame import DataFrame
 
 import sqlalchemy.orm.scoping as scoping
-from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
-from sqlalchemy.engine.url import URL
 from sqlalchemy.orm import scoped_session, sessionmaker
 
+from plotter.db_engine import get_engine
 from plotter.plotterweather import gen_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.frame_dtype import compact_frame
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.phase_timer import (
+    PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, PHASE_WRITE, span, start_timer, timed
+)
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, set_full_dump
+from plotter.resolution import (
+    AGGREGATE_COLUMNS, FMT_PG_BUCKET_TIME, RESOLUTION_CHOICES, RESOLUTION_RAW, bucket_seconds
+)
 
 """
 気象センサーデータの前年対比グラフをHTMLに出力する 
@@ -61,6 +70,25 @@ WHERE
 ORDER BY measurement_time;
 """
 
+# 気象センサーデバイス名と期間から集計間隔毎の平均値・最小値・最大値を取得するSQL (PostgreSQL)
+#  measurement_time の epoch を集計間隔 (秒) で切り捨てて集計する (--resolution)
+QUERY_RANGE_BUCKET_DATA: str = f"""
+SELECT
+   {FMT_PG_BUCKET_TIME.format(seconds="%(bucketSeconds)s")} AS measurement_time
+   ,{AGGREGATE_COLUMNS}
+FROM
+   weather.t_weather
+WHERE
+   did=(SELECT id FROM weather.t_device WHERE name=%(deviceName)s)
+   AND (
+      measurement_time >= %(fromDate)s
+      AND
+      measurement_time < %(toDate)s
+   )
+GROUP BY 1
+ORDER BY 1;
+"""
+
 
 def next_year_month(s_year_month: str) -> str:
     """
@@ -99,46 +127,45 @@ def previous_year_month(s_year_month: str) -> str:
     return f"{prev_year}-{s_month}"
 
 
+@timed(PHASE_WRITE)
 def save_text(file, contents):
     with open(file, 'w') as fp:
         fp.write(contents)
 
 
-def get_engine_url(conf_path: str, hostname: str = None) -> URL:
-    """
-    SQLAlchemyの接続URLを取得する
-    :param conf_path: 接続設定ファイルパス (JSON形式)
-    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
-    :return: SQLAlchemyのURL用辞書オブジェクトDB_HEALTHCARE_CONF
-    """
-    with open(conf_path, 'r') as fp:
-        db_conf: json = json.load(fp)
-        if hostname is None:
-            hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return URL.create(**db_conf)
-
-
 def get_dataframe(scoped_sess: scoped_session,
                   device_name: str, year_month: str,
-                  logger: Optional[logging.Logger] = None) -> DataFrame:
+                  logger: Optional[logging.Logger] = None,
+                  resolution: str = RESOLUTION_RAW,
+                  validation: str = POLICY_MASK,
+                  compact: bool = False) -> DataFrame:
     from_date: str = year_month + "-01"
     exclude_to_date = next_year_month(from_date)
     query_params: Dict = {
         'deviceName': device_name, 'fromDate': from_date, 'toDate': exclude_to_date
     }
+    query: str = QUERY_RANGE_DATA
+    if resolution != RESOLUTION_RAW:
+        query = QUERY_RANGE_BUCKET_DATA
+        query_params['bucketSeconds'] = bucket_seconds(resolution)
     if logger is not None:
         logger.info(f"query_params: {query_params}")
     try:
-        with scoped_sess.connection() as conn:
+        with span(PHASE_CONNECT):
+            conn = scoped_sess.connection()
+        with conn, span(PHASE_QUERY) as sp:
             df: pd.DataFrame = pd.read_sql(
-                QUERY_RANGE_DATA, conn,
+                query, conn,
                 params=query_params,
                 parse_dates=[COL_TIME]
             )
+            sp.rows = df.shape[0]
+        with span(PHASE_TRANSFORM):
+            if compact:
+                df = compact_frame(df, logger=logger, name=year_month)
+            df, _ = validate_readings(df, validation, logger=logger)
         if logger is not None:
-            logger.info(f"{df}")
+            logger.info(frame_summary(df, "df"))
         return df
     finally:
         scoped_sess.close()
@@ -146,7 +173,10 @@ def get_dataframe(scoped_sess: scoped_session,
 
 def get_all_df(cls_sess: scoping.scoped_session,
                device_name: str, curr_year_month: str,
-               logger: Optional[logging.Logger] = None
+               logger: Optional[logging.Logger] = None,
+               resolution: str = RESOLUTION_RAW,
+               validation: str = POLICY_MASK,
+               compact: bool = False
                ) -> Tuple[Optional[DataFrame], Optional[DataFrame], Optional[str]]:
     sess: scoped_session = cls_sess()
     if logger is not None:
@@ -156,14 +186,16 @@ def get_all_df(cls_sess: scoping.scoped_session,
     df_prev: Optional[DataFrame]
     try:
         # 今年の年月テータ取得
-        df_curr = get_dataframe(sess, device_name, curr_year_month, logger=logger)
+        df_curr = get_dataframe(sess, device_name, curr_year_month, logger=logger,
+                                resolution=resolution, validation=validation, compact=compact)
         if df_curr is not None and df_curr.shape[0] == 0:
             return None, None, curr_year_month
 
         # 前年の年月テータ取得
         # 前年計算
         prev_ym: str = previous_year_month(curr_year_month)
-        df_prev = get_dataframe(sess, device_name, prev_ym, logger=logger)
+        df_prev = get_dataframe(sess, device_name, prev_ym, logger=logger,
+                                resolution=resolution, validation=validation, compact=compact)
         return df_curr, df_prev, prev_ym
     finally:
         cls_sess.remove()
@@ -181,21 +213,49 @@ if __name__ == '__main__':
     # 最新の検索年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="2023-04")
+    # 集計間隔 (raw: 集計なし) ※集計時は平均値・最小値・最大値を取得する
+    parser.add_argument("--resolution", type=str, choices=RESOLUTION_CHOICES,
+                        default=RESOLUTION_RAW, help="Bucket size aggregated in SQL.")
     # データベースサーバーのホスト名 ※任意 (例) raspi-4
     parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32, ラベル列を category で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month,
+                resolution=args.resolution)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
     # デバイス名
     param_device_name: str = args.device_name
     # 比較最新年月
     param_year_month = args.year_month
 
-    # データベース接続URL生成
-    connUrl: URL = get_engine_url(DB_CONF, args.db_host)
-    app_logger.info(f"connUrl: {connUrl}")
     Cls_sess: Optional[scoping.scoped_session] = None
     try:
-        # SQLAlchemyデータベースエンジン
-        db_engine: Engine = create_engine(connUrl, echo=False)
+        # 共有エンジン (接続プール)
+        db_engine: Engine = get_engine(DB_CONF, hostname=args.db_host)
         eng_autocommit = db_engine.execution_options(isolation_level="AUTOCOMMIT")
         app_logger.info(f"db_engine: {db_engine}")
 
@@ -210,11 +270,14 @@ if __name__ == '__main__':
         prev_df: Optional[DataFrame]
         prev_year_month: Optional[str]
         curr_df, prev_df, prev_year_month = get_all_df(
-            Cls_sess, args.device_name, param_year_month, logger=app_logger)
+            Cls_sess, args.device_name, param_year_month, logger=app_logger,
+            resolution=args.resolution, validation=args.validate, compact=args.compact_dtypes)
 
         if curr_df is not None and prev_df is not None:
             img_src: str = gen_plot_image(
-                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger)
+                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger,
+                fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, bucket_seconds(args.resolution)))
             # プロット結果をPNG形式でファイル保存
             script_names: List[str] = script_name.split(".")
             save_name = f"{script_names[0]}.html"
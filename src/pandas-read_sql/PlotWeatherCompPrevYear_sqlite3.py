@@ -1,7 +1,7 @@
 import argparse
 import logging
 import os
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import sqlite3
 from sqlite3 import Error
@@ -10,6 +10,20 @@ import pandas as pd
 from pandas.core.frame import DataFrame
 
 from plotter.plotterweather_flat import gen_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.sqlite_db import connection_for_year_month
+from plotter.frame_dtype import compact_frame
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.phase_timer import (
+    PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, PHASE_WRITE, span, start_timer, timed
+)
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, set_full_dump
+from plotter.resolution import (
+    AGGREGATE_COLUMNS, FMT_SQLITE_BUCKET_EPOCH, JST_OFFSET_SECONDS, RESOLUTION_CHOICES,
+    RESOLUTION_RAW, bucket_seconds
+)
 
 """
 気象センサーデータの前年対比グラフをHTMLに出力する 
@@ -101,6 +115,28 @@ WHERE
 ORDER BY measurement_time;
 """
 
+# 気象センサーデバイス名と期間から集計間隔毎の平均値・最小値・最大値を取得するSQL (SQLite3専用)
+#  measurement_time (unix timestamp) を集計間隔で整数除算して集計する (--resolution)
+#  ※日単位の集計は日本時間の0時に揃える (tzOffset: 9時間)
+#  ※名前付きパラメータ (named: :name) は sqlite3 で使用可能
+_BUCKET_EPOCH: str = FMT_SQLITE_BUCKET_EPOCH.format(seconds=":bucketSeconds", offset=":tzOffset")
+QUERY_RANGE_BUCKET_DATA: str = f"""
+SELECT
+   datetime({_BUCKET_EPOCH}, 'unixepoch', 'localtime') as measurement_time
+   ,{AGGREGATE_COLUMNS}
+FROM
+   t_weather
+WHERE
+   did=(SELECT id FROM t_device WHERE name=:deviceName)
+   AND (
+      measurement_time >= strftime('%s', :fromDate ,'-9 hours')
+      AND
+      measurement_time < strftime('%s', :toDate ,'-9 hours')
+   )
+GROUP BY {_BUCKET_EPOCH}
+ORDER BY 1;
+"""
+
 
 def next_year_month(s_year_month: str) -> str:
     """
@@ -139,6 +175,7 @@ def previous_year_month(s_year_month: str) -> str:
     return f"{prev_year}-{s_month}"
 
 
+@timed(PHASE_WRITE)
 def save_text(file, contents):
     with open(file, 'w') as fp:
         fp.write(contents)
@@ -163,38 +200,68 @@ def get_connection(db_file_path,
 
 def get_dataframe(connection: sqlite3.Connection,
                   device_name: str, year_month: str,
-                  logger: Optional[logging.Logger] = None) -> DataFrame:
+                  logger: Optional[logging.Logger] = None,
+                  resolution: str = RESOLUTION_RAW,
+                  validation: str = POLICY_MASK,
+                  compact: bool = False) -> DataFrame:
     from_date: str = year_month + "-01"
     exclude_to_date: str = next_year_month(from_date)
     # https://pandas.pydata.org/docs/reference/api/pandas.read_sql.html
     # sql.py
     # params : list, tuple or dict, optional, default: None
-    query_params: Tuple = (
-        device_name, from_date, exclude_to_date,
-    )
+    query: str
+    query_params: Union[Tuple, Dict]
+    if resolution == RESOLUTION_RAW:
+        query = QUERY_RANGE_DATA
+        query_params = (
+            device_name, from_date, exclude_to_date,
+        )
+    else:
+        query = QUERY_RANGE_BUCKET_DATA
+        query_params = {
+            'deviceName': device_name, 'fromDate': from_date, 'toDate': exclude_to_date,
+            'bucketSeconds': bucket_seconds(resolution), 'tzOffset': JST_OFFSET_SECONDS
+        }
     if logger is not None:
         logger.info(f"query_params: {query_params}")
-    df: pd.DataFrame = pd.read_sql(
-        QUERY_RANGE_DATA, connection, params=query_params, parse_dates=[COL_TIME]
-    )
+    with span(PHASE_QUERY) as sp:
+        df: pd.DataFrame = pd.read_sql(
+            query, connection, params=query_params, parse_dates=[COL_TIME]
+        )
+        sp.rows = df.shape[0]
+    with span(PHASE_TRANSFORM):
+        if compact:
+            df = compact_frame(df, logger=logger, name=year_month)
+        df, _ = validate_readings(df, validation, logger=logger)
     if logger is not None:
-        logger.info(f"{df}")
+        logger.info(frame_summary(df, "df"))
     return df
 
 
 def get_all_df(connection: sqlite3.Connection,
                device_name: str, curr_year_month: str,
-               logger: Optional[logging.Logger] = None
+               logger: Optional[logging.Logger] = None,
+               resolution: str = RESOLUTION_RAW,
+               validation: str = POLICY_MASK,
+               prev_connection: Optional[sqlite3.Connection] = None,
+               compact: bool = False
                ) -> Tuple[Optional[DataFrame], Optional[DataFrame], Optional[str]]:
     # 今年の年月テータ取得
-    df_curr: DataFrame = get_dataframe(connection, device_name, curr_year_month, logger=logger)
+    df_curr: DataFrame = get_dataframe(connection, device_name, curr_year_month, logger=logger,
+                                       resolution=resolution, validation=validation,
+                                       compact=compact)
     if df_curr is not None and df_curr.shape[0] == 0:
         return None, None, curr_year_month
 
     # 前年の年月テータ取得
     # 前年計算
     prev_ym: str = previous_year_month(curr_year_month)
-    df_prev: DataFrame = get_dataframe(connection, device_name, prev_ym, logger=logger)
+    # 前年の接続の指定が無ければ今年と同じ接続 (前年のアーカイブファイル等)
+    if prev_connection is None:
+        prev_connection = connection
+    df_prev: DataFrame = get_dataframe(prev_connection, device_name, prev_ym, logger=logger,
+                                       resolution=resolution, validation=validation,
+                                       compact=compact)
     return df_curr, df_prev, prev_ym
 
 
@@ -213,7 +280,41 @@ if __name__ == '__main__':
     # 最新の検索年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="2023-04")
+    # 集計間隔 (raw: 集計なし) ※集計時は平均値・最小値・最大値を取得する
+    parser.add_argument("--resolution", type=str, choices=RESOLUTION_CHOICES,
+                        default=RESOLUTION_RAW, help="Bucket size aggregated in SQL.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32, ラベル列を category で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 年単位のアーカイブディレクトリ (weather_YYYY.db があれば該当年は immutable=1 で読み込む)
+    parser.add_argument("--archive-dir", type=str,
+                        help="Directory of closed-year archives (weather_YYYY.db).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month,
+                resolution=args.resolution)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
     # データベースパス
     db_path: str = os.path.expanduser(args.sqlite3_db)
     if not os.path.exists(db_path):
@@ -225,19 +326,31 @@ if __name__ == '__main__':
     # 比較最新年月
     param_year_month = args.year_month
 
-    conn = None
+    # アーカイブディレクトリ
+    archive_dir: Optional[str] = None
+    if args.archive_dir is not None:
+        archive_dir = os.path.expanduser(args.archive_dir)
     try:
-        conn = get_connection(db_path, read_only=True)
-        app_logger.info(f"connection: {conn}")
+        # 共有の読み込み専用接続 ※終了時に自動でクローズする
+        with span(PHASE_CONNECT):
+            conn: sqlite3.Connection = connection_for_year_month(
+                db_path, param_year_month, archive_dir=archive_dir)
+            prev_conn: sqlite3.Connection = connection_for_year_month(
+                db_path, previous_year_month(param_year_month), archive_dir=archive_dir)
+        app_logger.info(f"connection: {conn}, previous year: {prev_conn}")
         curr_df: Optional[DataFrame]
         prev_df: Optional[DataFrame]
         prev_year_month: Optional[str]
         curr_df, prev_df, prev_year_month = get_all_df(
-            conn, args.device_name, param_year_month, logger=app_logger)
+            conn, args.device_name, param_year_month, logger=app_logger,
+            resolution=args.resolution, validation=args.validate, prev_connection=prev_conn,
+            compact=args.compact_dtypes)
 
         if curr_df is not None and prev_df is not None:
             img_src: str = gen_plot_image(
-                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger)
+                curr_df, prev_df, param_year_month, prev_year_month, logger=app_logger,
+                fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, bucket_seconds(args.resolution)))
             # プロット結果をPNG形式でファイル保存
             script_names: List[str] = script_name.split(".")
             save_name = f"{script_names[0]}.html"
@@ -250,6 +363,3 @@ if __name__ == '__main__':
     except Exception as err:
         app_logger.warning(err)
         exit(1)
-    finally:
-        if conn is not None:
-            conn.close()
@@ -0,0 +1,307 @@
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from PlotWeatherCompPrevYear_sqlite3 import next_year_month, save_text
+from plotter.sqlite_db import get_shared_connection
+from plotter.plotterweather import COL_PLOT_TIME, gen_years_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.frame_dtype import compact_frame
+from plotter.sensor_validation import POLICY_CHOICES, POLICY_MASK, validate_readings
+from plotter.month_cache import (
+    DEFAULT_CACHE_DIR, cache_path, is_completed_month, load_month, save_month
+)
+from plotter.phase_timer import PHASE_CONNECT, PHASE_QUERY, PHASE_TRANSFORM, span, start_timer
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.mem_profiler import start_memprofiler
+from plotter.log_util import frame_summary, seq_summary, set_full_dump
+
+"""
+気象センサーデータの同一月のN年比較グラフをHTMLに出力する
+[Database] SQLite3
+[取得] 全年分の観測データを1回のクエリーで集計間隔 (デフォルト30分) 毎の平均値として取得する
+       ※完了月 (前月以前) はキャッシュ (cache/) から取得し、未キャッシュの年月のみクエリーする
+[プロット] 各年の測定時刻を最新年月に揃え (1回のベクトル演算)、年毎の平均線とともに重ねて描画する
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 出力画層用HTMLテンプレート
+OUT_HTML = """
+<!DOCTYPE html>
+<html lang="ja">
+<body>
+<img src="{}"/>
+</body>
+</html>
+"""
+
+# インデックス
+COL_TIME: str = "measurement_time"
+# 年月列
+COL_YEAR_MONTH: str = "year_month"
+# 比較年数のデフォルト
+DEFAULT_YEARS: int = 5
+# 集計間隔 (分) のデフォルト
+DEFAULT_BUCKET_MINUTES: int = 30
+
+# 複数年月の検索範囲 (年月, 開始時刻, 終了時刻) の行 ※年月の数だけ連結する
+#  strftime(,,'-9 hours'): 日本時間の日付をUTCのunix timestampに変換する
+FMT_RANGE_ROW: str = "(:ym{i}, CAST(strftime('%s', :from{i}, '-9 hours') AS INTEGER)," \
+                     " CAST(strftime('%s', :to{i}, '-9 hours') AS INTEGER))"
+# 気象センサーデバイス名と複数年月の範囲から集計間隔毎の平均値を取得するSQL (SQLite3専用)
+#  検索範囲をCTEの行とし、範囲毎に主キー (did, measurement_time) の範囲検索で結合する
+#  集計間隔は measurement_time (unix timestamp) の整数除算で求める
+QUERY_YEARS_BUCKET_DATA: str = """
+WITH ranges(year_month, from_time, to_time) AS (
+   VALUES {ranges}
+)
+SELECT
+   r.year_month
+   ,datetime((wt.measurement_time / :bucket) * :bucket, 'unixepoch', 'localtime') as measurement_time
+   ,avg(temp_out) as temp_out, avg(humid) as humid, avg(pressure) as pressure
+FROM
+   ranges r
+   INNER JOIN t_weather wt ON
+      wt.did=(SELECT id FROM t_device WHERE name=:deviceName)
+      AND wt.measurement_time >= r.from_time
+      AND wt.measurement_time < r.to_time
+GROUP BY r.year_month, wt.measurement_time / :bucket
+ORDER BY r.year_month, measurement_time;
+"""
+
+
+def to_year_months(s_year_month: str, years: int) -> List[str]:
+    """
+    指定年月から遡った同一月の年月リストを生成する
+    :param s_year_month: 最新年月 "YYYY-MM"
+    :param years: 比較年数
+    :return: 年月リスト (最新年月が先頭)
+    """
+    s_year, s_month = s_year_month.split('-')
+    return [f"{int(s_year) - i:04}-{s_month}" for i in range(years)]
+
+
+def get_years_dataframe(connection: sqlite3.Connection,
+                        device_name: str, year_months: List[str], bucket_seconds: int,
+                        logger: Optional[logging.Logger] = None) -> DataFrame:
+    """
+    複数年月の観測データを集計間隔毎の平均値として1回のクエリーで取得する
+    :param connection: SQLite3接続
+    :param device_name: デバイス名
+    :param year_months: 年月リスト
+    :param bucket_seconds: 集計間隔 (秒)
+    :param logger: application logger
+    :return: 全年月の観測データ (年月列付き)
+    """
+    query_params: Dict = {'deviceName': device_name, 'bucket': bucket_seconds}
+    for i, year_month in enumerate(year_months):
+        from_date: str = year_month + "-01"
+        query_params[f"ym{i}"] = year_month
+        query_params[f"from{i}"] = from_date
+        query_params[f"to{i}"] = next_year_month(from_date)
+    if logger is not None:
+        logger.info(f"query_params: {query_params}")
+    query: str = QUERY_YEARS_BUCKET_DATA.format(
+        ranges=",".join(FMT_RANGE_ROW.format(i=i) for i in range(len(year_months)))
+    )
+    with span(PHASE_QUERY) as sp:
+        df: DataFrame = pd.read_sql(query, connection, params=query_params, parse_dates=[COL_TIME])
+        sp.rows = df.shape[0]
+    if logger is not None:
+        logger.info(frame_summary(df, "df"))
+    return df
+
+
+def split_by_year_month(df: DataFrame, year_months: List[str]) -> Dict[str, DataFrame]:
+    """
+    全年月の観測データを年月毎に分割する ※データの無い年月は含まない
+    :param df: 全年月の観測データ (年月列付き)
+    :param year_months: 年月リスト (出力順)
+    :return: 年月をキーとする観測データ (指定順)
+    """
+    groups: Dict[str, DataFrame] = {
+        year_month: group.drop(columns=COL_YEAR_MONTH).reset_index(drop=True)
+        for year_month, group in df.groupby(COL_YEAR_MONTH, sort=False)
+    }
+    return {year_month: groups[year_month] for year_month in year_months if year_month in groups}
+
+
+def align_to_year_month(df: DataFrame, base_year_month: str) -> None:
+    """
+    全年月の測定時刻を基準年月に揃えたプロット用の測定時刻列を追加する\n
+    各行の年月の月初からの経過時間を基準年月の月初に加算する (全行を1回のベクトル演算で変換)\n
+    ※閏年の2月29日は基準年が平年なら3月1日に配置される
+    :param df: 全年月の観測データ (年月列付き)
+    :param base_year_month: 基準年月 "YYYY-MM"
+    """
+    times: np.ndarray = df[COL_TIME].to_numpy(dtype="datetime64[ns]")
+    month_starts: np.ndarray = df[COL_YEAR_MONTH].to_numpy(dtype=str).astype("datetime64[M]")
+    df[COL_PLOT_TIME] = np.datetime64(base_year_month, "M") + (times - month_starts)
+
+
+def get_years_df(connection: sqlite3.Connection, db_path: str,
+                 device_name: str, year_months: List[str], bucket_seconds: int,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 logger: Optional[logging.Logger] = None) -> DataFrame:
+    """
+    複数年月の観測データをキャッシュ経由で取得する\n
+    完了月でキャッシュが存在する年月はキャッシュから、それ以外の年月は1回のクエリーで取得し
+    データが存在する完了月をキャッシュに保存する
+    :param connection: SQLite3接続
+    :param db_path: データベースパス (キャッシュキー)
+    :param device_name: デバイス名
+    :param year_months: 年月リスト
+    :param bucket_seconds: 集計間隔 (秒)
+    :param cache_dir: キャッシュディレクトリ ※Noneならキャッシュを使わない
+    :param logger: application logger
+    :return: 全年月の観測データ (年月列付き)
+    """
+    def to_cache_path(ym: str) -> str:
+        return cache_path(cache_dir, os.path.abspath(db_path), device_name, bucket_seconds, ym)
+
+    frames: List[DataFrame] = []
+    missing: List[str] = []
+    for year_month in year_months:
+        cached: Optional[DataFrame] = None
+        if cache_dir is not None and is_completed_month(year_month):
+            cached = load_month(to_cache_path(year_month))
+        if cached is not None:
+            frames.append(cached.assign(**{COL_YEAR_MONTH: year_month}))
+        else:
+            missing.append(year_month)
+    if logger is not None:
+        logger.info(seq_summary(missing, "missing"))
+
+    if len(missing) > 0:
+        df_fetched: DataFrame = get_years_dataframe(
+            connection, device_name, missing, bucket_seconds, logger=logger)
+        if df_fetched.shape[0] > 0 or len(frames) == 0:
+            frames.append(df_fetched)
+        if cache_dir is not None:
+            for year_month, df in split_by_year_month(df_fetched, missing).items():
+                if not is_completed_month(year_month):
+                    continue
+                try:
+                    save_month(to_cache_path(year_month), df)
+                except OSError as err:
+                    if logger is not None:
+                        logger.warning(err)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # SQLite3 データベースパス: ~/db/weather.db
+    parser.add_argument("--sqlite3-db", type=str, required=True,
+                        help="QLite3 データベースパス")
+    # デバイス名: esp8266_1
+    parser.add_argument("--device-name", type=str, required=True,
+                        help="device name in t_device.")
+    # 最新の検索年月
+    parser.add_argument("--year-month", type=str, required=True,
+                        help="2023-04")
+    # 比較年数 (最新年月を含む)
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS,
+                        help=f"Number of years to compare (default {DEFAULT_YEARS}).")
+    # 集計間隔 (分)
+    parser.add_argument("--bucket-minutes", type=int, default=DEFAULT_BUCKET_MINUTES,
+                        help=f"Averaging bucket in minutes (default {DEFAULT_BUCKET_MINUTES}).")
+    # キャッシュを使わない
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always fetch from database.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32, 年月列を category で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
+    args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month, years=args.years)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger,
+                      year_month=args.year_month, years=args.years)
+    set_full_dump(args.debug_dump)
+    # データベースパス
+    db_path: str = os.path.expanduser(args.sqlite3_db)
+    if not os.path.exists(db_path):
+        app_logger.warning("database not found!")
+        exit(1)
+    if args.years < 2 or args.bucket_minutes < 1:
+        app_logger.warning("--years must be >= 2 and --bucket-minutes >= 1")
+        exit(1)
+
+    # 比較年月リスト (最新年月が先頭)
+    param_year_months: List[str] = to_year_months(args.year_month, args.years)
+
+    try:
+        # 共有の読み込み専用接続 ※終了時に自動でクローズする
+        with span(PHASE_CONNECT):
+            conn: sqlite3.Connection = get_shared_connection(db_path)
+        app_logger.info(f"connection: {conn}")
+        df_all: DataFrame = get_years_df(
+            conn, db_path, args.device_name, param_year_months, args.bucket_minutes * 60,
+            cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR, logger=app_logger)
+        with span(PHASE_TRANSFORM, rows=df_all.shape[0]):
+            # 省メモリ型に変換する ※キャッシュには変換前の集計データを保存する
+            if args.compact_dtypes:
+                df_all = compact_frame(df_all, logger=app_logger, name="df_all")
+            # 全年月の測定時刻を最新年月に揃える
+            align_to_year_month(df_all, param_year_months[0])
+            year_dfs: Dict[str, DataFrame] = split_by_year_month(df_all, param_year_months)
+            # 年月毎に不正値を処理する ※キャッシュには処理前の集計データを保存する
+            year_dfs = {
+                year_month: validate_readings(df, args.validate, logger=app_logger)[0]
+                for year_month, df in year_dfs.items()
+            }
+        for year_month in param_year_months:
+            if year_month not in year_dfs:
+                app_logger.warning(f"該当レコードなし: {year_month}")
+
+        if param_year_months[0] in year_dfs and len(year_dfs) > 1:
+            img_src: str = gen_years_plot_image(
+                year_dfs, logger=app_logger, fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, args.bucket_minutes * 60))
+            # プロット結果をPNG形式でファイル保存
+            script_names: List[str] = script_name.split(".")
+            save_name = f"{script_names[0]}.html"
+            save_path = os.path.join("output", save_name)
+            app_logger.info(save_path)
+            html: str = OUT_HTML.format(img_src)
+            save_text(save_path, html)
+        else:
+            app_logger.warning("該当レコードなし")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
@@ -0,0 +1,233 @@
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import psycopg2
+from sqlalchemy.pool import PoolProxiedConnection
+
+from plotter.db_engine import raw_connection
+from plotter.plotterweather import WeatherArrays, gen_range_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.stream_aggregate import (
+    DEFAULT_CHUNK_ROWS, DEFAULT_MAX_POINTS, RESOLUTION_AUTO, STREAM_RESOLUTION_CHOICES,
+    BucketAggregator, aggregate_cursor, fit_resolution, month_range_epochs
+)
+from plotter.phase_timer import PHASE_CONNECT, PHASE_QUERY, PHASE_WRITE, span, start_timer, timed
+from plotter.mem_profiler import max_rss_kb, start_memprofiler
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.log_util import set_full_dump
+from plotter.sensor_validation import POLICY_MASK, POLICY_OFF, STREAM_POLICY_CHOICES, ChunkValidator
+from plotter.resolution import JST_OFFSET_SECONDS, VALUE_COLUMNS, bucket_seconds
+
+"""
+気象センサーデータの複数年の期間のグラフ (集計間隔毎の平均値・最小値・最大値) をHTMLに出力する
+[Database] PostgreSQL
+[Python DB API 2.0] psycopg2 (pip install psycopg2-binary)
+[逐次集計] 名前付きカーソル (サーバーサイドカーソル) から itersize 行毎に読み込んで集計バッファに畳み込む
+  ※クライアント側には1チャンク分の行のみ保持する
+https://www.psycopg.org/docs/usage.html#server-side-cursors
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 気象センサーデータベース接続情報
+DB_CONF: str = os.path.join("conf", "db_sensors.json")
+
+# 出力画層用HTMLテンプレート
+OUT_HTML = """
+<!DOCTYPE html>
+<html lang="ja">
+<body>
+<img src="{}"/>
+</body>
+</html>
+"""
+
+# 名前付きカーソル名
+CURSOR_NAME: str = "weather_long_range"
+
+# 気象センサーデバイス名と期間から観測データを取得するSQL (PostgreSQL固有関数使用)
+#  ※測定時刻 (日本時間の timestamp) は unix epoch 秒 (UTC) に変換して取得する
+QUERY_RANGE_EPOCH_DATA: str = f"""
+SELECT
+   extract(epoch FROM measurement_time)::bigint - %(tzOffset)s AS measurement_epoch
+   ,{", ".join(VALUE_COLUMNS)}
+FROM
+   weather.t_weather
+WHERE
+   did=(SELECT id FROM weather.t_device WHERE name=%(deviceName)s)
+   AND (
+     measurement_time >= %(fromDate)s
+     AND
+     measurement_time < %(toDate)s
+   )
+ORDER BY measurement_time;
+"""
+
+
+def next_year_month(s_year_month: str) -> str:
+    """
+    年月文字列 "YYYY-MM" の次の月を計算する
+    :param s_year_month: 年月文字列
+    :return: 翌年月
+    """
+    year, month = (int(val) for val in s_year_month.split('-'))
+    month += 1
+    if month > 12:
+        year += 1
+        month = 1
+    return f"{year:04}-{month:02}"
+
+
+@timed(PHASE_WRITE)
+def save_text(file, contents):
+    with open(file, 'w') as fp:
+        fp.write(contents)
+
+
+def aggregate_range(conn: PoolProxiedConnection, device_name: str,
+                    from_year_month: str, to_year_month: str, resolution: str,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, validate: str = POLICY_MASK,
+                    logger: Optional[logging.Logger] = None) -> BucketAggregator:
+    """
+    期間の観測データを名前付きカーソルからチャンク毎に読み込み集計間隔毎に集計する\n
+    名前付きカーソルはトランザクション内でのみ有効なため、読み込み後にロールバックする
+    :param conn: psycopg2の接続 (autocommit 無効)
+    :param device_name: デバイス名
+    :param from_year_month: 開始年月 (形式: "%Y-%m")
+    :param to_year_month: 終了年月 (形式: "%Y-%m") ※終了年月を含む
+    :param resolution: 集計間隔
+    :param chunk_rows: 1チャンクの行数 (itersize)
+    :param validate: 不正値の処理方法 (STREAM_POLICY_CHOICES) ※チャンク毎に集計前に処理する
+    :param logger: application logger
+    :return: 集計バッファ
+    """
+    from_epoch, to_epoch = month_range_epochs(from_year_month, to_year_month)
+    aggregator: BucketAggregator = BucketAggregator(
+        from_epoch, to_epoch, bucket_seconds(resolution), columns=VALUE_COLUMNS)
+    query_params: Dict = {
+        'deviceName': device_name, 'fromDate': from_year_month + "-01",
+        'toDate': next_year_month(to_year_month) + "-01", 'tzOffset': JST_OFFSET_SECONDS
+    }
+    if logger is not None:
+        logger.info(f"query_params: {query_params}")
+    validator: Optional[ChunkValidator] = None
+    if validate != POLICY_OFF:
+        validator = ChunkValidator(VALUE_COLUMNS, policy=validate)
+    try:
+        with conn.cursor(name=CURSOR_NAME) as cursor, span(PHASE_QUERY) as sp:
+            cursor.itersize = chunk_rows
+            cursor.execute(QUERY_RANGE_EPOCH_DATA, query_params)
+            aggregate_cursor(cursor, aggregator, chunk_rows, validator=validator)
+            sp.rows = aggregator.rows
+    finally:
+        conn.rollback()
+    if validator is not None and logger is not None:
+        logger.info(f"validation({validate}): {validator.counts}")
+    return aggregator
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # デバイス名: esp8266_1
+    parser.add_argument("--device-name", type=str, required=True,
+                        help="device name in t_device.")
+    # 期間の開始年月・終了年月 (終了年月を含む)
+    parser.add_argument("--from-month", type=str, required=True, help="2021-10")
+    parser.add_argument("--to-month", type=str, required=True, help="2023-07")
+    # 集計間隔 (auto: プロット点数の上限以下になる最小の集計間隔)
+    parser.add_argument("--resolution", type=str, choices=STREAM_RESOLUTION_CHOICES,
+                        default=RESOLUTION_AUTO, help="Bucket size folded while streaming.")
+    # 集計間隔 auto のプロット点数の上限
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="Upper bound of plotted buckets for --resolution auto.")
+    # 1チャンクの行数 (名前付きカーソルの itersize)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Rows fetched per round trip of the server-side cursor.")
+    # データベースサーバーのホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, off: チェックしない)
+    #  ※チャンク毎に集計バッファに畳み込む前に処理する
+    parser.add_argument("--validate", type=str, choices=STREAM_POLICY_CHOICES,
+                        default=POLICY_MASK, help="Policy for out-of-range readings and spikes.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.chunk_rows < 1 or args.max_points < 1:
+        app_logger.warning("--chunk-rows and --max-points must be >= 1")
+        exit(1)
+
+    start_timer(script_name, enabled=args.timing, from_month=args.from_month,
+                to_month=args.to_month, resolution=args.resolution)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger,
+                      from_month=args.from_month, to_month=args.to_month)
+    set_full_dump(args.debug_dump)
+
+    db_conn: Optional[PoolProxiedConnection] = None
+    try:
+        param_resolution: str = args.resolution
+        if param_resolution == RESOLUTION_AUTO:
+            param_resolution = fit_resolution(
+                *month_range_epochs(args.from_month, args.to_month), args.max_points)
+        app_logger.info(f"resolution: {param_resolution}")
+        # 共有エンジンの接続プールから psycopg2 の接続を取得する ※close() でプールに返却
+        with span(PHASE_CONNECT):
+            db_conn = raw_connection(DB_CONF, hostname=args.db_host)
+        stream: BucketAggregator = aggregate_range(
+            db_conn, args.device_name, args.from_month, args.to_month, param_resolution,
+            chunk_rows=args.chunk_rows, validate=args.validate, logger=app_logger)
+        app_logger.info(f"rows: {stream.rows}, chunks: {stream.chunks}, "
+                        f"buffer: {stream.buffer_bytes():,} bytes, max_rss: {max_rss_kb()} KB")
+
+        if stream.rows > 0:
+            bucket_epochs: np.ndarray
+            bucket_columns: Dict[str, np.ndarray]
+            bucket_epochs, bucket_columns = stream.result()
+            img_src: str = gen_range_plot_image(
+                WeatherArrays(bucket_epochs, bucket_columns), args.device_name,
+                args.from_month, args.to_month, param_resolution, logger=app_logger,
+                fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, bucket_seconds(param_resolution)))
+            # プロット結果をPNG形式でファイル保存
+            script_names: List[str] = script_name.split(".")
+            save_name = f"{script_names[0]}.html"
+            save_path = os.path.join("output", save_name)
+            app_logger.info(save_path)
+            html: str = OUT_HTML.format(img_src)
+            save_text(save_path, html)
+        else:
+            app_logger.warning("該当レコードなし")
+    except psycopg2.Error as db_err:
+        app_logger.error(f"type({type(db_err)}): {db_err}")
+        exit(1)
+    except Exception as exp:
+        app_logger.error(exp)
+        exit(1)
+    finally:
+        if db_conn is not None:
+            db_conn.close()
@@ -0,0 +1,204 @@
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional
+
+import sqlite3
+
+import numpy as np
+
+from plotter.plotterweather import WeatherArrays, gen_range_plot_image
+from plotter.gap_util import DEFAULT_GAP_MINUTES, gap_threshold
+from plotter.sqlite_db import get_shared_connection
+from plotter.stream_aggregate import (
+    DEFAULT_CHUNK_ROWS, DEFAULT_MAX_POINTS, RESOLUTION_AUTO, STREAM_RESOLUTION_CHOICES,
+    BucketAggregator, aggregate_cursor, fit_resolution, month_range_epochs
+)
+from plotter.phase_timer import PHASE_CONNECT, PHASE_QUERY, PHASE_WRITE, span, start_timer, timed
+from plotter.mem_profiler import max_rss_kb, start_memprofiler
+from plotter.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from plotter.log_util import set_full_dump
+from plotter.sensor_validation import POLICY_MASK, POLICY_OFF, STREAM_POLICY_CHOICES, ChunkValidator
+from plotter.resolution import VALUE_COLUMNS, bucket_seconds
+
+"""
+気象センサーデータの複数年の期間のグラフ (集計間隔毎の平均値・最小値・最大値) をHTMLに出力する
+[Database] SQLite3
+[逐次集計] 期間全体を DataFrame に読み込まず、カーソルからチャンク毎に読み込んで集計バッファに畳み込む
+  ※メモリ使用量は期間の行数ではなく集計間隔の数 (プロット点数) で決まる
+[実行例] python PlotWeatherLongRange_sqlite3.py --sqlite3-db ~/db/weather.db --device-name esp8266_1
+           --from-month 2021-10 --to-month 2023-07
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 出力画層用HTMLテンプレート
+OUT_HTML = """
+<!DOCTYPE html>
+<html lang="ja">
+<body>
+<img src="{}"/>
+</body>
+</html>
+"""
+
+# 気象センサーデバイス名と期間 (unix timestamp) から観測データを取得するSQL (SQLite3専用)
+#  ※測定時刻は unix timestamp のまま取得する (集計時刻は BucketAggregator で日本時間基準に揃える)
+QUERY_RANGE_EPOCH_DATA: str = f"""
+SELECT
+   measurement_time, {", ".join(VALUE_COLUMNS)}
+FROM
+   t_weather
+WHERE
+   did=(SELECT id FROM t_device WHERE name=:deviceName)
+   AND measurement_time >= :fromEpoch AND measurement_time < :toEpoch
+ORDER BY measurement_time;
+"""
+
+
+@timed(PHASE_WRITE)
+def save_text(file, contents):
+    with open(file, 'w') as fp:
+        fp.write(contents)
+
+
+def aggregate_range(connection: sqlite3.Connection, device_name: str,
+                    from_epoch: int, to_epoch: int, resolution: str,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, validate: str = POLICY_MASK,
+                    logger: logging.Logger = None) -> BucketAggregator:
+    """
+    期間の観測データをカーソルからチャンク毎に読み込み集計間隔毎に集計する
+    :param connection: SQLite3接続
+    :param device_name: デバイス名
+    :param from_epoch: 期間の開始 (unix epoch 秒)
+    :param to_epoch: 期間の終了 (unix epoch 秒, 含まない)
+    :param resolution: 集計間隔
+    :param chunk_rows: 1チャンクの行数
+    :param validate: 不正値の処理方法 (STREAM_POLICY_CHOICES) ※チャンク毎に集計前に処理する
+    :param logger: application logger
+    :return: 集計バッファ
+    """
+    aggregator: BucketAggregator = BucketAggregator(
+        from_epoch, to_epoch, bucket_seconds(resolution), columns=VALUE_COLUMNS)
+    query_params: Dict = {'deviceName': device_name, 'fromEpoch': from_epoch, 'toEpoch': to_epoch}
+    if logger is not None:
+        logger.info(f"query_params: {query_params}")
+    validator: Optional[ChunkValidator] = None
+    if validate != POLICY_OFF:
+        validator = ChunkValidator(VALUE_COLUMNS, policy=validate)
+    cursor: sqlite3.Cursor = connection.cursor()
+    try:
+        with span(PHASE_QUERY) as sp:
+            cursor.execute(QUERY_RANGE_EPOCH_DATA, query_params)
+            aggregate_cursor(cursor, aggregator, chunk_rows, validator=validator)
+            sp.rows = aggregator.rows
+    finally:
+        cursor.close()
+    if validator is not None and logger is not None:
+        logger.info(f"validation({validate}): {validator.counts}")
+    return aggregator
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # SQLite3 データベースパス: ~/db/weather.db
+    parser.add_argument("--sqlite3-db", type=str, required=True,
+                        help="QLite3 データベースパス")
+    # デバイス名: esp8266_1
+    parser.add_argument("--device-name", type=str, required=True,
+                        help="device name in t_device.")
+    # 期間の開始年月・終了年月 (終了年月を含む)
+    parser.add_argument("--from-month", type=str, required=True, help="2021-10")
+    parser.add_argument("--to-month", type=str, required=True, help="2023-07")
+    # 集計間隔 (auto: プロット点数の上限以下になる最小の集計間隔)
+    parser.add_argument("--resolution", type=str, choices=STREAM_RESOLUTION_CHOICES,
+                        default=RESOLUTION_AUTO, help="Bucket size folded while streaming.")
+    # 集計間隔 auto のプロット点数の上限
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="Upper bound of plotted buckets for --resolution auto.")
+    # 1チャンクの行数 (カーソルの fetchmany)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Rows fetched per chunk.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, off: チェックしない)
+    #  ※チャンク毎に集計バッファに畳み込む前に処理する
+    parser.add_argument("--validate", type=str, choices=STREAM_POLICY_CHOICES,
+                        default=POLICY_MASK, help="Policy for out-of-range readings and spikes.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.chunk_rows < 1 or args.max_points < 1:
+        app_logger.warning("--chunk-rows and --max-points must be >= 1")
+        exit(1)
+
+    start_timer(script_name, enabled=args.timing, from_month=args.from_month,
+                to_month=args.to_month, resolution=args.resolution)
+    start_profiler(script_name, args.profile, "output", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger,
+                      from_month=args.from_month, to_month=args.to_month)
+    set_full_dump(args.debug_dump)
+    # データベースパス
+    db_path: str = os.path.expanduser(args.sqlite3_db)
+    if not os.path.exists(db_path):
+        app_logger.warning("database not found!")
+        exit(1)
+
+    try:
+        param_from_epoch: int
+        param_to_epoch: int
+        param_from_epoch, param_to_epoch = month_range_epochs(args.from_month, args.to_month)
+        param_resolution: str = args.resolution
+        if param_resolution == RESOLUTION_AUTO:
+            param_resolution = fit_resolution(param_from_epoch, param_to_epoch, args.max_points)
+        app_logger.info(f"resolution: {param_resolution}")
+        # 共有の読み込み専用接続 ※終了時に自動でクローズする
+        with span(PHASE_CONNECT):
+            conn: sqlite3.Connection = get_shared_connection(db_path)
+        stream: BucketAggregator = aggregate_range(
+            conn, args.device_name, param_from_epoch, param_to_epoch, param_resolution,
+            chunk_rows=args.chunk_rows, validate=args.validate, logger=app_logger)
+        app_logger.info(f"rows: {stream.rows}, chunks: {stream.chunks}, "
+                        f"buffer: {stream.buffer_bytes():,} bytes, max_rss: {max_rss_kb()} KB")
+
+        if stream.rows > 0:
+            bucket_epochs: np.ndarray
+            bucket_columns: Dict[str, np.ndarray]
+            bucket_epochs, bucket_columns = stream.result()
+            img_src: str = gen_range_plot_image(
+                WeatherArrays(bucket_epochs, bucket_columns), args.device_name,
+                args.from_month, args.to_month, param_resolution, logger=app_logger,
+                fixed_layout=args.fixed_layout,
+                gap_threshold=gap_threshold(args.gap_minutes, bucket_seconds(param_resolution)))
+            # プロット結果をPNG形式でファイル保存
+            script_names: List[str] = script_name.split(".")
+            save_name = f"{script_names[0]}.html"
+            save_path = os.path.join("output", save_name)
+            app_logger.info(save_path)
+            html: str = OUT_HTML.format(img_src)
+            save_text(save_path, html)
+        else:
+            app_logger.warning("該当レコードなし")
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
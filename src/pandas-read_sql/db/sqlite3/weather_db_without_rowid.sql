@@ -0,0 +1,17 @@
+CREATE TABLE IF NOT EXISTS t_device(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR UNIQUE NOT NULL
+);
+
+-- 観測データを主キー (did, measurement_time) 順に格納する (WITHOUT ROWID)
+--  範囲検索は主キーのB-treeを順に読むだけで、主キーインデックスからrowidを引く二段階の検索にならない
+CREATE TABLE IF NOT EXISTS t_weather(
+    did INTEGER NOT NULL,
+    measurement_time INTEGER NOT NULL,
+    temp_out real,
+    temp_in real,
+    humid real,
+    pressure real,
+    PRIMARY KEY (did, measurement_time),
+    FOREIGN KEY (did) REFERENCES t_devices (id) ON DELETE CASCADE
+) WITHOUT ROWID;
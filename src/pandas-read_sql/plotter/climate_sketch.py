@@ -0,0 +1,159 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from plotter.month_cache import db_key
+
+"""
+日別 (通日) の観測値分布スケッチ (気候値の分位点バンド用)
+(1) 観測項目毎に (通日, 値の区間) の度数を保持する固定幅ヒストグラム
+    ※度数の加算でマージでき、新しい観測データを追加するだけで更新できる (生データの再集計は不要)
+    ※分位点の誤差は概ね区間幅 (外気温 0.1℃, 湿度 0.5％, 気圧 0.1hPa) 程度 (区間内は線形補間)
+      偶数件の中央値などが離れた2つの値の間に入る場合は区間幅を超えることがある
+(2) 通日は閏年の暦 (0: 1月1日 〜 365: 12月31日) で表す ※平年の3月1日以降は1日ずらす
+(3) 保存形式: デバイス毎の numpy圧縮ファイル (.npz) ※取り込み済みの最終測定時刻 (unix timestamp) を含む
+"""
+
+# スケッチファイル名
+SKETCH_FILE_NAME: str = "climate_sketch.npz"
+# 通日の数 (閏年の暦)
+DAYS_OF_YEAR: int = 366
+# 平年の3月1日の通日 (0始まり)
+MARCH_1ST_DOY: int = 59
+# 観測項目毎の値の区間 (下限, 上限, 区間幅) ※範囲外の値は両端の区間に含める
+SKETCH_BINS: Dict[str, Tuple[float, float, float]] = {
+    'temp_out': (-40., 50., 0.1),
+    'humid': (0., 100., 0.5),
+    'pressure': (900., 1100., 0.1),
+}
+# スケッチファイルのメタデータキー
+KEY_WATERMARK: str = "__watermark__"
+
+
+def sketch_path(cache_dir: str, db_name: str, device_name: str) -> str:
+    """
+    スケッチファイルパスを取得する
+    :param cache_dir: キャッシュディレクトリ
+    :param db_name: データベースの識別名 (SQLite3ならデータベースファイルの絶対パス)
+    :param device_name: デバイス名
+    :return: スケッチファイルパス
+    """
+    return os.path.join(cache_dir, db_key(db_name), device_name, SKETCH_FILE_NAME)
+
+
+def day_of_year_index(times: np.ndarray) -> np.ndarray:
+    """
+    測定時刻を閏年の暦の通日 (0始まり) に変換する
+    :param times: 測定時刻の配列 (datetime64)
+    :return: 通日の配列
+    """
+    index: pd.DatetimeIndex = pd.DatetimeIndex(times)
+    doy: np.ndarray = index.dayofyear.to_numpy() - 1
+    return doy + ((~index.is_leap_year) & (doy >= MARCH_1ST_DOY))
+
+
+def _bin_count(col_name: str) -> int:
+    lo, hi, step = SKETCH_BINS[col_name]
+    return int(round((hi - lo) / step))
+
+
+class ClimateSketch:
+    """ 観測項目毎の (通日, 値の区間) の度数を保持するマージ可能なスケッチ """
+
+    def __init__(self, watermark: int = 0, counts: Optional[Dict[str, np.ndarray]] = None):
+        """
+        :param watermark: 取り込み済みの最終測定時刻 (unix timestamp)
+        :param counts: 観測項目毎の度数 (通日 × 区間) ※Noneなら空のスケッチ
+        """
+        self.watermark: int = watermark
+        self.counts: Dict[str, np.ndarray] = counts if counts is not None else {
+            col_name: np.zeros((DAYS_OF_YEAR, _bin_count(col_name)), dtype=np.int64)
+            for col_name in SKETCH_BINS
+        }
+
+    def update(self, doy: np.ndarray, df: DataFrame) -> None:
+        """
+        観測データを度数に加算する ※欠損値は除く
+        :param doy: 各行の通日
+        :param df: 観測データ (SKETCH_BINS の観測項目列)
+        """
+        for col_name, (lo, _, step) in SKETCH_BINS.items():
+            counts: np.ndarray = self.counts[col_name]
+            n_bins: int = counts.shape[1]
+            values: np.ndarray = df[col_name].to_numpy(dtype=np.float64)
+            valid: np.ndarray = ~np.isnan(values)
+            bins: np.ndarray = np.clip(np.floor((values[valid] - lo) / step), 0, n_bins - 1)
+            flat: np.ndarray = doy[valid] * n_bins + bins.astype(np.int64)
+            counts += np.bincount(flat, minlength=counts.size).reshape(counts.shape)
+
+    def merge(self, other: "ClimateSketch") -> None:
+        """
+        他のスケッチの度数を加算する
+        :param other: スケッチ
+        """
+        for col_name in SKETCH_BINS:
+            self.counts[col_name] += other.counts[col_name]
+        self.watermark = max(self.watermark, other.watermark)
+
+    def quantiles(self, col_name: str, probs: List[float]) -> np.ndarray:
+        """
+        通日毎の分位点を計算する
+        :param col_name: 観測項目列名
+        :param probs: 確率のリスト (例) [0.1, 0.5, 0.9]
+        :return: 分位点 (通日 × 確率) ※度数が0の通日は NaN
+        """
+        lo, _, step = SKETCH_BINS[col_name]
+        counts: np.ndarray = self.counts[col_name]
+        cum: np.ndarray = counts.cumsum(axis=1)
+        total: np.ndarray = cum[:, -1]
+        result: np.ndarray = np.empty((DAYS_OF_YEAR, len(probs)), dtype=np.float64)
+        for prob_idx, prob in enumerate(probs):
+            target: np.ndarray = prob * total
+            # 累積度数が目標値に達する区間と区間内の位置
+            bins: np.ndarray = np.minimum((cum < target[:, None]).sum(axis=1), counts.shape[1] - 1)
+            bin_counts: np.ndarray = np.take_along_axis(counts, bins[:, None], axis=1)[:, 0]
+            before: np.ndarray = np.take_along_axis(cum, bins[:, None], axis=1)[:, 0] - bin_counts
+            frac: np.ndarray = np.divide(target - before, bin_counts,
+                                         out=np.full(DAYS_OF_YEAR, 0.5), where=bin_counts > 0)
+            result[:, prob_idx] = lo + step * (bins + frac)
+        result[total == 0] = np.nan
+        return result
+
+    def save(self, path: str) -> None:
+        """
+        スケッチをファイルに保存する
+        :param path: スケッチファイルパス
+        """
+        arrays: Dict[str, np.ndarray] = {KEY_WATERMARK: np.array(self.watermark, dtype=np.int64)}
+        arrays.update(self.counts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 書き込み途中のファイルを読まないように一時ファイルから置き換える
+        tmp_path: str = path + ".tmp"
+        with open(tmp_path, "wb") as fp:
+            np.savez_compressed(fp, **arrays)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> Optional["ClimateSketch"]:
+        """
+        スケッチをファイルから読み込む
+        :param path: スケッチファイルパス
+        :return: スケッチ ※ファイルが存在しないか区間の定義が異なる場合はNone
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as npz:
+                counts: Dict[str, np.ndarray] = {col_name: npz[col_name] for col_name in SKETCH_BINS}
+                watermark: int = int(npz[KEY_WATERMARK])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        for col_name, col_counts in counts.items():
+            if col_counts.shape != (DAYS_OF_YEAR, _bin_count(col_name)):
+                return None
+        return ClimateSketch(watermark, counts)
@@ -0,0 +1,167 @@
+import atexit
+import json
+import os
+import socket
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import pandas as pd
+from pandas.core.frame import DataFrame
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.engine.url import URL
+from sqlalchemy.pool import PoolProxiedConnection
+from sqlalchemy.sql import text
+
+from plotter.phase_timer import PHASE_QUERY, span
+
+"""
+共有データベースエンジン (接続プール) ユーティリティ
+(1) 接続設定ファイル (JSON) とホスト名の組毎にエンジンを1つだけ生成しプロセス内で共有する
+    ※設定ファイルの読み込みとホスト名の解決も1回のみ
+(2) Raspberry Pi 向けの接続プール設定
+    小さいプールサイズ, 取得時の死活確認 (スリープ・ネットワーク断からの復帰), 接続の定期再作成,
+    接続タイムアウト・ステートメントタイムアウト (PostgreSQL)
+(3) fetch_frame() でクエリー結果を列単位で DataFrame に変換する
+[バッチ・常駐プロセス] get_engine() で取得したエンジンを使い回すと複数の図の間で接続が再利用される
+"""
+
+# 接続プールのサイズ (1プロセス: セッション + 直接接続)
+POOL_SIZE: int = 2
+# プールサイズを超えて一時的に作成する接続数
+MAX_OVERFLOW: int = 2
+# プールから接続を取得する際の待ち時間 (秒)
+POOL_TIMEOUT: int = 10
+# 接続の再作成間隔 (秒) ※サーバー・ルーターのアイドル切断より短くする
+POOL_RECYCLE: int = 1800
+# 接続タイムアウト (秒) ※データベースサーバー (Pi) がスリープ中の場合の待ち時間の上限
+CONNECT_TIMEOUT: int = 10
+# ステートメントタイムアウト (ミリ秒)
+STATEMENT_TIMEOUT_MS: int = 60000
+# TCPキープアライブの開始までのアイドル時間 (秒)
+KEEPALIVES_IDLE: int = 60
+
+# 生成済みエンジン (キー: 接続設定ファイルの絶対パス, ホスト名)
+_engines: Dict[Tuple[str, str], Engine] = {}
+
+
+@lru_cache(maxsize=None)
+def resolve_hostname(hostname: Optional[str] = None) -> str:
+    """
+    接続先のホスト名を解決する
+    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
+    :return: ホスト名
+    """
+    return hostname if hostname is not None else socket.gethostname()
+
+
+@lru_cache(maxsize=None)
+def _read_conf(conf_path: str) -> str:
+    with open(conf_path, 'r') as fp:
+        return fp.read()
+
+
+def load_db_conf(conf_path: str, hostname: Optional[str] = None) -> Dict[str, Any]:
+    """
+    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
+    :param conf_path: 接続設定ファイルパス (JSON形式)
+    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
+    :return: SQLAlchemyのURL用辞書オブジェクト
+    """
+    db_conf: Dict[str, Any] = json.loads(_read_conf(os.path.abspath(conf_path)))
+    # host in /etc/hostname: "hostname.local" ※SQLite等のホスト無しの設定はそのまま
+    if "host" in db_conf:
+        db_conf["host"] = db_conf["host"].format(hostname=resolve_hostname(hostname))
+    return db_conf
+
+
+def _connect_args(url: URL, statement_timeout_ms: int) -> Dict[str, Any]:
+    """
+    ドライバー毎の接続引数を生成する
+    :param url: 接続URL
+    :param statement_timeout_ms: ステートメントタイムアウト (ミリ秒) ※0ならタイムアウトなし
+    :return: 接続引数 ※PostgreSQL (psycopg2) 以外は空
+    """
+    if url.get_backend_name() != "postgresql":
+        return {}
+
+    return {
+        "connect_timeout": CONNECT_TIMEOUT,
+        "options": f"-c statement_timeout={statement_timeout_ms}",
+        "keepalives": 1,
+        "keepalives_idle": KEEPALIVES_IDLE,
+    }
+
+
+def get_engine(conf_path: str, hostname: Optional[str] = None,
+               statement_timeout_ms: int = STATEMENT_TIMEOUT_MS) -> Engine:
+    """
+    接続設定ファイルとホスト名に対応する共有エンジンを取得する ※未生成なら生成する
+    :param conf_path: 接続設定ファイルパス (JSON形式)
+    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
+    :param statement_timeout_ms: ステートメントタイムアウト (ミリ秒) ※初回の生成時のみ有効
+    :return: エンジン
+    """
+    key: Tuple[str, str] = (os.path.abspath(conf_path), resolve_hostname(hostname))
+    engine: Optional[Engine] = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    url: URL = URL.create(**load_db_conf(conf_path, hostname=hostname))
+    engine = create_engine(
+        url, echo=False,
+        pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE, pool_pre_ping=True,
+        connect_args=_connect_args(url, statement_timeout_ms)
+    )
+    _engines[key] = engine
+    return engine
+
+
+def raw_connection(conf_path: str, hostname: Optional[str] = None) -> PoolProxiedConnection:
+    """
+    共有エンジンの接続プールからDB-API接続を取得する ※close() でプールに返却する
+    :param conf_path: 接続設定ファイルパス (JSON形式)
+    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
+    :return: DB-API接続 (psycopg2のカーソル等をそのまま使用できる)
+    """
+    return get_engine(conf_path, hostname=hostname).raw_connection()
+
+
+def dispose_engines() -> None:
+    """ 共有エンジンの接続を全てクローズする ※終了時に自動で呼び出す """
+    for engine in _engines.values():
+        engine.dispose()
+    _engines.clear()
+
+
+atexit.register(dispose_engines)
+
+
+def fetch_frame(bind: Union[Engine, Connection], query: str,
+                params: Optional[Mapping[str, Any]] = None,
+                parse_dates: Optional[List[str]] = None) -> DataFrame:
+    """
+    クエリーを実行し結果を列単位で DataFrame に変換する\n
+    エンジンを指定した場合は接続プールから接続を取得し、実行後にプールに返却する
+    :param bind: エンジンまたは接続
+    :param query: 選択クエリー (名前付きパラメータ :name)
+    :param params: クエリーパラメータ
+    :param parse_dates: 日時型に変換する列名リスト
+    :return: DataFrame ※0件なら列のみ
+    """
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            return fetch_frame(conn, query, params=params, parse_dates=parse_dates)
+
+    with span(PHASE_QUERY) as sp:
+        result = bind.execute(text(query), params or {})
+        columns: List[str] = list(result.keys())
+        rows: List[Tuple] = result.fetchall()
+        sp.rows = len(rows)
+    # 行タプルを列毎のリストに転置してから DataFrame を生成する
+    col_values: List[Tuple] = list(zip(*rows)) if rows else [() for _ in columns]
+    df: DataFrame = pd.DataFrame(dict(zip(columns, col_values)), columns=columns)
+    for col in parse_dates or []:
+        df[col] = pd.to_datetime(df[col])
+    return df
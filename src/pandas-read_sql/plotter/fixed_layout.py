@@ -0,0 +1,134 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from matplotlib.figure import Figure
+
+"""
+固定レイアウトでの画像保存ユーティリティ
+  bbox_inches="tight" での保存は余白計測のための描画と保存の描画の2回描画し、
+  さらに constrained_layout の場合は描画の度にレイアウト計算が実行される
+(1) 初回のみレイアウトエンジンでサブプロットの位置を計算し、図のサイズ・解像度毎にキャッシュする
+(2) 2回目以降はキャッシュした位置を設定しレイアウトエンジンを外して1回の描画で保存する
+    ※画像サイズは図のサイズ (figsize * dpi) のまま (余白のトリミングなし)
+"""
+
+# デフォルトのレイアウトキャッシュファイル (スクリプト直下)
+DEFAULT_LAYOUT_CACHE_FILE: str = os.path.join("cache", "fixed_layout.json")
+
+# プロセス内のレイアウトキャッシュ ※Webアプリなど常駐プロセスではファイルを使わない
+_layout_cache: Dict[str, List[List[float]]] = {}
+
+
+def make_layout_key(layout_name: str, fig: Figure) -> str:
+    """
+    レイアウトキャッシュのキーを生成する
+    :param layout_name: レイアウト名 (スクリプト名など)
+    :param fig: Figure
+    :return: キャッシュキー (レイアウト名, 図のサイズ(インチ), dpi, サブプロット数)
+    """
+    width, height = fig.get_size_inches()
+    return f"{layout_name}:{width:.4f}x{height:.4f}@{fig.dpi:g}:{len(fig.axes)}"
+
+
+def _load_cache_file(cache_file: str) -> Dict[str, List[List[float]]]:
+    """
+    レイアウトキャッシュファイルを読み込む
+    :param cache_file: レイアウトキャッシュファイル
+    :return: キャッシュキーとサブプロット毎の位置の辞書 ※ファイルが無ければ空の辞書
+    """
+    if not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, 'r') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache_file(cache_file: str, layouts: Dict[str, List[List[float]]]) -> None:
+    """
+    レイアウトキャッシュファイルを保存する
+    :param cache_file: レイアウトキャッシュファイル
+    :param layouts: キャッシュキーとサブプロット毎の位置の辞書
+    """
+    cache_dir: str = os.path.dirname(cache_file)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_file: str = cache_file + ".tmp"
+    with open(tmp_file, 'w') as fp:
+        json.dump(layouts, fp)
+    os.replace(tmp_file, cache_file)
+
+
+def compute_positions(fig: Figure) -> List[List[float]]:
+    """
+    レイアウトエンジンでサブプロットの位置を計算する
+    :param fig: Figure
+    :return: サブプロット毎の位置 [left, bottom, width, height] (図に対する割合)
+    """
+    engine = fig.get_layout_engine()
+    if engine is not None:
+        engine.execute(fig)
+    return [list(ax.get_position().bounds) for ax in fig.axes]
+
+
+def apply_positions(fig: Figure, positions: List[List[float]]) -> None:
+    """
+    サブプロットに計算済みの位置を設定しレイアウトエンジンを外す
+    :param fig: Figure
+    :param positions: サブプロット毎の位置
+    """
+    # None: レイアウトエンジンを外す ※"none" はプレースホルダーが残り保存時に事前描画が実行される
+    fig.set_layout_engine(None)
+    if fig.get_layout_engine() is not None:
+        # rcParams (figure.autolayout 等) でレイアウトエンジンが設定される場合
+        fig.set_layout_engine("none")
+    for ax, pos in zip(fig.axes, positions):
+        ax.set_position(pos)
+
+
+def fix_layout(fig: Figure, layout_name: str,
+               cache_file: Optional[str] = DEFAULT_LAYOUT_CACHE_FILE) -> bool:
+    """
+    キャッシュ済みのサブプロットの位置を設定する ※未キャッシュなら計算してキャッシュする
+    :param fig: Figure
+    :param layout_name: レイアウト名 (スクリプト名など)
+    :param cache_file: レイアウトキャッシュファイル ※Noneならプロセス内のみキャッシュする
+    :return: キャッシュヒットなら True
+    """
+    key: str = make_layout_key(layout_name, fig)
+    layouts: Dict[str, List[List[float]]] = (
+        _layout_cache if cache_file is None else _load_cache_file(cache_file)
+    )
+    positions: Optional[List[List[float]]] = layouts.get(key)
+    is_hit: bool = positions is not None and len(positions) == len(fig.axes)
+    if not is_hit:
+        positions = compute_positions(fig)
+        layouts[key] = positions
+        if cache_file is not None:
+            try:
+                _save_cache_file(cache_file, layouts)
+            except OSError:
+                pass
+    apply_positions(fig, positions)
+    return is_hit
+
+
+def save_figure(fig: Figure, fname, layout_name: str, fixed_layout: bool = False,
+                cache_file: Optional[str] = DEFAULT_LAYOUT_CACHE_FILE, **kwargs) -> None:
+    """
+    図を保存する
+    :param fig: Figure
+    :param fname: 保存先 (ファイルパスまたはバイトストリーム)
+    :param layout_name: レイアウト名 (スクリプト名など)
+    :param fixed_layout: True なら固定レイアウト (1回の描画), False なら bbox_inches="tight"
+    :param cache_file: レイアウトキャッシュファイル ※Noneならプロセス内のみキャッシュする
+    :param kwargs: Figure.savefig のその他の引数 (format など)
+    """
+    if fixed_layout:
+        fix_layout(fig, layout_name, cache_file=cache_file)
+        fig.savefig(fname, **kwargs)
+    else:
+        fig.savefig(fname, bbox_inches="tight", **kwargs)
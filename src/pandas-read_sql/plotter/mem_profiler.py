@@ -0,0 +1,275 @@
+import atexit
+import gc
+import json
+import logging
+import os
+import socket
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from plotter.phase_timer import DEFAULT_LOG_DIR, add_phase_listener
+
+"""
+tracemallocによるフェーズ毎のメモリプロファイルユーティリティ (--memprofile)
+(1) フェーズ (util.phase_timer のスパン) の開始・終了時にスナップショットを取得し、
+    フェーズ毎の増減, ピーク (トレース対象メモリ), 終了時のRSS・最大RSS, 増加量上位の割り当て箇所を記録する
+(2) 終了時 (exit() を含む) に図を破棄してガベージコレクション後の残存メモリを記録する
+(3) 1実行1行のJSON (logs/<スクリプト名>.memprofile.jsonl) を追記する ※実行間の比較用
+[注意] スナップショットの取得に時間がかかるため --timing と同時に指定した場合の処理時間は参考値
+       RSSは /proc/self/statm (Linux) から取得する ※取得できない環境では null
+"""
+
+# 計測結果ファイル名フォーマット (JSON Lines)
+FMT_MEMPROFILE_LOG: str = "{}.memprofile.jsonl"
+# 割り当て箇所の出力件数
+DEFAULT_TOP_N: int = 10
+# 割り当て箇所のスタックフレーム数
+TRACE_FRAMES: int = 1
+# 割り当て箇所の集計から除外するファイル
+IGNORE_FILES: List[str] = ["<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+                           "<unknown>", tracemalloc.__file__]
+# RSSの取得元 (Linux)
+PROC_STATM: str = "/proc/self/statm"
+
+
+def current_rss_kb() -> Optional[int]:
+    """
+    現在のRSSを取得する
+    :return: RSS (KB) ※取得できない場合は None
+    """
+    try:
+        with open(PROC_STATM) as fp:
+            pages: int = int(fp.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss_kb() -> Optional[int]:
+    """
+    実行開始からの最大RSSを取得する
+    :return: 最大RSS (KB) ※取得できない場合は None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+def _filter_snapshot(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces(
+        [tracemalloc.Filter(False, file_name) for file_name in IGNORE_FILES]
+    )
+
+
+def top_sites(current: tracemalloc.Snapshot, base: tracemalloc.Snapshot,
+              top_n: int) -> List[Dict[str, Any]]:
+    """
+    スナップショット間で割り当てが増加した箇所の上位を取得する
+    :param current: 後のスナップショット
+    :param base: 前のスナップショット
+    :param top_n: 出力件数
+    :return: 割り当て箇所 (ファイル名:行番号) と増加バイト数・件数のリスト
+    """
+    result: List[Dict[str, Any]] = []
+    for stat in current.compare_to(base, "lineno")[:top_n]:
+        if stat.size_diff <= 0:
+            break
+        frame: tracemalloc.Frame = stat.traceback[0]
+        result.append({
+            "site": f"{frame.filename}:{frame.lineno}",
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+        })
+    return result
+
+
+class _PhaseMemory:
+    """ 実行中の1フェーズのメモリ計測情報 """
+    __slots__ = ("name", "snapshot", "start_bytes", "peak_bytes")
+
+    def __init__(self, name: str, snapshot: tracemalloc.Snapshot, start_bytes: int):
+        self.name: str = name
+        self.snapshot: tracemalloc.Snapshot = snapshot
+        self.start_bytes: int = start_bytes
+        self.peak_bytes: int = start_bytes
+
+
+class MemProfiler:
+    """ フェーズ毎のメモリ使用量を計測し記録するクラス """
+
+    def __init__(self, script_name: str, log_dir: str = DEFAULT_LOG_DIR,
+                 top_n: int = DEFAULT_TOP_N, **context):
+        """
+        :param script_name: スクリプト名
+        :param log_dir: 計測結果の出力ディレクトリ
+        :param top_n: フェーズ毎の割り当て箇所の出力件数
+        :param context: 計測結果に付加する実行条件 (年月など)
+        """
+        self.script_name: str = script_name
+        self.log_dir: str = log_dir
+        self.top_n: int = top_n
+        self.context: Dict[str, Any] = context
+        self.phases: List[Dict[str, Any]] = []
+        self._stack: List[_PhaseMemory] = []
+        self._started_at: datetime = datetime.now().astimezone()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_bytes: int = 0
+        self._written: bool = False
+
+    def start(self) -> None:
+        """ トレースを開始しベースラインのスナップショットを取得する """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._baseline = _filter_snapshot(tracemalloc.take_snapshot())
+        self._baseline_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        add_phase_listener(self._on_phase)
+
+    def _update_peak(self) -> int:
+        """
+        前回の境界からのピークを実行中の全フェーズに反映しピークをリセットする
+        :return: 現在のトレース対象メモリ (バイト)
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        for phase in self._stack:
+            phase.peak_bytes = max(phase.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _on_phase(self, name: str, is_start: bool) -> None:
+        """
+        フェーズの開始・終了時にスナップショットを取得する (フェーズリスナー)
+        :param name: フェーズ名
+        :param is_start: 開始なら True
+        """
+        current: int = self._update_peak()
+        snapshot: tracemalloc.Snapshot = _filter_snapshot(tracemalloc.take_snapshot())
+        if is_start:
+            self._stack.append(_PhaseMemory(name, snapshot, current))
+            return
+
+        phase: _PhaseMemory = self._stack.pop()
+        self.phases.append({
+            "phase": phase.name,
+            "depth": len(self._stack),
+            "start_bytes": phase.start_bytes,
+            "end_bytes": current,
+            "delta_bytes": current - phase.start_bytes,
+            "peak_bytes": phase.peak_bytes,
+            "peak_delta_bytes": phase.peak_bytes - phase.start_bytes,
+            "rss_kb": current_rss_kb(),
+            "max_rss_kb": max_rss_kb(),
+            "top_sites": top_sites(snapshot, phase.snapshot, self.top_n),
+        })
+
+    def retained(self) -> Dict[str, Any]:
+        """
+        図を破棄しガベージコレクション後にベースラインから残存しているメモリを取得する
+        :return: 残存メモリの辞書
+        """
+        # pyplotを使用しているスクリプトのみ全ての図を破棄する
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is not None:
+            plt.close("all")
+        gc.collect()
+        current: int = tracemalloc.get_traced_memory()[0]
+        snapshot: tracemalloc.Snapshot = _filter_snapshot(tracemalloc.take_snapshot())
+        return {
+            "traced_bytes": current,
+            "retained_bytes": current - self._baseline_bytes,
+            "rss_kb": current_rss_kb(),
+            "top_sites": top_sites(snapshot, self._baseline, self.top_n),
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        """
+        1実行分の計測結果を生成する
+        :return: 計測結果の辞書 (フェーズは終了順)
+        """
+        retained: Dict[str, Any] = self.retained()
+        return {
+            "script": self.script_name,
+            "host": socket.gethostname(),
+            "started_at": self._started_at.isoformat(timespec="milliseconds"),
+            **self.context,
+            "baseline_bytes": self._baseline_bytes,
+            "max_rss_kb": max_rss_kb(),
+            "phases": self.phases,
+            "retained": retained,
+        }
+
+    def write(self) -> Optional[Dict[str, Any]]:
+        """
+        計測結果を1行のJSONとして計測結果ファイルに追記しトレースを終了する ※1実行につき1回のみ
+        :return: 計測結果 ※出力済みなら None
+        """
+        if self._written:
+            return None
+
+        self._written = True
+        record: Dict[str, Any] = self.to_record()
+        tracemalloc.stop()
+        os.makedirs(self.log_dir, exist_ok=True)
+        stem: str = os.path.splitext(self.script_name)[0]
+        with open(os.path.join(self.log_dir, FMT_MEMPROFILE_LOG.format(stem)), 'a') as fp:
+            fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+
+def summarize(record: Dict[str, Any]) -> str:
+    """
+    計測結果のサマリーを生成する
+    :param record: 計測結果
+    :return: サマリー文字列 (フェーズ毎の増減・ピーク, 最大RSS, 残存メモリ)
+    """
+    mb: float = 1024. * 1024.
+    lines: List[str] = [f"memprofile: max_rss={record['max_rss_kb']}KB"]
+    for phase in record["phases"]:
+        top: str = phase["top_sites"][0]["site"] if phase["top_sites"] else "-"
+        lines.append(
+            f"  {'  ' * phase['depth']}{phase['phase']}: delta={phase['delta_bytes'] / mb:.2f}MB,"
+            f" peak_delta={phase['peak_delta_bytes'] / mb:.2f}MB, rss={phase['rss_kb']}KB, top={top}"
+        )
+    retained: Dict[str, Any] = record["retained"]
+    lines.append(f"  retained: {retained['retained_bytes'] / mb:.2f}MB, rss={retained['rss_kb']}KB")
+    return "\n".join(lines)
+
+
+def start_memprofiler(script_name: str, enabled: bool,
+                      log_dir: str = DEFAULT_LOG_DIR,
+                      logger: Optional[logging.Logger] = None,
+                      top_n: int = DEFAULT_TOP_N, **context) -> Optional[MemProfiler]:
+    """
+    メモリプロファイルを開始する ※終了時 (exit() を含む) に計測結果の出力とサマリーのログ出力を行う
+    :param script_name: スクリプト名
+    :param enabled: 計測の有効/無効
+    :param log_dir: 計測結果の出力ディレクトリ
+    :param logger: サマリー出力先のロガー ※Noneなら標準出力
+    :param top_n: フェーズ毎の割り当て箇所の出力件数
+    :param context: 計測結果に付加する実行条件 (年月など)
+    :return: プロファイラ ※無効の場合は None
+    """
+    if not enabled:
+        return None
+
+    profiler: MemProfiler = MemProfiler(script_name, log_dir=log_dir, top_n=top_n, **context)
+
+    def finish() -> None:
+        record: Optional[Dict[str, Any]] = profiler.write()
+        if record is None:
+            return
+        if logger is not None:
+            logger.info(summarize(record))
+        else:
+            print(summarize(record))
+
+    atexit.register(finish)
+    profiler.start()
+    return profiler
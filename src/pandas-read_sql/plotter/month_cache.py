@@ -0,0 +1,94 @@
+import hashlib
+import os
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+"""
+月単位の観測データキャッシュ
+(1) キャッシュキー: (データベース, デバイス名, 集計間隔, 年月) ※1エントリ = 1ヶ月分の集計結果
+(2) 保存形式: 列単位の numpy圧縮ファイル (.npz) ※測定時刻は datetime64[ns]
+(3) 完了月 (前月以前) のみキャッシュする ※過去の観測データは変更されない
+"""
+
+# デフォルトのキャッシュディレクトリ (スクリプト直下)
+DEFAULT_CACHE_DIR: str = "cache"
+# キャッシュファイル拡張子
+CACHE_FILE_EXT: str = ".npz"
+# 年月フォーマット
+FMT_YEAR_MONTH: str = "%Y-%m"
+# キャッシュファイルのメタデータキー
+KEY_COLUMNS: str = "__columns__"
+
+
+def is_completed_month(year_month: str) -> bool:
+    """
+    完了月 (前月以前) か判定する
+    :param year_month: 年月 (形式: "%Y-%m")
+    :return: 完了月なら True
+    """
+    return year_month < date.today().strftime(FMT_YEAR_MONTH)
+
+
+def db_key(db_name: str) -> str:
+    """
+    データベースの識別名をキャッシュディレクトリ名に変換する
+    :param db_name: データベースの識別名 (SQLite3ならデータベースファイルの絶対パス)
+    :return: ハッシュ化したディレクトリ名
+    """
+    return hashlib.sha1(db_name.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(cache_dir: str, db_name: str, device_name: str,
+               bucket_seconds: int, year_month: str) -> str:
+    """
+    キャッシュファイルパスを取得する ※データベース名はハッシュ化してディレクトリ名とする
+    :param cache_dir: キャッシュディレクトリ
+    :param db_name: データベースの識別名 (SQLite3ならデータベースファイルの絶対パス)
+    :param device_name: デバイス名
+    :param bucket_seconds: 集計間隔 (秒)
+    :param year_month: 年月
+    :return: キャッシュファイルパス
+    """
+    return os.path.join(cache_dir, db_key(db_name), device_name, str(bucket_seconds),
+                        year_month + CACHE_FILE_EXT)
+
+
+def save_month(path: str, df: DataFrame) -> None:
+    """
+    1ヶ月分の観測データを列単位でキャッシュファイルに保存する
+    :param path: キャッシュファイルパス
+    :param df: 1ヶ月分の観測データ
+    """
+    arrays: Dict[str, np.ndarray] = {KEY_COLUMNS: np.array(df.columns, dtype=np.str_)}
+    for col_idx, col_name in enumerate(df.columns):
+        arrays[str(col_idx)] = df[col_name].to_numpy()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 書き込み途中のファイルを読まないように一時ファイルから置き換える
+    tmp_path: str = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        np.savez_compressed(fp, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_month(path: str) -> Optional[DataFrame]:
+    """
+    キャッシュファイルから1ヶ月分の観測データを読み込む
+    :param path: キャッシュファイルパス
+    :return: 観測データ ※ファイルが存在しないか読み込めない場合はNone
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as npz:
+            columns = npz[KEY_COLUMNS].tolist()
+            return pd.DataFrame(
+                {col_name: npz[str(col_idx)] for col_idx, col_name in enumerate(columns)},
+                columns=columns
+            )
+    except (OSError, ValueError, KeyError):
+        return None
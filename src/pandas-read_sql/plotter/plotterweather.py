@@ -1,7 +1,7 @@
 import base64
 import logging
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, tzinfo
 from typing import Dict, List, Optional
 
 from matplotlib import rcParams
@@ -11,8 +11,16 @@ from matplotlib.figure import Figure
 from matplotlib.patches import Patch
 
 import numpy as np
+import pandas as pd
 from pandas.core.frame import DataFrame, Series
 
+from plotter.fixed_layout import save_figure
+from plotter.gap_util import gap_segments, insert_gap_breaks, shade_gaps
+from plotter.log_util import frame_summary
+from plotter.phase_timer import PHASE_ENCODE, PHASE_FIGURE, PHASE_TRANSFORM, span, timed_draw
+from plotter.resolution import JST_OFFSET_SECONDS, max_column, min_column
+from plotter.sensor_validation import VALID_RANGES
+
 """ 
 前年と比較した気象データ画像のbase64エンコードテキストデータを出力する
 """
@@ -20,9 +28,22 @@ from pandas.core.frame import DataFrame, Series
 rcParams['font.family'] = "sans-serif"
 rcParams['font.sans-serif'] = ["IPAexGothic"]
 
+# 固定レイアウトのキャッシュキー用レイアウト名
+LAYOUT_NAME: str = "plotterweather"
+LAYOUT_NAME_DEVICES: str = "plotterweather_devices"
+LAYOUT_NAME_YEARS: str = "plotterweather_years"
+LAYOUT_NAME_CLIMATE: str = "plotterweather_climate"
+LAYOUT_NAME_RANGE: str = "plotterweather_range"
+
 # pandas.DataFrameのインデックス列
 COL_TIME: str = 'measurement_time'
 COL_PREV_PLOT_TIME: str = 'prev_plot_measurement_time'
+# 共通年に揃えたプロット用の測定時刻列 (N年比較)
+COL_PLOT_TIME: str = 'plot_measurement_time'
+# 気候値の分位点バンド列 (下限, 中央値, 上限)
+COL_BAND_LOWER: str = 'band_lower'
+COL_BAND_MEDIAN: str = 'band_median'
+COL_BAND_UPPER: str = 'band_upper'
 # 観測データ列
 COL_TEMP_OUT: str = 'temp_out'
 COL_HUMID: str = "humid"
@@ -36,6 +57,13 @@ Y_LABEL_TEMP_OUT: str = '外気温 (℃)'
 
 # タイトルフォーマット
 FMT_MEASUREMENT_RANGE: str = "{} − {} データ比較"
+FMT_DEVICES_TITLE: str = "{} デバイス比較 ({})"
+FMT_YEARS_TITLE: str = "{month}月 {years}年間比較 ({first} − {last})"
+FMT_CLIMATE_TITLE: str = "{} 気候値 (通日毎の分布) 比較"
+FMT_RANGE_TITLE: str = "{device} {first} − {last} 観測データ ({resolution})"
+# 気候値バンドの凡例
+FMT_BAND_LABEL: str = "気候値 {lower:.0%}〜{upper:.0%}"
+BAND_MEDIAN_LABEL: str = "気候値 中央値"
 # 平均値文字列
 FMT_JP_YEAR_MONTH: str = "{year}年{month}月"
 FMT_AVEG_TEXT: str = "{jp_year_month} 平均{type} {value:#.1f} {unit}"
@@ -52,14 +80,24 @@ CURR_COLOR: str = 'C0'
 PREV_COLOR: str = 'C1'
 # 平均線スタイル
 AVEG_LINE_STYLE: Dict = {'linestyle': 'dashdot', 'linewidth': 1.}
-CURR_AVEG_LINE_STYLE: Dict = {'color': CURR_COLOR, **AVEG_LINE_STYLE}
-PREV_AVEG_LINE_STYLE: Dict = {'color': PREV_COLOR, **AVEG_LINE_STYLE}
+# 集計データ (--resolution) の最小値・最大値の包絡線スタイル
+ENVELOPE_LINE_STYLE: Dict = {'linewidth': 0.5, 'alpha': 0.5}
+# 気候値バンドのカラー: 'tab:gray'
+BAND_COLOR: str = 'C7'
+# 気候値バンドの塗りつぶしスタイル
+BAND_FILL_STYLE: Dict = {'alpha': 0.3, 'linewidth': 0.}
+# 気候値バンドの中央値線スタイル
+BAND_MEDIAN_STYLE: Dict = {'linestyle': 'dashed', 'linewidth': 1.}
 # プロット領域のラベルスタイル
 LABEL_STYLE: Dict = {'fontsize': 10, }
 # 凡例スタイル
 LEGEND_STYLE: Dict = {'fontsize': 10, }
 # タイトルスタイル
 TITLE_STYLE: Dict = {'fontsize': 11, }
+# 配列版 (gen_plot_image_arrays) の測定時刻の表示タイムゾーン (日本時間)
+DISPLAY_TZ: tzinfo = timezone(timedelta(seconds=JST_OFFSET_SECONDS))
+# 配列版の観測データ列 (集計データは最小値・最大値列も可)
+ARRAY_VALUE_COLUMNS: List[str] = [COL_TEMP_OUT, COL_HUMID, COL_PRESSURE]
 
 
 def datetime_plus_1_year(prev_datetime: datetime) -> datetime:
@@ -121,13 +159,78 @@ def set_ylim_with_axes(plot_axes: Axes, curr_ser: Series, prev_ser: Series) -> N
     :param curr_ser: 最新データ
     :param prev_ser: 前年データ
     """
-    val_min: float = np.min([curr_ser.min(), prev_ser.min()])
-    val_max: float = np.max([curr_ser.max(), prev_ser.max()])
+    set_ylim_with_series(plot_axes, [curr_ser, prev_ser])
+
+
+def set_ylim_with_series(plot_axes: Axes, ser_list: List[Series],
+                         col_name: Optional[str] = None) -> None:
+    """
+    複数データの最大値・最小値 (欠損値を除く) からY軸の範囲を設定する\n
+    有効な値が無い (全て欠損値・不正値) 場合は観測項目の物理的な範囲 ※NaN は軸の範囲に設定できない
+    :param plot_axes: プロット領域
+    :param ser_list: データのリスト
+    :param col_name: 観測項目列名 (VALID_RANGES のキー) ※未指定なら有効な値が無い場合は設定しない
+    """
+    valid_list: List[Series] = [ser for ser in ser_list if ser.count() > 0]
+    if len(valid_list) == 0:
+        if col_name in VALID_RANGES:
+            plot_axes.set_ylim(*VALID_RANGES[col_name])
+        return
+
+    val_min: float = np.min([ser.min() for ser in valid_list])
+    val_max: float = np.max([ser.max() for ser in valid_list])
     val_min = np.floor(val_min / 10.) * 10.
     val_max = np.ceil(val_max / 10.) * 10.
     plot_axes.set_ylim(val_min, val_max)
 
 
+def value_range_series(df: DataFrame, col_name: str) -> List[Series]:
+    """
+    Y軸の範囲の計算対象のデータを取得する
+    :param df: 観測データのDataFrame
+    :param col_name: 観測データ列名
+    :return: 集計データなら最小値・最大値列, それ以外は観測データ列のリスト
+    """
+    if min_column(col_name) in df.columns:
+        return [df[min_column(col_name)], df[max_column(col_name)]]
+    return [df[col_name]]
+
+
+def plot_envelope(plot_axes: Axes, x_ser: Series, df: DataFrame, col_name: str,
+                  s_color: str) -> None:
+    """
+    集計データ (--resolution) なら最小値・最大値の包絡線をプロットする ※観測データのみなら何もしない
+    :param plot_axes: プロット領域
+    :param x_ser: X軸データ (測定時刻)
+    :param df: 観測データのDataFrame
+    :param col_name: 観測データ列名
+    :param s_color: 線カラー
+    """
+    if min_column(col_name) not in df.columns:
+        return
+
+    for envelope_col in (min_column(col_name), max_column(col_name)):
+        plot_axes.plot(x_ser, df[envelope_col], color=s_color, **ENVELOPE_LINE_STYLE)
+
+
+def plot_with_average(plot_axes: Axes, x_ser: Series, y_ser: Series,
+                      plot_label: str, s_color: str, dict_ave: Dict) -> Patch:
+    """
+    データと平均線をプロットし凡例用の平均値パッチを生成する
+    :param plot_axes: プロット領域
+    :param x_ser: X軸データ (測定時刻)
+    :param y_ser: Y軸データ
+    :param plot_label: 凡例用ラベル (年月, デバイス名等)
+    :param s_color: 線カラー
+    :param dict_ave: データ型ごとの置換用辞書オブジェクト
+    :return: 平均値パッチ
+    """
+    plot_axes.plot(x_ser, y_ser, color=s_color, marker="")
+    val_ave = y_ser.mean()
+    plot_axes.axhline(val_ave, color=s_color, **AVEG_LINE_STYLE)
+    return make_average_patch(plot_label, val_ave, s_color, dict_ave)
+
+
 def _temperature_plotting(
         ax_temp: Axes,
         df_curr: DataFrame, df_prev: DataFrame,
@@ -145,17 +248,16 @@ def _temperature_plotting(
     :param prev_plot_label: 前年ラベル
     """
     # 最低・最高
-    set_ylim_with_axes(ax_temp, curr_temp_ser, prev_temp_ser)
+    set_ylim_with_series(ax_temp, value_range_series(df_curr, COL_TEMP_OUT)
+                         + value_range_series(df_prev, COL_TEMP_OUT), col_name=COL_TEMP_OUT)
     # 最新年月の外気温
-    ax_temp.plot(df_curr[COL_TIME], curr_temp_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_temp_ser.mean()
-    curr_patch = make_average_patch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_TEMP)
-    ax_temp.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+    curr_patch = plot_with_average(ax_temp, df_curr[COL_TIME], curr_temp_ser,
+                                   curr_plot_label, CURR_COLOR, DICT_AVEG_TEMP)
+    plot_envelope(ax_temp, df_curr[COL_TIME], df_curr, COL_TEMP_OUT, CURR_COLOR)
     # 前年月の外気温
-    ax_temp.plot(df_prev[COL_PREV_PLOT_TIME], prev_temp_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_temp_ser.mean()
-    prev_patch = make_average_patch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_TEMP)
-    ax_temp.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+    prev_patch = plot_with_average(ax_temp, df_prev[COL_PREV_PLOT_TIME], prev_temp_ser,
+                                   prev_plot_label, PREV_COLOR, DICT_AVEG_TEMP)
+    plot_envelope(ax_temp, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_TEMP_OUT, PREV_COLOR)
     ax_temp.set_ylabel(Y_LABEL_TEMP_OUT, **LABEL_STYLE)
     # 凡例
     ax_temp.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
@@ -173,15 +275,13 @@ def _humid_plotting(ax_humid: Axes,
     """
     ax_humid.set_ylim(ymin=0., ymax=100.)
     # 最新年月
-    ax_humid.plot(df_curr[COL_TIME], curr_humid_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_humid_ser.mean()
-    curr_patch = make_average_patch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_HUMID)
-    ax_humid.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+    curr_patch = plot_with_average(ax_humid, df_curr[COL_TIME], curr_humid_ser,
+                                   curr_plot_label, CURR_COLOR, DICT_AVEG_HUMID)
+    plot_envelope(ax_humid, df_curr[COL_TIME], df_curr, COL_HUMID, CURR_COLOR)
     # 前年月
-    ax_humid.plot(df_prev[COL_PREV_PLOT_TIME], prev_humid_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_humid_ser.mean()
-    prev_patch = make_average_patch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_HUMID)
-    ax_humid.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+    prev_patch = plot_with_average(ax_humid, df_prev[COL_PREV_PLOT_TIME], prev_humid_ser,
+                                   prev_plot_label, PREV_COLOR, DICT_AVEG_HUMID)
+    plot_envelope(ax_humid, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_HUMID, PREV_COLOR)
     ax_humid.set_ylabel(Y_LABEL_HUMID, **LABEL_STYLE)
     # 凡例
     ax_humid.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
@@ -198,17 +298,16 @@ def _pressure_plotting(
     気圧サブプロット(axes)に軸・軸ラベルを設定し、DataFrameオプジェクトの気圧データをプロットする
     """
     # 最大値と最小値からY軸範囲を設定
-    set_ylim_with_axes(ax_pressure, df_curr[COL_PRESSURE], df_prev[COL_PRESSURE])
+    set_ylim_with_series(ax_pressure, value_range_series(df_curr, COL_PRESSURE)
+                         + value_range_series(df_prev, COL_PRESSURE), col_name=COL_PRESSURE)
     # 最新年月
-    ax_pressure.plot(df_curr[COL_TIME], curr_pressure_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_pressure_ser.mean()
-    curr_patch = make_average_patch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_PRESSURE)
-    ax_pressure.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+    curr_patch = plot_with_average(ax_pressure, df_curr[COL_TIME], curr_pressure_ser,
+                                   curr_plot_label, CURR_COLOR, DICT_AVEG_PRESSURE)
+    plot_envelope(ax_pressure, df_curr[COL_TIME], df_curr, COL_PRESSURE, CURR_COLOR)
     # 前年月
-    ax_pressure.plot(df_prev[COL_PREV_PLOT_TIME], prev_pressure_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_pressure_ser.mean()
-    prev_patch = make_average_patch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_PRESSURE)
-    ax_pressure.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+    prev_patch = plot_with_average(ax_pressure, df_prev[COL_PREV_PLOT_TIME], prev_pressure_ser,
+                                   prev_plot_label, PREV_COLOR, DICT_AVEG_PRESSURE)
+    plot_envelope(ax_pressure, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_PRESSURE, PREV_COLOR)
     ax_pressure.set_ylabel(Y_LABEL_PRESSURE, **LABEL_STYLE)
     # 凡例
     ax_pressure.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
@@ -219,7 +318,9 @@ def _pressure_plotting(
 # 比較年月用の観測データの画像を生成する
 def gen_plot_image(
         df_curr: DataFrame, df_prev: DataFrame, year_month: str, prev_year_month: str,
-        logger: Optional[logging.Logger] = None) -> str:
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None) -> str:
     """
     指定年月とその前年の観測データをプロットした画像のBase64エンコード済み文字列を生成する
     :param df_curr: 指定年月の観測データのDataFrame
@@ -227,6 +328,8 @@ def gen_plot_image(
     :param year_month: 指定年月 (形式: "%Y-%m")
     :param prev_year_month: 前年の年月 (形式: "%Y-%m")
     :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
     :return: 画像のBase64エンコード済み文字列
     """
 
@@ -238,52 +341,518 @@ def gen_plot_image(
     # タイトル
     title: str = FMT_MEASUREMENT_RANGE.format(curr_plot_label, prev_plot_label)
 
-    # (1) 外気温データ(今年・前年)
-    curr_temp_ser: Series = df_curr[COL_TEMP_OUT]
-    prev_temp_ser: Series = df_prev[COL_TEMP_OUT]
-    # (2) 湿度データ(今年・前年)
-    curr_humid_ser: Series = df_curr[COL_HUMID]
-    prev_humid_ser: Series = df_prev[COL_HUMID]
-    # (3) 気圧データ(今年・前年)
-    curr_pressure_ser: Series = df_curr[COL_PRESSURE]
-    prev_pressure_ser: Series = df_prev[COL_PRESSURE]
-    # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
-    df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(datetime_plus_1_year)
-    if logger is not None:
-        logger.debug(f"{df_prev}")
-
-    fig: Figure
-    ax_temp: Axes
-    ax_humid: Axes
-    ax_pressure: Axes
-    # PCブラウザはinch指定でdpi=72
-    fig = Figure(figsize=(9.8, 6.4), constrained_layout=True)
-    if logger is not None:
-        logger.info(f"fig: {fig}")
-    # x軸を共有する3行1列のサブプロット生成
-    (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
-    # Y方向のグリッド線のみ表示
-    for ax in [ax_temp, ax_humid, ax_pressure]:
-        ax.grid(**GRID_STYLE)
-
-    # (1) 外気温領域のプロット
-    _temperature_plotting(ax_temp,
-                          df_curr, df_prev, curr_temp_ser, prev_temp_ser,
-                          title, curr_plot_label, prev_plot_label)
-    # (2) 湿度領域のプロット
-    _humid_plotting(ax_humid,
-                    df_curr, df_prev, curr_humid_ser, prev_humid_ser,
-                    curr_plot_label, prev_plot_label)
-    # (3) 気圧領域のプロット
-    _pressure_plotting(ax_pressure,
-                       df_curr, df_prev, curr_pressure_ser, prev_pressure_ser,
-                       curr_plot_label, prev_plot_label)
+    with span(PHASE_TRANSFORM):
+        # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
+        df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(datetime_plus_1_year)
+        # 欠測区間に区切り行を挿入する
+        curr_gaps: np.ndarray
+        df_curr, curr_gaps = insert_gap_breaks(df_curr, COL_TIME, gap_threshold)
+        df_prev, _ = insert_gap_breaks(df_prev, COL_PREV_PLOT_TIME, gap_threshold)
+        # (1) 外気温データ(今年・前年)
+        curr_temp_ser: Series = df_curr[COL_TEMP_OUT]
+        prev_temp_ser: Series = df_prev[COL_TEMP_OUT]
+        # (2) 湿度データ(今年・前年)
+        curr_humid_ser: Series = df_curr[COL_HUMID]
+        prev_humid_ser: Series = df_prev[COL_HUMID]
+        # (3) 気圧データ(今年・前年)
+        curr_pressure_ser: Series = df_curr[COL_PRESSURE]
+        prev_pressure_ser: Series = df_prev[COL_PRESSURE]
+        if logger is not None:
+            logger.debug(frame_summary(df_prev, "df_prev"))
+
+    with span(PHASE_FIGURE):
+        fig: Figure
+        ax_temp: Axes
+        ax_humid: Axes
+        ax_pressure: Axes
+        # PCブラウザはinch指定でdpi=72
+        fig = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        if logger is not None:
+            logger.info(f"fig: {fig}")
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # Y方向のグリッド線のみ表示, 最新年月の欠測区間を塗りつぶす
+        for ax in [ax_temp, ax_humid, ax_pressure]:
+            ax.grid(**GRID_STYLE)
+            shade_gaps(ax, curr_gaps, CURR_COLOR)
+
+        # (1) 外気温領域のプロット
+        _temperature_plotting(ax_temp,
+                              df_curr, df_prev, curr_temp_ser, prev_temp_ser,
+                              title, curr_plot_label, prev_plot_label)
+        # (2) 湿度領域のプロット
+        _humid_plotting(ax_humid,
+                        df_curr, df_prev, curr_humid_ser, prev_humid_ser,
+                        curr_plot_label, prev_plot_label)
+        # (3) 気圧領域のプロット
+        _pressure_plotting(ax_pressure,
+                           df_curr, df_prev, curr_pressure_ser, prev_pressure_ser,
+                           curr_plot_label, prev_plot_label)
 
     # 画像をバイトストリームに溜め込みそれをbase64エンコードしてレスポンスとして返す
-    buf = BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    data = base64.b64encode(buf.getbuffer()).decode("ascii")
+    return _gen_figure_image(fig, LAYOUT_NAME, fixed_layout, logger=logger)
+
+
+def _gen_figure_image(fig: Figure, layout_name: str, fixed_layout: bool,
+                      logger: Optional[logging.Logger] = None) -> str:
+    """
+    図をPNG形式で保存しBase64エンコードする
+    :param fig: 図
+    :param layout_name: 固定レイアウトのレイアウト名
+    :param fixed_layout: True なら固定レイアウトで保存する
+    :param logger: application logger
+    :return: 画像のBase64エンコード済み文字列
+    """
+    # エンコードの処理時間は描画 (Figure.draw) を除いて計測する
+    with span(PHASE_ENCODE), timed_draw(fig):
+        buf = BytesIO()
+        save_figure(fig, buf, layout_name, fixed_layout=fixed_layout, cache_file=None,
+                    format="png")
+        data = base64.b64encode(buf.getbuffer()).decode("ascii")
     if logger is not None:
         logger.debug(f"data.len: {len(data)}")
-    # base64エンコード文字列
     return "data:image/png;base64," + data
+
+
+# 複数デバイスの同一年月の観測データの画像を生成する
+def gen_devices_plot_image(
+        device_dfs: Dict[str, DataFrame], year_month: str,
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None) -> str:
+    """
+    指定年月の複数デバイスの観測データを重ねてプロットした画像のBase64エンコード済み文字列を生成する\n
+    線カラーはデバイスの指定順にカラーサイクル (C0, C1, ...) を割り当てる
+    :param device_dfs: デバイス名をキーとする観測データのDataFrame (指定順)
+    :param year_month: 指定年月 (形式: "%Y-%m")
+    :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :return: 画像のBase64エンコード済み文字列
+    """
+    device_names: List[str] = list(device_dfs.keys())
+    title: str = FMT_DEVICES_TITLE.format(make_legend_label(year_month), ", ".join(device_names))
+    fig: Figure = _gen_overlay_figure(device_dfs, COL_TIME, title, logger=logger,
+                                      gap_threshold=gap_threshold)
+    return _gen_figure_image(fig, LAYOUT_NAME_DEVICES, fixed_layout, logger=logger)
+
+
+# 複数年の同一月の観測データの画像を生成する
+def gen_years_plot_image(
+        year_dfs: Dict[str, DataFrame],
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None) -> str:
+    """
+    複数年の同一月の観測データを共通年に揃えて重ねてプロットした画像のBase64エンコード済み文字列を生成する\n
+    線カラーは年月の指定順 (最新年月が先頭) にカラーサイクル (C0, C1, ...) を割り当てる
+    :param year_dfs: 年月 (形式: "%Y-%m") をキーとする観測データのDataFrame (プロット用の測定時刻列付き)
+    :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :return: 画像のBase64エンコード済み文字列
+    """
+    year_months: List[str] = list(year_dfs.keys())
+    years: List[str] = sorted(year_month.split("-")[0] for year_month in year_months)
+    title: str = FMT_YEARS_TITLE.format(
+        month=int(year_months[0].split("-")[1]), years=len(years), first=years[0], last=years[-1])
+    label_dfs: Dict[str, DataFrame] = {
+        make_legend_label(year_month): df for year_month, df in year_dfs.items()
+    }
+    fig: Figure = _gen_overlay_figure(label_dfs, COL_PLOT_TIME, title, logger=logger,
+                                      gap_threshold=gap_threshold)
+    return _gen_figure_image(fig, LAYOUT_NAME_YEARS, fixed_layout, logger=logger)
+
+
+def _gen_overlay_figure(label_dfs: Dict[str, DataFrame], col_x: str, title: str,
+                        logger: Optional[logging.Logger] = None,
+                        gap_threshold: Optional[pd.Timedelta] = None) -> Figure:
+    """
+    複数の観測データを外気温・湿度・気圧の各領域に重ねてプロットした図を生成する\n
+    線カラーは指定順にカラーサイクル (C0, C1, ...) を割り当てる
+    :param label_dfs: 凡例用ラベル (デバイス名, 年月等) をキーとする観測データのDataFrame (指定順)
+    :param col_x: X軸の測定時刻列名
+    :param title: タイトル
+    :param logger: application logger
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :return: 図
+    """
+    colors: List[str] = [f"C{i}" for i in range(len(label_dfs))]
+    # 欠測区間に区切り行を挿入する ※重ねた線が見づらくなるため欠測区間は塗りつぶさない
+    with span(PHASE_TRANSFORM):
+        label_dfs = {
+            label: insert_gap_breaks(df, col_x, gap_threshold)[0] for label, df in label_dfs.items()
+        }
+
+    with span(PHASE_FIGURE):
+        fig: Figure = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        if logger is not None:
+            logger.info(f"fig: {fig}")
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # (描画領域, 列名, Y軸ラベル, 平均値の置換用辞書オブジェクト)
+        panels = [
+            (ax_temp, COL_TEMP_OUT, Y_LABEL_TEMP_OUT, DICT_AVEG_TEMP),
+            (ax_humid, COL_HUMID, Y_LABEL_HUMID, DICT_AVEG_HUMID),
+            (ax_pressure, COL_PRESSURE, Y_LABEL_PRESSURE, DICT_AVEG_PRESSURE),
+        ]
+        for ax, col_name, y_label, dict_ave in panels:
+            ax.grid(**GRID_STYLE)
+            patches: List[Patch] = [
+                plot_with_average(ax, df[col_x], df[col_name], label, color, dict_ave)
+                for (label, df), color in zip(label_dfs.items(), colors)
+            ]
+            ax.set_ylabel(y_label, **LABEL_STYLE)
+            ax.legend(handles=patches, **LEGEND_STYLE)
+        # 湿度は0〜100%固定, 外気温と気圧は全データの最大値・最小値
+        ax_humid.set_ylim(ymin=0., ymax=100.)
+        for ax, col_name in [(ax_temp, COL_TEMP_OUT), (ax_pressure, COL_PRESSURE)]:
+            set_ylim_with_series(ax, [df[col_name] for df in label_dfs.values()], col_name=col_name)
+        ax_temp.set_title(title, **TITLE_STYLE)
+        for ax in [ax_temp, ax_humid]:
+            ax.label_outer()
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+    return fig
+
+
+def plot_band(plot_axes: Axes, df_band: DataFrame, band_label: str,
+              s_color: str = BAND_COLOR) -> List[Patch]:
+    """
+    気候値の分位点バンド (下限〜上限の塗りつぶしと中央値線) をプロットし凡例用パッチを生成する
+    :param plot_axes: プロット領域
+    :param df_band: 分位点バンドのDataFrame (測定時刻, 下限, 中央値, 上限列)
+    :param band_label: バンドの凡例用ラベル
+    :param s_color: バンドのカラー
+    :return: 凡例用パッチ (バンド, 中央値)
+    """
+    plot_axes.fill_between(df_band[COL_TIME], df_band[COL_BAND_LOWER], df_band[COL_BAND_UPPER],
+                           color=s_color, **BAND_FILL_STYLE)
+    plot_axes.plot(df_band[COL_TIME], df_band[COL_BAND_MEDIAN], color=s_color,
+                   **BAND_MEDIAN_STYLE)
+    return [Patch(color=s_color, alpha=BAND_FILL_STYLE['alpha'], label=band_label),
+            Patch(color=s_color, label=BAND_MEDIAN_LABEL)]
+
+
+# 指定年月の観測データと気候値の分位点バンドの画像を生成する
+def gen_climatology_plot_image(
+        df_curr: DataFrame, bands: Dict[str, DataFrame], year_month: str,
+        probs: List[float],
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None) -> str:
+    """
+    指定年月の観測データを通日毎の気候値の分位点バンドに重ねてプロットした画像のBase64エンコード済み文字列を生成する
+    :param df_curr: 指定年月の観測データのDataFrame
+    :param bands: 観測項目列名をキーとする分位点バンドのDataFrame (測定時刻, 下限, 中央値, 上限列)
+    :param year_month: 指定年月 (形式: "%Y-%m")
+    :param probs: バンドの確率 (下限, 中央値, 上限)
+    :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :return: 画像のBase64エンコード済み文字列
+    """
+    plot_label: str = make_legend_label(year_month)
+    title: str = FMT_CLIMATE_TITLE.format(plot_label)
+    band_label: str = FMT_BAND_LABEL.format(lower=probs[0], upper=probs[-1])
+    # 欠測区間に区切り行を挿入する
+    with span(PHASE_TRANSFORM):
+        curr_gaps: np.ndarray
+        df_curr, curr_gaps = insert_gap_breaks(df_curr, COL_TIME, gap_threshold)
+
+    with span(PHASE_FIGURE):
+        fig: Figure = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        if logger is not None:
+            logger.info(f"fig: {fig}")
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # (描画領域, 列名, Y軸ラベル, 平均値の置換用辞書オブジェクト)
+        panels = [
+            (ax_temp, COL_TEMP_OUT, Y_LABEL_TEMP_OUT, DICT_AVEG_TEMP),
+            (ax_humid, COL_HUMID, Y_LABEL_HUMID, DICT_AVEG_HUMID),
+            (ax_pressure, COL_PRESSURE, Y_LABEL_PRESSURE, DICT_AVEG_PRESSURE),
+        ]
+        for ax, col_name, y_label, dict_ave in panels:
+            ax.grid(**GRID_STYLE)
+            shade_gaps(ax, curr_gaps, CURR_COLOR)
+            band_patches: List[Patch] = plot_band(ax, bands[col_name], band_label)
+            curr_patch: Patch = plot_with_average(
+                ax, df_curr[COL_TIME], df_curr[col_name], plot_label, CURR_COLOR, dict_ave)
+            ax.set_ylabel(y_label, **LABEL_STYLE)
+            ax.legend(handles=[curr_patch] + band_patches, **LEGEND_STYLE)
+        # 湿度は0〜100%固定, 外気温と気圧は観測データとバンドの最大値・最小値
+        ax_humid.set_ylim(ymin=0., ymax=100.)
+        for ax, col_name in [(ax_temp, COL_TEMP_OUT), (ax_pressure, COL_PRESSURE)]:
+            set_ylim_with_series(ax, [df_curr[col_name], bands[col_name][COL_BAND_LOWER],
+                                      bands[col_name][COL_BAND_UPPER]], col_name=col_name)
+        ax_temp.set_title(title, **TITLE_STYLE)
+        for ax in [ax_temp, ax_humid]:
+            ax.label_outer()
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+
+    return _gen_figure_image(fig, LAYOUT_NAME_CLIMATE, fixed_layout, logger=logger)
+
+
+class WeatherArrays:
+    """
+    1期間の観測データの配列 (配列版 gen_plot_image_arrays の入力)\n
+    DataFrame を生成せずに mmap・COPY のバッファ等の配列をそのまま渡す ※配列はコピー・変更しない
+    """
+    __slots__ = ("epochs", "columns")
+
+    def __init__(self, epochs: np.ndarray, columns: Dict[str, np.ndarray]):
+        """
+        :param epochs: 測定時刻 (unix epoch 秒, int64, 昇順, C連続の1次元配列)
+        :param columns: 観測データ列名をキーとする値 (float32 推奨, C連続の1次元配列, 欠損値は NaN)
+                        ※ARRAY_VALUE_COLUMNS は必須, 集計データは最小値・最大値列も可
+        :raise ValueError: 配列の型・形状・連続性が不正, 必須列が無い
+        """
+        if epochs.dtype != np.int64 or epochs.ndim != 1 or not epochs.flags.c_contiguous:
+            raise ValueError(f"epochs must be a contiguous 1-D int64 array: {epochs.dtype}")
+        for col_name in ARRAY_VALUE_COLUMNS:
+            if col_name not in columns:
+                raise ValueError(f"missing column: {col_name}")
+        for col_name, values in columns.items():
+            if (not np.issubdtype(values.dtype, np.floating) or values.shape != epochs.shape
+                    or not values.flags.c_contiguous):
+                raise ValueError(f"{col_name} must be a contiguous 1-D float array "
+                                 f"of {epochs.shape[0]} rows: {values.dtype}{values.shape}")
+        self.epochs: np.ndarray = epochs
+        self.columns: Dict[str, np.ndarray] = columns
+
+    def plot_times(self, offset_seconds: int = 0) -> np.ndarray:
+        """
+        プロット用の測定時刻 (datetime64[s], UTC) を取得する
+        :param offset_seconds: 測定時刻に加算する秒数 ※0なら測定時刻のビュー (コピーしない)
+        :return: 測定時刻の配列
+        """
+        if offset_seconds == 0:
+            return self.epochs.view("datetime64[s]")
+        return (self.epochs + offset_seconds).view("datetime64[s]")
+
+    def value_ranges(self, col_name: str) -> List[np.ndarray]:
+        """
+        Y軸の範囲の計算対象の配列を取得する
+        :param col_name: 観測データ列名
+        :return: 集計データなら最小値・最大値列, それ以外は観測データ列のリスト
+        """
+        if min_column(col_name) in self.columns:
+            return [self.columns[min_column(col_name)], self.columns[max_column(col_name)]]
+        return [self.columns[col_name]]
+
+
+def nan_mean(values: np.ndarray) -> float:
+    """
+    欠損値 (NaN) を除いた平均値を取得する ※np.nanmean と異なり配列をコピーしない
+    :param values: 観測値の配列
+    :return: 平均値 ※有効な値が無ければ NaN
+    """
+    valid: np.ndarray = ~np.isnan(values)
+    count: int = int(np.count_nonzero(valid))
+    if count == 0:
+        return np.nan
+    return float(np.sum(values, where=valid, dtype=np.float64) / count)
+
+
+def set_ylim_with_arrays(plot_axes: Axes, arrays: List[np.ndarray],
+                         col_name: Optional[str] = None) -> None:
+    """
+    複数の配列の最大値・最小値 (欠損値を除く) からY軸の範囲を設定する\n
+    有効な値が無い (全て欠損値・不正値) 場合は観測項目の物理的な範囲 ※NaN は軸の範囲に設定できない
+    :param plot_axes: プロット領域
+    :param arrays: 観測値の配列のリスト
+    :param col_name: 観測項目列名 (VALID_RANGES のキー) ※未指定なら有効な値が無い場合は設定しない
+    """
+    valid_arrays: List[np.ndarray] = [
+        values for values in arrays if np.count_nonzero(~np.isnan(values)) > 0
+    ]
+    if len(valid_arrays) == 0:
+        if col_name in VALID_RANGES:
+            plot_axes.set_ylim(*VALID_RANGES[col_name])
+        return
+
+    val_min: float = np.min([np.nanmin(values) for values in valid_arrays])
+    val_max: float = np.max([np.nanmax(values) for values in valid_arrays])
+    plot_axes.set_ylim(np.floor(val_min / 10.) * 10., np.ceil(val_max / 10.) * 10.)
+
+
+def plot_arrays_with_average(plot_axes: Axes, x_times: np.ndarray, data: WeatherArrays,
+                             col_name: str, segments: List[slice],
+                             plot_label: str, s_color: str, dict_ave: Dict) -> Patch:
+    """
+    欠測区間で区切った区間毎にデータ (集計データは最小値・最大値の包絡線も) と平均線をプロットし
+    凡例用の平均値パッチを生成する
+    :param plot_axes: プロット領域
+    :param x_times: X軸データ (測定時刻)
+    :param data: 観測データの配列
+    :param col_name: 観測データ列名
+    :param segments: 区間のスライスのリスト (gap_segments)
+    :param plot_label: 凡例用ラベル (年月等)
+    :param s_color: 線カラー
+    :param dict_ave: データ型ごとの置換用辞書オブジェクト
+    :return: 平均値パッチ
+    """
+    values: np.ndarray = data.columns[col_name]
+    envelopes: List[np.ndarray] = []
+    if min_column(col_name) in data.columns:
+        envelopes = [data.columns[min_column(col_name)], data.columns[max_column(col_name)]]
+    for segment in segments:
+        plot_axes.plot(x_times[segment], values[segment], color=s_color, marker="")
+        for envelope in envelopes:
+            plot_axes.plot(x_times[segment], envelope[segment], color=s_color, **ENVELOPE_LINE_STYLE)
+    val_ave: float = nan_mean(values)
+    plot_axes.axhline(val_ave, color=s_color, **AVEG_LINE_STYLE)
+    return make_average_patch(plot_label, val_ave, s_color, dict_ave)
+
+
+def one_year_seconds(prev_year_month: str) -> int:
+    """
+    前年の年月の月初から1年後の月初までの秒数を取得する (前年データのX軸を1年ずらす)
+    :param prev_year_month: 前年の年月 (形式: "%Y-%m")
+    :return: 秒数 ※うるう年の2月29日を含む場合は366日
+    """
+    month_start: np.datetime64 = np.datetime64(prev_year_month, "M")
+    next_year: np.datetime64 = month_start + np.timedelta64(12, "M")
+    return int((next_year.astype("datetime64[s]") - month_start.astype("datetime64[s]"))
+               .astype(np.int64))
+
+
+# 比較年月用の観測データの配列から画像を生成する (配列版)
+def gen_plot_image_arrays(
+        curr: WeatherArrays, prev: WeatherArrays, year_month: str, prev_year_month: str,
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None,
+        tz: tzinfo = DISPLAY_TZ) -> str:
+    """
+    指定年月とその前年の観測データの配列をプロットした画像のBase64エンコード済み文字列を生成する\n
+    gen_plot_image() の配列版: DataFrame を生成せず、入力配列はコピー・変更しない\n
+    ※測定時刻は UTC のままプロットし、目盛りを表示タイムゾーンで表示する
+    ※欠測区間は区切り行を挿入せず、区間毎のビューを別の線としてプロットする
+    :param curr: 指定年月の観測データの配列
+    :param prev: 前年の年月の観測データの配列
+    :param year_month: 指定年月 (形式: "%Y-%m")
+    :param prev_year_month: 前年の年月 (形式: "%Y-%m")
+    :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :param tz: 測定時刻の表示タイムゾーン
+    :return: 画像のBase64エンコード済み文字列
+    """
+    curr_plot_label: str = make_legend_label(year_month)
+    prev_plot_label: str = make_legend_label(prev_year_month)
+    title: str = FMT_MEASUREMENT_RANGE.format(curr_plot_label, prev_plot_label)
+
+    with span(PHASE_TRANSFORM, rows=curr.epochs.shape[0] + prev.epochs.shape[0]):
+        # 最新年月は測定時刻のビュー, 前年は1年後にずらした測定時刻 (新しい配列)
+        curr_times: np.ndarray = curr.plot_times()
+        prev_times: np.ndarray = prev.plot_times(one_year_seconds(prev_year_month))
+        curr_segments: List[slice] = gap_segments(curr.epochs, gap_threshold)
+        prev_segments: List[slice] = gap_segments(prev.epochs, gap_threshold)
+        # 最新年月の欠測区間 (欠測前の最終測定時刻, 欠測後の最初の測定時刻)
+        curr_gaps: np.ndarray = np.array(
+            [(curr_times[before.stop - 1], curr_times[after.start])
+             for before, after in zip(curr_segments[:-1], curr_segments[1:])],
+            dtype=curr_times.dtype).reshape(-1, 2)
+        if logger is not None:
+            logger.debug(f"curr: rows={curr.epochs.shape[0]}, segments={len(curr_segments)}, "
+                         f"prev: rows={prev.epochs.shape[0]}, segments={len(prev_segments)}")
+
+    with span(PHASE_FIGURE):
+        fig: Figure = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        if logger is not None:
+            logger.info(f"fig: {fig}")
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # (描画領域, 列名, Y軸ラベル, 平均値の置換用辞書オブジェクト)
+        panels = [
+            (ax_temp, COL_TEMP_OUT, Y_LABEL_TEMP_OUT, DICT_AVEG_TEMP),
+            (ax_humid, COL_HUMID, Y_LABEL_HUMID, DICT_AVEG_HUMID),
+            (ax_pressure, COL_PRESSURE, Y_LABEL_PRESSURE, DICT_AVEG_PRESSURE),
+        ]
+        for ax, col_name, y_label, dict_ave in panels:
+            # Y方向のグリッド線のみ表示, 最新年月の欠測区間を塗りつぶす
+            ax.grid(**GRID_STYLE)
+            shade_gaps(ax, curr_gaps, CURR_COLOR)
+            curr_patch: Patch = plot_arrays_with_average(
+                ax, curr_times, curr, col_name, curr_segments, curr_plot_label, CURR_COLOR, dict_ave)
+            prev_patch: Patch = plot_arrays_with_average(
+                ax, prev_times, prev, col_name, prev_segments, prev_plot_label, PREV_COLOR, dict_ave)
+            ax.set_ylabel(y_label, **LABEL_STYLE)
+            ax.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
+            # 目盛りは表示タイムゾーンの日付
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator(tz=tz))
+        # 湿度は0〜100%固定, 外気温と気圧は最新年月・前年の最大値・最小値
+        ax_humid.set_ylim(ymin=0., ymax=100.)
+        for ax, col_name in [(ax_temp, COL_TEMP_OUT), (ax_pressure, COL_PRESSURE)]:
+            set_ylim_with_arrays(ax, curr.value_ranges(col_name) + prev.value_ranges(col_name),
+                                 col_name=col_name)
+        ax_temp.set_title(title, **TITLE_STYLE)
+        for ax in [ax_temp, ax_humid]:
+            ax.label_outer()
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d", tz=tz))
+
+    return _gen_figure_image(fig, LAYOUT_NAME, fixed_layout, logger=logger)
+
+
+# 複数年の期間の集計データの配列から画像を生成する (逐次集計)
+def gen_range_plot_image(
+        data: WeatherArrays, device_name: str, from_year_month: str, to_year_month: str,
+        resolution: str,
+        logger: Optional[logging.Logger] = None,
+        fixed_layout: bool = False,
+        gap_threshold: Optional[pd.Timedelta] = None,
+        tz: tzinfo = DISPLAY_TZ) -> str:
+    """
+    期間の集計データ (平均値と最小値・最大値の包絡線) をプロットした画像のBase64エンコード済み文字列を生成する\n
+    入力配列はコピー・変更しない ※欠測区間は区間毎のビューを別の線としてプロットする
+    :param data: 集計データの配列 (最小値・最大値列付き)
+    :param device_name: デバイス名
+    :param from_year_month: 開始年月 (形式: "%Y-%m")
+    :param to_year_month: 終了年月 (形式: "%Y-%m")
+    :param resolution: 集計間隔
+    :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
+    :param tz: 測定時刻の表示タイムゾーン
+    :return: 画像のBase64エンコード済み文字列
+    """
+    title: str = FMT_RANGE_TITLE.format(
+        device=device_name, first=make_legend_label(from_year_month),
+        last=make_legend_label(to_year_month), resolution=resolution)
+
+    with span(PHASE_TRANSFORM, rows=data.epochs.shape[0]):
+        plot_times: np.ndarray = data.plot_times()
+        segments: List[slice] = gap_segments(data.epochs, gap_threshold)
+        if logger is not None:
+            logger.debug(f"rows={data.epochs.shape[0]}, segments={len(segments)}")
+
+    with span(PHASE_FIGURE):
+        fig: Figure = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        if logger is not None:
+            logger.info(f"fig: {fig}")
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # (描画領域, 列名, Y軸ラベル, 平均値の置換用辞書オブジェクト)
+        panels = [
+            (ax_temp, COL_TEMP_OUT, Y_LABEL_TEMP_OUT, DICT_AVEG_TEMP),
+            (ax_humid, COL_HUMID, Y_LABEL_HUMID, DICT_AVEG_HUMID),
+            (ax_pressure, COL_PRESSURE, Y_LABEL_PRESSURE, DICT_AVEG_PRESSURE),
+        ]
+        for ax, col_name, y_label, dict_ave in panels:
+            ax.grid(**GRID_STYLE)
+            patch: Patch = plot_arrays_with_average(
+                ax, plot_times, data, col_name, segments, device_name, CURR_COLOR, dict_ave)
+            ax.set_ylabel(y_label, **LABEL_STYLE)
+            ax.legend(handles=[patch], **LEGEND_STYLE)
+            # 目盛りは表示タイムゾーンの年月
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator(tz=tz))
+        # 湿度は0〜100%固定, 外気温と気圧は最小値・最大値
+        ax_humid.set_ylim(ymin=0., ymax=100.)
+        for ax, col_name in [(ax_temp, COL_TEMP_OUT), (ax_pressure, COL_PRESSURE)]:
+            set_ylim_with_arrays(ax, data.value_ranges(col_name), col_name=col_name)
+        ax_temp.set_title(title, **TITLE_STYLE)
+        for ax in [ax_temp, ax_humid]:
+            ax.label_outer()
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%Y/%m", tz=tz))
+
+    return _gen_figure_image(fig, LAYOUT_NAME_RANGE, fixed_layout, logger=logger)
@@ -11,8 +11,16 @@ from matplotlib.figure import Figure
 from matplotlib.patches import Patch
 
 import numpy as np
+import pandas as pd
 from pandas.core.frame import DataFrame, Series
 
+from plotter.fixed_layout import save_figure
+from plotter.gap_util import insert_gap_breaks, shade_gaps
+from plotter.log_util import frame_summary
+from plotter.phase_timer import PHASE_ENCODE, PHASE_FIGURE, PHASE_TRANSFORM, span, timed_draw
+from plotter.resolution import max_column, min_column
+from plotter.sensor_validation import VALID_RANGES
+
 """
 前年と比較した気象データ画像のbase64エンコードテキストデータを出力する
 ※投稿の説明用ソース (直値を定数・変数に定義しない)
@@ -21,6 +29,9 @@ from pandas.core.frame import DataFrame, Series
 rcParams['font.family'] = "sans-serif"
 rcParams['font.sans-serif'] = ["IPAexGothic"]
 
+# 固定レイアウトのキャッシュキー用レイアウト名
+LAYOUT_NAME: str = "plotterweather_flat"
+
 # pandas.DataFrameのインデックス列
 COL_TIME: str = 'measurement_time'
 # 前年DataFrameの年月日+1年
@@ -83,23 +94,63 @@ def make_average_patch(plot_label, f_ave: float, s_color: str, dict_ave: Dict) -
     return Patch(color=s_color, label=average_label)
 
 
-def set_ylim_with_axes(plot_axes: Axes, curr_ser: Series, prev_ser: Series) -> None:
+def set_ylim_with_axes(plot_axes: Axes, curr_ser: Series, prev_ser: Series,
+                       col_name: Optional[str] = None) -> None:
     """
-    各データの最大値・最小値を設定する
+    各データの最大値・最小値 (欠損値を除く) を設定する\n
+    有効な値が無い (全て欠損値・不正値) 場合は観測項目の物理的な範囲 ※NaN は軸の範囲に設定できない
     :param plot_axes: プロット領域
     :param curr_ser: 最新データ
     :param prev_ser: 前年データ
+    :param col_name: 観測項目列名 (VALID_RANGES のキー) ※未指定なら有効な値が無い場合は設定しない
     """
-    val_min: float = np.min([curr_ser.min(), prev_ser.min()])
-    val_max: float = np.max([curr_ser.max(), prev_ser.max()])
+    valid_list: List[Series] = [ser for ser in [curr_ser, prev_ser] if ser.count() > 0]
+    if len(valid_list) == 0:
+        if col_name in VALID_RANGES:
+            plot_axes.set_ylim(*VALID_RANGES[col_name])
+        return
+
+    val_min: float = np.min([ser.min() for ser in valid_list])
+    val_max: float = np.max([ser.max() for ser in valid_list])
     val_min = np.floor(val_min / 10.) * 10.
     val_max = np.ceil(val_max / 10.) * 10.
     plot_axes.set_ylim(val_min, val_max)
 
 
+def value_range(df: DataFrame, col_name: str) -> Series:
+    """
+    Y軸の範囲の計算対象のデータを取得する
+    :param df: 観測データのDataFrame
+    :param col_name: 観測データ列名
+    :return: 集計データ (--resolution) なら最小値・最大値列を連結したデータ, それ以外は観測データ列
+    """
+    if min_column(col_name) in df.columns:
+        return pd.concat([df[min_column(col_name)], df[max_column(col_name)]])
+    return df[col_name]
+
+
+def plot_envelope(plot_axes: Axes, x_ser: Series, df: DataFrame, col_name: str,
+                  s_color: str) -> None:
+    """
+    集計データ (--resolution) なら最小値・最大値の包絡線をプロットする ※観測データのみなら何もしない
+    :param plot_axes: プロット領域
+    :param x_ser: X軸データ (測定時刻)
+    :param df: 観測データのDataFrame
+    :param col_name: 観測データ列名
+    :param s_color: 線カラー
+    """
+    if min_column(col_name) not in df.columns:
+        return
+
+    plot_axes.plot(x_ser, df[min_column(col_name)], color=s_color, linewidth=0.5, alpha=0.5)
+    plot_axes.plot(x_ser, df[max_column(col_name)], color=s_color, linewidth=0.5, alpha=0.5)
+
+
 def gen_plot_image(df_curr: DataFrame, df_prev: DataFrame,
                    year_month: str, prev_year_month: str,
-                   logger: Optional[logging.Logger] = None) -> str:
+                   logger: Optional[logging.Logger] = None,
+                   fixed_layout: bool = False,
+                   gap_threshold: Optional[pd.Timedelta] = None) -> str:
     """
     指定年月とその前年の観測データをプロットした画像のBase64エンコード済み文字列を生成する
     :param df_curr: 指定年月の観測データのDataFrame
@@ -107,6 +158,8 @@ def gen_plot_image(df_curr: DataFrame, df_prev: DataFrame,
     :param year_month: 指定年月 (形式: "%Y-%m")
     :param prev_year_month: 前年の年月 (形式: "%Y-%m")
     :param logger: application logger
+    :param fixed_layout: True なら固定レイアウト (レイアウト計算はプロセス内で1回のみ) で保存する
+    :param gap_threshold: 欠測とみなす測定間隔 ※Noneなら欠測区間で線を途切れさせない
     :return: 画像のBase64エンコード済み文字列
     """
 
@@ -118,91 +171,109 @@ def gen_plot_image(df_curr: DataFrame, df_prev: DataFrame,
     # グラフタイトル
     title: str = "{} − {} データ比較".format(curr_plot_label, prev_plot_label)
 
-    # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
-    df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(datetime_plus_1_year)
-    if logger is not None:
-        logger.debug(f"{df_prev}")
-
-    fig: Figure
-    ax_temp: Axes
-    ax_humid: Axes
-    ax_pressure: Axes
-    # PCブラウザはinch指定でdpi=72
-    fig = Figure(figsize=(9.8, 6.4), constrained_layout=True)
-    # x軸を共有する3行1列のサブプロット生成
-    (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
-    # Y方向のグリッド線のみ表示
-    for ax in [ax_temp, ax_humid, ax_pressure]:
-        ax.grid(axis='y', linestyle='dashed', linewidth=0.7, alpha=0.75)
-
-    # (1) 外気温領域のプロット
-    # 最低・最高
-    set_ylim_with_axes(ax_temp, df_curr[COL_TEMP_OUT], df_prev[COL_TEMP_OUT])
-    # 最新年の凡例
-    curr_patch: Patch
-    # 前年の凡例
-    prev_patch: Patch
-    # 最新年月の外気温
-    ax_temp.plot(df_curr[COL_TIME], df_curr[COL_TEMP_OUT], color="C0", marker="")
-    curr_patch = make_average_patch(curr_plot_label, df_curr[COL_TEMP_OUT].mean(),
-                                    "C0", {'type': '気温', 'unit': '℃'})
-    ax_temp.axhline(df_curr[COL_TEMP_OUT].mean(),
-                    color="C0", linestyle='dashdot', linewidth=1.)
-    # 前年月の外気温
-    ax_temp.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_TEMP_OUT], color='C1', marker="")
-    prev_patch = make_average_patch(prev_plot_label, df_prev[COL_TEMP_OUT].mean(),
-                                    'C1', {'type': '気温', 'unit': '℃'})
-    ax_temp.axhline(df_prev[COL_TEMP_OUT].mean(),
-                    color='C1', linestyle='dashdot', linewidth=1.)
-    ax_temp.set_ylabel("外気温 (℃)", fontsize=10)
-    # 凡例
-    ax_temp.legend(handles=[curr_patch, prev_patch], fontsize=10)
-    ax_temp.set_title(title, fontsize=11)
-    # X軸ラベルを隠す
-    ax_temp.label_outer()
-
-    # (2) 湿度領域のプロット
-    ax_humid.set_ylim(ymin=0., ymax=100.)
-    # 最新年月
-    ax_humid.plot(df_curr[COL_TIME], df_curr[COL_HUMID], color="C0", marker="")
-    curr_patch = make_average_patch(curr_plot_label, df_curr[COL_HUMID].mean(),
-                                    "C0", {'type': '湿度', 'unit': '％'})
-    ax_humid.axhline(df_curr[COL_HUMID].mean(),
-                     color="C0", linestyle='dashdot', linewidth=1.)
-    # 前年月
-    ax_humid.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_HUMID], color='C1', marker="")
-    prev_patch = make_average_patch(prev_plot_label, df_prev[COL_HUMID].mean(),
-                                    'C1', {'type': '湿度', 'unit': '％'})
-    ax_humid.axhline(df_prev[COL_HUMID].mean(),
-                     color='C1', linestyle='dashdot', linewidth=1.)
-    ax_humid.set_ylabel("室内湿度 (％)", fontsize=10)
-    # 凡例
-    ax_humid.legend(handles=[curr_patch, prev_patch], fontsize=10)
-    ax_humid.label_outer()
-
-    # (3) 気圧領域のプロット
-    set_ylim_with_axes(ax_pressure, df_curr[COL_PRESSURE], df_prev[COL_PRESSURE])
-    # 最新年月
-    ax_pressure.plot(df_curr[COL_TIME], df_curr[COL_PRESSURE], color="C0", marker="")
-    curr_patch = make_average_patch(curr_plot_label, df_curr[COL_PRESSURE].mean(),
-                                    "C0", {'type': '気圧', 'unit': 'hPa'})
-    ax_pressure.axhline(df_curr[COL_PRESSURE].mean(),
+    with span(PHASE_TRANSFORM):
+        # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
+        df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(datetime_plus_1_year)
+        # 欠測区間に区切り行 (観測値は NaN) を挿入して線を途切れさせる
+        curr_gaps: np.ndarray
+        df_curr, curr_gaps = insert_gap_breaks(df_curr, COL_TIME, gap_threshold)
+        df_prev, _ = insert_gap_breaks(df_prev, COL_PREV_PLOT_TIME, gap_threshold)
+        if logger is not None:
+            logger.debug(frame_summary(df_prev, "df_prev"))
+
+    with span(PHASE_FIGURE):
+        fig: Figure
+        ax_temp: Axes
+        ax_humid: Axes
+        ax_pressure: Axes
+        # PCブラウザはinch指定でdpi=72
+        fig = Figure(figsize=(9.8, 6.4), constrained_layout=True)
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(nrows=3, ncols=1, sharex=True)
+        # Y方向のグリッド線のみ表示, 最新年月の欠測区間を塗りつぶす
+        for ax in [ax_temp, ax_humid, ax_pressure]:
+            ax.grid(axis='y', linestyle='dashed', linewidth=0.7, alpha=0.75)
+            shade_gaps(ax, curr_gaps, "C0")
+
+        # (1) 外気温領域のプロット
+        # 最低・最高
+        set_ylim_with_axes(ax_temp, value_range(df_curr, COL_TEMP_OUT),
+                           value_range(df_prev, COL_TEMP_OUT), col_name=COL_TEMP_OUT)
+        # 最新年の凡例
+        curr_patch: Patch
+        # 前年の凡例
+        prev_patch: Patch
+        # 最新年月の外気温
+        ax_temp.plot(df_curr[COL_TIME], df_curr[COL_TEMP_OUT], color="C0", marker="")
+        plot_envelope(ax_temp, df_curr[COL_TIME], df_curr, COL_TEMP_OUT, "C0")
+        curr_patch = make_average_patch(curr_plot_label, df_curr[COL_TEMP_OUT].mean(),
+                                        "C0", {'type': '気温', 'unit': '℃'})
+        ax_temp.axhline(df_curr[COL_TEMP_OUT].mean(),
                         color="C0", linestyle='dashdot', linewidth=1.)
-    # 前年月
-    ax_pressure.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_PRESSURE], color='C1', marker="")
-    prev_patch = make_average_patch(prev_plot_label, df_prev[COL_PRESSURE].mean(),
-                                    'C1', {'type': '気圧', 'unit': 'hPa'})
-    ax_pressure.axhline(df_prev[COL_PRESSURE].mean(),
+        # 前年月の外気温
+        ax_temp.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_TEMP_OUT], color='C1', marker="")
+        plot_envelope(ax_temp, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_TEMP_OUT, 'C1')
+        prev_patch = make_average_patch(prev_plot_label, df_prev[COL_TEMP_OUT].mean(),
+                                        'C1', {'type': '気温', 'unit': '℃'})
+        ax_temp.axhline(df_prev[COL_TEMP_OUT].mean(),
                         color='C1', linestyle='dashdot', linewidth=1.)
-    ax_pressure.set_ylabel("気　圧 (hPa)", fontsize=10)
-    # 凡例
-    ax_pressure.legend(handles=[curr_patch, prev_patch], fontsize=10)
-    # X軸ラベル
-    ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+        ax_temp.set_ylabel("外気温 (℃)", fontsize=10)
+        # 凡例
+        ax_temp.legend(handles=[curr_patch, prev_patch], fontsize=10)
+        ax_temp.set_title(title, fontsize=11)
+        # X軸ラベルを隠す
+        ax_temp.label_outer()
+
+        # (2) 湿度領域のプロット
+        ax_humid.set_ylim(ymin=0., ymax=100.)
+        # 最新年月
+        ax_humid.plot(df_curr[COL_TIME], df_curr[COL_HUMID], color="C0", marker="")
+        plot_envelope(ax_humid, df_curr[COL_TIME], df_curr, COL_HUMID, "C0")
+        curr_patch = make_average_patch(curr_plot_label, df_curr[COL_HUMID].mean(),
+                                        "C0", {'type': '湿度', 'unit': '％'})
+        ax_humid.axhline(df_curr[COL_HUMID].mean(),
+                         color="C0", linestyle='dashdot', linewidth=1.)
+        # 前年月
+        ax_humid.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_HUMID], color='C1', marker="")
+        plot_envelope(ax_humid, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_HUMID, 'C1')
+        prev_patch = make_average_patch(prev_plot_label, df_prev[COL_HUMID].mean(),
+                                        'C1', {'type': '湿度', 'unit': '％'})
+        ax_humid.axhline(df_prev[COL_HUMID].mean(),
+                         color='C1', linestyle='dashdot', linewidth=1.)
+        ax_humid.set_ylabel("室内湿度 (％)", fontsize=10)
+        # 凡例
+        ax_humid.legend(handles=[curr_patch, prev_patch], fontsize=10)
+        ax_humid.label_outer()
+
+        # (3) 気圧領域のプロット
+        set_ylim_with_axes(ax_pressure, value_range(df_curr, COL_PRESSURE),
+                           value_range(df_prev, COL_PRESSURE), col_name=COL_PRESSURE)
+        # 最新年月
+        ax_pressure.plot(df_curr[COL_TIME], df_curr[COL_PRESSURE], color="C0", marker="")
+        plot_envelope(ax_pressure, df_curr[COL_TIME], df_curr, COL_PRESSURE, "C0")
+        curr_patch = make_average_patch(curr_plot_label, df_curr[COL_PRESSURE].mean(),
+                                        "C0", {'type': '気圧', 'unit': 'hPa'})
+        ax_pressure.axhline(df_curr[COL_PRESSURE].mean(),
+                            color="C0", linestyle='dashdot', linewidth=1.)
+        # 前年月
+        ax_pressure.plot(df_prev[COL_PREV_PLOT_TIME], df_prev[COL_PRESSURE], color='C1', marker="")
+        plot_envelope(ax_pressure, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_PRESSURE, 'C1')
+        prev_patch = make_average_patch(prev_plot_label, df_prev[COL_PRESSURE].mean(),
+                                        'C1', {'type': '気圧', 'unit': 'hPa'})
+        ax_pressure.axhline(df_prev[COL_PRESSURE].mean(),
+                            color='C1', linestyle='dashdot', linewidth=1.)
+        ax_pressure.set_ylabel("気　圧 (hPa)", fontsize=10)
+        # 凡例
+        ax_pressure.legend(handles=[curr_patch, prev_patch], fontsize=10)
+        # X軸ラベル
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
 
     # 画像をバイトストリームに溜め込みそれをbase64エンコードしてレスポンスとして返す
-    buf = BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    data = base64.b64encode(buf.getbuffer()).decode("ascii")
+    # エンコードの処理時間は描画 (Figure.draw) を除いて計測する
+    with span(PHASE_ENCODE), timed_draw(fig):
+        buf = BytesIO()
+        save_figure(fig, buf, LAYOUT_NAME, fixed_layout=fixed_layout, cache_file=None,
+                    format="png")
+        data = base64.b64encode(buf.getbuffer()).decode("ascii")
     # base64エンコード文字列
     return "data:image/png;base64," + data
@@ -0,0 +1,205 @@
+import atexit
+import cProfile
+import logging
+import os
+import pstats
+from io import StringIO
+from typing import Dict, List, Optional, Set, Tuple
+
+from plotter.phase_timer import PHASE_DRAW, PHASE_ENCODE, PHASE_FIGURE, add_phase_listener
+
+"""
+cProfileによる実行プロファイルユーティリティ (--profile)
+(1) all: 引数解析後から終了までの実行全体をプロファイルする
+(2) render: 描画フェーズ (図の作成, 描画, エンコード) のみをプロファイルする ※util.phase_timer のスパン
+[出力] 終了時 (exit() を含む) に出力ディレクトリに以下を出力し、上位N件のホット関数をログ出力する
+  <スクリプト名>.prof: pstats形式 (snakeviz等で表示)
+  <スクリプト名>.collapsed.txt: collapsed stack形式 (flamegraph.pl, speedscope等で表示)
+  ※cProfileは呼び出し元・呼び出し先の組のみ記録するため、スタックは呼び出し時間の比率で按分した推定値
+"""
+
+# プロファイル範囲: 実行全体, 描画フェーズのみ
+PROFILE_ALL: str = "all"
+PROFILE_RENDER: str = "render"
+PROFILE_CHOICES: List[str] = [PROFILE_ALL, PROFILE_RENDER]
+# 描画フェーズ
+RENDER_PHASES: Set[str] = {PHASE_FIGURE, PHASE_DRAW, PHASE_ENCODE}
+# ホット関数のログ出力件数
+DEFAULT_TOP_N: int = 20
+# collapsed stack の最大スタック深さ
+MAX_STACK_DEPTH: int = 64
+# collapsed stack の出力単位 (マイクロ秒)
+STACK_TIME_UNIT: float = 1e6
+# collapsed stack に出力する部分木の最小累積時間 (秒) ※呼び出しパスの組み合わせ爆発を防ぐ
+MIN_STACK_TIME: float = 1e-4
+
+# pstatsの関数キー (ファイル名, 行番号, 関数名)
+FuncKey = Tuple[str, int, str]
+
+
+def _frame_name(func: FuncKey) -> str:
+    """
+    collapsed stack のフレーム名を生成する ※区切り文字 (;) と空白を含まない
+    :param func: pstatsの関数キー
+    :return: フレーム名 (例) fixed_layout.py:119:save_figure
+    """
+    file_name, line_no, func_name = func
+    name: str = func_name if file_name == "~" else \
+        f"{os.path.basename(file_name)}:{line_no}:{func_name}"
+    return name.replace(";", ":").replace(" ", "_")
+
+
+def collapse_stacks(stats: pstats.Stats) -> List[str]:
+    """
+    プロファイル結果を collapsed stack 形式 ("root;caller;callee 自己時間") に変換する\n
+    呼び出し元毎の呼び出し時間の比率で自己時間を按分する\n
+    ※再帰呼び出しと按分後の累積時間が MIN_STACK_TIME 未満の部分木は打ち切る
+    :param stats: プロファイル結果
+    :return: collapsed stack 行リスト (自己時間はマイクロ秒)
+    """
+    # 関数毎の (自己時間, 累積時間, 呼び出し元毎の統計)
+    raw: Dict[FuncKey, Tuple] = stats.stats
+    callees: Dict[FuncKey, List[Tuple[FuncKey, float, float]]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, (_, _, edge_tt, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_tt, edge_ct))
+
+    totals: Dict[str, float] = {}
+
+    def visit(func: FuncKey, path: List[str], self_time: float, scale: float) -> None:
+        path = path + [_frame_name(func)]
+        stack: str = ";".join(path)
+        totals[stack] = totals.get(stack, 0.) + self_time
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+
+        for callee, edge_tt, edge_ct in callees.get(func, []):
+            callee_name: str = _frame_name(callee)
+            callee_ct: float = raw[callee][3]
+            if callee_name in path or callee_ct <= 0. or edge_ct * scale < MIN_STACK_TIME:
+                continue
+            # 当該パスからの呼び出しに按分した自己時間と子孫の按分比率
+            visit(callee, path, edge_tt * scale, edge_ct * scale / callee_ct)
+
+    for func, (_, _, tt, _, callers) in raw.items():
+        if not callers:
+            visit(func, [], tt, 1.)
+    return [
+        f"{stack} {round(value * STACK_TIME_UNIT)}" for stack, value in totals.items()
+        if round(value * STACK_TIME_UNIT) > 0
+    ]
+
+
+class RunProfiler:
+    """ 実行全体または描画フェーズのみをプロファイルするクラス """
+
+    def __init__(self, script_name: str, mode: str, out_dir: str,
+                 top_n: int = DEFAULT_TOP_N):
+        """
+        :param script_name: スクリプト名
+        :param mode: プロファイル範囲 (all|render)
+        :param out_dir: 出力ディレクトリ
+        :param top_n: ホット関数のログ出力件数
+        """
+        if mode not in PROFILE_CHOICES:
+            raise ValueError(f"Invalid profile mode: {mode}")
+
+        self.script_name: str = script_name
+        self.mode: str = mode
+        self.out_dir: str = out_dir
+        self.top_n: int = top_n
+        self.profile: cProfile.Profile = cProfile.Profile()
+        # 実行中の描画フェーズのネスト数
+        self._render_depth: int = 0
+        self._stopped: bool = False
+
+    def _on_phase(self, name: str, is_start: bool) -> None:
+        """
+        描画フェーズの開始・終了でプロファイルを有効・無効にする (フェーズリスナー)
+        :param name: フェーズ名
+        :param is_start: 開始なら True
+        """
+        if name not in RENDER_PHASES:
+            return
+
+        if is_start:
+            self._render_depth += 1
+            if self._render_depth == 1:
+                self.profile.enable()
+        else:
+            self._render_depth -= 1
+            if self._render_depth == 0:
+                self.profile.disable()
+
+    def start(self) -> None:
+        """ プロファイルを開始する ※render なら描画フェーズの開始を待つ """
+        if self.mode == PROFILE_ALL:
+            self.profile.enable()
+        else:
+            add_phase_listener(self._on_phase)
+
+    def stop(self) -> Dict[str, str]:
+        """
+        プロファイルを終了し、pstats形式と collapsed stack 形式のファイルを出力する
+        :return: 出力ファイルパスの辞書 (キー: prof, collapsed) ※プロファイル結果が無ければ空
+        """
+        if self._stopped:
+            return {}
+
+        self._stopped = True
+        self.profile.disable()
+        self.profile.create_stats()
+        if not self.profile.stats:
+            return {}
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        stem: str = os.path.join(self.out_dir, os.path.splitext(self.script_name)[0])
+        paths: Dict[str, str] = {"prof": f"{stem}.prof", "collapsed": f"{stem}.collapsed.txt"}
+        self.profile.dump_stats(paths["prof"])
+        with open(paths["collapsed"], 'w') as fp:
+            fp.write("\n".join(collapse_stacks(pstats.Stats(self.profile))) + "\n")
+        return paths
+
+    def summary(self, sort_key: str = "tottime") -> str:
+        """
+        上位N件のホット関数のサマリーを生成する
+        :param sort_key: ソートキー (tottime: 自己時間, cumulative: 累積時間)
+        :return: サマリー文字列
+        """
+        buf: StringIO = StringIO()
+        stats: pstats.Stats = pstats.Stats(self.profile, stream=buf)
+        stats.strip_dirs().sort_stats(sort_key).print_stats(self.top_n)
+        return buf.getvalue()
+
+
+def start_profiler(script_name: str, mode: Optional[str], out_dir: str,
+                   logger: Optional[logging.Logger] = None,
+                   top_n: int = DEFAULT_TOP_N) -> Optional[RunProfiler]:
+    """
+    プロファイルを開始する ※終了時 (exit() を含む) にファイル出力とサマリーのログ出力を行う
+    :param script_name: スクリプト名
+    :param mode: プロファイル範囲 (all|render) ※Noneならプロファイルしない
+    :param out_dir: 出力ディレクトリ (スクリプトの出力ファイルと同じディレクトリ)
+    :param logger: サマリー出力先のロガー ※Noneなら標準出力
+    :param top_n: ホット関数のログ出力件数
+    :return: プロファイラ ※プロファイルしない場合は None
+    """
+    if mode is None:
+        return None
+
+    profiler: RunProfiler = RunProfiler(script_name, mode, out_dir, top_n=top_n)
+
+    def finish() -> None:
+        paths: Dict[str, str] = profiler.stop()
+        if not paths:
+            return
+        message: str = f"profile[{mode}]: {paths['prof']}, {paths['collapsed']}\n" \
+                       f"{profiler.summary()}"
+        if logger is not None:
+            logger.info(message)
+        else:
+            print(message)
+
+    atexit.register(finish)
+    profiler.start()
+    return profiler
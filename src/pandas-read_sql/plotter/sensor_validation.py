@@ -0,0 +1,280 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas.core.frame import DataFrame
+
+from plotter.resolution import max_column, min_column
+
+"""
+観測データの妥当性チェック (読み込み時)
+(1) 物理的な範囲外の値 ※集計データは最小値・最大値列もチェックする
+(2) スパイク: 前後の測定値の移動中央値からの偏差が 移動MAD (中央絶対偏差) の一定倍を超える値
+    ※移動窓は numpy の sliding_window_view (ストライド) で行毎のPythonループを使わずに計算する
+(3) 不正値の処理方法 (--validate)
+    mask: NaN に置き換える, drop: 不正値を含む行を除く, flag: 不正値フラグ列を追加する, off: チェックしない
+(4) 逐次集計 (チャンク読み込み) は ChunkValidator でチャンク毎にチェックする
+    ※チャンク境界の前後の行を移動窓に含めるため、期間全体を一度にチェックした結果と同じになる
+"""
+
+# 不正値の処理方法
+POLICY_MASK: str = "mask"
+POLICY_DROP: str = "drop"
+POLICY_FLAG: str = "flag"
+POLICY_OFF: str = "off"
+POLICY_CHOICES: List[str] = [POLICY_MASK, POLICY_DROP, POLICY_FLAG, POLICY_OFF]
+# 逐次集計の不正値の処理方法 (集計値にフラグ列は無いため flag は除く)
+STREAM_POLICY_CHOICES: List[str] = [POLICY_MASK, POLICY_DROP, POLICY_OFF]
+# 観測項目毎の物理的な範囲 (下限, 上限) ※センサーの測定範囲
+VALID_RANGES: Dict[str, Tuple[float, float]] = {
+    'temp_out': (-40., 50.),
+    'humid': (0., 100.),
+    'pressure': (900., 1100.),
+}
+# スパイク判定の移動窓の行数 (奇数: 前後3行 ※測定間隔が約10分なら約1時間)
+SPIKE_WINDOW: int = 7
+# スパイクとみなす偏差 (移動MADの倍数) ※MADは正規分布の標準偏差相当に換算する
+SPIKE_MAD_FACTOR: float = 5.
+MAD_TO_SIGMA: float = 1.4826
+# 観測項目毎のスパイクとみなす最小偏差 ※移動MADが小さい (値が一定) 区間の誤検出を防ぐ
+SPIKE_MIN_DEVIATIONS: Dict[str, float] = {
+    'temp_out': 8.,
+    'humid': 15.,
+    'pressure': 5.,
+}
+# 不正値フラグ列の接尾辞
+SUFFIX_INVALID: str = "_invalid"
+# 件数のキー
+COUNT_RANGE: str = "range"
+COUNT_SPIKE: str = "spike"
+
+
+def flag_column(col_name: str) -> str:
+    """
+    不正値フラグ列名を取得する
+    :param col_name: 観測データ列名
+    :return: 不正値フラグ列名
+    """
+    return col_name + SUFFIX_INVALID
+
+
+def out_of_range(values: np.ndarray, col_name: str) -> np.ndarray:
+    """
+    物理的な範囲外の値を判定する ※欠損値は範囲内とする
+    :param values: 観測値の配列
+    :param col_name: 観測項目列名 (VALID_RANGES のキー)
+    :return: 範囲外ならTrueの配列
+    """
+    lo, hi = VALID_RANGES[col_name]
+    return (values < lo) | (values > hi)
+
+
+def _fill_forward(values: np.ndarray) -> np.ndarray:
+    """
+    欠損値を直前の値 (先頭の欠損値は最初の値) で埋める ※np.nanmedian より np.median が高速なため
+    :param values: 観測値の配列 (float64)
+    :return: 欠損値を埋めた配列 ※欠損値が無ければ元の配列
+    """
+    is_nan: np.ndarray = np.isnan(values)
+    if not is_nan.any():
+        return values
+
+    positions: np.ndarray = np.where(is_nan, 0, np.arange(values.shape[0]))
+    np.maximum.accumulate(positions, out=positions)
+    filled: np.ndarray = values[positions]
+    filled[np.isnan(filled)] = values[np.argmax(~is_nan)]
+    return filled
+
+
+def find_spikes(values: np.ndarray, col_name: str, window: int = SPIKE_WINDOW) -> np.ndarray:
+    """
+    移動中央値と移動MADからスパイクを判定する ※欠損値は除いて計算する
+    :param values: 観測値の配列 (float64)
+    :param col_name: 観測項目列名 (SPIKE_MIN_DEVIATIONS のキー)
+    :param window: 移動窓の行数 (奇数)
+    :return: スパイクならTrueの配列
+    """
+    if values.shape[0] < window or np.isnan(values).all():
+        return np.zeros(values.shape[0], dtype=bool)
+
+    half: int = window // 2
+    # 両端は端の値で埋めて全行を窓の中心とする (行数 × 窓の行数 のビュー, コピーしない)
+    padded: np.ndarray = np.pad(_fill_forward(values), half, mode="edge")
+    windows: np.ndarray = sliding_window_view(padded, window)
+    median: np.ndarray = np.median(windows, axis=1)
+    mad: np.ndarray = np.median(np.abs(windows - median[:, None]), axis=1)
+    # 欠損値の行は比較結果が False になる
+    limit: np.ndarray = np.maximum(SPIKE_MAD_FACTOR * MAD_TO_SIGMA * mad,
+                                   SPIKE_MIN_DEVIATIONS[col_name])
+    return np.abs(values - median) > limit
+
+
+def find_invalid(values: np.ndarray, col_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    範囲外の値とスパイクを判定する ※スパイクは範囲外の値を除いて判定する
+    :param values: 観測値の配列 (float64, 測定時刻の昇順)
+    :param col_name: 観測項目列名 (VALID_RANGES のキー)
+    :return: (範囲外ならTrueの配列, スパイクならTrueの配列)
+    """
+    range_mask: np.ndarray = out_of_range(values, col_name)
+    spike_mask: np.ndarray = find_spikes(np.where(range_mask, np.nan, values), col_name)
+    return range_mask, spike_mask
+
+
+def validate_readings(df: DataFrame, policy: str = POLICY_MASK,
+                      logger: Optional[logging.Logger] = None
+                      ) -> Tuple[DataFrame, Dict[str, Dict[str, int]]]:
+    """
+    観測データの範囲外の値とスパイクを検出し、処理方法に従って処理する
+    :param df: 観測データのDataFrame (測定時刻の昇順)
+    :param policy: 不正値の処理方法 (POLICY_CHOICES)
+    :param logger: application logger
+    :return: (処理後のDataFrame, 観測項目列名をキーとする不正値の件数 {range: 件数, spike: 件数})
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    if policy == POLICY_OFF or df.shape[0] == 0:
+        return df, counts
+
+    # 列名をキーとする不正値の判定結果 (集計データは最小値・最大値列を含む)
+    invalid_masks: Dict[str, np.ndarray] = {}
+    # 観測項目列名をキーとする行毎の不正値フラグ (最小値・最大値列の不正値を含む)
+    row_flags: Dict[str, np.ndarray] = {}
+    for col_name in VALID_RANGES:
+        if col_name not in df.columns:
+            continue
+
+        range_mask, spike_mask = find_invalid(df[col_name].to_numpy(dtype=np.float64), col_name)
+        invalid_masks[col_name] = range_mask | spike_mask
+        row_flag: np.ndarray = invalid_masks[col_name]
+        # 集計データの最小値・最大値列は範囲外の値のみ
+        for envelope_col in (min_column(col_name), max_column(col_name)):
+            if envelope_col in df.columns:
+                envelope_mask: np.ndarray = out_of_range(
+                    df[envelope_col].to_numpy(dtype=np.float64), col_name)
+                invalid_masks[envelope_col] = envelope_mask
+                range_mask = range_mask | envelope_mask
+                row_flag = row_flag | envelope_mask
+        row_flags[col_name] = row_flag
+        counts[col_name] = {COUNT_RANGE: int(range_mask.sum()), COUNT_SPIKE: int(spike_mask.sum())}
+
+    if logger is not None:
+        logger.info(f"validation({policy}): {counts}")
+    if not any(flag.any() for flag in row_flags.values()):
+        return df, counts
+
+    if policy == POLICY_DROP:
+        any_invalid: np.ndarray = np.logical_or.reduce(list(row_flags.values()))
+        return df.loc[~any_invalid].reset_index(drop=True), counts
+
+    df = df.copy()
+    if policy == POLICY_FLAG:
+        for col_name, row_flag in row_flags.items():
+            df[flag_column(col_name)] = row_flag
+    else:
+        for col_name, mask in invalid_masks.items():
+            df.loc[mask, col_name] = np.nan
+    return df, counts
+
+
+class ChunkValidator:
+    """
+    チャンク毎の観測値の妥当性チェック (逐次集計用)\n
+    スパイク判定の移動窓がチャンク境界をまたぐため、
+    (1) 各チャンクの末尾 (移動窓の半分の行数) は次のチャンクを読み込むまで保留する
+    (2) 処理済みの末尾 (移動窓の行数) の値を次のチャンクの移動窓の前方に使う
+    最後のチャンクの後に flush() で保留中の行を処理する
+    """
+    __slots__ = ("policy", "columns", "window", "context", "pending_epochs", "pending_values",
+                 "counts")
+
+    def __init__(self, columns: List[str], policy: str = POLICY_MASK, window: int = SPIKE_WINDOW):
+        """
+        :param columns: 観測データ列名 ※チャンクの観測値の列順
+        :param policy: 不正値の処理方法 (STREAM_POLICY_CHOICES ※off 以外)
+        :param window: スパイク判定の移動窓の行数 (奇数)
+        :raise ValueError: 逐次集計で使えない処理方法
+        """
+        if policy not in (POLICY_MASK, POLICY_DROP):
+            raise ValueError(f"Invalid policy for streaming: {policy}")
+
+        self.policy: str = policy
+        self.columns: List[str] = list(columns)
+        self.window: int = window
+        # 処理済みの末尾の値 (範囲外の値は NaN, 欠損値は直前の値で埋める)
+        self.context: np.ndarray = np.empty((0, len(self.columns)), dtype=np.float64)
+        # 保留中の行 (測定時刻, 観測値)
+        self.pending_epochs: np.ndarray = np.empty(0, dtype=np.int64)
+        self.pending_values: np.ndarray = np.empty((0, len(self.columns)), dtype=np.float64)
+        # 観測項目列名をキーとする不正値の件数 (validate_readings と同じ形式)
+        self.counts: Dict[str, Dict[str, int]] = {
+            col_name: {COUNT_RANGE: 0, COUNT_SPIKE: 0}
+            for col_name in self.columns if col_name in VALID_RANGES
+        }
+
+    def validate(self, epochs: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        チャンクをチェックし、処理方法に従って処理する ※末尾の行は次のチャンクまで保留する
+        :param epochs: 測定時刻 (unix epoch 秒, int64, 昇順)
+        :param values: 観測値 (行数 × 列数, float64, 欠損値は NaN)
+        :return: 処理済みの行の (測定時刻, 観測値) ※保留中の行を含み、末尾の保留分を除く
+        """
+        self.pending_epochs = np.concatenate([self.pending_epochs, epochs])
+        self.pending_values = np.concatenate([self.pending_values, values])
+        return self._process(final=False)
+
+    def flush(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        保留中の行をチェックし、処理方法に従って処理する ※最後のチャンクの後に呼ぶ
+        :return: 処理済みの行の (測定時刻, 観測値)
+        """
+        return self._process(final=True)
+
+    def _process(self, final: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        保留中の行のうち移動窓の後方が揃った行をチェックし、処理方法に従って処理する
+        :param final: 最後のチャンクの後 (移動窓の後方は端の値で埋める)
+        :return: 処理済みの行の (測定時刻, 観測値)
+        """
+        half: int = self.window // 2
+        n_context: int = self.context.shape[0]
+        n_pending: int = self.pending_epochs.shape[0]
+        ready: int = n_pending
+        if not final:
+            # 移動窓より短い場合は find_spikes が判定しないため、移動窓の行数が揃うまで保留する
+            ready = max(n_pending - half, 0) if n_context + n_pending >= self.window else 0
+        epochs: np.ndarray = self.pending_epochs[:ready]
+        values: np.ndarray = self.pending_values[:ready].copy()
+        if ready == 0:
+            return epochs, values
+
+        invalid_rows: np.ndarray = np.zeros(ready, dtype=bool)
+        # 次のチャンクの移動窓の前方 (チェックしない列は NaN のまま)
+        context_rows: int = min(n_context + ready, self.window)
+        next_context: np.ndarray = np.full((context_rows, len(self.columns)), np.nan)
+        for col_idx, col_name in enumerate(self.columns):
+            if col_name not in VALID_RANGES:
+                continue
+
+            raw: np.ndarray = self.pending_values[:, col_idx]
+            range_mask: np.ndarray = out_of_range(raw, col_name)
+            checked: np.ndarray = np.where(range_mask, np.nan, raw)
+            # 前のチャンクの末尾を移動窓の前方に連結する (欠損値は連結後に直前の値で埋める)
+            filled: np.ndarray = _fill_forward(np.concatenate([self.context[:, col_idx], checked]))
+            spike_mask: np.ndarray = (find_spikes(filled, col_name, self.window)[n_context:]
+                                      & ~np.isnan(checked))
+            next_context[:, col_idx] = filled[n_context + ready - context_rows:n_context + ready]
+            invalid: np.ndarray = (range_mask | spike_mask)[:ready]
+            self.counts[col_name][COUNT_RANGE] += int(range_mask[:ready].sum())
+            self.counts[col_name][COUNT_SPIKE] += int(spike_mask[:ready].sum())
+            if self.policy == POLICY_DROP:
+                invalid_rows |= invalid
+            else:
+                values[invalid, col_idx] = np.nan
+
+        self.context = next_context
+        self.pending_epochs = self.pending_epochs[ready:]
+        self.pending_values = self.pending_values[ready:]
+        if invalid_rows.any():
+            return epochs[~invalid_rows], values[~invalid_rows]
+        return epochs, values
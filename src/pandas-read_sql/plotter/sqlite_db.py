@@ -0,0 +1,237 @@
+import atexit
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+"""
+SQLite3 読み込み用接続ユーティリティ
+(1) 接続の共有: データベースファイル毎 (スレッド毎) に接続を1つだけ生成しプロセス内で使い回す
+    ※sqlite3 のプリペアドステートメントキャッシュ (cached_statements) は接続毎のため、
+      接続を使い回すと同じSQLの2回目以降はコンパイルされない
+(2) 読み込み用の PRAGMA: mmap_size, cache_size, temp_store ※tuned=True の場合のみ設定する
+    月間データの取得 (execute + fetchall) では PRAGMA なしの方が速いためデフォルトは設定しない
+    (BenchmarkSQLiteRead.py の raw: shared と shared+pragmas を比較)
+(3) 年単位のアーカイブファイル (完了年の観測データのみを含む読み込み専用のコピー) は immutable=1 で開く
+    ※ファイルの変更検知・ロックを行わない (アーカイブファイルは作成後に更新しないこと)
+(4) t_weather を WITHOUT ROWID (主キー順に格納) のテーブルに移行したデータベースファイルを作成する
+[バッチ・常駐プロセス] get_shared_connection() で取得した接続は close() せずに使い回す ※終了時に自動でクローズ
+"""
+
+# メモリマップドI/Oのサイズ (バイト) ※Raspberry Pi (32bit OS) のアドレス空間を考慮して 64MiB
+MMAP_SIZE: int = 64 * 1024 * 1024
+# ページキャッシュのサイズ (負数: KiB単位) ※16MiB
+CACHE_SIZE_KIB: int = 16 * 1024
+# 一時テーブル・インデックスの保存先 (ソート・GROUP BY の作業領域)
+TEMP_STORE: str = "MEMORY"
+# 接続毎のプリペアドステートメントキャッシュのサイズ
+CACHED_STATEMENTS: int = 256
+# 読み込み用の PRAGMA
+READ_PRAGMAS: List[str] = [
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KIB}",
+    f"PRAGMA temp_store={TEMP_STORE}",
+]
+# アーカイブファイル名フォーマット (年)
+FMT_ARCHIVE_NAME: str = "weather_{year}.db"
+# 年単位のアーカイブ作成時に残す範囲 (日本時間の年初から翌年の年初まで) の外側の行を削除するSQL
+DELETE_OUTSIDE_YEAR: str = """
+DELETE FROM t_weather
+WHERE
+   measurement_time < CAST(strftime('%s', :fromDate, '-9 hours') AS INTEGER)
+   OR measurement_time >= CAST(strftime('%s', :toDate, '-9 hours') AS INTEGER)
+"""
+
+# テーブル生成SQL (WITHOUT ROWID 版)
+SCHEMA_WITHOUT_ROWID_SQL: str = os.path.join("db", "sqlite3", "weather_db_without_rowid.sql")
+# テーブル定義を取得するSQL
+QUERY_TABLE_SQL: str = "SELECT sql FROM sqlite_master WHERE type='table' AND name=?"
+# 移行元のデータベースの別名 (ATTACH)
+MIGRATE_SOURCE: str = "src"
+# 移行元から観測データを主キー順にコピーするSQL
+COPY_DEVICE: str = f"""
+INSERT INTO t_device(id, name) SELECT id, name FROM {MIGRATE_SOURCE}.t_device ORDER BY id
+"""
+COPY_WEATHER: str = f"""
+INSERT INTO t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+SELECT did, measurement_time, temp_out, temp_in, humid, pressure
+FROM {MIGRATE_SOURCE}.t_weather
+ORDER BY did, measurement_time
+"""
+COUNT_SOURCE_WEATHER: str = f"SELECT COUNT(*) FROM {MIGRATE_SOURCE}.t_weather"
+
+# 生成済み接続 (キー: データベースファイルの絶対パス, immutable, PRAGMA設定, スレッドID)
+_connections: Dict[Tuple[str, bool, bool, int], sqlite3.Connection] = {}
+_lock: threading.Lock = threading.Lock()
+
+
+def _read_only_uri(db_path: str, immutable: bool) -> str:
+    """
+    読み込み専用の接続URIを生成する
+    :param db_path: データベースファイルの絶対パス
+    :param immutable: True なら immutable=1 (変更検知・ロックなし)
+    :return: 接続URI
+    """
+    uri: str = f"file:{quote(db_path)}?mode=ro"
+    return uri + "&immutable=1" if immutable else uri
+
+
+def open_read_only(db_path: str, immutable: bool = False,
+                   tuned: bool = False) -> sqlite3.Connection:
+    """
+    読み込み専用の接続を生成する ※共有しない (呼び出し側でクローズする)
+    :param db_path: データベースファイルパス
+    :param immutable: True なら immutable=1 で開く (アーカイブファイル用)
+    :param tuned: True なら読み込み用の PRAGMA を設定する
+    :return: SQLite3接続
+    """
+    conn: sqlite3.Connection = sqlite3.connect(
+        _read_only_uri(os.path.abspath(db_path), immutable), uri=True,
+        cached_statements=CACHED_STATEMENTS,
+        # 常駐プロセスではスレッド毎に接続を生成する (get_shared_connection)
+        check_same_thread=False
+    )
+    if tuned:
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+    return conn
+
+
+def get_shared_connection(db_path: str, immutable: bool = False,
+                          tuned: bool = False) -> sqlite3.Connection:
+    """
+    データベースファイルに対応する共有の読み込み専用接続を取得する ※未生成なら生成する
+    :param db_path: データベースファイルパス
+    :param immutable: True なら immutable=1 で開く (アーカイブファイル用)
+    :param tuned: True なら読み込み用の PRAGMA を設定する
+    :return: SQLite3接続 ※クローズしないこと
+    """
+    key: Tuple[str, bool, bool, int] = (
+        os.path.abspath(db_path), immutable, tuned, threading.get_ident()
+    )
+    with _lock:
+        conn: Optional[sqlite3.Connection] = _connections.get(key)
+        if conn is None:
+            conn = open_read_only(db_path, immutable=immutable, tuned=tuned)
+            _connections[key] = conn
+        return conn
+
+
+def close_connections() -> None:
+    """ 共有の接続を全てクローズする ※終了時に自動で呼び出す """
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+atexit.register(close_connections)
+
+
+def archive_path(archive_dir: str, year: int) -> str:
+    """
+    年単位のアーカイブファイルパスを取得する
+    :param archive_dir: アーカイブディレクトリ
+    :param year: 年
+    :return: アーカイブファイルパス
+    """
+    return os.path.join(archive_dir, FMT_ARCHIVE_NAME.format(year=year))
+
+
+def connection_for_year_month(db_path: str, year_month: str,
+                              archive_dir: Optional[str] = None) -> sqlite3.Connection:
+    """
+    年月の観測データを読み込む共有接続を取得する\n
+    アーカイブディレクトリに該当年のアーカイブファイルがあれば immutable=1 で開き、無ければ元のデータベース
+    :param db_path: データベースファイルパス
+    :param year_month: 年月 "YYYY-MM"
+    :param archive_dir: アーカイブディレクトリ ※Noneならアーカイブファイルを使わない
+    :return: SQLite3接続 ※クローズしないこと
+    """
+    if archive_dir is not None:
+        path: str = archive_path(archive_dir, int(year_month.split("-")[0]))
+        if os.path.exists(path):
+            return get_shared_connection(path, immutable=True)
+    return get_shared_connection(db_path)
+
+
+def export_year_archive(db_path: str, archive_dir: str, year: int) -> str:
+    """
+    指定年 (完了年) の観測データのみを含むアーカイブファイルを作成する\n
+    VACUUM INTO でデータベース全体をコピーしてから指定年以外の行を削除する ※テーブル定義・インデックスを保つ
+    :param db_path: データベースファイルパス
+    :param archive_dir: アーカイブディレクトリ
+    :param year: 年
+    :return: アーカイブファイルパス
+    """
+    path: str = archive_path(archive_dir, year)
+    os.makedirs(archive_dir, exist_ok=True)
+    # 作成途中のファイルを開かないように一時ファイルから置き換える
+    tmp_path: str = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    src: sqlite3.Connection = open_read_only(db_path, tuned=False)
+    try:
+        src.execute("VACUUM INTO ?", (tmp_path,))
+    finally:
+        src.close()
+    dst: sqlite3.Connection = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        dst.execute(DELETE_OUTSIDE_YEAR, {'fromDate': f"{year}-01-01", 'toDate': f"{year + 1}-01-01"})
+        dst.execute("VACUUM")
+    finally:
+        dst.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def is_without_rowid(connection: sqlite3.Connection, table_name: str = "t_weather") -> bool:
+    """
+    テーブルが WITHOUT ROWID か判定する
+    :param connection: SQLite3接続
+    :param table_name: テーブル名
+    :return: WITHOUT ROWID ならTrue
+    """
+    row: Optional[Tuple[str]] = connection.execute(QUERY_TABLE_SQL, (table_name,)).fetchone()
+    return row is not None and "WITHOUT ROWID" in row[0].upper()
+
+
+def migrate_without_rowid(db_path: str, dst_path: str,
+                          schema_sql: str = SCHEMA_WITHOUT_ROWID_SQL) -> int:
+    """
+    t_weather を WITHOUT ROWID のテーブルに移行したデータベースファイルを作成する\n
+    移行元のデータベースは変更しない ※観測データは主キー順に挿入してB-treeを詰めて作成する
+    :param db_path: 移行元のデータベースファイルパス
+    :param dst_path: 移行先のデータベースファイルパス ※既に存在する場合はエラー
+    :param schema_sql: 移行先のテーブル生成SQLファイルパス
+    :return: 移行した観測データの行数
+    """
+    if os.path.exists(dst_path):
+        raise FileExistsError(f"already exists: {dst_path}")
+
+    # 作成途中のファイルを開かないように一時ファイルから置き換える
+    tmp_path: str = dst_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn: sqlite3.Connection = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        with open(schema_sql, 'r') as fp:
+            conn.executescript(fp.read())
+        conn.execute(f"ATTACH DATABASE ? AS {MIGRATE_SOURCE}", (os.path.abspath(db_path),))
+        conn.execute("BEGIN")
+        conn.execute(COPY_DEVICE)
+        rows: int = conn.execute(COPY_WEATHER).rowcount
+        source_rows: int = conn.execute(COUNT_SOURCE_WEATHER).fetchone()[0]
+        if rows != source_rows:
+            raise sqlite3.DatabaseError(f"row count mismatch: {rows} != {source_rows}")
+        conn.execute("COMMIT")
+        conn.execute(f"DETACH DATABASE {MIGRATE_SOURCE}")
+        conn.execute("ANALYZE")
+    except Exception:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, dst_path)
+    return rows
@@ -0,0 +1,194 @@
+import calendar
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from plotter.resolution import (
+    JST_OFFSET_SECONDS, RESOLUTION_RAW, RESOLUTION_SECONDS, VALUE_COLUMNS, max_column, min_column
+)
+from plotter.sensor_validation import ChunkValidator
+
+"""
+複数年の期間の観測データの逐次集計 (チャンク読み込み)
+(1) クエリー結果を一定行数 (チャンク) 毎に読み込み、集計間隔毎の件数・合計・最小値・最大値に畳み込む
+    ※期間全体の DataFrame を生成しないため、メモリ使用量は期間の行数ではなく集計間隔の数で決まる
+(2) チャンクの読み込みは DB-API カーソルの fetchmany
+    SQLite3: カーソルの逐次読み込み
+    PostgreSQL (psycopg2): 名前付きカーソル (サーバーサイドカーソル) ※接続はトランザクション内で使う
+(3) 集計時刻は日本時間基準で集計間隔に切り捨てる (SQL の --resolution の集計と同じ)
+(4) 集計間隔 auto はプロット点数の上限以下になる最小の集計間隔を選ぶ
+(5) 観測値の妥当性チェック (--validate) はチャンク毎に集計バッファに畳み込む前に行う (ChunkValidator)
+"""
+
+# 集計間隔の自動選択
+RESOLUTION_AUTO: str = "auto"
+# 逐次集計の集計間隔の選択肢 (raw は除く)
+STREAM_RESOLUTION_CHOICES: List[str] = [RESOLUTION_AUTO] + [
+    resolution for resolution in RESOLUTION_SECONDS if resolution != RESOLUTION_RAW
+]
+# 1チャンクの行数 (10分間隔で約1週間)
+DEFAULT_CHUNK_ROWS: int = 1000
+# 集計間隔 auto のプロット点数の上限 (図の幅のピクセル数程度)
+DEFAULT_MAX_POINTS: int = 1000
+
+
+def month_range_epochs(from_year_month: str, to_year_month: str,
+                       offset: int = JST_OFFSET_SECONDS) -> Tuple[int, int]:
+    """
+    年月の期間の unix epoch 秒を取得する
+    :param from_year_month: 開始年月 (形式: "%Y-%m")
+    :param to_year_month: 終了年月 (形式: "%Y-%m") ※終了年月を含む
+    :param offset: UTCからの時差 (秒)
+    :return: (開始年月の月初, 終了年月の翌月の月初) ※日本時間の0時
+    :raise ValueError: 年月が不正, 終了年月が開始年月より前
+    """
+    from_year, from_month = (int(val) for val in from_year_month.split("-"))
+    to_year, to_month = (int(val) for val in to_year_month.split("-"))
+    if (to_year, to_month) < (from_year, from_month):
+        raise ValueError(f"Invalid range: {from_year_month} - {to_year_month}")
+
+    next_year, next_month = (to_year + 1, 1) if to_month == 12 else (to_year, to_month + 1)
+    start: int = calendar.timegm(date(from_year, from_month, 1).timetuple()) - offset
+    end: int = calendar.timegm(date(next_year, next_month, 1).timetuple()) - offset
+    return start, end
+
+
+def fit_resolution(start_epoch: int, end_epoch: int, max_points: int) -> str:
+    """
+    プロット点数の上限以下になる最小の集計間隔を取得する
+    :param start_epoch: 期間の開始 (unix epoch 秒)
+    :param end_epoch: 期間の終了 (unix epoch 秒, 含まない)
+    :param max_points: プロット点数の上限
+    :return: 集計間隔 ※上限を超える場合は最大の集計間隔
+    """
+    candidates: List[str] = STREAM_RESOLUTION_CHOICES[1:]
+    for resolution in candidates:
+        if (end_epoch - start_epoch) / RESOLUTION_SECONDS[resolution] <= max_points:
+            return resolution
+    return candidates[-1]
+
+
+class BucketAggregator:
+    """
+    集計間隔毎の件数・合計・最小値・最大値の集計バッファ\n
+    バッファは期間と集計間隔から事前に確保し、チャンク毎に add() で畳み込む
+    """
+    __slots__ = ("first_bucket", "bucket_seconds", "offset", "columns",
+                 "counts", "sums", "mins", "maxs", "rows", "chunks")
+
+    def __init__(self, start_epoch: int, end_epoch: int, bucket_seconds: int,
+                 columns: Optional[List[str]] = None, offset: int = JST_OFFSET_SECONDS):
+        """
+        :param start_epoch: 期間の開始 (unix epoch 秒)
+        :param end_epoch: 期間の終了 (unix epoch 秒, 含まない)
+        :param bucket_seconds: 集計間隔 (秒)
+        :param columns: 観測データ列名 ※チャンクの観測値の列順, 未指定なら VALUE_COLUMNS
+        :param offset: 集計時刻を揃えるUTCからの時差 (秒)
+        :raise ValueError: 集計間隔・期間が不正
+        """
+        if bucket_seconds <= 0 or end_epoch <= start_epoch:
+            raise ValueError(f"Invalid bucket: {bucket_seconds}s, {start_epoch} - {end_epoch}")
+
+        self.first_bucket: int = (start_epoch + offset) // bucket_seconds
+        last_bucket: int = (end_epoch - 1 + offset) // bucket_seconds
+        self.bucket_seconds: int = bucket_seconds
+        self.offset: int = offset
+        self.columns: List[str] = list(columns) if columns is not None else list(VALUE_COLUMNS)
+        shape: Tuple[int, int] = (last_bucket - self.first_bucket + 1, len(self.columns))
+        self.counts: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.sums: np.ndarray = np.zeros(shape, dtype=np.float64)
+        # 最小値・最大値は NaN で初期化し np.fmin, np.fmax (NaN を無視) で畳み込む
+        self.mins: np.ndarray = np.full(shape, np.nan, dtype=np.float64)
+        self.maxs: np.ndarray = np.full(shape, np.nan, dtype=np.float64)
+        self.rows: int = 0
+        self.chunks: int = 0
+
+    def add(self, epochs: np.ndarray, values: np.ndarray) -> None:
+        """
+        チャンクを集計バッファに畳み込む\n
+        チャンク内は集計間隔の連続区間毎に reduceat で集計してからバッファに加える
+        ※測定時刻の昇順なら区間数は集計間隔の数, 期間外の行は除く
+        :param epochs: 測定時刻 (unix epoch 秒, int64)
+        :param values: 観測値 (行数 × 列数, float64, 欠損値は NaN)
+        """
+        buckets: np.ndarray = (epochs + self.offset) // self.bucket_seconds - self.first_bucket
+        in_range: np.ndarray = (buckets >= 0) & (buckets < self.counts.shape[0])
+        if not in_range.all():
+            buckets, values = buckets[in_range], values[in_range]
+        self.rows += buckets.shape[0]
+        self.chunks += 1
+        if buckets.shape[0] == 0:
+            return
+
+        starts: np.ndarray = np.flatnonzero(np.diff(buckets, prepend=-1) != 0)
+        targets: np.ndarray = buckets[starts]
+        valid: np.ndarray = ~np.isnan(values)
+        # 同一の集計間隔が複数の区間に分かれる場合 (昇順でない) も ufunc.at で加算する
+        np.add.at(self.counts, targets, np.add.reduceat(valid, starts, axis=0, dtype=np.int64))
+        np.add.at(self.sums, targets, np.add.reduceat(np.where(valid, values, 0.), starts, axis=0))
+        np.fmin.at(self.mins, targets, np.fmin.reduceat(values, starts, axis=0))
+        np.fmax.at(self.maxs, targets, np.fmax.reduceat(values, starts, axis=0))
+
+    def result(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        観測データのある集計間隔の平均値・最小値・最大値を取得する ※SQLの GROUP BY と同様に空の集計間隔は除く
+        :return: (集計時刻 (unix epoch 秒, int64), 列名をキーとする値 (平均値は元の列名, 最小値・最大値は
+                 "_min", "_max" の列名)) ※値は C連続の1次元配列, 欠損値は NaN
+        """
+        filled: np.ndarray = np.flatnonzero(self.counts.sum(axis=1) > 0)
+        epochs: np.ndarray = (
+            (filled + self.first_bucket) * self.bucket_seconds - self.offset).astype(np.int64)
+        counts: np.ndarray = self.counts[filled]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means: np.ndarray = np.where(counts > 0, self.sums[filled] / counts, np.nan)
+        columns: Dict[str, np.ndarray] = {}
+        for col_idx, col_name in enumerate(self.columns):
+            columns[col_name] = np.ascontiguousarray(means[:, col_idx])
+            columns[min_column(col_name)] = np.ascontiguousarray(self.mins[filled, col_idx])
+            columns[max_column(col_name)] = np.ascontiguousarray(self.maxs[filled, col_idx])
+        return epochs, columns
+
+    def buffer_bytes(self) -> int:
+        """
+        集計バッファのメモリ使用量を取得する
+        :return: バイト数
+        """
+        return self.counts.nbytes + self.sums.nbytes + self.mins.nbytes + self.maxs.nbytes
+
+
+def iter_cursor_chunks(cursor: Any,
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    カーソルのクエリー結果をチャンク毎に配列に変換する
+    :param cursor: 実行済みの DB-API カーソル ※1列目: 測定時刻 (unix epoch 秒), 2列目以降: 観測値
+    :param chunk_rows: 1チャンクの行数
+    :return: (測定時刻 (int64), 観測値 (行数 × 列数, float64, None は NaN)) のイテレータ
+    """
+    while True:
+        records: List[Tuple] = cursor.fetchmany(chunk_rows)
+        if not records:
+            break
+        chunk: np.ndarray = np.array(records, dtype=np.float64)
+        yield chunk[:, 0].astype(np.int64), chunk[:, 1:]
+
+
+def aggregate_cursor(cursor: Any, aggregator: BucketAggregator,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                     validator: Optional[ChunkValidator] = None) -> BucketAggregator:
+    """
+    カーソルのクエリー結果をチャンク毎に集計バッファに畳み込む
+    :param cursor: 実行済みの DB-API カーソル (iter_cursor_chunks)
+    :param aggregator: 集計バッファ
+    :param chunk_rows: 1チャンクの行数
+    :param validator: 観測値の妥当性チェック ※未指定ならチェックしない
+    :return: 集計バッファ
+    """
+    for epochs, values in iter_cursor_chunks(cursor, chunk_rows):
+        if validator is not None:
+            epochs, values = validator.validate(epochs, values)
+        aggregator.add(epochs, values)
+    if validator is not None:
+        # 保留中の末尾の行 (移動窓の半分) を畳み込む
+        aggregator.add(*validator.flush())
+    return aggregator
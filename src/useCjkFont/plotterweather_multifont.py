@@ -20,6 +20,8 @@ import matplotlib.dates as mdates
 from matplotlib.figure import Figure
 from matplotlib.pyplot import setp
 
+from gap_util import DEFAULT_GAP_MINUTES, gap_threshold, insert_gap_breaks, shade_gaps
+
 
 WEATHER_IDX_COLUMN = 'measurement_time'
 LABEL_FONTSIZE = 10
@@ -144,11 +146,12 @@ def _axesPressureSetting(ax, df):
     ax.grid(GRID_STYLES)
 
 
-def gen_plot_imagetag(csv_file, str_today="now"):
+def gen_plot_imagetag(csv_file, str_today="now", gap_minutes=DEFAULT_GAP_MINUTES):
     """
     気象データCSVファイルからMatplotlib画像を生成し、img タグを含むHTML文字列を返却する
     :param csv_file:CSVファイルパス
     :param str_today:当日を表す日付文字列: "now"なら今日, それ以外は有効な日付文字列(YYYY-mm-DD)
+    :param gap_minutes:欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
     :return: img タグを含むhtml文字列
     """
     # CSVファイルからDataFrameを生成
@@ -157,6 +160,8 @@ def gen_plot_imagetag(csv_file, str_today="now"):
                      parse_dates=[WEATHER_IDX_COLUMN],
                      names=[WEATHER_IDX_COLUMN, 'temp_out', 'temp_in', 'humid', 'pressure']
                      )
+    # 欠測区間に区切り行 (観測値は NaN) を挿入して線を途切れさせる
+    df, gaps = insert_gap_breaks(df, WEATHER_IDX_COLUMN, gap_threshold(gap_minutes))
     # タイムスタンプをデータフレームのインデックスに設定
     df.index = df[WEATHER_IDX_COLUMN]
 
@@ -190,6 +195,8 @@ def gen_plot_imagetag(csv_file, str_today="now"):
     # 1日データx軸の範囲: 当日 00時 から 翌日 00時
     for ax in [ax_temp, ax_humid, ax_pressure]:
         ax.set_xlim([x_day_min, x_day_max])
+        # 欠測区間を塗りつぶす
+        shade_gaps(ax, gaps, "gray")
 
     # サブプロットの設定
     # 1.外気温と室内気温
@@ -212,6 +219,8 @@ if __name__ == '__main__':
     parser.add_argument("--csv-path", type=str, required=True, help="Weather data csv file of absolute path.")
     parser.add_argument("--output-dir", type=str, help="Output HTML directory.")
     parser.add_argument("--today-date", type=str, help="CSV data date: 'now' or 'YYYY-mm-DD'.")
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
     args = parser.parse_args()
 
     csv_file = os.path.join(os.path.expanduser(args.csv_path))
@@ -233,14 +242,14 @@ if __name__ == '__main__':
 
     today_date = args.today_date
     if today_date is None or (today_date is not None and today_date == 'now'):
-        img_tag = gen_plot_imagetag(csv_file)
+        img_tag = gen_plot_imagetag(csv_file, gap_minutes=args.gap_minutes)
     else:
         try:
             datetime.strptime(today_date, "%Y-%m-%d")
         except ValueError:
             print("today-date is 'YYYY-MM-DD'")
             exit(1)
-        img_tag = gen_plot_imagetag(csv_file, str_today=today_date)
+        img_tag = gen_plot_imagetag(csv_file, str_today=today_date, gap_minutes=args.gap_minutes)
 
     with open(html_path, 'w') as fp:
         fp.write(img_tag)
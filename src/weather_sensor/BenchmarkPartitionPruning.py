@@ -0,0 +1,203 @@
+import argparse
+import logging
+import os
+import re
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import text
+
+from CheckQueryPlans import FMT_DATETIME, FMT_SEED_DEVICE, makeCheckQueries
+from util.db_engine import get_engine
+from util.plan_check import explain, format_plan
+from util.weather_partition import (
+    create_partitioned_tables, ensure_range_partitions, scanned_partitions
+)
+
+"""
+気象センサーデータベースの観測データテーブルの構成毎に選択クエリーの実行計画と処理時間を比較する
+[比較構成]
+  (1) heap: 単一テーブル + 主キー (B-tree) ※sql/11_weather_db.sql
+  (2) partitioned: 月単位のレンジパーティション + 測定時刻の BRIN ※sql/12_weather_partitioned.sql
+[チェック対象] CheckQueryPlans.py と同じ (PlotWeatherComparePreviousYear.py, GetLatestYearMonth.py 等)
+  読み込んだパーティション数 (パーティションプルーニング), 計画時間, 全行取得までの処理時間 (中央値)
+(1) 比較用のスキーマに同じ合成データ (10分間隔) をトランザクション内で登録する
+(2) トランザクションはロールバックするため比較用のスキーマ・合成データはデータベースに残らない
+[実行例] python BenchmarkPartitionPruning.py --years 5 --devices 3 --repeat 5
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 気象センサーデータベース接続情報
+DB_CONF: str = os.path.join("conf", "db_sensors.json")
+
+# 比較用のスキーマ (テーブル構成)
+SCHEMA_HEAP: str = "bench_heap"
+SCHEMA_PARTITIONED: str = "bench_partitioned"
+# クエリーのスキーマ名 (比較用のスキーマに置き換える)
+RE_QUERY_SCHEMA: re.Pattern = re.compile(r"\bweather\.")
+# 単一テーブル生成SQL (sql/11_weather_db.sql と同じ構成)
+CREATE_HEAP_TABLES: List[str] = [
+    """
+CREATE TABLE {schema}.t_device(
+   id INTEGER NOT NULL,
+   name VARCHAR(20) UNIQUE NOT NULL,
+   CONSTRAINT pk_device PRIMARY KEY (id)
+)
+""",
+    """
+CREATE TABLE {schema}.t_weather(
+   did INTEGER NOT NULL,
+   measurement_time timestamp NOT NULL,
+   temp_out REAL,
+   temp_in REAL,
+   humid REAL,
+   pressure REAL,
+   CONSTRAINT pk_weather PRIMARY KEY (did, measurement_time),
+   CONSTRAINT fk_device FOREIGN KEY (did) REFERENCES {schema}.t_device (id)
+)
+""",
+]
+# 合成データ登録SQL
+INSERT_SEED_DEVICE: str = """
+INSERT INTO {schema}.t_device(id, name)
+SELECT g, 'plancheck_' || g FROM generate_series(1, :devices) g
+"""
+INSERT_SEED_WEATHER: str = """
+INSERT INTO {schema}.t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+SELECT
+  dev.id, t
+  ,(10 - 15 * cos(2 * pi() * extract(doy FROM t) / 365) + random() * 5)::real
+  ,(20 + random() * 5)::real
+  ,(30 + random() * 40)::real
+  ,(990 + random() * 40)::real
+FROM
+  {schema}.t_device dev
+  CROSS JOIN generate_series(
+    CAST(:startTime AS timestamp), CAST(:endTime AS timestamp), interval '10 minutes') t
+"""
+# 単一テーブルの合成データを測定時刻順にコピーするSQL (sql/12_weather_partitioned.sql の移行と同じ)
+COPY_SEED: str = """
+INSERT INTO {dst}.t_device SELECT * FROM {src}.t_device;
+INSERT INTO {dst}.t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+SELECT did, measurement_time, temp_out, temp_in, humid, pressure
+FROM {src}.t_weather
+ORDER BY measurement_time, did
+"""
+# 結果出力フォーマット
+FMT_RESULT: str = "[{}] {:<12} partitions={:>3}/{:<3} planning={:>7.2f}ms query={:>8.2f}ms"
+
+
+def seedSchemas(conn: Connection, devices: int, start_time: str, end_time: str) -> int:
+    """
+    比較用のスキーマを作成し同じ合成データを登録する ※呼び出し側のトランザクション内で実行する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param devices: 合成デバイス数
+    :param start_time: 合成データの開始時刻
+    :param end_time: 合成データの終了時刻
+    :return: 月パーティション数
+    """
+    seed_range: Dict = {"startTime": start_time, "endTime": end_time}
+    for schema in (SCHEMA_HEAP, SCHEMA_PARTITIONED):
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    for ddl in CREATE_HEAP_TABLES:
+        conn.execute(text(ddl.format(schema=SCHEMA_HEAP)))
+    create_partitioned_tables(conn, SCHEMA_PARTITIONED)
+
+    conn.execute(text(INSERT_SEED_DEVICE.format(schema=SCHEMA_HEAP)), {"devices": devices})
+    rs = conn.execute(text(INSERT_SEED_WEATHER.format(schema=SCHEMA_HEAP)), seed_range)
+    app_logger.info(f"seed rows: {rs.rowcount}")
+    partitions: int = len(
+        ensure_range_partitions(conn, start_time, end_time, schema=SCHEMA_PARTITIONED))
+    for copy_sql in COPY_SEED.format(src=SCHEMA_HEAP, dst=SCHEMA_PARTITIONED).split(";"):
+        conn.execute(text(copy_sql))
+    # ANALYZE はトランザクション内で実行可能 (ロールバックで統計情報も元に戻る)
+    for schema in (SCHEMA_HEAP, SCHEMA_PARTITIONED):
+        for table in ("t_device", "t_weather"):
+            conn.execute(text(f"ANALYZE {schema}.{table}"))
+    return partitions
+
+
+def timeQuery(conn: Connection, query: str, query_params: Dict, repeat: int) -> float:
+    """
+    クエリーを繰り返し実行し処理時間の中央値を取得する (全行取得まで)
+    :param conn: SQLAlchemy接続オブジェクト
+    :param query: 選択クエリー
+    :param query_params: クエリーパラメータ
+    :param repeat: 実行回数
+    :return: 処理時間の中央値 (ミリ秒)
+    """
+    elapsed: List[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        conn.execute(text(query), query_params).fetchall()
+        elapsed.append((time.perf_counter() - start) * 1000.)
+    return statistics.median(elapsed)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.INFO)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数
+    parser.add_argument("--years", type=int, default=5, help="合成データの年数 (デフォルト 5)")
+    # 合成デバイス数
+    parser.add_argument("--devices", type=int, default=3, help="合成デバイス数 (デフォルト 3)")
+    # クエリーの実行回数
+    parser.add_argument("--repeat", type=int, default=5, help="実行回数 (デフォルト 5)")
+    # 実行計画をログ出力する
+    parser.add_argument("--show-plan", action="store_true", help="Log EXPLAIN ANALYZE plans.")
+    # ホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    args: argparse.Namespace = parser.parse_args()
+    if args.years < 1 or args.devices < 1 or args.repeat < 1:
+        app_logger.warning("--years, --devices and --repeat must be >= 1")
+        exit(1)
+
+    # 合成データの期間: 本日0時から指定年数前まで
+    today: datetime = datetime.combine(datetime.today().date(), datetime.min.time())
+    seed_start: str = (today - timedelta(days=365 * args.years)).strftime(FMT_DATETIME)
+    seed_end: str = today.strftime(FMT_DATETIME)
+    # チェック対象の期間: 合成データの中間の月の1日
+    check_month: datetime = (today - timedelta(days=365 * args.years // 2)).replace(day=1)
+    check_queries: List[Tuple[str, str, Dict, Optional[Tuple[datetime, datetime]]]] = makeCheckQueries(
+        FMT_SEED_DEVICE.format(1), check_month
+    )
+    app_logger.info(f"seed: {seed_start} - {seed_end}")
+
+    # 共有エンジン (接続プール)
+    engine: Engine = get_engine(DB_CONF, hostname=args.db_host)
+
+    try:
+        with engine.connect() as conn:
+            trans = conn.begin()
+            try:
+                total_partitions: int = seedSchemas(conn, args.devices, seed_start, seed_end)
+                for query_id, query, query_params, _ in check_queries:
+                    app_logger.info(f"{query_id}: {query_params}")
+                    for schema in (SCHEMA_HEAP, SCHEMA_PARTITIONED):
+                        schema_query: str = RE_QUERY_SCHEMA.sub(f"{schema}.", query)
+                        plan: Dict = explain(conn, schema_query, query_params, analyze=True)
+                        if args.show_plan:
+                            app_logger.info(f"[{schema}]\n{format_plan(plan)}")
+                        median_ms: float = timeQuery(conn, schema_query, query_params, args.repeat)
+                        # 単一テーブルは1テーブル
+                        partitions: int = total_partitions if schema == SCHEMA_PARTITIONED else 1
+                        app_logger.info(FMT_RESULT.format(
+                            query_id, schema.replace("bench_", ""),
+                            len(scanned_partitions(plan)), partitions,
+                            plan["Planning Time"], median_ms))
+            finally:
+                # 比較用のスキーマ・合成データは残さない
+                trans.rollback()
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
@@ -0,0 +1,259 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import text
+
+from GetLatestYearMonth import QUERY as QUERY_LATEST_YEAR_MONTH
+from PlotWeatherComparePreviousYear import QUERY_RANGE_BUCKET_DATA, QUERY_RANGE_DATA
+from util.db_engine import get_engine
+from util.plan_check import PlanWarning, check_plan, explain, format_plan
+from util.weather_partition import (
+    covered_partitions, ensure_range_partitions, is_partitioned, next_month_start, scanned_partitions,
+    spanned_partitions
+)
+
+"""
+気象センサーデータベースの選択クエリーの実行計画をチェックする
+(1) 複数年分の合成データ (10分間隔) をトランザクション内で登録し統計情報を更新する
+(2) 各クエリーの EXPLAIN を取得し、シーケンシャルスキャンと行数見積もりの爆発を警告する
+    月パーティションの場合
+    (a) 検索期間が月全体を含むパーティションのみシーケンシャルスキャンを許容する
+    (b) 検索期間と重なるパーティションより多くのパーティションを読み込む場合 (プルーニング不足) を警告する
+(3) トランザクションはロールバックするため合成データはデータベースに残らない
+[チェック対象]
+  PlotWeatherComparePreviousYear.py, GetLatestYearMonth.py, pandas-read_sql の月間データ取得クエリー
+[実行例] python CheckQueryPlans.py --years 5 --devices 3 --analyze
+"""
+
+# スクリプト名
+script_name = os.path.basename(__file__)
+# ログフォーマット
+LOG_FMT = '%(levelname)s %(message)s'
+
+# 気象センサーデータベース接続情報
+DB_CONF: str = os.path.join("conf", "db_sensors.json")
+
+# datetime変換フォーマット
+FMT_DATETIME: str = '%Y-%m-%d %H:%M:%S'
+# 合成データのデバイス名
+FMT_SEED_DEVICE: str = "plancheck_{}"
+SEED_DEVICE_PATTERN: str = "plancheck_%"
+# シーケンシャルスキャンを許容するテーブル (デバイステーブルは件数が少ない)
+IGNORE_SEQ_SCAN_TABLES: Set[str] = {"t_device"}
+# パーティションプルーニング不足の警告のノード種別
+PRUNING_NODE_TYPE: str = "Append"
+
+# pandas-read_sql の月間データ取得クエリー (SQLAlchemy用に名前付きパラメータに置換)
+QUERY_RANGE_DATA_SUBQUERY: str = """
+SELECT
+   measurement_time, temp_out, humid, pressure
+FROM
+   weather.t_weather
+WHERE
+   did=(SELECT id FROM weather.t_device WHERE name=:deviceName)
+   AND (
+      measurement_time >= :fromDate
+      AND
+      measurement_time < :toDate
+   )
+ORDER BY measurement_time;
+"""
+
+# 合成データ登録SQL
+# デバイステーブル: 既存の最大ID以降に登録 ※説明列 (description) がある場合も登録可能
+INSERT_SEED_DEVICE: str = """
+INSERT INTO weather.t_device(id, name{description_col})
+SELECT
+  (SELECT COALESCE(MAX(id), 0) FROM weather.t_device) + g
+  ,'plancheck_' || g
+  {description_val}
+FROM generate_series(1, :devices) g
+"""
+# 観測データ: 10分間隔
+INSERT_SEED_WEATHER: str = """
+INSERT INTO weather.t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+SELECT
+  dev.id, t
+  ,(10 - 15 * cos(2 * pi() * extract(doy FROM t) / 365) + random() * 5)::real
+  ,(20 + random() * 5)::real
+  ,(30 + random() * 40)::real
+  ,(990 + random() * 40)::real
+FROM
+  weather.t_device dev
+  CROSS JOIN generate_series(
+    CAST(:startTime AS timestamp), CAST(:endTime AS timestamp), interval '10 minutes') t
+WHERE
+  dev.name LIKE :devicePattern
+"""
+QUERY_HAS_DESCRIPTION: str = """
+SELECT count(*) FROM information_schema.columns
+WHERE table_schema='weather' AND table_name='t_device' AND column_name='description'
+"""
+SEED_TABLES: List[str] = ["weather.t_device", "weather.t_weather"]
+
+
+def seedSyntheticData(conn: Connection, devices: int, start_time: str, end_time: str) -> bool:
+    """
+    合成データを登録し統計情報を更新する ※呼び出し側のトランザクション内で実行する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param devices: 合成デバイス数
+    :param start_time: 合成データの開始時刻
+    :param end_time: 合成データの終了時刻
+    :return: 観測データテーブルが月パーティションならTrue
+    """
+    has_description: int = conn.execute(text(QUERY_HAS_DESCRIPTION)).scalar()
+    insert_device: str = INSERT_SEED_DEVICE.format(
+        description_col=", description" if has_description else "",
+        description_val=",'plancheck'" if has_description else ""
+    )
+    conn.execute(text(insert_device), {"devices": devices})
+    # 月パーティションの観測データテーブル (sql/12_weather_partitioned.sql) は合成データの期間のパーティションを作成する
+    partitioned: bool = is_partitioned(conn)
+    if partitioned:
+        ensure_range_partitions(conn, start_time, end_time)
+    rs = conn.execute(
+        text(INSERT_SEED_WEATHER),
+        {"startTime": start_time, "endTime": end_time, "devicePattern": SEED_DEVICE_PATTERN}
+    )
+    app_logger.info(f"seed rows: {rs.rowcount}")
+    # ANALYZE はトランザクション内で実行可能 (ロールバックで統計情報も元に戻る)
+    for table in SEED_TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
+    return partitioned
+
+
+def makeCheckQueries(device_name: str, check_start: datetime
+                     ) -> List[Tuple[str, str, Dict, Optional[Tuple[datetime, datetime]]]]:
+    """
+    チェック対象の (クエリーID, クエリー, パラメータ, 検索期間) リストを生成する
+    :param device_name: 合成デバイス名
+    :param check_start: チェック対象月の開始時刻 (月初)
+    :return: (クエリーID, クエリー, パラメータ, 検索期間 [開始時刻, 終了時刻) ※期間指定なしは None) リスト
+    """
+    # 検索期間はチェック対象月の月初から翌月の月初まで (翌月のパーティションを含まない)
+    check_end: datetime = next_month_start(check_start)
+    check_range: Tuple[datetime, datetime] = (check_start, check_end)
+    return [
+        ("weather_sensor.range_data", QUERY_RANGE_DATA, {
+            "deviceName": device_name,
+            "startTime": check_start.strftime(FMT_DATETIME),
+            "endTime": (check_end - timedelta(seconds=1)).strftime(FMT_DATETIME)
+        }, check_range),
+        ("weather_sensor.range_bucket_data", QUERY_RANGE_BUCKET_DATA, {
+            "deviceName": device_name,
+            "startTime": check_start.strftime(FMT_DATETIME),
+            "endTime": (check_end - timedelta(seconds=1)).strftime(FMT_DATETIME),
+            "bucketSeconds": 3600
+        }, check_range),
+        ("weather_sensor.latest_year_month", QUERY_LATEST_YEAR_MONTH, {
+            "deviceName": device_name
+        }, None),
+        ("pandas-read_sql.range_data", QUERY_RANGE_DATA_SUBQUERY, {
+            "deviceName": device_name,
+            "fromDate": check_start.strftime(FMT_DATETIME),
+            "toDate": check_end.strftime(FMT_DATETIME)
+        }, check_range),
+    ]
+
+
+def ignoreSeqScanTables(partitioned: bool,
+                        check_range: Optional[Tuple[datetime, datetime]]) -> Set[str]:
+    """
+    クエリー毎のシーケンシャルスキャンを許容するテーブルを取得する\n
+    月パーティションの場合は検索期間が月全体を含むパーティションを加える (全行を読み込むためシーケンシャルスキャンが最適)
+    :param partitioned: 観測データテーブルが月パーティションならTrue
+    :param check_range: 検索期間 [開始時刻, 終了時刻) ※期間指定なしは None
+    :return: シーケンシャルスキャンを許容するテーブル
+    """
+    if not partitioned or check_range is None:
+        return IGNORE_SEQ_SCAN_TABLES
+    return IGNORE_SEQ_SCAN_TABLES | set(covered_partitions(*check_range))
+
+
+def checkPruning(plan: Dict, check_range: Tuple[datetime, datetime]) -> List[PlanWarning]:
+    """
+    検索期間と重なるパーティションより多くのパーティションを読み込む場合 (プルーニング不足) を検出する
+    :param plan: explain() で取得した実行計画
+    :param check_range: 検索期間 [開始時刻, 終了時刻)
+    :return: 警告リスト
+    """
+    scanned: List[str] = scanned_partitions(plan)
+    spanned: List[str] = spanned_partitions(*check_range)
+    if len(scanned) <= len(spanned):
+        return []
+
+    extra: List[str] = [name for name in scanned if name not in spanned]
+    return [PlanWarning(
+        PRUNING_NODE_TYPE, None,
+        f"{len(scanned)} partitions scanned for {len(spanned)} spanned by the range: {extra}"
+    )]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format=LOG_FMT)
+    app_logger = logging.getLogger(__name__)
+    app_logger.setLevel(level=logging.DEBUG)
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    # 合成データの年数
+    parser.add_argument("--years", type=int, default=5, help="合成データの年数 (デフォルト 5)")
+    # 合成デバイス数
+    parser.add_argument("--devices", type=int, default=3, help="合成デバイス数 (デフォルト 3)")
+    # EXPLAIN ANALYZE で実際の行数と比較する
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE を実行する")
+    # 見積もり行数の爆発とみなす倍率
+    parser.add_argument("--blowup-ratio", type=float, default=10., help="行数見積もりの許容倍率")
+    # ホスト名 ※任意 (例) raspi-4
+    parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    args: argparse.Namespace = parser.parse_args()
+
+    # 合成データの期間: 本日0時から指定年数前まで
+    today: datetime = datetime.combine(datetime.today().date(), datetime.min.time())
+    seed_start: str = (today - timedelta(days=365 * args.years)).strftime(FMT_DATETIME)
+    seed_end: str = today.strftime(FMT_DATETIME)
+    # チェック対象の期間: 合成データの中間の月の1日
+    check_month: datetime = (today - timedelta(days=365 * args.years // 2)).replace(day=1)
+    check_queries: List[Tuple[str, str, Dict, Optional[Tuple[datetime, datetime]]]] = makeCheckQueries(
+        FMT_SEED_DEVICE.format(1), check_month
+    )
+    app_logger.info(f"seed: {seed_start} - {seed_end}")
+
+    # 共有エンジン (接続プール)
+    engine: Engine = get_engine(DB_CONF, hostname=args.db_host)
+
+    all_warnings: Dict[str, List[PlanWarning]] = {}
+    try:
+        with engine.connect() as conn:
+            trans = conn.begin()
+            try:
+                partitioned: bool = seedSyntheticData(conn, args.devices, seed_start, seed_end)
+                for query_id, query, query_params, check_range in check_queries:
+                    plan: Dict = explain(conn, query, query_params, analyze=args.analyze)
+                    app_logger.info(f"[{query_id}] {query_params}\n{format_plan(plan)}")
+                    all_warnings[query_id] = check_plan(
+                        plan, ignore_relations=ignoreSeqScanTables(partitioned, check_range),
+                        blowup_ratio=args.blowup_ratio
+                    )
+                    if partitioned and check_range is not None:
+                        all_warnings[query_id].extend(checkPruning(plan, check_range))
+            finally:
+                # 合成データは残さない
+                trans.rollback()
+    except Exception as err:
+        app_logger.warning(err)
+        exit(1)
+
+    has_warning: bool = False
+    for query_id, warnings in all_warnings.items():
+        if len(warnings) == 0:
+            app_logger.info(f"[{query_id}] OK")
+            continue
+
+        has_warning = True
+        for warning in warnings:
+            app_logger.warning(f"[{query_id}] {warning.message}")
+    exit(1 if has_warning else 0)
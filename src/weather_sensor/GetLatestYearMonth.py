@@ -1,16 +1,14 @@
 import argparse
 import logging
-import json
 import os
-import socket
 from typing import Dict, List
 
 from sqlalchemy.engine import Engine
-from sqlalchemy.engine.url import URL
 from sqlalchemy.engine.cursor import CursorResult
-from sqlalchemy import create_engine
 from sqlalchemy.sql import text
 
+from util.db_engine import get_engine
+
 """
 気象センサーデータベースの外気温データの前年度月データがある最新の年月リストを取得する
 [DB] sensors_pgdb
@@ -23,45 +21,42 @@ LOG_FMT = '%(levelname)s %(message)s'
 DB_CONF: str = os.path.join("conf", "db_sensors.json")
 
 # 1年前の同月データがある最新の年月を取得
+#  デバイスの最初と最後の測定時刻の間の月毎に、その月の観測データの有無を主キーの範囲検索で確認する
+#  ※全観測データを集計しない (月パーティションの場合は各月の確認で該当月のパーティションのみ読み込む)
 QUERY = """
-WITH t_year_month AS(
+WITH dev AS (
+  SELECT id FROM weather.t_device WHERE name=:deviceName
+), t_month AS (
+  SELECT
+    generate_series(date_trunc('month', min(measurement_time)), max(measurement_time),
+                    interval '1 month') AS month_start
+  FROM
+    weather.t_weather
+  WHERE
+    did=(SELECT id FROM dev)
+), t_year_month AS (
   SELECT
-    did
-    ,to_char(measurement_time, 'YYYYMM') AS year_month
+    month_start
   FROM
-    weather.t_device dev
-    INNER JOIN weather.t_weather w ON dev.id = w.did
+    t_month m
   WHERE
-    dev.name=:deviceName
-  GROUP BY did,year_month
+    EXISTS (
+      SELECT 1 FROM weather.t_weather w
+      WHERE
+        w.did=(SELECT id FROM dev)
+        AND w.measurement_time >= m.month_start
+        AND w.measurement_time < m.month_start + interval '1 month'
+    )
 )
 SELECT
-  curr.year_month as latest_year_month
+  to_char(curr.month_start, 'YYYYMM') AS latest_year_month
 FROM
   t_year_month curr
-  INNER JOIN t_year_month prev ON curr.did = prev.did
-WHERE
-  to_number(curr.year_month, '999999') = to_number(prev.year_month, '999999') + 100
+  INNER JOIN t_year_month prev ON prev.month_start = curr.month_start - interval '1 year'
 ORDER BY latest_year_month DESC;
 """
 
 
-def getDBConnectionWithDict(filePath: str, hostname: str = None) -> dict:
-    """
-    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
-    :param filePath: 接続設定ファイルパス (JSON形式)
-    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
-    :return: SQLAlchemyのURL用辞書オブジェクトDB_HEALTHCARE_CONF
-    """
-    with open(filePath, 'r') as fp:
-        db_conf: json = json.load(fp)
-        if hostname is None:
-            hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return db_conf
-
-
 if __name__ == '__main__':
     logging.basicConfig(format=LOG_FMT)
     app_logger = logging.getLogger(__name__)
@@ -79,12 +74,8 @@ if __name__ == '__main__':
     # DBサーバーホスト
     db_host = args.db_host
 
-    connDict: dict = getDBConnectionWithDict(DB_CONF, hostname=db_host)
-    # データベース接続URL生成
-    connUrl: URL = URL.create(**connDict)
-    app_logger.info(f"connUrl: {connUrl}")
-    # SQLAlchemyデータベースエンジン
-    engine: Engine = create_engine(connUrl, echo=False)
+    # 共有エンジン (接続プール)
+    engine: Engine = get_engine(DB_CONF, hostname=db_host)
 
     query_params: Dict = {"deviceName": device_name}
     rows: List[str]
@@ -1,29 +1,37 @@
 import argparse
 import logging
-import json
 import os
-import socket
 from datetime import date, datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
+import pandas as pd
 import matplotlib.dates as mdates
 from matplotlib.axes import Axes
 from matplotlib.figure import Figure
 from matplotlib.patches import Patch
 
-import pandas as pd
 from pandas.core.frame import DataFrame, Series
 
-from sqlalchemy.engine import Engine
-from sqlalchemy.engine.url import URL
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
-from sqlalchemy.orm import scoped_session, sessionmaker
-import sqlalchemy.orm.scoping as scoping
+from sqlalchemy.engine import Connection, Engine
 
+from util.db_engine import fetch_frame, get_engine
 import util.date_util as du
 from util.file_util import gen_imgname
+from util.fixed_layout import save_figure
+from util.gap_util import DEFAULT_GAP_MINUTES, gap_threshold, insert_gap_breaks, shade_gaps
+from util.frame_dtype import compact_frame
+from util.sensor_validation import POLICY_CHOICES, POLICY_MASK, VALID_RANGES, validate_readings
+from util.phase_timer import (
+    PHASE_CONNECT, PHASE_FIGURE, PHASE_TRANSFORM, span, start_timer, timed_save
+)
+from util.run_profiler import PROFILE_ALL, PROFILE_CHOICES, start_profiler
+from util.mem_profiler import start_memprofiler
+from util.log_util import frame_summary, set_full_dump
+from util.resolution import (
+    AGGREGATE_COLUMNS, FMT_PG_BUCKET_TIME, RESOLUTION_CHOICES, RESOLUTION_RAW,
+    bucket_seconds, max_column, min_column
+)
 
 """
 気象センサーの外気温の前年対比グラフをプロットする
@@ -55,6 +63,22 @@ WHERE
   measurement_time BETWEEN :startTime AND :endTime
   ORDER BY measurement_time
 """
+# 指定した気象デバイス名と期間から集計間隔毎の平均値・最小値・最大値を取得 (--resolution)
+#  measurement_time の epoch を集計間隔 (秒) で切り捨てて集計する
+QUERY_RANGE_BUCKET_DATA = f"""
+SELECT
+  {FMT_PG_BUCKET_TIME.format(seconds=":bucketSeconds")} AS measurement_time
+  ,{AGGREGATE_COLUMNS}
+FROM
+  weather.t_device dev
+  INNER JOIN weather.t_weather wt ON dev.id = wt.did
+WHERE
+  dev.name=:deviceName
+  AND
+  measurement_time BETWEEN :startTime AND :endTime
+  GROUP BY 1
+  ORDER BY 1
+"""
 
 # ISO8601フォーマット
 FMT_DATE: str = '%Y-%m-%d'
@@ -70,6 +94,7 @@ COL_PREV_PLOT_TIME: str = 'prev_plot_measurement_time'
 PARAM_DEVICE_NAME: str = 'deviceName'
 PARAM_STA_TIME: str = 'startTime'
 PARAM_END_TIME: str = 'endTime'
+PARAM_BUCKET_SECONDS: str = 'bucketSeconds'
 # 気圧
 Y_PRESSURE_MIN: float = 960.
 Y_PRESSURE_MAX: float = 1060.
@@ -95,6 +120,8 @@ PREV_COLOR: str = 'C1' #'tab:orange'
 AVEG_LINE_STYLE: Dict = {'linestyle': 'dashdot', 'linewidth': 1.}
 CURR_AVEG_LINE_STYLE: Dict = {'color': CURR_COLOR, **AVEG_LINE_STYLE}
 PREV_AVEG_LINE_STYLE: Dict = {'color': PREV_COLOR, **AVEG_LINE_STYLE}
+# 集計データ (--resolution) の最小値・最大値の包絡線スタイル
+ENVELOPE_LINE_STYLE: Dict = {'linewidth': 0.5, 'alpha': 0.5}
 # X軸のラベルスタイル
 X_TICKS_STYLE: Dict = {'fontsize': 8, 'fontweight': 'heavy', 'rotation': 90}
 # プロット領域のラベルスタイル
@@ -105,46 +132,23 @@ LEGEND_STYLE: Dict = {'fontsize': 10, }
 TITLEL_STYLE: Dict = {'fontsize': 11, }
 
 
-def getDBConnectionWithDict(filePath: str, hostname: str = None) -> dict:
-    """
-    SQLAlchemyの接続URL用の辞書オブジェクトを取得する
-    :param filePath: 接続設定ファイルパス (JSON形式)
-    :param hostname: ホスト名 ※未設定なら実行PCのホスト名
-    :return: SQLAlchemyのURL用辞書オブジェクトDB_HEALTHCARE_CONF
-    """
-    with open(filePath, 'r') as fp:
-        db_conf: json = json.load(fp)
-        if hostname is None:
-            hostname = socket.gethostname()
-        # host in /etc/hostname: "hostname.local"
-        db_conf["host"] = db_conf["host"].format(hostname=hostname)
-    return db_conf
-
-
-def getMeasurementTimeRangeData(cls_sess: scoping.scoped_session, qry_params: Dict) -> DataFrame:
+def getMeasurementTimeRangeData(db_engine: Engine, qry_params: Dict,
+                                resolution: str = RESOLUTION_RAW) -> DataFrame:
     """
     指定されたクエリーパラメータの検索クエリーからデータフレームを生成する
-    :param cls_sess: 接続設定ファイルパス (JSON形式)
-    :param qry_params: ホスト名 ※未設定なら実行PCのホスト名
+    :param db_engine: 共有エンジン ※接続はプールから取得し、検索後にプールに返却する
+    :param qry_params: クエリーパラメータ (デバイス名, 期間)
+    :param resolution: 集計間隔 ※raw以外は集計間隔毎の平均値・最小値・最大値を取得する
     :return: DataFrame
     """
-    # Sessionオブジェクトは sqlalchemy.orm.scoped_session
-    # バッチアプリでは同一スレッドで実行されるのでオブジェクトは前回と同一になる
-    sess_obj: scoped_session = cls_sess()
-    app_logger.info(f"scoped_session: {sess_obj}")
-    try:
-        with sess_obj.connection() as conn:
-            read_df = pd.read_sql(
-                text(QUERY_RANGE_DATA), conn, params=qry_params,
-                parse_dates=[COL_TIME]
-            )
-        return read_df
-    except Exception as err:
-        raise err
-    finally:
-        # Webアプリケーションではクリーンアップでクラスのremove()呼び出しが必須
-        # バッチアプリでは不要
-        cls_sess.remove()
+    query: str = QUERY_RANGE_DATA
+    if resolution != RESOLUTION_RAW:
+        query = QUERY_RANGE_BUCKET_DATA
+        qry_params = {**qry_params, PARAM_BUCKET_SECONDS: bucket_seconds(resolution)}
+    with span(PHASE_CONNECT):
+        conn: Connection = db_engine.connect()
+    with conn:
+        return fetch_frame(conn, query, params=qry_params, parse_dates=[COL_TIME])
 
 
 def calcEndOfMonth(s_year_month: str) -> int:
@@ -248,20 +252,58 @@ def makeAvePatch(plot_label, f_ave: float, s_color: str, dict_ave: Dict) -> Patc
     return Patch(color=s_color, label=s_ave)
 
 
-def setYLimWithAxes(plot_axes: Axes, curr_ser: Series, prev_ser: Series) -> None:
+def setYLimWithAxes(plot_axes: Axes, curr_ser: Series, prev_ser: Series,
+                    col_name: Optional[str] = None) -> None:
     """
-    各データの最大値・最小値を設定する
+    各データの最大値・最小値 (欠損値を除く) を設定する\n
+    有効な値が無い (全て欠損値・不正値) 場合は観測項目の物理的な範囲 ※NaN は軸の範囲に設定できない
     @param plot_axes: プロット領域
     @param curr_ser: 最新データ
     @param prev_ser: 前年データ
+    @param col_name: 観測項目列名 (VALID_RANGES のキー) ※未指定なら有効な値が無い場合は設定しない
     """
-    val_min: float = np.min([curr_ser.min(), prev_ser.min()])
-    val_max: float = np.max([curr_temp_ser.max(), prev_temp_ser.max()])
+    valid_list: List[Series] = [ser for ser in [curr_ser, prev_ser] if ser.count() > 0]
+    if len(valid_list) == 0:
+        if col_name in VALID_RANGES:
+            plot_axes.set_ylim(*VALID_RANGES[col_name])
+        return
+
+    val_min: float = np.min([ser.min() for ser in valid_list])
+    val_max: float = np.max([ser.max() for ser in valid_list])
     val_min = np.floor(val_min / 10.) * 10.
     val_max = np.ceil(val_max / 10.) * 10.
     plot_axes.set_ylim(val_min, val_max)
 
 
+def valueRangeSeries(df: DataFrame, col_name: str) -> Series:
+    """
+    Y軸の範囲の計算対象のデータを取得する
+    @param df: 観測データ
+    @param col_name: 観測データ列名
+    @return: 集計データなら最小値・最大値列を連結したデータ, それ以外は観測データ列
+    """
+    if min_column(col_name) in df.columns:
+        return pd.concat([df[min_column(col_name)], df[max_column(col_name)]])
+    return df[col_name]
+
+
+def plotEnvelope(plot_axes: Axes, x_ser: Series, df: DataFrame, col_name: str,
+                 s_color: str) -> None:
+    """
+    集計データ (--resolution) なら最小値・最大値の包絡線をプロットする ※観測データのみなら何もしない
+    @param plot_axes: プロット領域
+    @param x_ser: X軸データ (測定時刻)
+    @param df: 観測データ
+    @param col_name: 観測データ列名
+    @param s_color: 線カラー
+    """
+    if min_column(col_name) not in df.columns:
+        return
+
+    for envelope_col in (min_column(col_name), max_column(col_name)):
+        plot_axes.plot(x_ser, df[envelope_col], color=s_color, **ENVELOPE_LINE_STYLE)
+
+
 if __name__ == '__main__':
     logging.basicConfig(format=LOG_FMT)
     app_logger = logging.getLogger(__name__)
@@ -274,9 +316,40 @@ if __name__ == '__main__':
     # 最新の検索年月
     parser.add_argument("--year-month", type=str, required=True,
                         help="2023-04")
+    # 集計間隔 (raw: 集計なし) ※集計時は平均値・最小値・最大値を取得する
+    parser.add_argument("--resolution", type=str, choices=RESOLUTION_CHOICES,
+                        default=RESOLUTION_RAW, help="Bucket size aggregated in SQL.")
     # ホスト名 ※任意 (例) raspi-4
     parser.add_argument("--db-host", type=str, help="Other database hostname.")
+    # 不正値 (範囲外の値・スパイク) の処理方法 (mask: NaN, drop: 行を除く, flag: フラグ列, off: チェックしない)
+    parser.add_argument("--validate", type=str, choices=POLICY_CHOICES, default=POLICY_MASK,
+                        help="Policy for out-of-range readings and spikes.")
+    # 観測値列を float32 で保持する (変換前後のメモリ使用量をログ出力)
+    parser.add_argument("--compact-dtypes", action="store_true",
+                        help="Hold readings as float32 and labels as category.")
+    # 欠測とみなす測定間隔 (分) ※欠測区間で線を途切れさせる, 0なら途切れさせない
+    parser.add_argument("--gap-minutes", type=int, default=DEFAULT_GAP_MINUTES,
+                        help="Break plotted lines at gaps longer than this (0: never).")
+    # 固定レイアウトで保存する (bbox_inches="tight" を使わず1回の描画で保存)
+    parser.add_argument("--fixed-layout", action="store_true",
+                        help="Save with cached subplot positions (single draw).")
+    # フェーズ毎の処理時間を計測する (logs/にJSON Linesで出力)
+    parser.add_argument("--timing", action="store_true", help="Log per-phase timings.")
+    # cProfileでプロファイルする (all: 実行全体, render: 図の作成〜エンコードのみ)
+    parser.add_argument("--profile", nargs="?", const=PROFILE_ALL, choices=PROFILE_CHOICES,
+                        help="Profile the whole run (all) or only the render phases.")
+    # tracemallocでフェーズ毎のメモリ使用量を計測する (logs/*.memprofile.jsonl)
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Record per-phase memory usage with tracemalloc.")
+    # DataFrame・リストを要約せず全行・全要素をログ出力する
+    parser.add_argument("--debug-dump", action="store_true",
+                        help="Log whole DataFrames and lists instead of summaries.")
     args: argparse.Namespace = parser.parse_args()
+    start_timer(script_name, enabled=args.timing, year_month=args.year_month,
+                resolution=args.resolution)
+    start_profiler(script_name, args.profile, "screen_shots", logger=app_logger)
+    start_memprofiler(script_name, args.memprofile, logger=app_logger, year_month=args.year_month)
+    set_full_dump(args.debug_dump)
     # 複合主キー: デバイス名
     device_name: str = args.device_name
     # 比較最新年月
@@ -288,16 +361,9 @@ if __name__ == '__main__':
         app_logger.warning("Invalid year-month format is 'YYYY-MM'")
         exit(1)
 
-    connDict: dict = getDBConnectionWithDict(DB_CONF, hostname=db_host)
-    # データベース接続URL生成
-    connUrl: URL = URL.create(**connDict)
-    # SQLAlchemyデータベースエンジン
-    db_engine: Engine = create_engine(connUrl, echo=False)
-    sess_factory = sessionmaker(bind=db_engine)
-    app_logger.info(f"session_factory: {sess_factory}")
-    # Sessionクラスは sqlalchemy.orm.scoping.scoped_session
-    Cls_sess = scoped_session(sess_factory)
-    app_logger.info(f"Session class: {Cls_sess}")
+    # 共有エンジン (接続プール)
+    db_engine: Engine = get_engine(DB_CONF, hostname=db_host)
+    app_logger.info(f"db_engine: {db_engine}")
 
     # クエリーパラメータにデバイス名をセット
     query_params: Dict = {PARAM_DEVICE_NAME: device_name}
@@ -306,111 +372,136 @@ if __name__ == '__main__':
     app_logger.info(f"curr.query_params: {query_params}")
     prev_year_month: str
     try:
-        df_curr: DataFrame = getMeasurementTimeRangeData(Cls_sess, query_params)
+        df_curr: DataFrame = getMeasurementTimeRangeData(db_engine, query_params, args.resolution)
         # 年前年月の範囲
         prev_year_month = toPreviousYearMonth(year_month)
         query_params = measurementTimeRangeToDict(prev_year_month, query_params)
         app_logger.info(f"prev.query_params: {query_params}")
-        df_prev: DataFrame = getMeasurementTimeRangeData(Cls_sess, query_params)
+        df_prev: DataFrame = getMeasurementTimeRangeData(db_engine, query_params, args.resolution)
     except Exception as err:
         app_logger.warning(err)
         exit(1)
 
-    app_logger.info(df_curr.head())
-    app_logger.info(df_prev.head())
-    # (1) 外気温
-    curr_temp_ser: Series = df_curr[COL_TEMP]
-    prev_temp_ser: Series = df_prev[COL_TEMP]
-    # (2) 湿度
-    curr_humid_ser: Series = df_curr[COL_HUMID]
-    prev_humid_ser: Series = df_prev[COL_HUMID]
-    # (3) 気圧
-    curr_pressure_ser: Series = df_curr[COL_PRESSUE]
-    prev_pressure_ser: Series = df_prev[COL_PRESSUE]
-    # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
-    df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(plusOneYear)
-
-    # 凡例用ラベル
-    # 最新年月
-    curr_plot_label = makeLegendLabel(year_month)
-    # 前年月
-    prev_plot_label = makeLegendLabel(prev_year_month)
-    # タイトル
-    main_title: str = FMT_MEASUREMENT_RANGE.format(curr_plot_label, prev_plot_label)
-
-    fig: Figure
-    ax_temp: Axes
-    ax_humid: Axes
-    ax_pressure: Axes
-    fig = Figure(figsize=[12, 10])
-    # x軸を共有する3行1列のサブプロット生成
-    (ax_temp, ax_humid, ax_pressure) = fig.subplots(3, 1, sharex=True)
-    # サブプロット間の間隔を変更する
-    fig.subplots_adjust(wspace=0.1, hspace=0.1)
-    # Y方向のグリッド線のみ表示
-    for ax in [ax_temp, ax_humid, ax_pressure]:
-        ax_temp.grid(**AXES_GRID_STYLE)
-
-    # 平均値
-    val_ave: float
-    # 平均値用のラベル文字列
-    ave_text: str
-    curr_patch: Patch
-    prev_patch: Patch
-    # (1) 外気温領域のプロット
-    # 最低・最高
-    setYLimWithAxes(ax_temp, curr_temp_ser, prev_temp_ser)
-    # 最新年月の外気温
-    ax_temp.plot(df_curr[COL_TIME], curr_temp_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_temp_ser.mean()
-    curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVE_TEMP)
-    ax_temp.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
-    # 前年月の外気温
-    ax_temp.plot(df_prev[COL_PREV_PLOT_TIME], prev_temp_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_temp_ser.mean()
-    prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVE_TEMP)
-    ax_temp.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
-    ax_temp.set_ylabel(Y_LABEL_TEMPER, **LABEL_STYLE)
-    # 凡例
-    ax_temp.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
-    ax_temp.set_title(main_title, **TITLEL_STYLE)
-
-    # (2) 湿度領域のプロット
-    ax_humid.set_ylim([0., 100.])
-    # 最新年月
-    ax_humid.plot(df_curr[COL_TIME], curr_humid_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_humid_ser.mean()
-    curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_HUMID)
-    ax_humid.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
-    # 前年月
-    ax_humid.plot(df_prev[COL_PREV_PLOT_TIME], prev_humid_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_humid_ser.mean()
-    prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_HUMID)
-    ax_humid.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
-    ax_humid.set_ylabel(Y_LABEL_HUMID, **LABEL_STYLE)
-    # 凡例
-    ax_humid.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
-
-    # (3) 気圧領域のプロット
-    ax_pressure.set_ylim(Y_PRESSURE_MIN, Y_PRESSURE_MAX)
-    # 最新年月
-    ax_pressure.plot(df_curr[COL_TIME], curr_pressure_ser, color=CURR_COLOR, marker="")
-    val_ave = curr_pressure_ser.mean()
-    curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_PRESSURE)
-    ax_pressure.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
-    # 前年月
-    ax_pressure.plot(df_prev[COL_PREV_PLOT_TIME], prev_pressure_ser, color=PREV_COLOR, marker="")
-    val_ave = prev_pressure_ser.mean()
-    prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_PRESSURE)
-    ax_pressure.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
-    ax_pressure.set_ylabel(Y_LABEL_PRESSURE, **LABEL_STYLE)
-    # 凡例
-    ax_pressure.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
-    # X軸ラベル
-    ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+    with span(PHASE_TRANSFORM):
+        # 省メモリ型に変換する
+        if args.compact_dtypes:
+            df_curr = compact_frame(df_curr, logger=app_logger, name=year_month)
+            df_prev = compact_frame(df_prev, logger=app_logger, name=prev_year_month)
+        # 不正値 (範囲外の値・スパイク) を処理する
+        df_curr, _ = validate_readings(df_curr, args.validate, logger=app_logger)
+        df_prev, _ = validate_readings(df_prev, args.validate, logger=app_logger)
+    app_logger.info(frame_summary(df_curr, "df_curr"))
+    app_logger.info(frame_summary(df_prev, "df_prev"))
+    with span(PHASE_TRANSFORM):
+        # 前年データをX軸にプロットするために測定時刻列にを1年プラスする
+        df_prev[COL_PREV_PLOT_TIME] = df_prev[COL_TIME].apply(plusOneYear)
+        # 欠測区間に区切り行 (観測値は NaN) を挿入して線を途切れさせる
+        gap_limit: Optional[pd.Timedelta] = gap_threshold(args.gap_minutes,
+                                                          bucket_seconds(args.resolution))
+        curr_gaps: np.ndarray
+        df_curr, curr_gaps = insert_gap_breaks(df_curr, COL_TIME, gap_limit)
+        df_prev, _ = insert_gap_breaks(df_prev, COL_PREV_PLOT_TIME, gap_limit)
+        # (1) 外気温
+        curr_temp_ser: Series = df_curr[COL_TEMP]
+        prev_temp_ser: Series = df_prev[COL_TEMP]
+        # (2) 湿度
+        curr_humid_ser: Series = df_curr[COL_HUMID]
+        prev_humid_ser: Series = df_prev[COL_HUMID]
+        # (3) 気圧
+        curr_pressure_ser: Series = df_curr[COL_PRESSUE]
+        prev_pressure_ser: Series = df_prev[COL_PRESSUE]
+
+        # 凡例用ラベル
+        # 最新年月
+        curr_plot_label = makeLegendLabel(year_month)
+        # 前年月
+        prev_plot_label = makeLegendLabel(prev_year_month)
+        # タイトル
+        main_title: str = FMT_MEASUREMENT_RANGE.format(curr_plot_label, prev_plot_label)
+
+    with span(PHASE_FIGURE):
+        fig: Figure
+        ax_temp: Axes
+        ax_humid: Axes
+        ax_pressure: Axes
+        fig = Figure(figsize=[12, 10])
+        # x軸を共有する3行1列のサブプロット生成
+        (ax_temp, ax_humid, ax_pressure) = fig.subplots(3, 1, sharex=True)
+        # サブプロット間の間隔を変更する
+        fig.subplots_adjust(wspace=0.1, hspace=0.1)
+        # Y方向のグリッド線のみ表示, 最新年月の欠測区間を塗りつぶす
+        for ax in [ax_temp, ax_humid, ax_pressure]:
+            ax_temp.grid(**AXES_GRID_STYLE)
+            shade_gaps(ax, curr_gaps, CURR_COLOR)
+
+        # 平均値
+        val_ave: float
+        # 平均値用のラベル文字列
+        ave_text: str
+        curr_patch: Patch
+        prev_patch: Patch
+        # (1) 外気温領域のプロット
+        # 最低・最高
+        setYLimWithAxes(ax_temp, valueRangeSeries(df_curr, COL_TEMP),
+                        valueRangeSeries(df_prev, COL_TEMP), col_name=COL_TEMP)
+        # 最新年月の外気温
+        ax_temp.plot(df_curr[COL_TIME], curr_temp_ser, color=CURR_COLOR, marker="")
+        plotEnvelope(ax_temp, df_curr[COL_TIME], df_curr, COL_TEMP, CURR_COLOR)
+        val_ave = curr_temp_ser.mean()
+        curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVE_TEMP)
+        ax_temp.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+        # 前年月の外気温
+        ax_temp.plot(df_prev[COL_PREV_PLOT_TIME], prev_temp_ser, color=PREV_COLOR, marker="")
+        plotEnvelope(ax_temp, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_TEMP, PREV_COLOR)
+        val_ave = prev_temp_ser.mean()
+        prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVE_TEMP)
+        ax_temp.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+        ax_temp.set_ylabel(Y_LABEL_TEMPER, **LABEL_STYLE)
+        # 凡例
+        ax_temp.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
+        ax_temp.set_title(main_title, **TITLEL_STYLE)
+
+        # (2) 湿度領域のプロット
+        ax_humid.set_ylim([0., 100.])
+        # 最新年月
+        ax_humid.plot(df_curr[COL_TIME], curr_humid_ser, color=CURR_COLOR, marker="")
+        plotEnvelope(ax_humid, df_curr[COL_TIME], df_curr, COL_HUMID, CURR_COLOR)
+        val_ave = curr_humid_ser.mean()
+        curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_HUMID)
+        ax_humid.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+        # 前年月
+        ax_humid.plot(df_prev[COL_PREV_PLOT_TIME], prev_humid_ser, color=PREV_COLOR, marker="")
+        plotEnvelope(ax_humid, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_HUMID, PREV_COLOR)
+        val_ave = prev_humid_ser.mean()
+        prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_HUMID)
+        ax_humid.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+        ax_humid.set_ylabel(Y_LABEL_HUMID, **LABEL_STYLE)
+        # 凡例
+        ax_humid.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
+
+        # (3) 気圧領域のプロット
+        ax_pressure.set_ylim(Y_PRESSURE_MIN, Y_PRESSURE_MAX)
+        # 最新年月
+        ax_pressure.plot(df_curr[COL_TIME], curr_pressure_ser, color=CURR_COLOR, marker="")
+        plotEnvelope(ax_pressure, df_curr[COL_TIME], df_curr, COL_PRESSUE, CURR_COLOR)
+        val_ave = curr_pressure_ser.mean()
+        curr_patch = makeAvePatch(curr_plot_label, val_ave, CURR_COLOR, DICT_AVEG_PRESSURE)
+        ax_pressure.axhline(val_ave, **CURR_AVEG_LINE_STYLE)
+        # 前年月
+        ax_pressure.plot(df_prev[COL_PREV_PLOT_TIME], prev_pressure_ser, color=PREV_COLOR, marker="")
+        plotEnvelope(ax_pressure, df_prev[COL_PREV_PLOT_TIME], df_prev, COL_PRESSUE, PREV_COLOR)
+        val_ave = prev_pressure_ser.mean()
+        prev_patch = makeAvePatch(prev_plot_label, val_ave, PREV_COLOR, DICT_AVEG_PRESSURE)
+        ax_pressure.axhline(val_ave, **PREV_AVEG_LINE_STYLE)
+        ax_pressure.set_ylabel(Y_LABEL_PRESSURE, **LABEL_STYLE)
+        # 凡例
+        ax_pressure.legend(handles=[curr_patch, prev_patch], **LEGEND_STYLE)
+        # X軸ラベル
+        ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
 
     # プロット結果をPNG形式でファイル保存
     save_name = gen_imgname(script_name)
     save_path = os.path.join("screen_shots", save_name)
     app_logger.info(save_path)
-    fig.savefig(save_path, format="png", bbox_inches="tight")
+    timed_save(fig, save_path, lambda fp: save_figure(
+        fig, fp, script_name, fixed_layout=args.fixed_layout, format="png"))
@@ -0,0 +1,74 @@
+\connect sensors_pgdb
+
+-- 観測データテーブルを測定時刻の月単位のレンジパーティションに移行する (新規作成時も 11_weather_db.sql の後に実行する)
+--  (1) 既存のテーブルは weather.t_weather_heap に名前を変更して残す (移行結果の確認後に削除する)
+--  (2) 月パーティション weather.t_weather_YYYYMM は観測データの登録時に
+--      weather.ensure_t_weather_partition(測定時刻) で作成する (util/weather_partition.py)
+--  (3) 追記のみの観測データのため測定時刻に BRIN インデックスを作成する ※主キーは重複登録のチェック用
+--  ※ パーティションテーブルの主キーはパーティションキー (measurement_time) を含むこと
+--  ※ パーティションテーブルのインデックス・外部キー・ON CONFLICT は PostgreSQL 11 以降
+BEGIN;
+
+ALTER TABLE weather.t_weather RENAME TO t_weather_heap;
+-- 主キーのインデックス名はスキーマ内で一意のため変更する
+ALTER TABLE weather.t_weather_heap RENAME CONSTRAINT pk_weather TO pk_weather_heap;
+
+CREATE TABLE weather.t_weather(
+   did INTEGER NOT NULL,
+   measurement_time timestamp NOT NULL,
+   temp_out REAL,
+   temp_in REAL,
+   humid REAL,
+   pressure REAL,
+   CONSTRAINT pk_weather PRIMARY KEY (did, measurement_time),
+   CONSTRAINT fk_device FOREIGN KEY (did) REFERENCES weather.t_device (id)
+) PARTITION BY RANGE (measurement_time);
+
+-- BRIN の範囲 (8ページ) は1デバイスで約1週間分 ※月パーティション内の期間検索用
+CREATE INDEX idx_weather_time_brin ON weather.t_weather
+   USING brin (measurement_time) WITH (pages_per_range = 8);
+
+-- 測定時刻を含む月のパーティションが無ければ作成し、パーティション名を返す
+--  同時に作成された場合 (duplicate_table) は作成済みとする
+CREATE OR REPLACE FUNCTION weather.ensure_t_weather_partition(ts timestamp) RETURNS text AS $$
+DECLARE
+  month_start timestamp := date_trunc('month', ts);
+  part_name text := 't_weather_' || to_char(date_trunc('month', ts), 'YYYYMM');
+BEGIN
+  IF to_regclass('weather.' || part_name) IS NULL THEN
+    BEGIN
+      EXECUTE format(
+        'CREATE TABLE weather.%I PARTITION OF weather.t_weather FOR VALUES FROM (%L) TO (%L)',
+        part_name, month_start, month_start + interval '1 month');
+    EXCEPTION WHEN duplicate_table THEN
+      NULL;
+    END;
+  END IF;
+  RETURN part_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存の観測データの月と当月のパーティションを作成する
+SELECT weather.ensure_t_weather_partition(month_start)
+FROM (
+  SELECT DISTINCT date_trunc('month', measurement_time) AS month_start FROM weather.t_weather_heap
+  UNION
+  SELECT date_trunc('month', LOCALTIMESTAMP)
+) months
+ORDER BY month_start;
+
+-- 測定時刻順に登録する (BRIN の範囲毎の最小値・最大値を狭くする)
+INSERT INTO weather.t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+SELECT did, measurement_time, temp_out, temp_in, humid, pressure
+FROM weather.t_weather_heap
+ORDER BY measurement_time, did;
+
+ALTER TABLE weather.t_weather OWNER TO developer;
+ALTER FUNCTION weather.ensure_t_weather_partition(timestamp) OWNER TO developer;
+
+COMMIT;
+
+ANALYZE weather.t_weather;
+
+-- 移行結果の確認後に旧テーブルを削除する
+-- DROP TABLE weather.t_weather_heap;
@@ -0,0 +1,90 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from util.resolution import max_column, min_column
+
+"""
+観測データの DataFrame の省メモリ型 (--compact-dtypes)
+(1) 観測値 (外気温, 室内気温, 湿度, 気圧 ※集計データは最小値・最大値列を含む) は float32
+    ※センサーの分解能 (0.1) に対して float32 の有効桁数 (約7桁) で十分
+(2) 文字列のラベル列 (デバイス名等) は重複が多ければ category
+(3) 変換前後のメモリ使用量 (文字列の実体を含む) をログ出力する
+[常駐プロセス] 複数年分の観測データを保持する場合に観測値列のメモリ使用量が半分になる
+"""
+
+# 観測値列 (集計データは最小値・最大値列も対象)
+SENSOR_COLUMNS: List[str] = ["temp_out", "temp_in", "humid", "pressure"]
+# 観測値列の省メモリ型
+COMPACT_FLOAT: type = np.float32
+# category に変換する文字列列のユニーク数の上限 (行数に対する比率)
+CATEGORY_MAX_RATIO: float = 0.5
+# メモリ使用量の出力フォーマット
+FMT_MEMORY: str = "{name}: {before:,} -> {after:,} bytes ({ratio:.1%})"
+
+
+def compact_columns(columns: List[str]) -> List[str]:
+    """
+    float32 に変換する観測値列名を取得する
+    :param columns: DataFrameの列名リスト
+    :return: 観測値列名 (最小値・最大値列を含む) のリスト
+    """
+    candidates: List[str] = []
+    for col_name in SENSOR_COLUMNS:
+        candidates += [col_name, min_column(col_name), max_column(col_name)]
+    return [col_name for col_name in candidates if col_name in columns]
+
+
+def frame_memory(df: DataFrame) -> int:
+    """
+    DataFrameのメモリ使用量を取得する
+    :param df: DataFrame
+    :return: インデックスと文字列の実体を含むメモリ使用量 (バイト)
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact_frame(df: DataFrame, logger: Optional[logging.Logger] = None,
+                  name: str = "df") -> DataFrame:
+    """
+    観測値列を float32, 重複の多い文字列列を category に変換したDataFrameを取得する\n
+    元のDataFrameは変更しない
+    :param df: 観測データのDataFrame
+    :param logger: application logger ※指定時は変換前後のメモリ使用量を出力する
+    :param name: ログ出力用の名前
+    :return: 変換後のDataFrame ※変換対象が無ければ元のDataFrame
+    """
+    dtypes: Dict[str, object] = {
+        col_name: COMPACT_FLOAT for col_name in compact_columns(list(df.columns))
+        if df[col_name].dtype != COMPACT_FLOAT
+    }
+    rows: int = df.shape[0]
+    for col_name in df.columns:
+        if (col_name not in dtypes and pd.api.types.is_string_dtype(df[col_name].dtype)
+                and rows > 0 and df[col_name].nunique() <= rows * CATEGORY_MAX_RATIO):
+            dtypes[col_name] = "category"
+    if not dtypes:
+        return df
+
+    compacted: DataFrame = df.astype(dtypes)
+    if logger is not None:
+        log_savings(logger, df, compacted, name)
+    return compacted
+
+
+def log_savings(logger: logging.Logger, before: DataFrame, after: DataFrame,
+                name: str = "df") -> None:
+    """
+    変換前後のメモリ使用量をログ出力する
+    :param logger: application logger
+    :param before: 変換前のDataFrame
+    :param after: 変換後のDataFrame
+    :param name: ログ出力用の名前
+    """
+    before_bytes: int = frame_memory(before)
+    after_bytes: int = frame_memory(after)
+    logger.info(FMT_MEMORY.format(name=name, before=before_bytes, after=after_bytes,
+                                  ratio=after_bytes / before_bytes if before_bytes > 0 else 1.))
@@ -0,0 +1,116 @@
+from typing import Dict, Optional, Tuple
+
+from matplotlib.axes import Axes
+
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+"""
+観測データの欠測 (センサーのバッテリー切れ, Wi-Fi障害等) の検出
+(1) 測定時刻の差分 (np.diff) が閾値を超える箇所を欠測区間とする
+(2) 欠測区間毎に1行の区切り行 (観測値は NaN) を挿入し、プロットの線を欠測区間で途切れさせる
+    ※出力用の配列は列毎に1回だけ確保し、行毎のPythonループは使わない
+"""
+
+# 欠測とみなす測定間隔のデフォルト (分) ※センサーの測定間隔は約10分
+DEFAULT_GAP_MINUTES: int = 30
+# 欠測区間の塗りつぶしスタイル
+GAP_SHADE_STYLE: Dict = {'alpha': 0.15, 'linewidth': 0.}
+
+
+def gap_threshold(gap_minutes: int, bucket_seconds: int = 0) -> Optional[pd.Timedelta]:
+    """
+    欠測とみなす測定間隔を取得する ※集計データは集計間隔未満にならないようにする
+    :param gap_minutes: 欠測とみなす測定間隔 (分) ※0以下なら欠測を検出しない
+    :param bucket_seconds: 集計間隔 (秒) ※0なら観測データのまま
+    :return: 欠測とみなす測定間隔 ※欠測を検出しない場合はNone
+    """
+    if gap_minutes <= 0:
+        return None
+    return pd.Timedelta(seconds=max(gap_minutes * 60, bucket_seconds))
+
+
+def find_gaps(times: np.ndarray, threshold: pd.Timedelta) -> np.ndarray:
+    """
+    欠測区間の直前の行位置を検出する
+    :param times: 測定時刻の配列 (datetime64, 昇順)
+    :param threshold: 欠測とみなす測定間隔
+    :return: 次の行との間隔が閾値を超える行位置の配列
+    """
+    epochs: np.ndarray = times.astype("datetime64[ns]").view(np.int64)
+    return np.flatnonzero(np.diff(epochs) > threshold.value)
+
+
+def gap_intervals(times: np.ndarray, gaps: np.ndarray) -> np.ndarray:
+    """
+    欠測区間 (開始時刻, 終了時刻) を取得する
+    :param times: 測定時刻の配列 (datetime64, 昇順)
+    :param gaps: 欠測区間の直前の行位置の配列 (find_gaps)
+    :return: 欠測区間の配列 (欠測区間数 × 2) ※欠測前の最終測定時刻, 欠測後の最初の測定時刻
+    """
+    return np.column_stack([times[gaps], times[gaps + 1]])
+
+
+def _break_values(values: np.ndarray, gaps: np.ndarray) -> Tuple[np.ndarray, object]:
+    """
+    列の出力用の型と区切り行の値を取得する
+    :param values: 列の配列
+    :param gaps: 欠測区間の直前の行位置の配列
+    :return: (出力用の型に変換した配列, 区切り行の値) ※時刻列は欠測区間の中間時刻
+    """
+    if np.issubdtype(values.dtype, np.datetime64):
+        # 時刻列の区切り行は欠測区間の中間時刻 (X軸の順序を保つ)
+        return values, values[gaps] + (values[gaps + 1] - values[gaps]) // 2
+    if np.issubdtype(values.dtype, np.floating):
+        # 省メモリ型 (float32) はそのまま
+        return values, np.nan
+    if np.issubdtype(values.dtype, np.number) or values.dtype == np.bool_:
+        return values.astype(np.float64, copy=False), np.nan
+    return values.astype(object, copy=False), None
+
+
+def insert_gap_breaks(df: DataFrame, col_time: str,
+                      threshold: Optional[pd.Timedelta]) -> Tuple[DataFrame, np.ndarray]:
+    """
+    欠測区間毎に区切り行 (観測値は NaN) を挿入したDataFrameと欠測区間を取得する
+    :param df: 観測データのDataFrame (測定時刻の昇順)
+    :param col_time: 測定時刻列名
+    :param threshold: 欠測とみなす測定間隔 ※Noneなら欠測を検出しない
+    :return: (区切り行を挿入したDataFrame, 欠測区間の配列) ※欠測が無ければ元のDataFrame
+    """
+    times: np.ndarray = df[col_time].to_numpy()
+    if threshold is None or times.shape[0] < 2:
+        return df, np.empty((0, 2), dtype=times.dtype)
+
+    gaps: np.ndarray = find_gaps(times, threshold)
+    intervals: np.ndarray = gap_intervals(times, gaps)
+    if gaps.shape[0] == 0:
+        return df, intervals
+
+    rows: int = times.shape[0]
+    # 元の行の出力位置: 直前までの欠測区間の数だけ後ろにずらす
+    shift: np.ndarray = np.zeros(rows, dtype=np.int64)
+    shift[gaps + 1] = 1
+    dest: np.ndarray = np.arange(rows) + np.cumsum(shift)
+    # 区切り行の出力位置: 欠測区間の直後の行の直前
+    break_rows: np.ndarray = dest[gaps + 1] - 1
+    columns: Dict[str, np.ndarray] = {}
+    for col_name in df.columns:
+        values, break_value = _break_values(df[col_name].to_numpy(), gaps)
+        out: np.ndarray = np.empty(rows + gaps.shape[0], dtype=values.dtype)
+        out[dest] = values
+        out[break_rows] = break_value
+        columns[col_name] = out
+    return pd.DataFrame(columns, columns=df.columns), intervals
+
+
+def shade_gaps(plot_axes: Axes, intervals: np.ndarray, s_color: str) -> None:
+    """
+    欠測区間を塗りつぶす
+    :param plot_axes: プロット領域
+    :param intervals: 欠測区間の配列 (insert_gap_breaks)
+    :param s_color: 塗りつぶしカラー
+    """
+    for gap_start, gap_end in intervals:
+        plot_axes.axvspan(gap_start, gap_end, color=s_color, **GAP_SHADE_STYLE)
@@ -0,0 +1,107 @@
+from typing import Any, Callable, Sequence, Union
+
+import pandas as pd
+from pandas import DataFrame, Series
+
+"""
+DataFrame・大きなリストの遅延ログ出力ユーティリティ
+(1) frame_summary(), seq_summary() はログ出力時 (ログレベルが有効な場合のみ) に文字列化するオブジェクトを返す
+    (例) app_logger.info(frame_summary(df, "df_main"))
+    ※f-string で埋め込むとログレベルに関わらず呼び出し時にDataFrame全体が文字列化される
+(2) 既定では要約 (件数, データ型, 先頭・末尾) のみを出力する
+(3) set_full_dump(True) (各スクリプトの --debug-dump) で全行・全要素を出力する
+"""
+
+# 要約時に出力する先頭・末尾の行数 (DataFrame, Series)
+SUMMARY_EDGE_ROWS: int = 3
+# 要約時に出力する先頭・末尾の要素数 (リスト, 配列)
+SUMMARY_EDGE_ITEMS: int = 5
+
+# 全行・全要素を出力するか ※--debug-dump
+_full_dump: bool = False
+
+
+def set_full_dump(enabled: bool) -> None:
+    """
+    全行・全要素の出力の有効/無効を設定する
+    :param enabled: 全行・全要素を出力するなら True
+    """
+    global _full_dump
+    _full_dump = enabled
+
+
+class LazyLog:
+    """ ログ出力時に文字列化するオブジェクト ※ロガーはメッセージを出力時のみ str() で文字列化する """
+    __slots__ = ("_format", "_args")
+
+    def __init__(self, format_func: Callable[..., str], *args):
+        """
+        :param format_func: 文字列化関数
+        :param args: 文字列化関数の引数
+        """
+        self._format: Callable[..., str] = format_func
+        self._args = args
+
+    def __str__(self) -> str:
+        return self._format(*self._args)
+
+
+def format_frame(df: Union[DataFrame, Series], name: str) -> str:
+    """
+    DataFrame (Series) を文字列化する ※既定では要約のみ
+    :param df: DataFrame または Series
+    :param name: 変数名等の見出し
+    :return: 要約 (件数, データ型, 先頭・末尾の行) または全行の文字列
+    """
+    if _full_dump:
+        with pd.option_context("display.max_rows", None, "display.max_columns", None):
+            return f"{name}: shape={df.shape}\n{df}"
+
+    if isinstance(df, DataFrame):
+        dtypes: str = ", ".join(f"{col}={dtype}" for col, dtype in df.dtypes.items())
+    else:
+        dtypes = str(df.dtype)
+    header: str = f"{name}: shape={df.shape}, dtypes: {dtypes}"
+    if len(df) <= SUMMARY_EDGE_ROWS * 2:
+        return f"{header}\n{df.to_string()}"
+
+    return f"{header}\nhead:\n{df.head(SUMMARY_EDGE_ROWS).to_string()}" \
+           f"\ntail:\n{df.tail(SUMMARY_EDGE_ROWS).to_string()}"
+
+
+def format_seq(values: Sequence[Any], name: str) -> str:
+    """
+    リスト・配列 (np.ndarray, pd.Index を含む) を文字列化する ※既定では要約のみ
+    :param values: リストまたは配列
+    :param name: 変数名等の見出し
+    :return: 要約 (要素数, 先頭・末尾の要素) または全要素の文字列
+    """
+    size: int = len(values)
+    dtype = getattr(values, "dtype", None)
+    header: str = f"{name}: len={size}" + (f", dtype={dtype}" if dtype is not None else "")
+    if _full_dump or size <= SUMMARY_EDGE_ITEMS * 2:
+        items: str = ", ".join(str(val) for val in values)
+    else:
+        items = ", ".join(str(val) for val in values[:SUMMARY_EDGE_ITEMS]) + ", ..., " + \
+                ", ".join(str(val) for val in values[-SUMMARY_EDGE_ITEMS:])
+    return f"{header}\n[{items}]"
+
+
+def frame_summary(df: Union[DataFrame, Series], name: str = "") -> LazyLog:
+    """
+    DataFrame (Series) をログ出力時に要約するオブジェクトを生成する
+    :param df: DataFrame または Series
+    :param name: 変数名等の見出し
+    :return: 遅延ログオブジェクト
+    """
+    return LazyLog(format_frame, df, name)
+
+
+def seq_summary(values: Sequence[Any], name: str = "") -> LazyLog:
+    """
+    リスト・配列をログ出力時に要約するオブジェクトを生成する
+    :param values: リストまたは配列
+    :param name: 変数名等の見出し
+    :return: 遅延ログオブジェクト
+    """
+    return LazyLog(format_seq, values, name)
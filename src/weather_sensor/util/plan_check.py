@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import text
+
+"""
+PostgreSQLの実行計画 (EXPLAIN FORMAT JSON) チェックユーティリティ
+(1) シーケンシャルスキャン (Seq Scan) の検出 ※小さいマスターテーブルは除外可能
+(2) 行数見積もりの爆発の検出
+  (a) 結合ノードの見積もり行数が入力ノードの見積もり行数を大きく超える (直積に近い結合)
+  (b) EXPLAIN ANALYZE 時: 実際の行数と見積もり行数の乖離
+      ※Limit の配下, セミ結合・アンチ結合の内側 (EXISTS 等) は最初の行で実行を打ち切るため除外する
+"""
+
+# 結合ノード種別
+JOIN_NODE_TYPES: Set[str] = {"Nested Loop", "Hash Join", "Merge Join"}
+# シーケンシャルスキャンノード種別
+SEQ_SCAN_NODE_TYPES: Set[str] = {"Seq Scan", "Parallel Seq Scan"}
+# 内側の実行を最初の行で打ち切る結合種別
+EARLY_STOP_JOIN_TYPES: Set[str] = {"Semi", "Anti"}
+# 見積もり行数の爆発とみなす倍率
+DEFAULT_BLOWUP_RATIO: float = 10.
+
+
+@dataclass
+class PlanWarning:
+    """ 実行計画の警告を保持するデータクラス """
+    nodeType: str
+    relationName: Optional[str]
+    message: str
+
+
+def explain(conn: Connection, sql: str, params: Dict, analyze: bool = False) -> Dict:
+    """
+    選択クエリーの実行計画を JSON形式で取得する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param sql: 選択クエリー (名前付きパラメータ ":name" 形式)
+    :param params: クエリーパラメータ
+    :param analyze: True なら EXPLAIN ANALYZE (実際にクエリーを実行する)
+    :return: 実行計画の辞書オブジェクト ("Plan" キーを含む)
+    """
+    options: str = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = conn.execute(text(f"EXPLAIN ({options}) {sql}"), params).scalar()
+    # psycopg2 は json型を Pythonオブジェクトに変換済み: [{"Plan": {...}, ...}]
+    return result[0]
+
+
+def walk_plan(node: Dict, depth: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """
+    実行計画ノードを深さ優先で走査する
+    :param node: 実行計画ノード
+    :param depth: ノードの深さ
+    :return: (深さ, ノード) のイテレータ
+    """
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child, depth + 1)
+
+
+def early_stop_nodes(node: Dict, stopped: bool = False) -> Set[int]:
+    """
+    途中で実行を打ち切るノード (Limit の配下, セミ結合・アンチ結合の内側) を取得する
+    :param node: 実行計画ノード
+    :param stopped: 親ノードが実行を打ち切る場合はTrue
+    :return: ノードの id() のセット
+    """
+    node_ids: Set[int] = {id(node)} if stopped else set()
+    for child in node.get("Plans", []):
+        child_stopped: bool = stopped or node["Node Type"] == "Limit" or (
+            node.get("Join Type") in EARLY_STOP_JOIN_TYPES
+            and child.get("Parent Relationship") == "Inner"
+        )
+        node_ids |= early_stop_nodes(child, child_stopped)
+    return node_ids
+
+
+def check_plan(plan: Dict,
+               ignore_relations: Optional[Set[str]] = None,
+               blowup_ratio: float = DEFAULT_BLOWUP_RATIO) -> List[PlanWarning]:
+    """
+    実行計画からシーケンシャルスキャンと行数見積もりの爆発を検出する
+    :param plan: explain() で取得した実行計画
+    :param ignore_relations: シーケンシャルスキャンを許容するテーブル名 (小さいマスターテーブル)
+    :param blowup_ratio: 見積もり行数の爆発とみなす倍率
+    :return: 警告リスト
+    """
+    ignores: Set[str] = ignore_relations or set()
+    warnings: List[PlanWarning] = []
+    stopped_nodes: Set[int] = early_stop_nodes(plan["Plan"])
+    for _, node in walk_plan(plan["Plan"]):
+        node_type: str = node["Node Type"]
+        relation: Optional[str] = node.get("Relation Name")
+        plan_rows: float = node.get("Plan Rows", 0)
+        # (1) シーケンシャルスキャン
+        if node_type in SEQ_SCAN_NODE_TYPES and relation not in ignores:
+            warnings.append(PlanWarning(
+                node_type, relation,
+                f"sequential scan on {relation} (estimated rows={plan_rows:.0f})"))
+        # (2-a) 結合ノードの見積もり行数が入力を大きく超える
+        if node_type in JOIN_NODE_TYPES:
+            child_rows: List[float] = [child.get("Plan Rows", 0) for child in node.get("Plans", [])]
+            max_child_rows: float = max(child_rows) if child_rows else 0
+            if max_child_rows > 0 and plan_rows > max_child_rows * blowup_ratio:
+                warnings.append(PlanWarning(
+                    node_type, relation,
+                    f"join estimate blowup: rows={plan_rows:.0f}, max input rows={max_child_rows:.0f}"))
+        # (2-b) EXPLAIN ANALYZE: 実際の行数と見積もり行数の乖離
+        if "Actual Rows" in node and id(node) not in stopped_nodes:
+            loops: float = node.get("Actual Loops", 1) or 1
+            actual_rows: float = node["Actual Rows"] * loops
+            estimated_rows: float = max(plan_rows * loops, 1)
+            ratio: float = max(actual_rows, 1) / estimated_rows
+            if ratio > blowup_ratio or ratio < 1. / blowup_ratio:
+                warnings.append(PlanWarning(
+                    node_type, relation,
+                    f"row misestimate: estimated={estimated_rows:.0f}, actual={actual_rows:.0f}"))
+    return warnings
+
+
+def format_plan(plan: Dict) -> str:
+    """
+    実行計画をインデント付きのテキストに整形する (ログ出力用)
+    :param plan: explain() で取得した実行計画
+    :return: 整形済み実行計画
+    """
+    lines: List[str] = []
+    for depth, node in walk_plan(plan["Plan"]):
+        relation: str = f" on {node['Relation Name']}" if "Relation Name" in node else ""
+        index: str = f" using {node['Index Name']}" if "Index Name" in node else ""
+        actual: str = ""
+        if "Actual Rows" in node:
+            actual = f" (actual rows={node['Actual Rows']} loops={node.get('Actual Loops', 1)})"
+        lines.append(
+            f"{'  ' * depth}-> {node['Node Type']}{relation}{index}"
+            f" (cost={node.get('Total Cost', 0):.2f} rows={node.get('Plan Rows', 0)}){actual}"
+        )
+    return "\n".join(lines)
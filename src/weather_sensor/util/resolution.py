@@ -0,0 +1,73 @@
+from typing import Dict, List
+
+"""
+気象観測データの集計間隔 (--resolution) の定義
+(1) raw 以外は集計間隔毎の平均値・最小値・最大値をSQLで集計して取得する
+    平均値は元の列名, 最小値・最大値は列名 + "_min", "_max" の列とする
+(2) 集計時刻 (各間隔の開始時刻)
+    PostgreSQL: timestamp の epoch を集計間隔で切り捨てる (date_trunc を任意の間隔に一般化したもの)
+    SQLite3: unix timestamp (整数) を集計間隔で整数除算する ※日単位は日本時間の0時に揃える
+"""
+
+# 集計なし (観測データをそのまま取得)
+RESOLUTION_RAW: str = "raw"
+# 集計間隔 (秒)
+RESOLUTION_SECONDS: Dict[str, int] = {
+    RESOLUTION_RAW: 0,
+    "10min": 600,
+    "hourly": 3600,
+    "3h": 3 * 3600,
+    "daily": 24 * 3600,
+}
+RESOLUTION_CHOICES: List[str] = list(RESOLUTION_SECONDS.keys())
+# 集計対象の観測データ列
+VALUE_COLUMNS: List[str] = ["temp_out", "humid", "pressure"]
+# 最小値・最大値列の接尾辞
+SUFFIX_MIN: str = "_min"
+SUFFIX_MAX: str = "_max"
+# 日本時間のUTCからの時差 (秒) ※SQLite3の unix timestamp を日本時間の日単位に揃える
+JST_OFFSET_SECONDS: int = 9 * 3600
+
+# 集計列 (平均値, 最小値, 最大値) のSELECT句
+AGGREGATE_COLUMNS: str = "\n   ,".join(
+    f"avg({col}) AS {col}, min({col}) AS {col}{SUFFIX_MIN}, max({col}) AS {col}{SUFFIX_MAX}"
+    for col in VALUE_COLUMNS
+)
+# PostgreSQL: timestamp を集計間隔 (秒) で切り捨てる式 ※{seconds}: パラメータ
+FMT_PG_BUCKET_TIME: str = \
+    "to_timestamp(floor(extract(epoch FROM measurement_time) / {seconds}) * {seconds})" \
+    " AT TIME ZONE 'UTC'"
+# SQLite3: unix timestamp を日本時間基準で集計間隔 (秒) で切り捨てる式 ※{seconds}, {offset}: パラメータ
+FMT_SQLITE_BUCKET_EPOCH: str = \
+    "((measurement_time + {offset}) / {seconds}) * {seconds} - {offset}"
+
+
+def bucket_seconds(resolution: str) -> int:
+    """
+    集計間隔の秒数を取得する
+    :param resolution: 集計間隔 (RESOLUTION_CHOICES)
+    :return: 秒数 ※raw は 0
+    :raise ValueError: 未定義の集計間隔
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise ValueError(f"Invalid resolution: {resolution}")
+
+    return RESOLUTION_SECONDS[resolution]
+
+
+def min_column(col_name: str) -> str:
+    """
+    最小値列名を取得する
+    :param col_name: 観測データ列名
+    :return: 最小値列名
+    """
+    return col_name + SUFFIX_MIN
+
+
+def max_column(col_name: str) -> str:
+    """
+    最大値列名を取得する
+    :param col_name: 観測データ列名
+    :return: 最大値列名
+    """
+    return col_name + SUFFIX_MAX
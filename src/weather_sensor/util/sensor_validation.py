@@ -0,0 +1,173 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas.core.frame import DataFrame
+
+from util.resolution import max_column, min_column
+
+"""
+観測データの妥当性チェック (読み込み時)
+(1) 物理的な範囲外の値 ※集計データは最小値・最大値列もチェックする
+(2) スパイク: 前後の測定値の移動中央値からの偏差が 移動MAD (中央絶対偏差) の一定倍を超える値
+    ※移動窓は numpy の sliding_window_view (ストライド) で行毎のPythonループを使わずに計算する
+(3) 不正値の処理方法 (--validate)
+    mask: NaN に置き換える, drop: 不正値を含む行を除く, flag: 不正値フラグ列を追加する, off: チェックしない
+"""
+
+# 不正値の処理方法
+POLICY_MASK: str = "mask"
+POLICY_DROP: str = "drop"
+POLICY_FLAG: str = "flag"
+POLICY_OFF: str = "off"
+POLICY_CHOICES: List[str] = [POLICY_MASK, POLICY_DROP, POLICY_FLAG, POLICY_OFF]
+# 観測項目毎の物理的な範囲 (下限, 上限) ※センサーの測定範囲
+VALID_RANGES: Dict[str, Tuple[float, float]] = {
+    'temp_out': (-40., 50.),
+    'humid': (0., 100.),
+    'pressure': (900., 1100.),
+}
+# スパイク判定の移動窓の行数 (奇数: 前後3行 ※測定間隔が約10分なら約1時間)
+SPIKE_WINDOW: int = 7
+# スパイクとみなす偏差 (移動MADの倍数) ※MADは正規分布の標準偏差相当に換算する
+SPIKE_MAD_FACTOR: float = 5.
+MAD_TO_SIGMA: float = 1.4826
+# 観測項目毎のスパイクとみなす最小偏差 ※移動MADが小さい (値が一定) 区間の誤検出を防ぐ
+SPIKE_MIN_DEVIATIONS: Dict[str, float] = {
+    'temp_out': 8.,
+    'humid': 15.,
+    'pressure': 5.,
+}
+# 不正値フラグ列の接尾辞
+SUFFIX_INVALID: str = "_invalid"
+# 件数のキー
+COUNT_RANGE: str = "range"
+COUNT_SPIKE: str = "spike"
+
+
+def flag_column(col_name: str) -> str:
+    """
+    不正値フラグ列名を取得する
+    :param col_name: 観測データ列名
+    :return: 不正値フラグ列名
+    """
+    return col_name + SUFFIX_INVALID
+
+
+def out_of_range(values: np.ndarray, col_name: str) -> np.ndarray:
+    """
+    物理的な範囲外の値を判定する ※欠損値は範囲内とする
+    :param values: 観測値の配列
+    :param col_name: 観測項目列名 (VALID_RANGES のキー)
+    :return: 範囲外ならTrueの配列
+    """
+    lo, hi = VALID_RANGES[col_name]
+    return (values < lo) | (values > hi)
+
+
+def _fill_forward(values: np.ndarray) -> np.ndarray:
+    """
+    欠損値を直前の値 (先頭の欠損値は最初の値) で埋める ※np.nanmedian より np.median が高速なため
+    :param values: 観測値の配列 (float64)
+    :return: 欠損値を埋めた配列 ※欠損値が無ければ元の配列
+    """
+    is_nan: np.ndarray = np.isnan(values)
+    if not is_nan.any():
+        return values
+
+    positions: np.ndarray = np.where(is_nan, 0, np.arange(values.shape[0]))
+    np.maximum.accumulate(positions, out=positions)
+    filled: np.ndarray = values[positions]
+    filled[np.isnan(filled)] = values[np.argmax(~is_nan)]
+    return filled
+
+
+def find_spikes(values: np.ndarray, col_name: str, window: int = SPIKE_WINDOW) -> np.ndarray:
+    """
+    移動中央値と移動MADからスパイクを判定する ※欠損値は除いて計算する
+    :param values: 観測値の配列 (float64)
+    :param col_name: 観測項目列名 (SPIKE_MIN_DEVIATIONS のキー)
+    :param window: 移動窓の行数 (奇数)
+    :return: スパイクならTrueの配列
+    """
+    if values.shape[0] < window or np.isnan(values).all():
+        return np.zeros(values.shape[0], dtype=bool)
+
+    half: int = window // 2
+    # 両端は端の値で埋めて全行を窓の中心とする (行数 × 窓の行数 のビュー, コピーしない)
+    padded: np.ndarray = np.pad(_fill_forward(values), half, mode="edge")
+    windows: np.ndarray = sliding_window_view(padded, window)
+    median: np.ndarray = np.median(windows, axis=1)
+    mad: np.ndarray = np.median(np.abs(windows - median[:, None]), axis=1)
+    # 欠損値の行は比較結果が False になる
+    limit: np.ndarray = np.maximum(SPIKE_MAD_FACTOR * MAD_TO_SIGMA * mad,
+                                   SPIKE_MIN_DEVIATIONS[col_name])
+    return np.abs(values - median) > limit
+
+
+def find_invalid(values: np.ndarray, col_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    範囲外の値とスパイクを判定する ※スパイクは範囲外の値を除いて判定する
+    :param values: 観測値の配列 (float64, 測定時刻の昇順)
+    :param col_name: 観測項目列名 (VALID_RANGES のキー)
+    :return: (範囲外ならTrueの配列, スパイクならTrueの配列)
+    """
+    range_mask: np.ndarray = out_of_range(values, col_name)
+    spike_mask: np.ndarray = find_spikes(np.where(range_mask, np.nan, values), col_name)
+    return range_mask, spike_mask
+
+
+def validate_readings(df: DataFrame, policy: str = POLICY_MASK,
+                      logger: Optional[logging.Logger] = None
+                      ) -> Tuple[DataFrame, Dict[str, Dict[str, int]]]:
+    """
+    観測データの範囲外の値とスパイクを検出し、処理方法に従って処理する
+    :param df: 観測データのDataFrame (測定時刻の昇順)
+    :param policy: 不正値の処理方法 (POLICY_CHOICES)
+    :param logger: application logger
+    :return: (処理後のDataFrame, 観測項目列名をキーとする不正値の件数 {range: 件数, spike: 件数})
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    if policy == POLICY_OFF or df.shape[0] == 0:
+        return df, counts
+
+    # 列名をキーとする不正値の判定結果 (集計データは最小値・最大値列を含む)
+    invalid_masks: Dict[str, np.ndarray] = {}
+    # 観測項目列名をキーとする行毎の不正値フラグ (最小値・最大値列の不正値を含む)
+    row_flags: Dict[str, np.ndarray] = {}
+    for col_name in VALID_RANGES:
+        if col_name not in df.columns:
+            continue
+
+        range_mask, spike_mask = find_invalid(df[col_name].to_numpy(dtype=np.float64), col_name)
+        invalid_masks[col_name] = range_mask | spike_mask
+        row_flag: np.ndarray = invalid_masks[col_name]
+        # 集計データの最小値・最大値列は範囲外の値のみ
+        for envelope_col in (min_column(col_name), max_column(col_name)):
+            if envelope_col in df.columns:
+                envelope_mask: np.ndarray = out_of_range(
+                    df[envelope_col].to_numpy(dtype=np.float64), col_name)
+                invalid_masks[envelope_col] = envelope_mask
+                range_mask = range_mask | envelope_mask
+                row_flag = row_flag | envelope_mask
+        row_flags[col_name] = row_flag
+        counts[col_name] = {COUNT_RANGE: int(range_mask.sum()), COUNT_SPIKE: int(spike_mask.sum())}
+
+    if logger is not None:
+        logger.info(f"validation({policy}): {counts}")
+    if not any(flag.any() for flag in row_flags.values()):
+        return df, counts
+
+    if policy == POLICY_DROP:
+        any_invalid: np.ndarray = np.logical_or.reduce(list(row_flags.values()))
+        return df.loc[~any_invalid].reset_index(drop=True), counts
+
+    df = df.copy()
+    if policy == POLICY_FLAG:
+        for col_name, row_flag in row_flags.items():
+            df[flag_column(col_name)] = row_flag
+    else:
+        for col_name, mask in invalid_masks.items():
+            df.loc[mask, col_name] = np.nan
+    return df, counts
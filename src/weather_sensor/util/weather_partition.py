@@ -0,0 +1,265 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import text
+
+from util.plan_check import walk_plan
+
+"""
+月単位のレンジパーティション (weather.t_weather_YYYYMM) の観測データテーブル用ユーティリティ
+[テーブル定義・移行] sql/12_weather_partitioned.sql
+(1) 観測データの登録時に測定時刻を含む月のパーティションを作成する (ensure_partitions, insert_weather_rows)
+    ※作成済みの月はプロセス内で保持し、新しい月のみデータベースの関数を呼び出す
+(2) 実行計画から読み込んだパーティションを取得する (パーティションプルーニングの確認)
+    ※期間と重なるパーティション (spanned_partitions) と比較する
+(3) 任意のスキーマに同じ構成のテーブルを作成する (ベンチマーク用)
+"""
+
+# 観測データのスキーマ
+SCHEMA: str = "weather"
+# パーティション名の接頭辞 (接尾辞: 年月 YYYYMM)
+PARTITION_PREFIX: str = "t_weather_"
+FMT_PARTITION_SUFFIX: str = "%Y%m"
+# パーティション作成関数の呼び出しSQL
+QUERY_ENSURE_PARTITION: str = """
+SELECT {schema}.ensure_t_weather_partition(CAST(:monthStart AS timestamp))
+"""
+# 期間の月パーティションを作成するSQL
+CREATE_RANGE_PARTITIONS: str = """
+SELECT {schema}.ensure_t_weather_partition(m)
+FROM generate_series(
+  date_trunc('month', CAST(:startTime AS timestamp)), CAST(:endTime AS timestamp), interval '1 month') m
+"""
+# 観測データテーブルがパーティションテーブルか判定するSQL
+QUERY_IS_PARTITIONED: str = """
+SELECT count(*) FROM pg_partitioned_table pt
+  INNER JOIN pg_class c ON pt.partrelid = c.oid
+  INNER JOIN pg_namespace n ON c.relnamespace = n.oid
+WHERE n.nspname=:schema AND c.relname='t_weather'
+"""
+# 観測データテーブルのパーティション名を取得するSQL
+QUERY_PARTITIONS: str = """
+SELECT c.relname FROM pg_inherits i
+  INNER JOIN pg_class c ON i.inhrelid = c.oid
+WHERE i.inhparent = to_regclass(:schema || '.t_weather')
+ORDER BY c.relname
+"""
+# 観測データ登録SQL ※登録済みの測定時刻は無視する
+INSERT_WEATHER: str = """
+INSERT INTO {schema}.t_weather(did, measurement_time, temp_out, temp_in, humid, pressure)
+VALUES (:did, :measurement_time, :temp_out, :temp_in, :humid, :pressure)
+ON CONFLICT (did, measurement_time) DO NOTHING
+"""
+# パーティションテーブル生成SQL (sql/12_weather_partitioned.sql と同じ構成)
+CREATE_PARTITIONED_TABLES: List[str] = [
+    """
+CREATE TABLE {schema}.t_device(
+   id INTEGER NOT NULL,
+   name VARCHAR(20) UNIQUE NOT NULL,
+   CONSTRAINT pk_device PRIMARY KEY (id)
+)
+""",
+    """
+CREATE TABLE {schema}.t_weather(
+   did INTEGER NOT NULL,
+   measurement_time timestamp NOT NULL,
+   temp_out REAL,
+   temp_in REAL,
+   humid REAL,
+   pressure REAL,
+   CONSTRAINT pk_weather PRIMARY KEY (did, measurement_time),
+   CONSTRAINT fk_device FOREIGN KEY (did) REFERENCES {schema}.t_device (id)
+) PARTITION BY RANGE (measurement_time)
+""",
+    """
+CREATE INDEX idx_weather_time_brin ON {schema}.t_weather
+   USING brin (measurement_time) WITH (pages_per_range = 8)
+""",
+    """
+CREATE OR REPLACE FUNCTION {schema}.ensure_t_weather_partition(ts timestamp) RETURNS text AS $$
+DECLARE
+  month_start timestamp := date_trunc('month', ts);
+  part_name text := 't_weather_' || to_char(date_trunc('month', ts), 'YYYYMM');
+BEGIN
+  IF to_regclass('{schema}.' || part_name) IS NULL THEN
+    BEGIN
+      EXECUTE format(
+        'CREATE TABLE {schema}.%I PARTITION OF {schema}.t_weather FOR VALUES FROM (%L) TO (%L)',
+        part_name, month_start, month_start + interval '1 month');
+    EXCEPTION WHEN duplicate_table THEN
+      NULL;
+    END;
+  END IF;
+  RETURN part_name;
+END;
+$$ LANGUAGE plpgsql
+""",
+]
+
+# 作成済みのパーティション (スキーマ, 月初日時)
+_known_months: Set[Tuple[str, datetime]] = set()
+
+
+def month_start(measurement_time: datetime) -> datetime:
+    """
+    測定時刻を含む月の月初日時を取得する
+    :param measurement_time: 測定時刻
+    :return: 月初日時
+    """
+    return measurement_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month_start(measurement_time: datetime) -> datetime:
+    """
+    測定時刻を含む月の翌月の月初日時を取得する
+    :param measurement_time: 測定時刻
+    :return: 翌月の月初日時
+    """
+    start: datetime = month_start(measurement_time)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(measurement_time: datetime) -> str:
+    """
+    測定時刻を含む月のパーティション名を取得する
+    :param measurement_time: 測定時刻
+    :return: パーティション名 t_weather_YYYYMM
+    """
+    return PARTITION_PREFIX + measurement_time.strftime(FMT_PARTITION_SUFFIX)
+
+
+def ensure_partitions(conn: Connection, times: Iterable[datetime], schema: str = SCHEMA) -> List[str]:
+    """
+    測定時刻を含む月のパーティションが無ければ作成する\n
+    ※呼び出し側のトランザクションをロールバックした場合は clear_known_partitions() を呼び出すこと
+    :param conn: SQLAlchemy接続オブジェクト
+    :param times: 測定時刻
+    :param schema: スキーマ
+    :return: このプロセスで初めて確認したパーティション名リスト
+    """
+    months: List[datetime] = sorted(
+        {month_start(t) for t in times} - {month for sch, month in _known_months if sch == schema}
+    )
+    names: List[str] = []
+    for month in months:
+        names.append(conn.execute(
+            text(QUERY_ENSURE_PARTITION.format(schema=schema)), {"monthStart": month}).scalar())
+        _known_months.add((schema, month))
+    return names
+
+
+def is_partitioned(conn: Connection, schema: str = SCHEMA) -> bool:
+    """
+    観測データテーブルがパーティションテーブルか判定する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param schema: スキーマ
+    :return: パーティションテーブルならTrue
+    """
+    return conn.execute(text(QUERY_IS_PARTITIONED), {"schema": schema}).scalar() > 0
+
+
+def list_partitions(conn: Connection, schema: str = SCHEMA) -> List[str]:
+    """
+    観測データテーブルのパーティション名を取得する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param schema: スキーマ
+    :return: パーティション名リスト ※単一テーブルなら空
+    """
+    return [row[0] for row in conn.execute(text(QUERY_PARTITIONS), {"schema": schema})]
+
+
+def ensure_range_partitions(conn: Connection, start_time: str, end_time: str,
+                            schema: str = SCHEMA) -> List[str]:
+    """
+    期間の月パーティションが無ければ作成する (一括登録用)
+    :param conn: SQLAlchemy接続オブジェクト
+    :param start_time: 期間の開始時刻
+    :param end_time: 期間の終了時刻
+    :param schema: スキーマ
+    :return: 期間のパーティション名リスト
+    """
+    rs = conn.execute(text(CREATE_RANGE_PARTITIONS.format(schema=schema)),
+                      {"startTime": start_time, "endTime": end_time})
+    return [row[0] for row in rs]
+
+
+def spanned_partitions(start_time: datetime, end_time: datetime) -> List[str]:
+    """
+    期間 [開始時刻, 終了時刻) と重なる月パーティション名を取得する ※パーティションの有無は確認しない
+    :param start_time: 期間の開始時刻
+    :param end_time: 期間の終了時刻 (含まない)
+    :return: パーティション名リスト (月の昇順)
+    """
+    names: List[str] = []
+    month: datetime = month_start(start_time)
+    while month < end_time:
+        names.append(partition_name(month))
+        month = next_month_start(month)
+    return names
+
+
+def covered_partitions(start_time: datetime, end_time: datetime) -> List[str]:
+    """
+    境界 (月初〜翌月初) が期間 [開始時刻, 終了時刻) に含まれる月パーティション名を取得する\n
+    ※パーティション全体を読み込むためシーケンシャルスキャンが最適なパーティション
+    :param start_time: 期間の開始時刻
+    :param end_time: 期間の終了時刻 (含まない)
+    :return: パーティション名リスト (月の昇順)
+    """
+    names: List[str] = []
+    month: datetime = month_start(start_time)
+    while next_month_start(month) <= end_time:
+        if month >= start_time:
+            names.append(partition_name(month))
+        month = next_month_start(month)
+    return names
+
+
+def clear_known_partitions() -> None:
+    """ 作成済みのパーティションの記録を破棄する """
+    _known_months.clear()
+
+
+def insert_weather_rows(conn: Connection, rows: List[Dict], schema: str = SCHEMA) -> int:
+    """
+    観測データを登録する ※測定時刻を含む月のパーティションが無ければ作成する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param rows: 観測データの辞書リスト (did, measurement_time, temp_out, temp_in, humid, pressure)
+    :param schema: スキーマ
+    :return: 登録件数 ※登録済みの測定時刻は含まない
+    """
+    if len(rows) == 0:
+        return 0
+
+    ensure_partitions(conn, (row["measurement_time"] for row in rows), schema=schema)
+    return conn.execute(text(INSERT_WEATHER.format(schema=schema)), rows).rowcount
+
+
+def create_partitioned_tables(conn: Connection, schema: str) -> None:
+    """
+    スキーマにデバイステーブルと月パーティションの観測データテーブルを作成する
+    :param conn: SQLAlchemy接続オブジェクト
+    :param schema: スキーマ ※作成済みであること
+    """
+    for ddl in CREATE_PARTITIONED_TABLES:
+        conn.execute(text(ddl.format(schema=schema)))
+
+
+def scanned_partitions(plan: Dict) -> List[str]:
+    """
+    実行計画から読み込む観測データのテーブル (パーティション) を取得する\n
+    EXPLAIN ANALYZE の場合は実行時に除外されたパーティション (never executed) を含まない
+    :param plan: explain() で取得した実行計画
+    :return: テーブル名リスト (重複なし, 実行計画の順)
+    """
+    names: List[str] = []
+    for _, node in walk_plan(plan["Plan"]):
+        relation: str = node.get("Relation Name", "")
+        if node.get("Actual Loops", 1) == 0:
+            continue
+        if relation.startswith("t_weather") and relation not in names:
+            names.append(relation)
+    return names